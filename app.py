@@ -5,7 +5,6 @@ Hauptanwendung für den FEMM-Simulationskonfigurator.
 import logging
 import json
 import os
-import math
 import time
 import pandas as pd
 
@@ -19,7 +18,9 @@ from server.measurements import measurements_bp
 from server.utils import (
     load_csv,
     calculate_position_steps,
-    calculate_label_positions,
+    add_details_to_assembly,
+    add_details_to_standalone,
+    build_simulation_run,
     sanitize_filename,
 )
 from server import db
@@ -286,71 +287,10 @@ def generate_simulation():
     with app.app_context():
         library_data = get_library_from_db()
 
-    active_assemblies = [
-        a for a in data.get("assemblies", []) if a.get("enabled", True)
-    ]
-    active_standalone = [
-        c for c in data.get("standAloneComponents", []) if c.get("enabled", True)
-    ]
-    sim_params = data.get("simulationParams", {})
-
     try:
-        nennstrom_float = float(sim_params.get("ratedCurrent"))
-    except (ValueError, TypeError):
-        return jsonify({"error": "Ungültiger Nennstrom-Wert."}), 400
-
-    leiter_bewegungspfade = calculate_position_steps(
-        sim_params.get("startpositionen"),
-        sim_params.get("bewegungsRichtungen"),
-        sim_params.get("schrittweiten"),
-    )
-
-    assemblies_with_details = [
-        add_details_to_assembly(asm, library_data) for asm in active_assemblies
-    ]
-    standalone_with_details = [
-        add_details_to_standalone(comp, library_data) for comp in active_standalone
-    ]
-
-    initial_labels = calculate_label_positions(
-        assemblies_with_details,
-        standalone_with_details,
-        leiter_bewegungspfade[0],
-        sim_params.get("spielraum"),
-    )
-
-    electrical_system = data.get("electricalSystem", [])
-    for phase in electrical_system:
-        phase["peakCurrentA"] = nennstrom_float * math.sqrt(2)
-
-    final_assemblies = []
-    for asm_data in assemblies_with_details:
-        phase_name = asm_data.get("phaseName")
-        if sim_params.get("startpositionen", {}).get(f"x_{phase_name}") is not None:
-            asm_data["calculated_positions"] = [
-                step[phase_name] for step in leiter_bewegungspfade
-            ]
-            final_assemblies.append(asm_data)
-
-    simulation_data = {
-        "description": "Konfiguration erstellt via Web-UI",
-        "scenarioParams": sim_params,
-        "materials": library_data.get("materials", []),
-        "electricalSystem": electrical_system,
-        "assemblies": final_assemblies,
-        "standAloneComponents": standalone_with_details,
-        "simulation_meta": {
-            **data.get("simulationMeta", {}),
-            "nennstrom_A": sim_params.get("ratedCurrent"),
-            "bewegungsgruppe": sim_params.get("bewegungsRichtungen"),
-            "simulationsraum": sim_params.get("spielraum"),
-            "bewegungspfade_alle_leiter": {
-                "beschreibung": "Bewegungsgruppe: Manuell",
-                "schritte_details": leiter_bewegungspfade,
-            },
-            "material_labels": initial_labels,
-        },
-    }
+        simulation_data = build_simulation_run(data, library_data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     output_path = os.path.join(BASE_DIR, SIMULATION_RUN_FILE)
     with open(output_path, "w", encoding="utf-8") as f:
@@ -421,44 +361,6 @@ def visualize_configuration():
 
 
 # --- Hilfsfunktionen ---
-def add_details_to_assembly(assembly_data, library_data):
-    """Fügt Bauteil-Details aus der Bibliothek zu einem Assembly hinzu."""
-    if assembly_data.get("transformerName"):
-        assembly_data["transformer_details"] = next(
-            (
-                t
-                for t in library_data.get("components", {}).get("transformers", [])
-                if t.get("templateProductInformation", {}).get("name")
-                == assembly_data.get("transformerName")
-            ),
-            None,
-        )
-    assembly_data["copperRail_details"] = next(
-        (
-            r
-            for r in library_data.get("components", {}).get("copperRails", [])
-            if r.get("templateProductInformation", {}).get("name")
-            == assembly_data.get("copperRailName")
-        ),
-        None,
-    )
-    return assembly_data
-
-
-def add_details_to_standalone(component_data, library_data):
-    """Fügt Bauteil-Details zu einem Standalone-Bauteil hinzu."""
-    component_data["component_details"] = next(
-        (
-            s
-            for s in library_data.get("components", {}).get("transformerSheets", [])
-            if s.get("templateProductInformation", {}).get("name")
-            == component_data.get("name")
-        ),
-        None,
-    )
-    return component_data
-
-
 def process_assembly_for_viz(asm_data, step, library_data, scene_elements, step_coords):
     """Verarbeitet ein Assembly für die SVG-Visualisierung."""
     phase = asm_data.get("phaseName")
@@ -0,0 +1,176 @@
+# benchmarks/fem_writer_benchmark.py
+"""
+Benchmark des direkten .fem-Schreibers (siehe src.fem_writer).
+
+Für jede Konfiguration werden alle Varianten aus Positionsschritten und
+Phasenwinkeln gebildet und:
+    - die Zeit je Variante für das Zeichnen über FEMM-Aufrufe (mit der
+      simulierten Latenz je Aufruf) und das direkte Schreiben gemessen
+    - alle Varianten mit `write_fem_files` parallel geschrieben
+
+Ob die geschriebenen Dateien den von FEMM gezeichneten Modellen entsprechen,
+prüft `tests/test_fem_writer.py` gegen Modelle, die FEMM gespeichert hat.
+
+Aufruf:
+    python -m benchmarks.fem_writer_benchmark [--configs Sim.json ...] [--processes N]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.run_benchmarks import (
+    DEFAULT_CALL_LATENCY,
+    DEFAULT_CONFIGS,
+    build_run_data,
+    load_library,
+)
+from src.fem_writer import write_fem_files
+from src.femm_wrapper import FEMMSession
+from src.simulation_worker import (
+    build_fem_model,
+    build_femm_geometry,
+    setup_femm_problem,
+)
+
+# Anzahl der Varianten, deren Aufbau über FEMM-Aufrufe gemessen wird
+DEFAULT_TIMED_VARIANTS = 5
+
+
+def iter_variants(run_data):
+    """
+    Liefert (Name, step_config, Winkel) für alle Positionsschritte und
+    Phasenwinkel der Konfiguration, wie sie der Runner im Modus "sweep" löst.
+    """
+    meta = run_data["simulation_meta"]
+    sweep = run_data["scenarioParams"]["phaseSweep"]
+    start, end, step = (float(sweep[k]) for k in ("start", "end", "step"))
+    angles = [start + k * step for k in range(int((end - start) / step) + 1)]
+    steps = meta["bewegungspfade_alle_leiter"]["schritte_details"]
+    for i, positions in enumerate(steps):
+        step_config = dict(run_data)
+        step_config["assemblies"] = [asm.copy() for asm in run_data["assemblies"]]
+        for asm in step_config["assemblies"]:
+            if asm["phaseName"] in positions:
+                asm["position"] = positions[asm["phaseName"]]
+        for angle in angles:
+            yield f"pos_{i + 1}_angle{int(angle)}", step_config, angle
+
+
+def draw_with_femm(run_data, step_config, angle, fem_path, backend):
+    """Zeichnet das Modell Befehl für Befehl und speichert es."""
+    femm = FEMMSession(backend=backend)
+    setup_femm_problem(femm, run_data, step_config["electricalSystem"], angle)
+    build_femm_geometry(femm, step_config)
+    femm.save_as(fem_path)
+    femm.close()
+
+
+def benchmark_config(config_name, processes, call_latency, timed_variants):
+    """Misst eine Konfiguration und gibt die Ergebnisse zurück."""
+    with tempfile.TemporaryDirectory(prefix="fem_writer_benchmark_") as work_dir:
+        run_data = build_run_data(
+            config_name, load_library(), "sweep", 1, "replay", work_dir
+        )
+        variants = list(iter_variants(run_data))
+
+        backend = {"type": "replay", "latency": {"default": call_latency}}
+        start = time.perf_counter()
+        for name, step_config, angle in variants[:timed_variants]:
+            draw_with_femm(
+                run_data,
+                step_config,
+                angle,
+                os.path.join(work_dir, f"{name}_femm.fem"),
+                backend,
+            )
+        femm_seconds = (time.perf_counter() - start) / min(
+            timed_variants, len(variants)
+        )
+
+        start = time.perf_counter()
+        for name, step_config, angle in variants[:timed_variants]:
+            build_fem_model(run_data, step_config, angle).write(
+                os.path.join(work_dir, f"{name}_direct.fem")
+            )
+        direct_seconds = (time.perf_counter() - start) / min(
+            timed_variants, len(variants)
+        )
+
+        jobs = [
+            (
+                os.path.join(work_dir, "all", f"{name}.fem"),
+                step_config,
+                run_data,
+                angle,
+                False,
+            )
+            for name, step_config, angle in variants
+        ]
+        start = time.perf_counter()
+        write_fem_files(jobs, processes=processes)
+        parallel_seconds = time.perf_counter() - start
+
+    return {
+        "config": config_name,
+        "variants": len(variants),
+        "femmSecondsPerVariant": round(femm_seconds, 5),
+        "directSecondsPerVariant": round(direct_seconds, 5),
+        "parallelSeconds": round(parallel_seconds, 4),
+        "filesPerSecond": round(len(variants) / parallel_seconds, 1),
+    }
+
+
+def main(args):
+    """Misst alle Konfigurationen und gibt die Tabelle aus."""
+    results = [
+        benchmark_config(
+            config_name, args.processes, args.call_latency, args.timed_variants
+        )
+        for config_name in args.configs
+    ]
+    print(
+        f"  {'Konfiguration':<24}{'Varianten':>10}"
+        f"{'FEMM [ms]':>11}{'direkt [ms]':>13}{'Dateien/s':>11}"
+    )
+    for result in results:
+        print(
+            f"  {result['config']:<24}{result['variants']:>10}"
+            f"{result['femmSecondsPerVariant'] * 1000:>11.2f}"
+            f"{result['directSecondsPerVariant'] * 1000:>13.2f}"
+            f"{result['filesPerSecond']:>11.1f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    PARSER = argparse.ArgumentParser(
+        description="Benchmark des direkten .fem-Schreibers."
+    )
+    PARSER.add_argument(
+        "--configs",
+        nargs="+",
+        default=list(DEFAULT_CONFIGS),
+        help="Konfigurationen aus 'configurations/'",
+    )
+    PARSER.add_argument(
+        "--processes", type=int, help="Prozesse beim parallelen Schreiben"
+    )
+    PARSER.add_argument(
+        "--call-latency",
+        type=float,
+        default=DEFAULT_CALL_LATENCY,
+        help="Simulierte Dauer eines FEMM-Aufrufs in Sekunden",
+    )
+    PARSER.add_argument(
+        "--timed-variants",
+        type=int,
+        default=DEFAULT_TIMED_VARIANTS,
+        help="Varianten, deren Aufbau einzeln gemessen wird",
+    )
+    sys.exit(main(PARSER.parse_args()))
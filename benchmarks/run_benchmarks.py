@@ -0,0 +1,460 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks der Simulations-Pipeline.
+
+Repräsentative Konfigurationen aus `configurations/` werden wie über die
+Web-UI zu einer `simulation_run.json` aufbereitet und mit dem
+`SimulationRunner` gegen das Replay-Backend (siehe src.femm_backends) gelöst.
+Das Backend liefert reproduzierbare Modellwerte und simuliert die Rechenzeit
+von FEMM über feste Latenzen, sodass die Messungen nur von der Orchestrierung
+abhängen und zwischen Versionen vergleichbar sind.
+
+Gemessen werden je Konfiguration:
+    - die Zeit je Stufe (Setup, Geometrie, Speichern, Lösen, Auswertung,
+      Bilder, CSV-Ausgabe), aus der Aufzeichnung der FEMM-Aufrufe
+    - der maximale Arbeitsspeicher (Peak-RSS) von Runner und Workern
+    - der Durchsatz und die Skalierung von 1 bis N Workern
+
+Jeder Fall läuft in einem eigenen Prozess, damit Peak-RSS und Pools sich
+nicht gegenseitig beeinflussen. Die Ergebnisse werden an
+`benchmarks/history.json` angehängt und mit dem letzten Eintrag verglichen.
+
+Aufruf:
+    python -m benchmarks.run_benchmarks [--configs Sim.json ...] [--max-workers N]
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARK_DIR)
+CONFIGURATIONS_DIR = os.path.join(PROJECT_DIR, "configurations")
+# Feste Bauteil-Bibliothek, damit die Messungen nicht vom Inhalt der DB abhängen
+LIBRARY_PATH = os.path.join(BENCHMARK_DIR, "library.json")
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, "history.json")
+
+DEFAULT_CONFIGS = ("Sim.json", "mit_L2_wandler.json")
+DEFAULT_RUN_MODE = "sweep"
+# Simulierte Rechenzeit von FEMM in Sekunden
+DEFAULT_SOLVE_LATENCY = 0.02
+DEFAULT_CALL_LATENCY = 0.0002
+# Durchsatzverlust gegenüber dem letzten Eintrag, ab dem gewarnt wird
+REGRESSION_THRESHOLD = 0.10
+
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+STAGES = ("setup", "geometry", "save", "solve", "post", "plots", "csv")
+# Zuordnung der FEMM-Aufrufe zu den Stufen; übrige mi_* zählen zur Geometrie,
+# übrige mo_* zur Auswertung
+STAGE_CALLS = {
+    "setup": {
+        "openfemm",
+        "closefemm",
+        "newdocument",
+        "mi_close",
+        "mi_probdef",
+        "mi_addmaterial",
+        "mi_addbhpoint",
+        "mi_getmaterial",
+        "mi_addcircprop",
+        "mi_modifycircprop",
+    },
+    "save": {"mi_saveas"},
+    "solve": {"mi_analyze", "mi_loadsolution"},
+}
+SESSION_CALLS = {"openfemm", "closefemm"}
+
+
+def load_library(path=LIBRARY_PATH):
+    """Lädt die Bauteil-Bibliothek im Format von `get_library_from_db`."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_run_data(config_name, library, run_mode, workers, backend, work_dir):
+    """
+    Erstellt die Laufdaten einer Konfiguration aus `configurations/` mit den
+    Einstellungen des Benchmarks.
+    """
+    # Erst hier importieren, damit der Hauptprozess schlank bleibt
+    from server.utils import build_simulation_run
+
+    with open(
+        os.path.join(CONFIGURATIONS_DIR, config_name), "r", encoding="utf-8"
+    ) as f:
+        config = json.load(f)
+    run_data = build_simulation_run(config, copy.deepcopy(library))
+    run_data["simulation_meta"].update(
+        {
+            "runMode": run_mode,
+            "workers": workers,
+            # Die Worker-Anzahl soll nicht vom freien Speicher abhängen
+            "memoryPerWorkerMB": 0,
+            "solveCache": {"enabled": False},
+            "schedulerHistoryPath": os.path.join(work_dir, "scheduler_history.json"),
+            "femmBackend": backend,
+        }
+    )
+    return run_data
+
+
+def stage_of(call):
+    """Ordnet einen FEMM-Aufruf eines Solver-Workers einer Stufe zu."""
+    for stage, calls in STAGE_CALLS.items():
+        if call in calls:
+            return stage
+    return "post" if call.startswith("mo_") else "geometry"
+
+
+def stage_timings(log_dir):
+    """
+    Summiert die aufgezeichneten Laufzeiten der FEMM-Aufrufe je Stufe. Die
+    Aufrufe der Render-Prozesse (erkennbar an `mo_savebitmap`) zählen, bis auf
+    das Starten und Beenden von FEMM, vollständig zu den Bildern.
+
+    Returns:
+        tuple: ({Stufe: Sekunden}, Anzahl der Lösungen)
+    """
+    timings = dict.fromkeys(STAGES[:-1], 0.0)
+    solves = 0
+    for filename in sorted(os.listdir(log_dir)):
+        with open(os.path.join(log_dir, filename), "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        renders = any(entry["call"] == "mo_savebitmap" for entry in entries)
+        for entry in entries:
+            call = entry["call"]
+            if renders and call not in SESSION_CALLS:
+                stage = "plots"
+            else:
+                stage = stage_of(call)
+            timings[stage] += entry["seconds"]
+            solves += call == "mi_analyze"
+    return timings, solves
+
+
+def peak_rss_mb():
+    """Peak-RSS des eigenen Prozesses und des größten Kindprozesses in MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss ist unter Linux in KB, unter macOS in Byte angegeben
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    )
+
+
+def run_case(case):
+    """
+    Führt einen Benchmark-Fall im aktuellen Prozess aus.
+
+    Args:
+        case (dict): config, runMode, workers, solveLatency, callLatency und
+            stages (True: Aufrufe aufzeichnen und Bilder rendern).
+    """
+    from src import simulation_runner
+    from src.result_writer import StreamingResultWriter
+
+    csv_seconds = [0.0]
+
+    class TimedResultWriter(StreamingResultWriter):
+        """Misst die Zeit, die in der CSV-Ausgabe verbracht wird."""
+
+        def add_rows(self, rows):
+            start = time.perf_counter()
+            super().add_rows(rows)
+            csv_seconds[0] += time.perf_counter() - start
+
+        def close(self):
+            start = time.perf_counter()
+            super().close()
+            csv_seconds[0] += time.perf_counter() - start
+
+    simulation_runner.StreamingResultWriter = TimedResultWriter
+
+    with tempfile.TemporaryDirectory(prefix="femm_benchmark_") as work_dir:
+        backend = {
+            "type": "replay",
+            "latency": {
+                "mi_analyze": case["solveLatency"],
+                "default": case["callLatency"],
+            },
+        }
+        log_dir = os.path.join(work_dir, "femm_calls")
+        if case["stages"]:
+            backend = {"type": "recording", "inner": backend, "logDir": log_dir}
+        run_data = build_run_data(
+            case["config"],
+            load_library(),
+            case["runMode"],
+            case["workers"],
+            backend,
+            work_dir,
+        )
+        run_data["simulation_meta"]["plotMode"] = "all" if case["stages"] else "off"
+        config_path = os.path.join(work_dir, "simulation_run.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(run_data, f)
+
+        runner = simulation_runner.SimulationRunner(
+            config_path, base_path=os.path.join(work_dir, "run")
+        )
+        start = time.perf_counter()
+        runner.run()
+        wall_seconds = time.perf_counter() - start
+
+        result = {
+            "config": case["config"],
+            "runMode": case["runMode"],
+            "workers": case["workers"],
+            "tasks": runner.total_tasks,
+            "wallSeconds": round(wall_seconds, 4),
+            "tasksPerSecond": round(runner.total_tasks / wall_seconds, 4),
+        }
+        if case["stages"]:
+            timings, solves = stage_timings(log_dir)
+            timings["csv"] = csv_seconds[0]
+            result["solves"] = solves
+            result["stageSeconds"] = {
+                stage: round(seconds, 4) for stage, seconds in timings.items()
+            }
+        rss_self, rss_children = peak_rss_mb()
+        result["peakRssMB"] = {"runner": rss_self, "worker": rss_children}
+    return result
+
+
+def run_case_subprocess(case):
+    """Führt einen Fall in einem eigenen Python-Prozess aus."""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--case", json.dumps(case)],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX) :])
+    raise RuntimeError(
+        f"Benchmark '{case['config']}' mit {case['workers']} Worker(n) "
+        f"fehlgeschlagen:\n{completed.stderr[-2000:]}"
+    )
+
+
+def worker_steps(max_workers):
+    """Worker-Anzahlen der Skalierungsmessung: 1, 2, 4, ... bis max_workers."""
+    steps = []
+    workers = 1
+    while workers < max_workers:
+        steps.append(workers)
+        workers *= 2
+    steps.append(max_workers)
+    return steps
+
+
+def git_commit():
+    """Aktueller Commit des Projekts oder None außerhalb eines Git-Repos."""
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def load_history(path):
+    """Liest die bisherigen Benchmark-Einträge."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def save_history(path, history):
+    """Schreibt die Benchmark-Einträge atomar."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def find_regressions(entry, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    Vergleicht den Durchsatz mit einem früheren Eintrag gleicher Einstellungen.
+
+    Returns:
+        list[str]: Meldungen zu Fällen, die um mehr als `threshold` langsamer
+        geworden sind.
+    """
+    if previous is None:
+        return []
+    old_results = {
+        (r["config"], r["runMode"], r["workers"], "stageSeconds" in r): r
+        for r in previous["results"]
+    }
+    messages = []
+    for result in entry["results"]:
+        key = (
+            result["config"],
+            result["runMode"],
+            result["workers"],
+            "stageSeconds" in result,
+        )
+        old = old_results.get(key)
+        if old is None or not old["tasksPerSecond"]:
+            continue
+        change = result["tasksPerSecond"] / old["tasksPerSecond"] - 1
+        if change < -threshold:
+            messages.append(
+                f"{result['config']} ({result['workers']} Worker): "
+                f"{old['tasksPerSecond']:.2f} -> {result['tasksPerSecond']:.2f} "
+                f"Aufgaben/s ({change:+.0%}) gegenüber {previous.get('commit')}"
+            )
+    return messages
+
+
+def print_report(entry):
+    """Gibt die Ergebnisse eines Benchmark-Laufs als Tabellen aus."""
+    for result in entry["results"]:
+        if "stageSeconds" not in result:
+            continue
+        print(
+            f"\n{result['config']} ({result['runMode']}, {result['workers']} Worker, "
+            f"{result['tasks']} Aufgaben, {result['solves']} Lösungen)"
+        )
+        for stage in STAGES:
+            print(f"  {stage:<10} {result['stageSeconds'][stage]:10.3f} s")
+        print(
+            f"  Peak-RSS   Runner {result['peakRssMB']['runner'] or 0:.0f} MB, "
+            f"Worker {result['peakRssMB']['worker'] or 0:.0f} MB"
+        )
+
+    print("\nSkalierung:")
+    print(f"  {'Konfiguration':<24}{'Worker':>7}{'Dauer/s':>10}{'Aufg./s':>10}")
+    baseline = {}
+    for result in entry["results"]:
+        if "stageSeconds" in result:
+            continue
+        baseline.setdefault(result["config"], result["tasksPerSecond"])
+        speedup = result["tasksPerSecond"] / baseline[result["config"]]
+        print(
+            f"  {result['config']:<24}{result['workers']:>7}"
+            f"{result['wallSeconds']:>10.2f}{result['tasksPerSecond']:>10.2f}"
+            f"   Speedup {speedup:.2f}, Effizienz {speedup / result['workers']:.0%}"
+        )
+
+
+def main(args):
+    """Führt alle Fälle aus, gibt den Bericht aus und ergänzt die Historie."""
+    max_workers = args.max_workers or os.cpu_count() or 1
+    results = []
+    for config_name in args.configs:
+        common = {
+            "config": config_name,
+            "runMode": args.run_mode,
+            "solveLatency": args.solve_latency,
+            "callLatency": args.call_latency,
+        }
+        logging.info("Stufen von '%s' mit %d Worker(n)...", config_name, max_workers)
+        results.append(
+            run_case_subprocess({**common, "workers": max_workers, "stages": True})
+        )
+        for workers in worker_steps(max_workers):
+            logging.info(
+                "Skalierung von '%s' mit %d Worker(n)...", config_name, workers
+            )
+            results.append(
+                run_case_subprocess({**common, "workers": workers, "stages": False})
+            )
+
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "solveLatency": args.solve_latency,
+        "callLatency": args.call_latency,
+        "results": results,
+    }
+    print_report(entry)
+
+    history = load_history(args.history)
+    previous = next(
+        (
+            old
+            for old in reversed(history)
+            if old.get("solveLatency") == entry["solveLatency"]
+            and old.get("callLatency") == entry["callLatency"]
+        ),
+        None,
+    )
+    regressions = find_regressions(entry, previous)
+    for message in regressions:
+        logging.warning("Regression: %s", message)
+    history.append(entry)
+    save_history(args.history, history)
+    logging.info("Ergebnisse an '%s' angehängt.", args.history)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    PARSER = argparse.ArgumentParser(
+        description="Benchmarks der Simulations-Pipeline mit dem Replay-Backend."
+    )
+    PARSER.add_argument(
+        "--configs",
+        nargs="+",
+        default=list(DEFAULT_CONFIGS),
+        help="Konfigurationen aus 'configurations/'",
+    )
+    PARSER.add_argument(
+        "--run-mode", default=DEFAULT_RUN_MODE, help="Ausführungsmodus der Läufe"
+    )
+    PARSER.add_argument(
+        "--max-workers", type=int, help="Größte Worker-Anzahl (Standard: alle Kerne)"
+    )
+    PARSER.add_argument(
+        "--solve-latency",
+        type=float,
+        default=DEFAULT_SOLVE_LATENCY,
+        help="Simulierte Dauer einer Lösung (mi_analyze) in Sekunden",
+    )
+    PARSER.add_argument(
+        "--call-latency",
+        type=float,
+        default=DEFAULT_CALL_LATENCY,
+        help="Simulierte Dauer aller übrigen FEMM-Aufrufe in Sekunden",
+    )
+    PARSER.add_argument(
+        "--history", default=HISTORY_PATH, help="JSON-Datei mit früheren Ergebnissen"
+    )
+    PARSER.add_argument("--case", help=argparse.SUPPRESS)
+    ARGS = PARSER.parse_args()
+    if ARGS.case:
+        logging.getLogger().setLevel(logging.WARNING)
+        print(RESULT_PREFIX + json.dumps(run_case(json.loads(ARGS.case))))
+    else:
+        sys.exit(main(ARGS))
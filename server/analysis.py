@@ -2,6 +2,7 @@
 """
 Dieses Modul stellt die Logik für die Analyse- und Ergebnisseite bereit.
 """
+import functools
 import os
 import re
 import json
@@ -11,12 +12,36 @@ from flask import Blueprint, jsonify, request, current_app
 
 from server.db import get_db
 from server.utils import load_json
+from src.fem_solution import FemSolution
+from src.femm_backends import backend_spec
+from src.field_lines import (
+    DEFAULT_LEVELS,
+    DEFAULT_RESOLUTION,
+    extract_field_lines,
+    find_solution,
+    potential_at_angle,
+)
+from src.adaptive_sweep import unique_periodic_angles
+from src.plot_renderer import BackgroundPlotRenderer, find_task_solution, plot_mode
+from src.result_table import RESULT_TABLE_FILENAME, load_result_table
+from src.superposition import evaluate_scenario, scenario_electrical_system
+from src.utils import phase_sweep_angles
 
 analysis_bp = Blueprint("analysis_bp", __name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.join(BASE_DIR, "..")
 RESULTS_DIR = os.path.join(PROJECT_ROOT, "simulations")
 
+# Render-Pools für Bilder, die erst beim ersten Abruf erzeugt werden, je
+# FEMM-Backend der Läufe
+_PLOT_RENDERERS = {}
+
+# Anzahl der geladenen Lösungen (.ans), die für Abfragen im Speicher bleiben
+SOLUTION_CACHE_SIZE = 8
+
+# Höchstzahl der Punkte einer Abfrage über `/analysis/probe`
+MAX_PROBE_POINTS = 100000
+
 
 def _get_library_from_db():
     """Hilfsfunktion, um die Bibliothek innerhalb des Blueprints aus der DB zu laden."""
@@ -164,6 +189,93 @@ def create_chartjs_data(df, x_col, y_col, selected_conductors):
     return {"labels": labels, "datasets": datasets}
 
 
+def _render_missing_plots(run_path, pos_group, current_group):
+    """
+    Stellt fehlende FEMM-Bilder eines Positionsschritts und Stroms in die
+    Warteschlange des Render-Pools (Plot-Modus "lazy"), ohne darauf zu warten.
+
+    Returns:
+        int: Anzahl der Bilder, die noch gerendert werden.
+    """
+    run_data = load_json(os.path.join(run_path, "simulation_run.json"))
+    if not run_data or plot_mode(run_data) == "off":
+        return 0
+    # Gerendert wird mit dem Backend des Laufs; xfemm erzeugt keine Bilder
+    backend = run_data.get("simulation_meta", {}).get("femmBackend")
+    if backend is not None and backend_spec(backend).get("type") == "xfemm":
+        return 0
+    angles, _ = unique_periodic_angles(phase_sweep_angles(run_data))
+
+    key = json.dumps(backend, sort_keys=True)
+    if key not in _PLOT_RENDERERS:
+        _PLOT_RENDERERS[key] = BackgroundPlotRenderer(backend=backend)
+    renderer = _PLOT_RENDERERS[key]
+    jobs = [
+        renderer.submit(run_path, run_data, pos_group, current_group, angle)
+        for angle in angles
+    ]
+    return sum(1 for job in jobs if job is not None and not job.ready())
+
+
+@functools.lru_cache(maxsize=SOLUTION_CACHE_SIZE)
+def _cached_solution(ans_path, mtime):
+    """Lädt eine Lösung; `mtime` verwirft den Eintrag bei einer neuen Datei."""
+    return FemSolution.load(ans_path)
+
+
+def _load_solution(ans_path):
+    """Lädt eine gespeicherte Lösung über den Zwischenspeicher."""
+    return _cached_solution(ans_path, os.path.getmtime(ans_path))
+
+
+def _load_table_frame(table_path, pos_group, current_group):
+    """
+    Lädt die Zeilen eines Positionsschritts und Stroms aus der typisierten
+    Ergebnisdatei; komplexe Spalten werden in Real- und Imaginärteil geteilt.
+    """
+    df = load_result_table(table_path, pos_group, current_group)
+    df = df.drop(columns=["pos_name", "current_name"], errors="ignore")
+    df["conductor"] = df["conductor"].astype(str)
+    for col in df.select_dtypes(include=[np.complex128]).columns:
+        df[f"{col}_real"] = df[col].to_numpy().real
+        df[f"{col}_imag"] = df[col].to_numpy().imag
+        df.drop(columns=[col], inplace=True)
+    return df
+
+
+def _load_csv_frame(file_path):
+    """
+    Lädt eine `*_summary.csv`-Datei älterer Läufe ohne typisierte
+    Ergebnisdatei und erkennt komplexe Spalten am Textformat.
+    """
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+
+    # Konvertiere komplexe Zahlen-Strings in komplexe Zahlen
+    for col in df.columns:
+        if (
+            df[col].dtype == "object"
+            and df[col].str.contains(r"\(.*\)", na=False).any()
+        ):
+            try:
+                df[col] = df[col].apply(
+                    lambda x: complex(x) if isinstance(x, str) and "(" in x else x
+                )
+            except (ValueError, TypeError):
+                pass
+
+    # Extrahiere Real- und Imaginärteile
+    for col in df.select_dtypes(include=[np.complex128]).columns:
+        df[f"{col}_real"] = df[col].apply(lambda x: x.real)
+        df[f"{col}_imag"] = df[col].apply(lambda x: x.imag)
+        df.drop(columns=[col], inplace=True)
+
+    # Konvertiere alle restlichen Spalten in numerische Werte
+    for col in df.columns:
+        if col not in ["conductor", "pos_name", "current_name", "run_identifier"]:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
 @analysis_bp.route("/analysis/plot", methods=["GET"])
 def get_plot_data():
     """Erstellt Chart.js-Daten basierend auf den Filter-Parametern."""
@@ -174,40 +286,23 @@ def get_plot_data():
     if not all([run_folder, pos_group, current_group]):
         return jsonify({"error": "Fehlende Parameter."}), 400
 
+    run_path = os.path.join(RESULTS_DIR, run_folder)
     csv_file = f"{pos_group}_{current_group}_summary.csv"
-    file_path = os.path.join(RESULTS_DIR, run_folder, csv_file)
+    table_path = os.path.join(run_path, RESULT_TABLE_FILENAME)
+    file_path = os.path.join(run_path, csv_file)
 
-    if not os.path.exists(file_path):
+    if not os.path.exists(table_path) and not os.path.exists(file_path):
         return jsonify({"error": f"Datei '{csv_file}' nicht gefunden."}), 404
 
     try:
-        df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+        if os.path.exists(table_path):
+            df = _load_table_frame(table_path, pos_group, current_group)
+            if df.empty:
+                return jsonify({"error": f"Datei '{csv_file}' nicht gefunden."}), 404
+        else:
+            df = _load_csv_frame(file_path)
         conductors = df["conductor"].unique().tolist()
 
-        # Konvertiere komplexe Zahlen-Strings in komplexe Zahlen
-        for col in df.columns:
-            if (
-                df[col].dtype == "object"
-                and df[col].str.contains(r"\(.*\)", na=False).any()
-            ):
-                try:
-                    df[col] = df[col].apply(
-                        lambda x: complex(x) if isinstance(x, str) and "(" in x else x
-                    )
-                except (ValueError, TypeError):
-                    pass
-
-        # Extrahiere Real- und Imaginärteile
-        for col in df.select_dtypes(include=[np.complex128]).columns:
-            df[f"{col}_real"] = df[col].apply(lambda x: x.real)
-            df[f"{col}_imag"] = df[col].apply(lambda x: x.imag)
-            df.drop(columns=[col], inplace=True)
-
-        # Konvertiere alle restlichen Spalten in numerische Werte
-        for col in df.columns:
-            if col not in ["conductor", "pos_name", "current_name", "run_identifier"]:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
-
         # Berechne Beträge für komplexe Spaltenpaare
         all_columns = df.columns.tolist()
         base_names_for_abs = set()
@@ -293,10 +388,67 @@ def get_plot_data():
         )
 
 
+@analysis_bp.route("/analysis/superposition", methods=["POST"])
+def evaluate_superposition():
+    """
+    Wertet neue Phasenströme gegen die gespeicherte Basis eines Laufs aus.
+
+    Erwartet JSON mit `run_folder`, optional `pos_group`, `rms` (für alle
+    Phasen), `currents` ({Phase: {"rms": ..., "phaseShiftDeg": ...}}) und
+    `phaseSweep` ({"start", "end", "step"}).
+    """
+    data = request.get_json(silent=True) or {}
+    run_folder = data.get("run_folder")
+    if not run_folder:
+        return jsonify({"error": "Fehlende Parameter."}), 400
+
+    run_path = os.path.join(RESULTS_DIR, run_folder)
+    if not os.path.isdir(os.path.join(run_path, "basis")):
+        return jsonify({"error": "Für diesen Lauf ist keine Basis vorhanden."}), 404
+
+    try:
+        overrides = {
+            name: (float(spec["rms"]), spec.get("phaseShiftDeg"))
+            for name, spec in (data.get("currents") or {}).items()
+        }
+        electrical_system = scenario_electrical_system(
+            load_json(os.path.join(run_path, "simulation_run.json")),
+            data.get("rms"),
+            overrides,
+        )
+        angles = None
+        if data.get("phaseSweep"):
+            sweep = data["phaseSweep"]
+            angles = np.arange(
+                float(sweep["start"]),
+                float(sweep["end"]) + float(sweep["step"]),
+                float(sweep["step"]),
+            )
+        positions = [data["pos_group"]] if data.get("pos_group") else None
+        rows = evaluate_scenario(run_path, electrical_system, positions, angles)
+    except (IOError, KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Auswertung fehlgeschlagen: {e}"}), 400
+
+    # Komplexe Werte für JSON in Real- und Imaginärteil aufteilen
+    result_rows = []
+    for row in rows:
+        res = {}
+        for col, value in row.items():
+            if isinstance(value, complex):
+                res[f"{col}_real"] = value.real
+                res[f"{col}_imag"] = value.imag
+            else:
+                res[col] = value
+        result_rows.append(res)
+    return jsonify({"rows": result_rows})
+
+
 @analysis_bp.route("/analysis/femm_plots", methods=["GET"])
 def get_femm_plots():
     """
     Sucht alle FEMM-Plot-Bilder für einen Lauf und gibt eine Liste mit URLs und Winkeln zurück.
+    `pending` nennt die Bilder, die noch im Hintergrund gerendert werden; der
+    Client fragt dann erneut an.
     """
     run_folder = request.args.get("run_folder")
     pos_group = request.args.get("pos_group")
@@ -305,9 +457,13 @@ def get_femm_plots():
     if not all([run_folder, pos_group, current_group]):
         return jsonify({"error": "Fehlende Parameter."}), 400
 
+    pending = _render_missing_plots(
+        os.path.join(RESULTS_DIR, run_folder), pos_group, current_group
+    )
+
     plots_dir = os.path.join(RESULTS_DIR, run_folder, "femm_plots")
     if not os.path.isdir(plots_dir):
-        return jsonify({"density_plots": [], "vector_plots": []})
+        return jsonify({"density_plots": [], "vector_plots": [], "pending": pending})
 
     plot_files = os.listdir(plots_dir)
 
@@ -331,7 +487,143 @@ def get_femm_plots():
     density_plots.sort(key=lambda p: p["angle"])
     vector_plots.sort(key=lambda p: p["angle"])
 
-    return jsonify({"density_plots": density_plots, "vector_plots": vector_plots})
+    return jsonify(
+        {
+            "density_plots": density_plots,
+            "vector_plots": vector_plots,
+            "pending": pending,
+        }
+    )
+
+
+@analysis_bp.route("/analysis/field_lines", methods=["GET"])
+def get_field_lines():
+    """
+    Berechnet die Feldlinien (Isolinien von A) eines Positionsschritts und
+    Stroms zu einem Phasenwinkel aus der gespeicherten Lösung, vereinfacht
+    auf `resolution` Punkte über die Breite des Netzes. `levels` ist die
+    Anzahl der Abstufungen zwischen kleinstem und größtem A.
+    """
+    run_folder = request.args.get("run_folder")
+    pos_group = request.args.get("pos_group")
+    current_group = request.args.get("current_group")
+
+    if not all([run_folder, pos_group, current_group]):
+        return jsonify({"error": "Fehlende Parameter."}), 400
+
+    try:
+        angle = float(request.args.get("angle", 0))
+        num_levels = int(request.args.get("levels", DEFAULT_LEVELS))
+        resolution = int(request.args.get("resolution", DEFAULT_RESOLUTION))
+    except ValueError:
+        return jsonify({"error": "Ungültige Parameter."}), 400
+
+    ans_path, phasor_angle = find_solution(
+        os.path.join(RESULTS_DIR, run_folder), pos_group, current_group, angle
+    )
+    if ans_path is None:
+        return (
+            jsonify({"error": f"Keine Lösung für den Winkel {angle:g}° gespeichert."}),
+            404,
+        )
+
+    try:
+        solution = _load_solution(ans_path)
+    except (IOError, ValueError) as e:
+        return jsonify({"error": f"Lösung nicht lesbar: {e}"}), 500
+
+    values = potential_at_angle(solution.potential, phasor_angle)
+    lines = extract_field_lines(
+        solution.nodes, solution.elements, values, num_levels, resolution
+    )
+    return jsonify(
+        {
+            "angle": angle,
+            "unit": solution.model.problem["units"],
+            "bounds": {
+                "min": solution.nodes.min(axis=0).tolist(),
+                "max": solution.nodes.max(axis=0).tolist(),
+            },
+            "lines": [
+                {"level": line["level"], "points": line["points"].tolist()}
+                for line in lines
+            ],
+        }
+    )
+
+
+def _json_column(values, found):
+    """Spalte für JSON; Punkte außerhalb des Netzes werden zu null."""
+    return [float(v) if ok else None for v, ok in zip(values.tolist(), found)]
+
+
+@analysis_bp.route("/analysis/probe", methods=["POST"])
+def probe_solution():
+    """
+    Wertet A und B einer gespeicherten Lösung an beliebigen Punkten aus.
+
+    Erwartet JSON mit `run_folder`, `run_identifier` (z. B.
+    "pos_1_I_1_angle30" oder "pos_1_I_1_phasor") und `points` als Liste von
+    [x, y] oder {"x": ..., "y": ...} in Modelleinheiten. Die Antwort enthält
+    je Größe eine Spalte mit einem Wert je Punkt; Punkte außerhalb des Netzes
+    haben `inside` false und null als Werte.
+    """
+    data = request.get_json(silent=True) or {}
+    run_folder = data.get("run_folder")
+    run_identifier = data.get("run_identifier")
+    raw_points = data.get("points")
+    if not run_folder or not run_identifier or not isinstance(raw_points, list):
+        return jsonify({"error": "Fehlende Parameter."}), 400
+    if len(raw_points) > MAX_PROBE_POINTS:
+        return (
+            jsonify({"error": f"Höchstens {MAX_PROBE_POINTS} Punkte je Abfrage."}),
+            400,
+        )
+    try:
+        points = np.array(
+            [
+                (p["x"], p["y"]) if isinstance(p, dict) else (p[0], p[1])
+                for p in raw_points
+            ],
+            dtype=float,
+        ).reshape(-1, 2)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return jsonify({"error": "Ungültige Punkte."}), 400
+
+    ans_path = find_task_solution(os.path.join(RESULTS_DIR, run_folder), run_identifier)
+    if ans_path is None:
+        return (
+            jsonify({"error": f"Keine Lösung für '{run_identifier}' gespeichert."}),
+            404,
+        )
+    try:
+        solution = _load_solution(ans_path)
+    except (IOError, ValueError) as e:
+        return jsonify({"error": f"Lösung nicht lesbar: {e}"}), 500
+
+    probe = solution.probe(points)
+    found = (probe["element"] >= 0).tolist()
+    labels = solution.model.labels
+    b_abs = np.sqrt(np.abs(probe["bx"]) ** 2 + np.abs(probe["by"]) ** 2)
+    return jsonify(
+        {
+            "unit": solution.model.problem["units"],
+            "x": points[:, 0].tolist(),
+            "y": points[:, 1].tolist(),
+            "inside": found,
+            "material": [
+                labels[label]["material"] if ok else None
+                for label, ok in zip(probe["label"].tolist(), found)
+            ],
+            "A_real": _json_column(probe["potential"].real, found),
+            "A_imag": _json_column(probe["potential"].imag, found),
+            "Bx_real": _json_column(probe["bx"].real, found),
+            "Bx_imag": _json_column(probe["bx"].imag, found),
+            "By_real": _json_column(probe["by"].real, found),
+            "By_imag": _json_column(probe["by"].imag, found),
+            "B_abs": _json_column(b_abs, found),
+        }
+    )
 
 
 @analysis_bp.route("/analysis/full_preview/<path:run_folder>", methods=["GET"])
@@ -9,8 +9,6 @@ import os
 import re
 import tempfile
 from collections import defaultdict
-import femm
-import pythoncom
 
 from flask import Blueprint, jsonify, request
 
@@ -66,6 +64,14 @@ def get_femm_materials():
 @api_bp.route("/femm_material_details/<string:material_name>", methods=["GET"])
 def get_femm_material_details(material_name):
     """Holt die detaillierten Eigenschaften eines Materials aus der FEMM-Bibliothek."""
+    # Erst hier importieren, damit der Server auch ohne FEMM (z. B. unter
+    # Linux) startet
+    try:
+        import femm  # pylint: disable=import-outside-toplevel
+        import pythoncom  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        return jsonify({"error": f"FEMM ist nicht verfügbar: {e}"}), 501
+
     temp_fd, temp_path = tempfile.mkstemp(suffix=".fem")
     os.close(temp_fd)
 
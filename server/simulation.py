@@ -2,17 +2,76 @@
 """
 Blueprint für die Steuerung von Simulationsläufen.
 Startet das Python-Simulationsskript im Hintergrund.
+
+Der Runner gibt Fortschritt, erledigte Aufgaben und Log-Meldungen über seine
+Ausgabe-Pipe aus (siehe `src.progress`); sie werden an alle Clients von
+`/simulation_events` als Server-Sent Events verteilt. `/simulation_progress`
+liest die Statusdatei und bleibt als Rückfall für Clients ohne SSE erhalten.
 """
 import json
 import os
+import queue
 import subprocess
 import sys
 import threading
 from datetime import datetime
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, Response, jsonify, current_app, stream_with_context
+
+from src.progress import parse_event_line
 
 simulation_bp = Blueprint("simulation_bp", __name__)
 
+# Ereignisse, die für einen langsamen Client zwischengespeichert werden
+MAX_QUEUED_EVENTS = 1000
+# Abstand der Keep-Alive-Kommentare im Event-Stream in Sekunden
+SSE_KEEPALIVE_INTERVAL = 15
+
+
+class EventBroadcaster:
+    """Verteilt die Ereignisse des laufenden Simulationsprozesses an alle Clients."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.latest_progress = None
+
+    def subscribe(self):
+        """
+        Meldet einen Client an.
+
+        Returns:
+            queue.Queue: Die Ereignisse ab jetzt, beginnend mit dem letzten
+            bekannten Fortschritt.
+        """
+        events = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+        with self._lock:
+            if self.latest_progress is not None:
+                events.put_nowait(self.latest_progress)
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        """Meldet einen Client ab."""
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def publish(self, event):
+        """Gibt ein Ereignis an alle Clients weiter."""
+        with self._lock:
+            if event.get("type") == "progress":
+                self.latest_progress = event
+            elif event.get("type") == "start":
+                self.latest_progress = None
+            for events in self._subscribers:
+                try:
+                    events.put_nowait(event)
+                except queue.Full:
+                    # Ein Client, der nicht mehr liest, verpasst Ereignisse
+                    pass
+
+
+BROADCASTER = EventBroadcaster()
+
 
 def run_simulation_script(app, run_path):
     """
@@ -21,31 +80,45 @@ def run_simulation_script(app, run_path):
     with app.app_context():
         project_root = app.root_path
         python_executable = sys.executable
-        command = [python_executable, "-m", "src.simulation_runner", run_path]
+        command = [
+            python_executable,
+            "-m",
+            "src.simulation_runner",
+            run_path,
+            "--events",
+        ]
+        BROADCASTER.publish({"type": "start", "run_path": run_path})
+        returncode = None
 
         try:
+            # Log-Meldungen (stderr) und Ereignisse (stdout) kommen über eine
+            # Pipe und werden zeilenweise weitergegeben, sobald sie anfallen
             process = subprocess.Popen(
                 command,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
+                encoding="utf-8",
+                errors="replace",
+                bufsize=1,
                 cwd=project_root,
+                env={**os.environ, "PYTHONIOENCODING": "utf-8"},
                 creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
             )
-            stdout, stderr = process.communicate()
-
-            if process.returncode == 0:
+            for line in process.stdout:
+                event = parse_event_line(line)
+                if event["type"] == "log":
+                    print(event["message"])
+                BROADCASTER.publish(event)
+            returncode = process.wait()
+
+            if returncode == 0:
                 print("Python-Simulationsskript erfolgreich ausgeführt.")
-                if stdout:
-                    print("Ausgabe (stdout):", stdout)
-                if stderr:
-                    print("Log-Ausgabe (stderr):", stderr)
             else:
                 print(
                     f"Fehler bei der Ausführung des Python-Skripts "
-                    f"(Exit Code: {process.returncode})."
+                    f"(Exit Code: {returncode})."
                 )
-                print("Fehlermeldung:", stderr)
 
         except FileNotFoundError:
             print(
@@ -54,6 +127,7 @@ def run_simulation_script(app, run_path):
             )
         except (subprocess.SubprocessError, OSError) as e:
             print(f"Ein Fehler im Subprozess ist aufgetreten: {e}")
+        BROADCASTER.publish({"type": "end", "returncode": returncode})
         # KORREKTUR: Der "finally"-Block wurde entfernt, um das Zurücksetzen
         # des aktiven Pfades dem Main-Thread zu überlassen.
 
@@ -118,3 +192,40 @@ def simulation_progress():
 
     except (FileNotFoundError, json.JSONDecodeError):
         return jsonify({"status": "starting"})
+
+
+@simulation_bp.route("/simulation_events")
+def simulation_events():
+    """
+    Server-Sent Events der aktiven Simulation: Fortschritt ("progress"),
+    erledigte Aufgaben ("task"), Log-Meldungen ("log") und das Ende des
+    Prozesses ("end"). Ohne laufende Simulation wird nur "idle" gesendet.
+    """
+    thread = current_app.config.get("SIMULATION_THREAD")
+    running = thread is not None and thread.is_alive()
+
+    def generate():
+        if not running:
+            yield f"data: {json.dumps({'type': 'idle'})}\n\n"
+            return
+        events = BROADCASTER.subscribe()
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    if not thread.is_alive():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+                if event.get("type") == "end":
+                    break
+        finally:
+            BROADCASTER.unsubscribe(events)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
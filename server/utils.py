@@ -10,8 +10,12 @@ import secrets
 from typing import Dict, List, Tuple
 import math
 
+import numpy as np
 import pandas as pd
 
+from src.fem_solution import FemSolution, element_b_field
+from src.field_lines import contour_levels, contour_segments
+
 # --- Pfad-Konfiguration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
@@ -183,83 +187,162 @@ def calculate_label_positions(assemblies, standalone_components, positions, room
     return labels
 
 
-def parse_fem_ans_files(fem_path, ans_path):
+def add_details_to_assembly(assembly_data, library_data):
+    """Fügt Bauteil-Details aus der Bibliothek zu einem Assembly hinzu."""
+    if assembly_data.get("transformerName"):
+        assembly_data["transformer_details"] = next(
+            (
+                t
+                for t in library_data.get("components", {}).get("transformers", [])
+                if t.get("templateProductInformation", {}).get("name")
+                == assembly_data.get("transformerName")
+            ),
+            None,
+        )
+    assembly_data["copperRail_details"] = next(
+        (
+            r
+            for r in library_data.get("components", {}).get("copperRails", [])
+            if r.get("templateProductInformation", {}).get("name")
+            == assembly_data.get("copperRailName")
+        ),
+        None,
+    )
+    return assembly_data
+
+
+def add_details_to_standalone(component_data, library_data):
+    """Fügt Bauteil-Details zu einem Standalone-Bauteil hinzu."""
+    component_data["component_details"] = next(
+        (
+            s
+            for s in library_data.get("components", {}).get("transformerSheets", [])
+            if s.get("templateProductInformation", {}).get("name")
+            == component_data.get("name")
+        ),
+        None,
+    )
+    return component_data
+
+
+def build_simulation_run(data, library_data):
     """
-    Liest die Geometrie aus einer .fem-Datei und die Lösung aus einer .ans-Datei.
+    Erstellt die Daten der `simulation_run.json` aus einer Konfiguration der
+    Web-UI und der Bauteil-Bibliothek.
+
+    Raises:
+        ValueError: Wenn der Nennstrom keine Zahl ist.
     """
-    nodes, elements, solution = {}, [], {}
+    active_assemblies = [
+        a for a in data.get("assemblies", []) if a.get("enabled", True)
+    ]
+    active_standalone = [
+        c for c in data.get("standAloneComponents", []) if c.get("enabled", True)
+    ]
+    sim_params = data.get("simulationParams", {})
+
     try:
-        with open(fem_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        node_block = re.search(
-            r"\[Nodes\](.*?)\[NumElements\]", content, re.DOTALL | re.IGNORECASE
-        ).group(1)
-        for line in node_block.strip().split("\n"):
-            parts = line.split()
-            if len(parts) >= 3:
-                nodes[int(parts[0])] = (float(parts[1]), float(parts[2]))
-        element_block = re.search(
-            r"\[Elements\](.*?)\[NumBlockLabels\]", content, re.DOTALL | re.IGNORECASE
-        ).group(1)
-        for line in element_block.strip().split("\n"):
-            parts = line.split()
-            if len(parts) >= 7:
-                elements.append(tuple(int(p) for p in parts[3:6]))
-    except (AttributeError, FileNotFoundError):
-        return {}, [], {}
+        nennstrom_float = float(sim_params.get("ratedCurrent"))
+    except (ValueError, TypeError):
+        raise ValueError("Ungültiger Nennstrom-Wert.") from None
+
+    leiter_bewegungspfade = calculate_position_steps(
+        sim_params.get("startpositionen"),
+        sim_params.get("bewegungsRichtungen"),
+        sim_params.get("schrittweiten"),
+    )
+
+    assemblies_with_details = [
+        add_details_to_assembly(asm, library_data) for asm in active_assemblies
+    ]
+    standalone_with_details = [
+        add_details_to_standalone(comp, library_data) for comp in active_standalone
+    ]
+
+    initial_labels = calculate_label_positions(
+        assemblies_with_details,
+        standalone_with_details,
+        leiter_bewegungspfade[0],
+        sim_params.get("spielraum"),
+    )
+
+    electrical_system = data.get("electricalSystem", [])
+    for phase in electrical_system:
+        phase["peakCurrentA"] = nennstrom_float * math.sqrt(2)
+
+    final_assemblies = []
+    for asm_data in assemblies_with_details:
+        phase_name = asm_data.get("phaseName")
+        if sim_params.get("startpositionen", {}).get(f"x_{phase_name}") is not None:
+            asm_data["calculated_positions"] = [
+                step[phase_name] for step in leiter_bewegungspfade
+            ]
+            final_assemblies.append(asm_data)
+
+    simulation_data = {
+        "description": "Konfiguration erstellt via Web-UI",
+        "scenarioParams": sim_params,
+        "materials": library_data.get("materials", []),
+        "electricalSystem": electrical_system,
+        "assemblies": final_assemblies,
+        "standAloneComponents": standalone_with_details,
+        "simulation_meta": {
+            **data.get("simulationMeta", {}),
+            "nennstrom_A": sim_params.get("ratedCurrent"),
+            "bewegungsgruppe": sim_params.get("bewegungsRichtungen"),
+            "simulationsraum": sim_params.get("spielraum"),
+            "bewegungspfade_alle_leiter": {
+                "beschreibung": "Bewegungsgruppe: Manuell",
+                "schritte_details": leiter_bewegungspfade,
+            },
+            "material_labels": initial_labels,
+        },
+    }
+    return simulation_data
+
+
+def parse_fem_ans_files(ans_path):
+    """
+    Liest Netz und Lösung einer .ans-Datei (sie enthält auch das Modell der
+    .fem-Datei) als NumPy-Arrays, siehe `src.fem_solution.FemSolution`.
+
+    Returns:
+        tuple: Knotenkoordinaten (N, 2), Knotenindizes der Dreiecke (E, 3) und
+        das komplexe Vektorpotential je Knoten (N,); leer, wenn die Datei
+        fehlt oder keine Lösung enthält.
+    """
     try:
-        with open(ans_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        solution_block = re.search(
-            r"\[Solution\](.*)", content, re.DOTALL | re.IGNORECASE
-        ).group(1)
-        for i, line in enumerate(solution_block.strip().split("\n")):
-            if line.strip():
-                solution[i] = float(line.split()[0])
-    except (AttributeError, FileNotFoundError):
-        return nodes, elements, {}
-    return nodes, elements, solution
+        solution = FemSolution.load(ans_path)
+    except (FileNotFoundError, ValueError):
+        return np.zeros((0, 2)), np.zeros((0, 3), dtype=np.int64), np.zeros(0, complex)
+    return solution.nodes, solution.elements, solution.potential
 
 
 def calculate_b_field(p1, p2, p3, a1, a2, a3):
-    """Berechnet die mittlere Flussdichte (Bx, By) für ein Dreieck."""
-    det = (p2[0] - p1[0]) * (p3[1] - p1[1]) - (p3[0] - p1[0]) * (p2[1] - p1[1])
-    if abs(det) < 1e-12:
-        return (0.0, 0.0)
-    bx = ((p1[1] - p2[1]) * a3 + (p2[1] - p3[1]) * a1 + (p3[1] - p1[1]) * a2) / det
-    by = -((p2[0] - p1[0]) * a3 + (p3[0] - p2[0]) * a1 + (p1[0] - p3[0]) * a2) / det
-    return (bx, by)
+    """
+    Berechnet die Flussdichte (Bx, By) für ein Dreieck oder, mit Arrays der
+    Eckpunkte (..., 2) und Potentiale (...), für viele Dreiecke auf einmal.
+    """
+    p1, p2, p3 = (np.asarray(p, dtype=float) for p in (p1, p2, p3))
+    x = np.stack([p1[..., 0], p2[..., 0], p3[..., 0]], axis=-1).reshape(-1, 3)
+    y = np.stack([p1[..., 1], p2[..., 1], p3[..., 1]], axis=-1).reshape(-1, 3)
+    potential = np.stack(np.broadcast_arrays(a1, a2, a3), axis=-1).reshape(-1, 3)
+    bx, by, _ = element_b_field(x, y, potential)
+    shape = np.shape(p1)[:-1]
+    if not shape:
+        return (bx[0].item(), by[0].item())
+    return (bx.reshape(shape), by.reshape(shape))
 
 
 def get_contour_lines(nodes, elements, solution, num_levels=30):
-    """Erzeugt Isolinien (Feldlinien) für das Vektorpotential A."""
-    lines = []
-    if not solution:
-        return []
-    min_a, max_a = min(solution.values()), max(solution.values())
-    if abs(max_a - min_a) < 1e-9:
+    """
+    Erzeugt Isolinien (Feldlinien) für den Realteil des Vektorpotentials A
+    (Arrays wie von `parse_fem_ans_files`) als einzelne Strecken; zu
+    Polylinien verbunden liefert sie `src.field_lines.extract_field_lines`.
+    """
+    solution = np.real(solution)
+    levels = contour_levels(solution, num_levels)
+    if len(levels) == 0 or len(elements) == 0:
         return []
-    levels = [min_a + (max_a - min_a) * i / num_levels for i in range(1, num_levels)]
-    for n1, n2, n3 in elements:
-        points = [nodes.get(i) for i in (n1, n2, n3)]
-        potentials = [solution.get(i) for i in (n1, n2, n3)]
-        if not all(p is not None for p in points) or not all(
-            p is not None for p in potentials
-        ):
-            continue
-        for level in levels:
-            sides = []
-            for i in range(3):
-                p_start, p_end = points[i], points[(i + 1) % 3]
-                a_start, a_end = potentials[i], potentials[(i + 1) % 3]
-                if (a_start > level) != (a_end > level):
-                    t = (level - a_start) / (a_end - a_start)
-                    sides.append(
-                        (
-                            (p_start[0] * (1 - t) + p_end[0] * t),
-                            (p_start[1] * (1 - t) + p_end[1] * t),
-                        )
-                    )
-            if len(sides) == 2:
-                lines.append(sides)
-    return lines
+    point_a, point_b, _, _, _ = contour_segments(nodes, elements, solution, levels)
+    return np.stack([point_a, point_b], axis=1).tolist()
@@ -0,0 +1,305 @@
+# src/adaptive_sweep.py
+"""
+Adaptive Verfeinerung der Phasenwinkel (Modus "adaptive").
+
+Jede Kombination aus Positionsschritt und Strom wird zunächst auf einem groben
+Winkelraster gelöst. Für die Blockintegrale, `Isec_*` und die
+Stromkreisspannung wird daraus ein periodisches Modell gebildet: eine
+Fourier-Reihe bis zur zweiten Harmonischen (bei linearen Materialien exakt)
+plus eine periodisch lineare Interpolation der Restfehler. Die Güte wird per
+Leave-one-out an den gelösten Winkeln geschätzt; nur neben Stützstellen mit
+zu großem relativem Fehler werden weitere Winkel des Zielrasters gelöst.
+Alle übrigen Winkel des `phaseSweep` werden aus dem Modell berechnet.
+
+Winkel, die sich nur um ganze Perioden unterscheiden (z. B. 0° und 360°),
+werden in allen Winkel-Modi nur einmal gelöst. Bei linearen Materialien gilt
+außerdem i(θ+180°) = −i(θ): Lineare Größen wechseln über eine halbe Periode
+das Vorzeichen, quadratische und geometrische wiederholen sich. Die zweite
+Halbperiode wird dann aus der ersten berechnet.
+"""
+import numpy as np
+
+from src.phasor import (
+    CIRCUIT_COLUMNS,
+    COMPLEX_PAIR_COLUMNS,
+    integral_column_rotations,
+)
+from src.utils import make_run_identifier
+
+PERIOD_DEG = 360.0
+
+DEFAULT_COARSE_FACTOR = 4
+DEFAULT_TOLERANCE = 1e-3
+DEFAULT_MAX_ROUNDS = 6
+
+# Harmonische des Grundmodells: Mittelwert, Grundschwingung und 2x-Anteile
+BASE_HARMONICS = 2
+
+# Beträge darunter gelten bei der Fehlerschätzung als null
+ZERO_THRESHOLD = 1e-12
+
+# Spalten, deren Winkelverlauf modelliert wird; alle anderen werden kopiert
+FITTED_PREFIXES = ("conductor_", "core_", "Isec_", "circuit_voltage_")
+
+
+def unique_periodic_angles(angles, period=PERIOD_DEG):
+    """
+    Entfernt Winkel, die modulo der Periode einem früheren Winkel entsprechen.
+
+    Returns:
+        tuple: (Liste der zu lösenden Winkel, {gelöster Winkel: [Duplikate]})
+    """
+    unique = []
+    aliases = {}
+    seen = {}
+    for angle in angles:
+        angle = float(angle)
+        key = round(angle % period, 9)
+        if key in seen:
+            aliases.setdefault(seen[key], []).append(angle)
+        else:
+            seen[key] = angle
+            unique.append(angle)
+    return unique, aliases
+
+
+def alias_rows(rows, aliases):
+    """Ergänzt die Zeilen um Kopien für die periodisch doppelten Winkel."""
+    if not aliases:
+        return rows
+    extra = []
+    for row in rows:
+        for alias in aliases.get(row.get("phaseAngle_deg"), ()):
+            res = dict(row)
+            res["phaseAngle_deg"] = alias
+            res["run_identifier"] = make_run_identifier(
+                row["pos_name"], row["current_name"], alias
+            )
+            extra.append(res)
+    return rows + extra
+
+
+def half_period_mirrors(angles, period=PERIOD_DEG):
+    """
+    Teilt eindeutige Winkel in zu lösende und gespiegelte Winkel auf. Ein
+    Winkel wird gespiegelt, wenn der um eine halbe Periode frühere Winkel
+    bereits gelöst wird.
+
+    Returns:
+        tuple: (Liste der zu lösenden Winkel, {gelöster Winkel: [gespiegelte]})
+    """
+    solved = []
+    mirrors = {}
+    solved_keys = {}
+    for angle in angles:
+        mirror_key = round((angle - period / 2) % period, 9)
+        if mirror_key in solved_keys:
+            mirrors.setdefault(solved_keys[mirror_key], []).append(angle)
+        else:
+            solved_keys[round(angle % period, 9)] = angle
+            solved.append(angle)
+    return solved, mirrors
+
+
+def mirror_rows(rows, mirrors):
+    """
+    Ergänzt die Zeilen um die Werte der gespiegelten Winkel: Lineare Größen
+    (Integrale der Ordnung 1, `Isec_*`, Stromkreisspannung) wechseln das
+    Vorzeichen, alle übrigen werden übernommen.
+    """
+    if not mirrors:
+        return rows
+    linear_columns = {
+        col for col, multiple in integral_column_rotations().items() if multiple == 1
+    }
+    linear_columns.update(CIRCUIT_COLUMNS)
+    linear_columns.update(col for pair in COMPLEX_PAIR_COLUMNS for col in pair)
+    extra = []
+    for row in rows:
+        for mirror in mirrors.get(row.get("phaseAngle_deg"), ()):
+            res = dict(row)
+            res["phaseAngle_deg"] = mirror
+            res["run_identifier"] = make_run_identifier(
+                row["pos_name"], row["current_name"], mirror
+            )
+            for col in linear_columns:
+                if col in res and res[col] is not None:
+                    # 0.0 - x statt -x, damit aus 0.0 nicht -0.0 wird
+                    res[col] = 0.0 - res[col]
+            extra.append(res)
+    return rows + extra
+
+
+def coarse_angles(targets, factor=DEFAULT_COARSE_FACTOR):
+    """
+    Wählt das grobe Startraster aus den Zielwinkeln: jeden `factor`-ten Winkel
+    und den letzten, mindestens aber genug Stützstellen für das Grundmodell.
+    """
+    chosen = list(targets[:: max(1, int(factor))])
+    if targets[-1] not in chosen:
+        chosen.append(targets[-1])
+    min_samples = min(2 * BASE_HARMONICS + 2, len(targets))
+    if len(chosen) < min_samples:
+        indices = np.unique(
+            np.linspace(0, len(targets) - 1, min_samples).round().astype(int)
+        )
+        chosen = [targets[i] for i in indices]
+    return chosen
+
+
+def _design_matrix(angles_deg, harmonics):
+    """Spalten 1, cos(kθ), sin(kθ) für k = 1..harmonics."""
+    theta = np.deg2rad(np.asarray(angles_deg, dtype=float))
+    columns = [np.ones_like(theta)]
+    for k in range(1, harmonics + 1):
+        columns.extend([np.cos(k * theta), np.sin(k * theta)])
+    return np.column_stack(columns)
+
+
+def _fit_predict(sample_angles, values, query_angles):
+    """
+    Wertet das periodische Modell an `query_angles` aus.
+
+    Args:
+        sample_angles (np.ndarray): Gelöste Winkel (N,).
+        values (np.ndarray): Komplexe Werte (N, M) an diesen Winkeln.
+        query_angles (np.ndarray): Auszuwertende Winkel (Q,).
+    """
+    harmonics = min(BASE_HARMONICS, (len(sample_angles) - 1) // 2)
+    design = _design_matrix(sample_angles, harmonics)
+    coef = np.linalg.lstsq(design, values, rcond=None)[0]
+    residual = values - design @ coef
+    base = _design_matrix(query_angles, harmonics) @ coef
+
+    # Restfehler periodisch linear zwischen den Nachbarwinkeln interpolieren
+    wrapped = np.asarray(sample_angles, dtype=float) % PERIOD_DEG
+    order = np.argsort(wrapped)
+    xs = wrapped[order]
+    rs = residual[order]
+    xp = np.concatenate([[xs[-1] - PERIOD_DEG], xs, [xs[0] + PERIOD_DEG]])
+    rp = np.concatenate([rs[-1:], rs, rs[:1]])
+    query = np.asarray(query_angles, dtype=float) % PERIOD_DEG
+    idx = np.clip(np.searchsorted(xp, query, side="right") - 1, 0, len(xp) - 2)
+    weight = ((query - xp[idx]) / (xp[idx + 1] - xp[idx]))[:, None]
+    return base + rp[idx] * (1 - weight) + rp[idx + 1] * weight
+
+
+def _group_samples(rows):
+    """
+    Ordnet die gelösten Zeilen einer Gruppe nach Winkel und Leiter.
+
+    Returns:
+        tuple: (Winkel, Werte (N, M), Schlüssel [(Leiter, Spalte)],
+        komplexe Schlüssel, {Winkel: {Leiter: Zeile}})
+    """
+    by_angle = {}
+    for row in rows:
+        by_angle.setdefault(float(row["phaseAngle_deg"]), {})[row["conductor"]] = row
+    angles = sorted(by_angle)
+
+    keys = []
+    for conductor, row in by_angle[angles[0]].items():
+        for col, value in row.items():
+            if col.startswith(FITTED_PREFIXES) and isinstance(
+                value, (int, float, complex, np.number)
+            ):
+                keys.append((conductor, col))
+
+    values = np.array(
+        [
+            [complex(by_angle[a][cond].get(col, np.nan)) for cond, col in keys]
+            for a in angles
+        ],
+        dtype=np.complex128,
+    ).reshape(len(angles), len(keys))
+    values = np.nan_to_num(values)
+    complex_keys = {
+        key
+        for key in keys
+        if any(isinstance(by_angle[a][key[0]].get(key[1]), complex) for a in angles)
+    }
+    return np.array(angles), values, keys, complex_keys, by_angle
+
+
+def loo_errors(sample_angles, values):
+    """
+    Relativer Leave-one-out-Fehler des Modells an jeder Stützstelle, bezogen
+    auf den größten Betrag der jeweiligen Spalte.
+    """
+    scale = np.max(np.abs(values), axis=0)
+    # Spalten, die praktisch null sind, enthalten nur numerisches Rauschen
+    active = scale > ZERO_THRESHOLD
+    if not active.any():
+        return np.zeros(len(sample_angles))
+    values = values[:, active]
+    scale = scale[active]
+    errors = np.zeros(len(sample_angles))
+    for i in range(len(sample_angles)):
+        mask = np.arange(len(sample_angles)) != i
+        prediction = _fit_predict(
+            sample_angles[mask], values[mask], sample_angles[i : i + 1]
+        )
+        errors[i] = np.max(np.abs(prediction[0] - values[i]) / scale, initial=0.0)
+    return errors
+
+
+def refinement_angles(rows, targets, tolerance=DEFAULT_TOLERANCE):
+    """
+    Bestimmt die Zielwinkel, die in der nächsten Runde zusätzlich gelöst
+    werden: neben jeder Stützstelle mit zu großem Fehler jeweils der mittlere
+    noch ungelöste Winkel der angrenzenden Lücken.
+    """
+    sample_angles, values, _, _, _ = _group_samples(rows)
+    solved = set(sample_angles.tolist())
+    if len(sample_angles) < 2 or all(t in solved for t in targets):
+        return []
+
+    errors = loo_errors(sample_angles, values)
+    new_angles = set()
+    for angle, error in zip(sample_angles.tolist(), errors):
+        if error <= tolerance or angle not in targets:
+            continue
+        index = targets.index(angle)
+        for direction in (-1, 1):
+            gap = []
+            j = index + direction
+            while 0 <= j < len(targets) and targets[j] not in solved:
+                gap.append(targets[j])
+                j += direction
+            if gap:
+                new_angles.add(gap[len(gap) // 2])
+    return sorted(new_angles)
+
+
+def complete_rows(rows, targets):
+    """
+    Liefert die gelösten Zeilen und für alle übrigen Zielwinkel die aus dem
+    Modell berechneten Zeilen. Nicht modellierte Spalten (z. B. Positionen)
+    werden von der nächstgelegenen gelösten Zeile übernommen.
+    """
+    sample_angles, values, keys, complex_keys, by_angle = _group_samples(rows)
+    solved = set(sample_angles.tolist())
+    missing = [t for t in targets if t not in solved]
+    if not missing:
+        return rows
+
+    prediction = _fit_predict(sample_angles, values, np.array(missing))
+    result = list(rows)
+    for j, angle in enumerate(missing):
+        distance = np.abs((sample_angles - angle + 180.0) % PERIOD_DEG - 180.0)
+        nearest = by_angle[float(sample_angles[np.argmin(distance)])]
+        new_rows = {}
+        for conductor, template in nearest.items():
+            res = dict(template)
+            res["phaseAngle_deg"] = angle
+            res["run_identifier"] = make_run_identifier(
+                template["pos_name"], template["current_name"], angle
+            )
+            new_rows[conductor] = res
+        for m, key in enumerate(keys):
+            value = prediction[j, m]
+            new_rows[key[0]][key[1]] = (
+                complex(value) if key in complex_keys else float(value.real)
+            )
+        result.extend(new_rows.values())
+    return result
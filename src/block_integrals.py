@@ -0,0 +1,204 @@
+# src/block_integrals.py
+"""
+Definitionen der FEMM-Blockintegrale und Planung ihrer Abfrage, ohne
+Abhängigkeit von pyfemm.
+"""
+from collections import namedtuple
+
+# Eine geplante Abfrage: welche Integrale für welche Gruppe berechnet werden.
+# `prefix` ("conductor" oder "core") bildet zusammen mit Symbol und Einheit
+# den Spaltennamen der Ergebniszeile.
+IntegralRequest = namedtuple(
+    "IntegralRequest", ["group_id", "prefix", "phase_name", "integral_types"]
+)
+
+# Das Ergebnis einer Abfrage; `values` ordnet jedem Integral-Typ seinen Wert zu.
+GroupIntegrals = namedtuple(
+    "GroupIntegrals", ["group_id", "prefix", "phase_name", "values"]
+)
+
+# Definition der Blockintegral-Typen mit Namen, Formelzeichen und Einheiten.
+# "order" gibt an, wie ein Integral von den Erregerströmen abhängt:
+# 0 = geometrisch (stromunabhängig), 1 = linear, 2 = quadratisch.
+BLOCK_INTEGRAL_TYPES = {
+    0: {"name": "A·J-Integral", "symbol": "W_AJ", "unit": "J", "order": 2},
+    1: {"name": "A-Integral", "symbol": "A_int", "unit": "Wb·m", "order": 1},
+    2: {"name": "Magnetische Feldenergie", "symbol": "W_m", "unit": "J", "order": 2},
+    3: {
+        "name": "Hysterese- und Blechverluste",
+        "symbol": "P_h",
+        "unit": "W",
+        "order": 2,
+    },
+    4: {"name": "Ohmsche Verluste", "symbol": "P_R", "unit": "W", "order": 2},
+    5: {
+        "name": "Blockquerschnittsfläche",
+        "symbol": "A_Block",
+        "unit": "m²",
+        "order": 0,
+    },
+    6: {"name": "Gesamtverluste", "symbol": "P_ges", "unit": "W", "order": 2},
+    7: {"name": "Gesamtstrom", "symbol": "I_ges", "unit": "A", "order": 1},
+    8: {"name": "Integral von Bx über Block", "symbol": "Φx", "unit": "Wb", "order": 1},
+    9: {"name": "Integral von By über Block", "symbol": "Φy", "unit": "Wb", "order": 1},
+    10: {"name": "Blockvolumen", "symbol": "V_Block", "unit": "m³", "order": 0},
+    11: {
+        "name": "x-Anteil der Lorentzkraft (stationär)",
+        "symbol": "F_x,L,ss",
+        "unit": "N",
+        "order": 2,
+    },
+    12: {
+        "name": "y-Anteil der Lorentzkraft (stationär)",
+        "symbol": "F_y,L,ss",
+        "unit": "N",
+        "order": 2,
+    },
+    13: {
+        "name": "x-Anteil der 2·Lorentzkraft",
+        "symbol": "F_x,L,2x",
+        "unit": "N",
+        "order": 2,
+    },
+    14: {
+        "name": "y-Anteil der 2·Lorentzkraft",
+        "symbol": "F_y,L,2x",
+        "unit": "N",
+        "order": 2,
+    },
+    15: {
+        "name": "Lorentz-Drehmoment (stationär)",
+        "symbol": "M_L,ss",
+        "unit": "N·m",
+        "order": 2,
+    },
+    16: {
+        "name": "2·Komponente des Lorentz-Drehmoments",
+        "symbol": "M_L,2x",
+        "unit": "N·m",
+        "order": 2,
+    },
+    17: {"name": "Magnetische Koenergie", "symbol": "W_c", "unit": "J", "order": 2},
+    18: {
+        "name": "x-Anteil der WST-Kraft (stationär)",
+        "symbol": "F_x,WST,ss",
+        "unit": "N",
+        "order": 2,
+    },
+    19: {
+        "name": "y-Anteil der WST-Kraft (stationär)",
+        "symbol": "F_y,WST,ss",
+        "unit": "N",
+        "order": 2,
+    },
+    20: {
+        "name": "x-Anteil der 2·WST-Kraft",
+        "symbol": "F_x,WST,2x",
+        "unit": "N",
+        "order": 2,
+    },
+    21: {
+        "name": "y-Anteil der 2·WST-Kraft",
+        "symbol": "F_y,WST,2x",
+        "unit": "N",
+        "order": 2,
+    },
+    22: {
+        "name": "WST-Drehmoment (stationär)",
+        "symbol": "M_WST,ss",
+        "unit": "N·m",
+        "order": 2,
+    },
+    23: {
+        "name": "2·Komponente des WST-Drehmoments",
+        "symbol": "M_WST,2x",
+        "unit": "N·m",
+        "order": 2,
+    },
+    24: {
+        "name": "R² (Trägheitsmoment / Dichte)",
+        "symbol": "R²",
+        "unit": "m⁴",
+        "order": 0,
+    },
+    25: {
+        "name": "x-Anteil der 1·WST-Kraft",
+        "symbol": "F_x,WST,1x",
+        "unit": "N",
+        "order": 1,
+    },
+    26: {
+        "name": "y-Anteil der 1·WST-Kraft",
+        "symbol": "F_y,WST,1x",
+        "unit": "N",
+        "order": 1,
+    },
+    27: {
+        "name": "1·Komponente des WST-Drehmoments",
+        "symbol": "M_WST,1x",
+        "unit": "N·m",
+        "order": 1,
+    },
+    28: {
+        "name": "x-Anteil der 1·Lorentzkraft",
+        "symbol": "F_x,L,1x",
+        "unit": "N",
+        "order": 1,
+    },
+    29: {
+        "name": "y-Anteil der 1·Lorentzkraft",
+        "symbol": "F_y,L,1x",
+        "unit": "N",
+        "order": 1,
+    },
+    30: {
+        "name": "1·Komponente des Lorentz-Drehmoments",
+        "symbol": "M_L,1x",
+        "unit": "N·m",
+        "order": 1,
+    },
+}
+
+
+def selected_integral_types(selected_integrals=None):
+    """
+    Gibt die abzufragenden Integral-Typen in der Reihenfolge von
+    BLOCK_INTEGRAL_TYPES zurück; ohne Auswahl sind es alle.
+    """
+    return tuple(
+        int_type
+        for int_type in BLOCK_INTEGRAL_TYPES
+        if selected_integrals is None or int_type in selected_integrals
+    )
+
+
+def plan_block_integrals(step_config):
+    """
+    Plant die Blockintegral-Abfragen für eine Lösung: je Leiter die Gruppe der
+    Kupferschiene (i*10+1) und, falls ein Wandler vorhanden ist, die des
+    Kerns (i*10+2), jeweils nur mit den ausgewählten Integralen.
+
+    Returns:
+        list[IntegralRequest]: Die Abfragen in der Reihenfolge der Assemblies.
+    """
+    integral_types = selected_integral_types(
+        step_config.get("simulation_meta", {}).get("selectedIntegrals")
+    )
+    plan = []
+    for i, asm in enumerate(step_config["assemblies"]):
+        phase_name = asm["phaseName"]
+        plan.append(
+            IntegralRequest(i * 10 + 1, "conductor", phase_name, integral_types)
+        )
+        if "transformer_details" in asm and asm["transformer_details"]:
+            plan.append(IntegralRequest(i * 10 + 2, "core", phase_name, integral_types))
+    return plan
+
+
+def integral_columns(record):
+    """Wandelt ein GroupIntegrals-Ergebnis in Spaltenname/Wert-Paare um."""
+    columns = {}
+    for int_type, value in record.values.items():
+        data = BLOCK_INTEGRAL_TYPES[int_type]
+        columns[f"{record.prefix}_{data['symbol']}_{data['unit']}"] = value
+    return columns
@@ -0,0 +1,613 @@
+# src/distributed.py
+"""
+Verteilte Ausführung der Simulationsaufgaben über mehrere Rechner.
+
+Im Modus `executor = "distributed"` startet der `SimulationRunner` statt des
+lokalen Prozess-Pools einen Broker (TCP, ein JSON-Objekt pro Zeile). Die
+Aufgabenpakete aus `schedule_batches` werden dort in eine Warteschlange
+gestellt; Agenten auf beliebigen Rechnern holen sich Pakete ab, lösen sie mit
+ihrer eigenen FEMM-Sitzung und schicken die Ergebniszeilen zurück.
+
+Agenten senden während der Arbeit regelmäßig Heartbeats. Meldet sich ein
+Agent länger als `heartbeatTimeout` Sekunden nicht oder bricht seine
+Verbindung ab, gehen seine Pakete zurück an das Ende der Warteschlange. Kommt
+ein Ergebnis doppelt an, zählt das erste.
+
+Scheitert ein Paket in einem Agenten, meldet der Agent den Fehler und
+arbeitet weiter. Jedes Paket wird höchstens `maxRetries`-mal erneut vergeben
+(Fehler und verlorene Agenten zusammen), danach bricht der Lauf mit dem
+Fehler ab. Der Lauf bricht außerdem ab, wenn er länger als `timeout`
+Sekunden dauert oder `idleTimeout` Sekunden lang kein Agent ein Lebenszeichen
+gibt.
+
+Agenten melden sich mit einem gemeinsamen Token an (`broker.token` bzw. die
+Umgebungsvariable FEMM_BROKER_TOKEN, beim Agenten `--token`). Lauscht der
+Broker nicht nur auf localhost, ist ein Token Pflicht.
+
+Nachrichten (Agent -> Broker, Antwort des Brokers):
+    {"type": "hello", "agent", "token"}   -> {"type": "welcome", "heartbeat": s}
+                                             | {"type": "rejected"}
+    {"type": "get"}                       -> {"type": "task", "id", "worker", "tasks"}
+                                             | {"type": "wait"} | {"type": "shutdown"}
+    {"type": "result", "id", "results"}   -> {"type": "ok"}
+    {"type": "error", "id", "error"}      -> {"type": "ok"}
+    {"type": "heartbeat"}                 -> keine Antwort
+
+Start eines Agenten:
+    python -m src.distributed agent --broker HOST:PORT [--token TOKEN]
+"""
+import argparse
+import collections
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+import traceback
+
+from src.utils import json_default, json_object_hook
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47800
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+DEFAULT_HEARTBEAT_TIMEOUT = 30.0
+# Erneute Vergaben eines Pakets nach Fehlern oder verlorenen Agenten
+DEFAULT_MAX_RETRIES = 2
+# Abbruch, wenn so lange kein Agent ein Lebenszeichen gibt (Sekunden)
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+TOKEN_ENV_VAR = "FEMM_BROKER_TOKEN"
+
+# Wartezeit eines Agenten, wenn gerade keine Aufgabe verfügbar ist
+POLL_INTERVAL = 1.0
+# Wartezeit eines Agenten, bevor er sich erneut mit dem Broker verbindet
+RECONNECT_INTERVAL = 3.0
+
+# Worker-Funktionen, die ein Agent im Auftrag des Brokers ausführen darf
+WORKER_FUNCTIONS = (
+    "run_single_simulation",
+    "run_group_simulation",
+    "run_phasor_simulation",
+    "run_basis_simulation",
+)
+
+
+def parse_address(address, default_port=DEFAULT_PORT):
+    """Zerlegt "HOST:PORT" (Port optional) in (host, port)."""
+    host, _, port = str(address).rpartition(":")
+    if not host:
+        return port or DEFAULT_HOST, default_port
+    return host, int(port)
+
+
+def _is_loopback(host):
+    """Prüft, ob eine Adresse nur lokal erreichbar ist."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _send(stream, message):
+    """Schreibt eine Nachricht als JSON-Zeile."""
+    stream.write((json.dumps(message, default=json_default) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+def _receive(stream):
+    """Liest die nächste Nachricht; None, wenn die Verbindung geschlossen ist."""
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line.decode("utf-8"), object_hook=json_object_hook)
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """Bedient die Verbindung eines Agenten (ein Thread pro Agent)."""
+
+    def handle(self):
+        broker = self.server.broker
+        agent_id = f"{self.client_address[0]}:{self.client_address[1]}"
+        # Ohne gültiges "hello" wird keine Nachricht bearbeitet
+        message = None
+        try:
+            message = _receive(self.rfile)
+        except (OSError, ValueError):
+            pass
+        if not message or message.get("type") != "hello":
+            return
+        if not broker.authenticate(message.get("token")):
+            logging.warning("Agent von %s mit falschem Token abgewiesen.", agent_id)
+            try:
+                _send(self.wfile, {"type": "rejected"})
+            except OSError:
+                pass
+            return
+        agent_id = f"{message.get('agent', agent_id)}@{agent_id}"
+        broker.touch(agent_id)
+        logging.info("Agent '%s' verbunden.", agent_id)
+        try:
+            _send(
+                self.wfile,
+                {"type": "welcome", "heartbeat": broker.heartbeat_interval},
+            )
+            while True:
+                message = _receive(self.rfile)
+                if message is None:
+                    break
+                kind = message.get("type")
+                broker.touch(agent_id)
+                if kind == "get":
+                    _send(self.wfile, broker.next_item(agent_id))
+                elif kind == "result":
+                    broker.complete(agent_id, message["id"], message["results"])
+                    _send(self.wfile, {"type": "ok"})
+                elif kind == "error":
+                    broker.fail(agent_id, message["id"], message.get("error"))
+                    _send(self.wfile, {"type": "ok"})
+                elif kind != "heartbeat":
+                    logging.warning(
+                        "Unbekannte Nachricht von Agent '%s': %s", agent_id, kind
+                    )
+        except (OSError, ValueError) as e:
+            logging.warning("Verbindung zu Agent '%s' unterbrochen: %s", agent_id, e)
+        finally:
+            broker.release_agent(agent_id, "Verbindung geschlossen")
+
+
+class _BrokerServer(socketserver.ThreadingTCPServer):
+    """TCP-Server des Brokers."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class TaskBroker:
+    """
+    Warteschlange der Aufgabenpakete mit Vergabe an Agenten und erneuter
+    Vergabe bei Verbindungs- oder Heartbeat-Verlust.
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+        heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        token=None,
+    ):
+        token = token or os.environ.get(TOKEN_ENV_VAR)
+        if not token and not _is_loopback(host):
+            raise ValueError(
+                f"Der Broker lauscht auf '{host}': ohne Token ({TOKEN_ENV_VAR}) "
+                "sind nur lokale Adressen erlaubt."
+            )
+        self.token = token
+        self.heartbeat_interval = float(heartbeat_interval)
+        self.heartbeat_timeout = float(heartbeat_timeout)
+        self.max_retries = int(max_retries)
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.items = {}
+        self.leases = {}
+        self.attempts = collections.Counter()
+        self.finished = set()
+        self.last_seen = {}
+        self.last_activity = time.monotonic()
+        # Einträge (Paket, Ergebnisse, Fehler); Fehler ist None bei Erfolg
+        self.results = queue.Queue()
+        self.closed = False
+
+        self.server = _BrokerServer((host, int(port)), _AgentHandler)
+        self.server.broker = self
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._watch_heartbeats, daemon=True).start()
+        logging.info("Broker wartet auf Agenten unter %s:%d.", *self.address[:2])
+
+    def submit(self, item_id, worker_name, tasks):
+        """Stellt ein Aufgabenpaket in die Warteschlange."""
+        with self.lock:
+            self.items[item_id] = {"worker": worker_name, "tasks": tasks}
+            self.pending.append(item_id)
+
+    def authenticate(self, token):
+        """Prüft das Token eines Agenten (ohne Token des Brokers: immer gültig)."""
+        if not self.token:
+            return True
+        return hmac.compare_digest(str(token or ""), self.token)
+
+    def touch(self, agent_id):
+        """Merkt sich das letzte Lebenszeichen eines Agenten."""
+        with self.lock:
+            self.last_seen[agent_id] = self.last_activity = time.monotonic()
+
+    def next_item(self, agent_id):
+        """Vergibt das nächste offene Paket an einen Agenten."""
+        with self.lock:
+            if self.closed:
+                return {"type": "shutdown"}
+            while self.pending:
+                item_id = self.pending.popleft()
+                if item_id in self.finished:
+                    continue
+                self.leases[item_id] = agent_id
+                item = self.items[item_id]
+                return {"type": "task", "id": item_id, **item}
+            return {"type": "wait"}
+
+    def complete(self, agent_id, item_id, results):
+        """Nimmt das Ergebnis eines Pakets an; Duplikate werden verworfen."""
+        with self.lock:
+            if item_id in self.finished or item_id not in self.items:
+                logging.info(
+                    "Doppeltes Ergebnis für Paket %s von '%s' verworfen.",
+                    item_id,
+                    agent_id,
+                )
+                return
+            self.finished.add(item_id)
+            self.leases.pop(item_id, None)
+            del self.items[item_id]
+        self.results.put((item_id, results, None))
+
+    def _retry(self, item_id, error):
+        """
+        Vergibt ein gescheitertes Paket erneut (am Ende der Warteschlange)
+        oder meldet es nach `max_retries` Versuchen als Fehler. Nur mit
+        gehaltenem Lock aufrufen.
+
+        Returns:
+            bool: True, wenn das Paket erneut vergeben wird.
+        """
+        self.leases.pop(item_id, None)
+        self.attempts[item_id] += 1
+        if self.attempts[item_id] <= self.max_retries:
+            self.pending.append(item_id)
+            return True
+        self.finished.add(item_id)
+        del self.items[item_id]
+        self.results.put((item_id, None, error))
+        return False
+
+    def fail(self, agent_id, item_id, error):
+        """Nimmt die Fehlermeldung eines Agenten zu einem Paket an."""
+        with self.lock:
+            if item_id in self.finished or self.leases.get(item_id) != agent_id:
+                return
+            retried = self._retry(item_id, error)
+        logging.warning(
+            "Paket %s in Agent '%s' gescheitert (%s): %s",
+            item_id,
+            agent_id,
+            "wird neu vergeben" if retried else "keine Versuche mehr",
+            (error or "unbekannter Fehler").strip().splitlines()[-1],
+        )
+
+    def release_agent(self, agent_id, reason):
+        """Stellt die Pakete eines verlorenen Agenten zurück in die Warteschlange."""
+        with self.lock:
+            self.last_seen.pop(agent_id, None)
+            lost = [item for item, owner in self.leases.items() if owner == agent_id]
+            for item_id in lost:
+                self._retry(item_id, f"Agent '{agent_id}' verloren ({reason})")
+        if lost:
+            logging.warning(
+                "Agent '%s' verloren (%s), %d Paket(e) werden neu vergeben.",
+                agent_id,
+                reason,
+                len(lost),
+            )
+
+    def _watch_heartbeats(self):
+        """Prüft regelmäßig, ob sich alle Agenten mit Paketen noch melden."""
+        while not self.closed:
+            time.sleep(min(self.heartbeat_interval, self.heartbeat_timeout) / 2)
+            now = time.monotonic()
+            with self.lock:
+                expired = [
+                    agent_id
+                    for agent_id, seen in self.last_seen.items()
+                    if now - seen > self.heartbeat_timeout
+                ]
+            for agent_id in expired:
+                self.release_agent(agent_id, "kein Heartbeat")
+
+    def close(self):
+        """Meldet den Agenten das Ende und beendet den Server."""
+        with self.lock:
+            self.closed = True
+        # Wartenden Agenten Zeit geben, das Ende abzuholen
+        time.sleep(POLL_INTERVAL * 2)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DistributedExecutor:
+    """
+    Ersatz für `multiprocessing.Pool` im `SimulationRunner`: verteilt die
+    Pakete aus `run_task_batch` über den Broker an die Agenten.
+    """
+
+    def __init__(
+        self,
+        host=DEFAULT_HOST,
+        port=DEFAULT_PORT,
+        timeout=None,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        **broker_options,
+    ):
+        self.broker = TaskBroker(host, port, **broker_options)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.next_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def imap_unordered(self, function, batches):
+        """
+        Verteilt die Pakete (Paketnummer, Worker-Funktion, Aufgaben) und
+        liefert die Ergebnisse wie `run_task_batch` in Fertigstellungsreihenfolge.
+
+        Raises:
+            RuntimeError: Ein Paket ist auch nach `maxRetries` erneuten
+                Vergaben gescheitert.
+            TimeoutError: `timeout` ist abgelaufen oder seit `idleTimeout`
+                Sekunden hat sich kein Agent gemeldet.
+        """
+        del function  # Die Agenten führen immer `run_task_batch` aus
+        indices = {}
+        for index, worker_function, tasks in batches:
+            self.next_id += 1
+            indices[self.next_id] = index
+            self.broker.submit(self.next_id, worker_function.__name__, tasks)
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while indices:
+            try:
+                item_id, results, error = self.broker.results.get(
+                    timeout=min(60.0, POLL_INTERVAL * 10)
+                )
+            except queue.Empty:
+                self._check_timeouts(deadline, len(indices))
+                continue
+            if error is not None:
+                raise RuntimeError(
+                    f"Paket {indices[item_id]} ist gescheitert:\n{error}"
+                )
+            yield indices.pop(item_id), [tuple(result) for result in results]
+
+    def _check_timeouts(self, deadline, open_items):
+        """Bricht ab, wenn der Lauf zu lange dauert oder kein Agent arbeitet."""
+        now = time.monotonic()
+        if deadline is not None and now > deadline:
+            raise TimeoutError(
+                f"Zeitlimit von {self.timeout} s abgelaufen, {open_items} Paket(e) offen."
+            )
+        if self.idle_timeout is not None and (
+            now - self.broker.last_activity > self.idle_timeout
+        ):
+            raise TimeoutError(
+                f"Seit {self.idle_timeout} s hat sich kein Agent gemeldet, "
+                f"{open_items} Paket(e) offen."
+            )
+        logging.info(
+            "Warte auf Agenten: %d Paket(e) offen, %d Agent(en) verbunden.",
+            open_items,
+            len(self.broker.last_seen),
+        )
+
+    def close(self):
+        """Beendet den Broker."""
+        if not self.broker.closed:
+            self.broker.close()
+
+    def join(self):
+        """Für die Schnittstelle von `multiprocessing.Pool`; nichts zu tun."""
+
+
+def _local_femm_dir(femm_files_dir, work_dir):
+    """
+    Verlegt den FEMM-Ordner einer Aufgabe in das Arbeitsverzeichnis des
+    Agenten (`<work_dir>/<Lauf>/femm_files/<Gruppe>`).
+    """
+    if not work_dir:
+        return femm_files_dir
+    group_dir = os.path.normpath(femm_files_dir)
+    run_name = os.path.basename(os.path.dirname(os.path.dirname(group_dir)))
+    return os.path.join(work_dir, run_name, "femm_files", os.path.basename(group_dir))
+
+
+class _HeartbeatThread(threading.Thread):
+    """Sendet die Heartbeats eines Agenten, während er ein Paket löst."""
+
+    def __init__(self, stream, send_lock, interval):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.send_lock = send_lock
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                with self.send_lock:
+                    _send(self.stream, {"type": "heartbeat"})
+            except OSError:
+                return
+
+
+def run_agent(
+    address,
+    name=None,
+    work_dir=None,
+    once=False,
+    session_max_tasks=None,
+    backend=None,
+    token=None,
+):
+    """
+    Holt Aufgabenpakete vom Broker, löst sie und schickt die Ergebnisse
+    zurück. Ohne `once` verbindet sich der Agent nach dem Ende eines Laufs
+    erneut und wartet auf den nächsten. Weist der Broker das Token ab, endet
+    der Agent.
+    """
+    # Erst hier importieren, damit der Broker-Teil ohne FEMM nutzbar ist
+    from src import simulation_worker
+
+    simulation_worker.init_worker(
+        session_max_tasks or simulation_worker.DEFAULT_SESSION_MAX_TASKS, backend
+    )
+    host, port = parse_address(address)
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    token = token or os.environ.get(TOKEN_ENV_VAR)
+
+    while True:
+        try:
+            with socket.create_connection((host, port)) as sock:
+                stream = sock.makefile("rwb")
+                send_lock = threading.Lock()
+                with send_lock:
+                    _send(stream, {"type": "hello", "agent": name, "token": token})
+                welcome = _receive(stream)
+                if welcome is None or welcome.get("type") == "rejected":
+                    logging.error(
+                        "Broker %s:%d hat den Agenten abgewiesen (Token?).", host, port
+                    )
+                    break
+                logging.info("Agent '%s' mit Broker %s:%d verbunden.", name, host, port)
+                if _serve_broker(
+                    stream, send_lock, welcome, work_dir, simulation_worker
+                ):
+                    logging.info("Broker meldet das Ende des Laufs.")
+                    if once:
+                        break
+        except (ConnectionError, OSError) as e:
+            logging.info("Broker %s:%d nicht erreichbar: %s", host, port, e)
+            if once:
+                break
+        time.sleep(RECONNECT_INTERVAL)
+    simulation_worker.close_worker_session()
+
+
+def _run_batch(message, work_dir, simulation_worker):
+    """Löst die Aufgaben eines Pakets und gibt ihre Ergebnisse zurück."""
+    if message["worker"] not in WORKER_FUNCTIONS:
+        raise ValueError(f"Unbekannte Worker-Funktion '{message['worker']}'.")
+    worker_function = getattr(simulation_worker, message["worker"])
+    tasks = []
+    for task in message["tasks"]:
+        task[0] = _local_femm_dir(task[0], work_dir)
+        os.makedirs(task[0], exist_ok=True)
+        tasks.append(tuple(task))
+    _, results = simulation_worker.run_task_batch(
+        (message["id"], worker_function, tasks), raise_errors=True
+    )
+    return results
+
+
+def _serve_broker(stream, send_lock, welcome, work_dir, simulation_worker):
+    """
+    Arbeitet Pakete ab, bis der Broker das Ende meldet (True) oder die
+    Verbindung abbricht (False).
+    """
+    interval = float((welcome or {}).get("heartbeat", DEFAULT_HEARTBEAT_INTERVAL))
+    while True:
+        with send_lock:
+            _send(stream, {"type": "get"})
+        message = _receive(stream)
+        if message is None:
+            return False
+        if message["type"] == "shutdown":
+            return True
+        if message["type"] == "wait":
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        heartbeat = _HeartbeatThread(stream, send_lock, interval)
+        heartbeat.start()
+        # Fehler eines Pakets gehen an den Broker, der Agent arbeitet weiter
+        try:
+            results = _run_batch(message, work_dir, simulation_worker)
+            reply = {"type": "result", "id": message["id"], "results": results}
+            logging.info(
+                "Paket %s mit %d Aufgabe(n) gelöst.",
+                message["id"],
+                len(message["tasks"]),
+            )
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Paket %s ist gescheitert.", message["id"])
+            reply = {
+                "type": "error",
+                "id": message["id"],
+                "error": traceback.format_exc(),
+            }
+        finally:
+            heartbeat.stopped.set()
+            heartbeat.join()
+
+        with send_lock:
+            _send(stream, reply)
+        if _receive(stream) is None:
+            return False
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    PARSER = argparse.ArgumentParser(
+        description="Verteilte Ausführung der FEMM-Simulationen."
+    )
+    SUBPARSERS = PARSER.add_subparsers(dest="command", required=True)
+    AGENT = SUBPARSERS.add_parser("agent", help="Startet einen Agenten")
+    AGENT.add_argument(
+        "--broker",
+        default=f"{DEFAULT_HOST}:{DEFAULT_PORT}",
+        help="Adresse des Brokers als HOST:PORT",
+    )
+    AGENT.add_argument("--name", help="Name des Agenten in den Logmeldungen")
+    AGENT.add_argument(
+        "--work-dir",
+        help="Lokaler Ordner für die FEMM-Dateien (Standard: Pfade des Runners)",
+    )
+    AGENT.add_argument(
+        "--once",
+        action="store_true",
+        help="Nach dem Ende eines Laufs beenden statt auf den nächsten zu warten",
+    )
+    AGENT.add_argument(
+        "--session-max-tasks",
+        type=int,
+        help="Aufgaben pro FEMM-Sitzung, bevor sie neu gestartet wird",
+    )
+    AGENT.add_argument(
+        "--backend",
+        help="FEMM-Backend als Name oder JSON (siehe src.femm_backends)",
+    )
+    AGENT.add_argument(
+        "--token",
+        help=f"Gemeinsames Token des Brokers (Standard: {TOKEN_ENV_VAR})",
+    )
+    ARGS = PARSER.parse_args()
+    run_agent(
+        ARGS.broker,
+        name=ARGS.name,
+        work_dir=ARGS.work_dir,
+        once=ARGS.once,
+        session_max_tasks=ARGS.session_max_tasks,
+        backend=ARGS.backend,
+        token=ARGS.token,
+    )
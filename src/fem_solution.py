@@ -0,0 +1,604 @@
+# src/fem_solution.py
+"""
+Liest eine gelöste Magnetik-Lösung (.ans von FEMM bzw. xfemm) in NumPy-Arrays
+und wertet sie ohne FEMM aus: Blockintegrale über ausgewählte Gruppen und die
+Eigenschaften der Stromkreise, wie sie `mo_blockintegral` und
+`mo_getcircuitproperties` liefern.
+
+Eine .ans-Datei enthält das Modell im .fem-Format, gefolgt von `[Solution]`:
+Anzahl und Zeilen der Netzknoten (x, y, A bzw. Re A, Im A), Anzahl und Zeilen
+der Dreiecke (drei Knoten, Index des Block-Labels) und die Daten der
+Stromkreise.
+
+Das Vektorpotential ist je Dreieck linear, B damit je Dreieck konstant. Die
+Stromdichte ergibt sich je Block aus dem Strom des Stromkreises und den
+Wirbelströmen (J = σ·(−jωA + E0), E0 so, dass der Blockstrom stimmt); Blöcke
+ohne Stromkreis haben kein E0. Lineare Materialien mit Hysteresewinkel
+(Phi_hx, Phi_hy) haben bei Wechselstrom die komplexe Permeabilität
+μ·exp(−jφ); daraus ergeben sich die Hystereseverluste (Typ 3) und die
+Gesamtverluste (Typ 6).
+
+Was FEMM anders rechnet, als es sich aus A allein ergibt, ist NaN statt
+einer Näherung: H, Energie, Koenergie und Hystereseverluste (Typen 2, 3, 6,
+17) in nichtlinearen Materialien (FEMM integriert die B-H-Kurve bzw. nutzt
+eine effektive Permeabilität), in Magneten und in geblechten Materialien,
+die Stromdichte in leitfähigen geblechten Materialien bei Wechselstrom
+sowie die Integrale über den Maxwell'schen Spannungstensor (Typen 18–23).
+Die 1x-Anteile (25–30) gibt es nur bei inkrementellen Problemen und sind 0.
+
+Alle Größen werden je Dreieck in einem vektorisierten Durchgang berechnet;
+die Blockintegrale aller Gruppen einer Lösung ergeben sich daraus durch
+Aufsummieren je Gruppe (`extract_block_integrals`), ohne Auswahl und Abfrage
+je Gruppe und Typ wie über FEMM (`simulation_meta.postProcessor` = "numpy").
+"""
+import math
+
+import numpy as np
+
+from src.block_integrals import GroupIntegrals
+from src.fem_writer import LENGTH_UNITS_M, MU0, FemModel
+from src.mesh_index import TriangleGrid
+
+# Integrale über den Spannungstensor, die hier nicht berechnet werden
+STRESS_TENSOR_TYPES = frozenset(range(18, 24))
+# Anteile, die nur bei inkrementellen Problemen von 0 verschieden sind
+INCREMENTAL_TYPES = frozenset(range(25, 31))
+# Integrale, die H enthalten und daher nur in einfachen Materialien vorliegen
+FIELD_ENERGY_TYPES = frozenset((2, 3, 6, 17))
+
+
+def element_b_field(x, y, potential):
+    """
+    Flussdichte und Fläche je Dreieck aus den Koordinaten (E, 3) und dem
+    Vektorpotential (E, 3) der Ecken; entartete Dreiecke haben B = 0.
+
+    Returns:
+        tuple: (Bx, By, Fläche), je (E,).
+    """
+    # Gradienten der linearen Formfunktionen
+    b_coef = np.stack([y[:, 1] - y[:, 2], y[:, 2] - y[:, 0], y[:, 0] - y[:, 1]], 1)
+    c_coef = np.stack([x[:, 2] - x[:, 1], x[:, 0] - x[:, 2], x[:, 1] - x[:, 0]], 1)
+    double_area = (x * b_coef).sum(axis=1)
+    degenerate = np.abs(double_area) < 1e-30
+    safe = np.where(degenerate, 1.0, double_area)
+    bx = np.where(degenerate, 0, (potential * c_coef).sum(axis=1) / safe)
+    by = np.where(degenerate, 0, -(potential * b_coef).sum(axis=1) / safe)
+    return bx, by, np.abs(double_area) / 2
+
+
+def _triangle_product(f, g, area):
+    """Integral des Produkts zweier je Dreieck linearer Größen (Knotenwerte (E, 3))."""
+    return area / 12 * ((f * g).sum(axis=1) + f.sum(axis=1) * g.sum(axis=1))
+
+
+class FemSolution:
+    """Netz, Vektorpotential und Modell einer gelösten Magnetik-Aufgabe."""
+
+    def __init__(self, model, nodes, elements, element_labels, potential):
+        """
+        Args:
+            model (FemModel): Das gelöste Modell.
+            nodes (ndarray): Knotenkoordinaten (N, 2) in Modelleinheiten.
+            elements (ndarray): Knotenindizes der Dreiecke (E, 3).
+            element_labels (ndarray): Block-Label je Dreieck (E,).
+            potential (ndarray): Komplexes Vektorpotential je Knoten (N,) in Wb/m.
+        """
+        self.model = model
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.elements = np.asarray(elements, dtype=np.int64)
+        self.element_labels = np.asarray(element_labels, dtype=np.int64)
+        self.potential = np.asarray(potential, dtype=complex)
+        self.unit = LENGTH_UNITS_M[model.problem["units"]]
+        self.depth = model.problem["depth"] * self.unit
+        self.omega = 2 * math.pi * model.problem["frequency"]
+        self._fields = None
+        self._contributions = {}
+        self._index = None
+
+    @classmethod
+    def load(cls, ans_path):
+        """Liest eine .ans-Datei."""
+        with open(ans_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        head, marker, solution = text.partition("[Solution]")
+        if not marker:
+            raise ValueError(f"'{ans_path}' enthält keine Lösung.")
+        model = FemModel.from_text(head)
+        lines = solution.strip().splitlines()
+
+        count = int(lines[0].split()[0])
+        node_lines = lines[1 : 1 + count]
+        columns = len(node_lines[0].split())
+        values = np.array(" ".join(node_lines).split(), dtype=float)
+        values = values.reshape(count, columns)
+        potential = values[:, 2].astype(complex)
+        if model.problem["frequency"] != 0 and columns >= 4:
+            potential += 1j * values[:, 3]
+
+        position = 1 + count
+        count = int(lines[position].split()[0])
+        element_lines = lines[position + 1 : position + 1 + count]
+        elements = np.array(
+            [line.split()[:4] for line in element_lines], dtype=np.int64
+        ).reshape(count, 4)
+        return cls(model, values[:, :2], elements[:, :3], elements[:, 3], potential)
+
+    # --- Größen je Dreieck ---
+
+    def _material_values(self, name):
+        """Eine Materialeigenschaft je Block-Label (0 ohne Material)."""
+        return np.array(
+            [
+                self.model.materials[label["material"]][name]
+                if label["material"] in self.model.materials
+                else 0.0
+                for label in self.model.labels
+            ],
+            dtype=float,
+        )
+
+    def _laminated(self, material):
+        """Ob FEMM ein Material als geblecht behandelt."""
+        return (
+            material["lam_type"] != 0
+            or material["lam_fill"] != 1
+            or (material["d_lam"] > 0 and self.omega != 0)
+        )
+
+    def _unsupported_labels(self):
+        """
+        Block-Labels, in denen H bzw. die Stromdichte nicht aus A folgt, wie
+        FEMM sie rechnet (siehe Modulbeschreibung).
+
+        Returns:
+            tuple: (H unbekannt, Stromdichte unbekannt), je bool (Labels,).
+        """
+        labels = self.model.labels
+        field = np.zeros(len(labels), dtype=bool)
+        current = np.zeros(len(labels), dtype=bool)
+        for k, label in enumerate(labels):
+            material = self.model.materials.get(label["material"])
+            if material is None:
+                continue
+            laminated = self._laminated(material)
+            field[k] = bool(material["bh_points"]) or material["h_c"] != 0 or laminated
+            current[k] = laminated and material["sigma"] > 0 and self.omega != 0
+        return field, current
+
+    def _relative_permeability(self):
+        """
+        Relative Permeabilität je Block-Label (x, y), bei Wechselstrom mit
+        dem Hysteresewinkel komplex; NaN, wo H nicht aus B folgt.
+        """
+        labels = self.model.labels
+        mu = np.ones((len(labels), 2), dtype=complex)
+        for k, label in enumerate(labels):
+            material = self.model.materials.get(label["material"])
+            if material is None:
+                continue
+            mu[k] = material["mu_x"], material["mu_y"]
+            if self.omega:
+                mu[k] *= np.exp(
+                    -1j * np.deg2rad([material["phi_hx"], material["phi_hy"]])
+                )
+        mu[self._unsupported_labels()[0]] = np.nan
+        return mu
+
+    def fields(self):
+        """
+        Berechnet einmalig in einem Durchgang alle Größen je Dreieck: Fläche,
+        Schwerpunkt, B, H, Energiedichte (zeitlich gemittelt), Leitfähigkeit
+        und die Stromdichte an den Ecken (SI-Einheiten).
+        """
+        if self._fields is not None:
+            return self._fields
+        points = self.nodes[self.elements] * self.unit
+        x, y = points[..., 0], points[..., 1]
+        potential = self.potential[self.elements]
+
+        bx, by, area = element_b_field(x, y, potential)
+
+        b_abs = np.sqrt(np.abs(bx) ** 2 + np.abs(by) ** 2)
+        mu = self._relative_permeability()[self.element_labels]
+        # NaN-Permeabilität (siehe `_relative_permeability`) ergibt NaN für H
+        with np.errstate(invalid="ignore"):
+            hx = bx / (MU0 * mu[:, 0])
+            hy = by / (MU0 * mu[:, 1])
+
+        labels = self.element_labels
+        sigma_label = self._material_values("sigma") * 1e6
+        sigma = sigma_label[labels]
+        a_integral = np.bincount(
+            labels,
+            weights=area * potential.mean(axis=1).real,
+            minlength=len(sigma_label),
+        ) + 1j * np.bincount(
+            labels,
+            weights=area * potential.mean(axis=1).imag,
+            minlength=len(sigma_label),
+        )
+        label_area = np.bincount(labels, weights=area, minlength=len(sigma_label))
+        offset = self._current_offsets(sigma_label, label_area, a_integral)
+        current_density = (
+            -1j * self.omega * sigma[:, None] * potential + offset[labels][:, None]
+        )
+        current_unknown = self._unsupported_labels()[1]
+        current_density[current_unknown[labels]] = np.nan
+        # Zeitliche Mittelwerte quadratischer Größen bei Wechselstrom
+        half = 0.5 if self.omega else 1.0
+
+        self._fields = {
+            "area": area,
+            "x": x,
+            "y": y,
+            "centroid": points.mean(axis=1),
+            "potential": potential,
+            "bx": bx,
+            "by": by,
+            "hx": hx,
+            "hy": hy,
+            "b_abs": b_abs,
+            "h_abs": np.sqrt(np.abs(hx) ** 2 + np.abs(hy) ** 2),
+            "energy_density": half * 0.5 * (bx * np.conj(hx) + by * np.conj(hy)).real,
+            # Hystereseverluste (ω/2)·Im(H·B*), bei Gleichstrom keine
+            "hysteresis_density": (
+                self.omega * half * (hx * np.conj(bx) + hy * np.conj(by)).imag
+                if self.omega
+                else np.zeros(len(area))
+            ),
+            "half": half,
+            "sigma": sigma,
+            "current_density": current_density,
+            "label_area": label_area,
+            "label_a_integral": a_integral,
+            "label_offset": offset,
+            "sigma_label": sigma_label,
+        }
+        return self._fields
+
+    def _turns(self, label):
+        """Windungszahl eines Blocks (0 wie bei FEMM als 1)."""
+        return label["turns"] if label["turns"] else 1
+
+    def _current_offsets(self, sigma, area, a_integral):
+        """
+        Konstanter Anteil der Stromdichte je Block-Label (σ·E0 bzw. die
+        eingeprägte Stromdichte), sodass jeder Block den Strom seines
+        Stromkreises führt.
+        """
+        labels = self.model.labels
+        offset = np.zeros(len(labels), dtype=complex)
+        for k, label in enumerate(labels):
+            material = self.model.materials.get(label["material"])
+            if material is not None:
+                offset[k] = complex(material["j_re"], material["j_im"]) * 1e6
+        for name, circuit in self.model.circuits.items():
+            members = [k for k, l in enumerate(labels) if l["circuit"] == name]
+            members = [k for k in members if area[k] > 0]
+            if not members:
+                continue
+            current = circuit["current"]
+            if circuit["type"] == 1:
+                for k in members:
+                    block_current = self._turns(labels[k]) * current
+                    offset[k] += (
+                        block_current + 1j * self.omega * sigma[k] * a_integral[k]
+                    ) / area[k]
+            else:
+                conductance = sum(sigma[k] * area[k] for k in members)
+                if conductance > 0:
+                    field = (
+                        current
+                        + 1j
+                        * self.omega
+                        * sum(sigma[k] * a_integral[k] for k in members)
+                    ) / conductance
+                    for k in members:
+                        offset[k] += sigma[k] * field
+                else:
+                    total_area = sum(area[k] for k in members)
+                    for k in members:
+                        offset[k] += current / total_area
+        return offset
+
+    # --- Auswertung ---
+
+    def labels_in_groups(self, groups):
+        """Indizes der Block-Labels, die zu einer der Gruppen gehören."""
+        groups = set(groups)
+        return [k for k, l in enumerate(self.model.labels) if l["group"] in groups]
+
+    def spatial_index(self):
+        """Der räumliche Index über die Dreiecke, beim ersten Aufruf aufgebaut."""
+        if self._index is None:
+            self._index = TriangleGrid(self.nodes, self.elements)
+        return self._index
+
+    def probe(self, points):
+        """
+        Wertet die Lösung an beliebigen Punkten (Modelleinheiten) aus: A wird
+        linear im Dreieck interpoliert, B ist je Dreieck konstant.
+
+        Returns:
+            dict: Je Punkt "element" (-1 außerhalb des Netzes), "label"
+            (Index des Block-Labels, -1 außerhalb), "potential" (Wb/m) sowie
+            "bx" und "by" (T), außerhalb NaN.
+        """
+        element, weights = self.spatial_index().locate(points)
+        found = element >= 0
+        f = self.fields()
+        potential = np.full(len(element), np.nan, dtype=complex)
+        bx = np.full(len(element), np.nan, dtype=complex)
+        by = np.full(len(element), np.nan, dtype=complex)
+        hits = element[found]
+        potential[found] = (weights[found] * self.potential[self.elements[hits]]).sum(
+            axis=1
+        )
+        bx[found] = f["bx"][hits]
+        by[found] = f["by"][hits]
+        return {
+            "element": element,
+            "label": np.where(found, self.element_labels[element], -1),
+            "potential": potential,
+            "bx": bx,
+            "by": by,
+        }
+
+    def label_at(self, x, y):
+        """Index des Block-Labels an einem Punkt (Modelleinheiten), sonst None."""
+        element, _ = self.spatial_index().locate([[x, y]])
+        return int(self.element_labels[element[0]]) if element[0] >= 0 else None
+
+    def element_integrals(self, int_type):
+        """
+        Beiträge jedes Dreiecks zu einem Blockintegral (Typen wie
+        `mo_blockintegral`); die Summe über eine Auswahl ist das Integral.
+        """
+        int_type = int(int_type)
+        if int_type in self._contributions:
+            return self._contributions[int_type]
+        f = self.fields()
+        area = f["area"]
+        potential = f["potential"]
+        current = f["current_density"]
+        bx, by = f["bx"], f["by"]
+        sigma = f["sigma"]
+        depth = self.depth
+
+        def losses():
+            conducting = sigma > 0
+            density = np.zeros(len(area))
+            density[conducting] = (
+                _triangle_product(
+                    current[conducting], np.conj(current[conducting]), area[conducting]
+                ).real
+                / sigma[conducting]
+            )
+            return depth * f["half"] * density
+
+        def lorentz(steady):
+            j_mean = current.mean(axis=1)
+            if steady:
+                fx = (-j_mean * np.conj(by)).real * f["half"]
+                fy = (j_mean * np.conj(bx)).real * f["half"]
+            elif self.omega:
+                fx = -0.5 * j_mean * by
+                fy = 0.5 * j_mean * bx
+            else:
+                fx = fy = np.zeros_like(j_mean)
+            return depth * area * fx, depth * area * fy
+
+        if int_type in STRESS_TENSOR_TYPES:
+            values = np.full(len(area), np.nan)
+        elif int_type in INCREMENTAL_TYPES:
+            values = np.zeros(len(area))
+        elif int_type == 0:
+            values = depth * _triangle_product(potential, np.conj(current), area)
+        elif int_type == 1:
+            values = depth * area * potential.mean(axis=1)
+        elif int_type in (2, 17):
+            values = depth * area * f["energy_density"]
+        elif int_type == 3:
+            values = depth * area * f["hysteresis_density"]
+        elif int_type == 4:
+            values = losses()
+        elif int_type == 6:
+            values = losses() + self.element_integrals(3)
+        elif int_type == 5:
+            values = area
+        elif int_type == 7:
+            values = area * current.mean(axis=1)
+        elif int_type == 8:
+            values = depth * area * bx
+        elif int_type == 9:
+            values = depth * area * by
+        elif int_type == 10:
+            values = depth * area
+        elif int_type in (11, 12, 13, 14):
+            fx, fy = lorentz(steady=int_type in (11, 12))
+            values = fx if int_type in (11, 13) else fy
+        elif int_type in (15, 16):
+            fx, fy = lorentz(steady=int_type == 15)
+            cx, cy = f["centroid"][:, 0], f["centroid"][:, 1]
+            values = cx * fy - cy * fx
+        elif int_type == 24:
+            x, y = f["x"], f["y"]
+            values = depth * (
+                _triangle_product(x, x, area) + _triangle_product(y, y, area)
+            )
+        else:
+            raise ValueError(f"Unbekannter Blockintegral-Typ {int_type}.")
+        self._contributions[int_type] = values
+        return values
+
+    def block_integral(self, int_type, labels):
+        """
+        Berechnet ein Blockintegral (Typen wie `mo_blockintegral`) über die
+        Dreiecke der angegebenen Block-Labels; NaN, wenn es sich nicht wie
+        in FEMM berechnen lässt.
+        """
+        int_type = int(int_type)
+        mask = np.isin(self.element_labels, list(labels))
+        return self.element_integrals(int_type)[mask].sum()
+
+    def group_integrals(self, group_ids, integral_types):
+        """
+        Berechnet alle angegebenen Integrale für alle Gruppen in einem
+        Durchgang: die Beiträge der Dreiecke werden je Gruppe aufsummiert.
+        Enthält eine Gruppe Dreiecke, deren Beitrag nicht wie in FEMM
+        berechnet werden kann, ist ihr Wert NaN.
+
+        Returns:
+            dict: Gruppe -> {Integral-Typ: Wert}.
+        """
+        group_ids = list(group_ids)
+        index = {group_id: k for k, group_id in enumerate(group_ids)}
+        # Gruppe je Block-Label, Labels außerhalb der Gruppen ans Ende
+        label_group = np.array(
+            [index.get(label["group"], len(group_ids)) for label in self.model.labels],
+            dtype=np.int64,
+        )
+        element_group = label_group[self.element_labels]
+        sums = {}
+        for int_type in integral_types:
+            int_type = int(int_type)
+            values = self.element_integrals(int_type)
+            total = np.bincount(
+                element_group, weights=values.real, minlength=len(group_ids) + 1
+            )
+            if np.iscomplexobj(values):
+                total = total + 1j * np.bincount(
+                    element_group, weights=values.imag, minlength=len(group_ids) + 1
+                )
+            sums[int_type] = total[: len(group_ids)]
+        return {
+            group_id: {int_type: sums[int(int_type)][k] for int_type in integral_types}
+            for group_id, k in index.items()
+        }
+
+    def extract_block_integrals(self, plan):
+        """
+        Wertet geplante Blockintegral-Abfragen (siehe `plan_block_integrals`)
+        direkt aus der Lösung aus, wie `FEMMSession.extract_block_integrals`.
+
+        Returns:
+            list[GroupIntegrals]: Die Ergebnisse in der Reihenfolge des Plans.
+        """
+        integral_types = []
+        for request in plan:
+            integral_types.extend(
+                t for t in request.integral_types if t not in integral_types
+            )
+        values = self.group_integrals(
+            [request.group_id for request in plan if request.group_id is not None],
+            integral_types,
+        )
+        records = []
+        for request in plan:
+            if request.group_id is None:
+                # Wie `mo_selectblock(0, 0)`: der Block am Ursprung
+                label = self.label_at(0, 0)
+                labels = [] if label is None else [label]
+                group_values = {
+                    t: self.block_integral(t, labels) for t in request.integral_types
+                }
+            else:
+                group_values = values[request.group_id]
+            records.append(
+                GroupIntegrals(
+                    request.group_id,
+                    request.prefix,
+                    request.phase_name,
+                    {t: group_values[t] for t in request.integral_types},
+                )
+            )
+        return records
+
+    def circuit_properties(self, name):
+        """
+        Strom, Spannung und Flussverkettung eines Stromkreises wie
+        `mo_getcircuitproperties`.
+        """
+        circuit = self.model.circuits[name]
+        f = self.fields()
+        labels = self.model.labels
+        members = [
+            k
+            for k, l in enumerate(labels)
+            if l["circuit"] == name and f["label_area"][k] > 0
+        ]
+        if self._unsupported_labels()[1][members].any():
+            raise NotImplementedError(
+                f"Stromkreis '{name}' enthält geblechte leitfähige Blöcke."
+            )
+        current = circuit["current"]
+        if not members:
+            return current, 0j, 0j
+        area = f["label_area"]
+        mean_potential = f["label_a_integral"] / np.where(area > 0, area, 1.0)
+        sigma = f["sigma_label"]
+        if circuit["type"] == 1:
+            turns = {k: self._turns(labels[k]) for k in members}
+            flux = self.depth * sum(turns[k] * mean_potential[k] for k in members)
+            voltage = 0j
+            for k in members:
+                if sigma[k] > 0:
+                    voltage += turns[k] * self.depth * f["label_offset"][k] / sigma[k]
+                else:
+                    voltage += (
+                        1j * self.omega * turns[k] * self.depth * mean_potential[k]
+                    )
+        else:
+            total_area = sum(area[k] for k in members)
+            flux = self.depth * sum(f["label_a_integral"][k] for k in members)
+            flux /= total_area
+            conducting = [k for k in members if sigma[k] > 0]
+            if conducting:
+                k = conducting[0]
+                voltage = self.depth * f["label_offset"][k] / sigma[k]
+            else:
+                voltage = 1j * self.omega * flux
+        return complex(current), complex(voltage), complex(flux)
+
+
+def write_combined_solution(sources, target_path, real_part=False):
+    """
+    Schreibt die Überlagerung Σ w·A mehrerer Lösungen desselben Netzes als
+    .ans-Datei, z. B. für die Bilder von Winkeln, die nicht selbst gelöst
+    wurden. Modell, Netz und Stromkreise stammen aus der ersten Lösung; mit
+    `real_part` wird nur der Momentanwert Re(Σ w·A) geschrieben.
+
+    Args:
+        sources (list): Paare (Pfad der .ans-Datei, Gewicht).
+        target_path (str): Pfad der neuen .ans-Datei.
+        real_part (bool): Nur den Realteil des Vektorpotentials schreiben.
+    """
+    first = None
+    potential = None
+    for path, weight in sources:
+        solution = FemSolution.load(path)
+        if first is None:
+            first = solution
+            potential = weight * solution.potential
+            continue
+        if solution.nodes.shape != first.nodes.shape or not np.allclose(
+            solution.nodes, first.nodes
+        ):
+            raise ValueError(f"'{path}' hat ein anderes Netz als '{sources[0][0]}'.")
+        potential = potential + weight * solution.potential
+    if real_part:
+        potential = potential.real.astype(complex)
+
+    with open(sources[0][0], "r", encoding="utf-8", errors="replace") as f:
+        head, marker, solution_text = f.read().partition("[Solution]")
+    lines = solution_text.split("\n")
+    start = next(i for i, line in enumerate(lines) if line.strip())
+    harmonic = first.model.problem["frequency"] != 0
+    for index, value in enumerate(potential):
+        fields = lines[start + 1 + index].split()
+        fields[2] = f"{value.real:.17g}"
+        if harmonic and len(fields) >= 4:
+            fields[3] = f"{value.imag:.17g}"
+        lines[start + 1 + index] = "\t".join(fields)
+    with open(target_path, "w", encoding="utf-8") as f:
+        f.write(head + marker + "\n".join(lines))
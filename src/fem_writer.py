@@ -0,0 +1,824 @@
+# src/fem_writer.py
+"""
+Schreibt FEMM-Modelle direkt als `.fem`-Datei, ohne FEMM aufzurufen.
+
+`FemModel` bietet dieselben Befehle zum Aufbau eines Modells wie
+`FEMMSession` (`new_document`, `prob_def`, `add_material`, `add_node`,
+`set_block_prop`, `make_abc`, `save_as`, ...), merkt sich das Modell aber nur,
+statt jeden Befehl an FEMM zu senden. `setup_femm_problem` und
+`build_femm_geometry` aus `src.simulation_worker` erzeugen damit dasselbe
+Modell wie interaktiv; `write` bzw. `save_as` schreibt es im Textformat von
+FEMM 4.2. FEMM muss die Datei danach nur noch öffnen und lösen
+(`simulation_meta.modelBuilder` = "direct").
+
+Beim Schreiben werden wie in FEMM doppelte Knoten zusammengefasst und
+Segmente an Knoten, die auf ihnen liegen, geteilt, alles mit NumPy über alle
+Knoten und Segmente zugleich. Segmente, die sich kreuzen, teilt FEMM beim
+Zeichnen an einem neuen Knoten; das geschieht hier nicht, solche Modelle
+werden mit einem ValueError abgelehnt.
+
+Den offenen Rand zeichnet `make_abc` nicht: `mi_makeABC` baut ihn aus
+Schalen mit abgestufter Permeabilität auf, die FEMM selbst erzeugt. Das
+Modell merkt sich nur die Angaben (`abc`); `prepare_model` ruft damit nach
+dem Öffnen der Datei `mi_makeABC` in FEMM auf, sodass der Rand genau dem
+gezeichneten Modell entspricht. Ohne FEMM (xfemm) kann der Rand mit
+`add_asymptotic_boundary` durch einen Kreis mit gemischter Randbedingung
+c0 = 1/(μ0·R) ersetzt werden, einer asymptotischen Randbedingung erster
+Ordnung, die nicht dieselben Ergebnisse wie FEMM liefert.
+
+Für die Prüfung, welche Knoten auf welchen Segmenten liegen und welche
+Segmente sich kreuzen, werden nur Paare betrachtet, deren umschließende
+Rechtecke sich überlappen (Sortieren nach x und Durchlaufen der Bereiche),
+statt alle Paare.
+
+`write_fem_files` erzeugt viele Varianten parallel in einem Prozess-Pool.
+"""
+import io
+import logging
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+MU0 = 4e-7 * math.pi
+
+# Knoten, die nach Rundung auf so viele Nachkommastellen gleich sind, werden
+# zusammengefasst; gilt auch als Abstand für "liegt auf dem Segment"
+NODE_DECIMALS = 6
+NODE_TOLERANCE = 10.0**-NODE_DECIMALS
+
+# Maximale Winkelweite eines Teilstücks beim Vernetzen der Randbögen in Grad
+ABC_MAX_SEGMENT_DEG = 1
+ABC_BOUNDARY_NAME = "ABC"
+
+LENGTH_UNITS_M = {
+    "inches": 0.0254,
+    "millimeters": 1e-3,
+    "centimeters": 1e-2,
+    "meters": 1.0,
+    "mils": 2.54e-5,
+    "micrometers": 1e-6,
+}
+
+# Die Materialien, die `get_material` aus der FEMM-Bibliothek lädt
+LIBRARY_MATERIALS = {
+    "Air": {"mu_x": 1.0, "mu_y": 1.0, "sigma": 0.0},
+    "Copper": {"mu_x": 1.0, "mu_y": 1.0, "sigma": 58.0},
+}
+
+# Zuordnung der FEMM-Funktionen zu den Methoden von `FemModel` (`apply`)
+FEMM_CALLS = {
+    "newdocument": "new_document",
+    "mi_probdef": "prob_def",
+    "mi_addmaterial": "add_material",
+    "mi_addbhpoint": "add_bh_point",
+    "mi_getmaterial": "get_material",
+    "mi_addcircprop": "add_circuit",
+    "mi_modifycircprop": "modify_circuit",
+    "mi_drawrectangle": "draw_rectangle",
+    "mi_addnode": "add_node",
+    "mi_addsegment": "add_segment",
+    "mi_addarc": "add_arc",
+    "mi_addblocklabel": "add_block_label",
+    "mi_selectlabel": "select_label",
+    "mi_setblockprop": "set_block_prop",
+    "mi_clearselected": "clear_selected",
+    "mi_makeABC": "make_abc",
+    "mi_saveas": "save_as",
+}
+
+
+# Kopfzeilen einer .fem-Datei und die Felder von `FemModel.problem`
+_HEADER_KEYS = {
+    "[frequency]": ("frequency", float),
+    "[precision]": ("precision", float),
+    "[minangle]": ("min_angle", float),
+    "[depth]": ("depth", float),
+    "[lengthunits]": ("units", str),
+    "[problemtype]": ("prob_type", str),
+}
+
+
+def _format_value(value):
+    """Zahl im Format von FEMM (volle Genauigkeit, ohne unnötige Stellen)."""
+    return f"{float(value):.17g}"
+
+
+def _format_table(rows, formats):
+    """Formatiert eine Tabelle zeilenweise mit Tabulatoren."""
+    if len(rows) == 0:
+        return ""
+    buffer = io.StringIO()
+    np.savetxt(buffer, np.asarray(rows, dtype=float), fmt=formats, delimiter="\t")
+    return buffer.getvalue()
+
+
+class FemModel:
+    """Ein Magnetik-Modell, das ohne FEMM aufgebaut und als .fem gespeichert wird."""
+
+    def __init__(self):
+        self.new_document(0)
+
+    def new_document(self, doc_type=0):
+        """Beginnt ein leeres Modell; nur Magnetik (0) wird unterstützt."""
+        if int(doc_type) != 0:
+            raise ValueError("Es werden nur Magnetik-Modelle (Typ 0) unterstützt.")
+        self.problem = {
+            "frequency": 0.0,
+            "units": "inches",
+            "prob_type": "planar",
+            "precision": 1e-8,
+            "depth": 1.0,
+            "min_angle": 30.0,
+        }
+        self.materials = {}
+        self.circuits = {}
+        self.boundaries = {}
+        self._nodes = []
+        self._segments = []
+        self._arcs = []
+        self.labels = []
+        self._selected = set()
+        # Angaben von `make_abc`, solange der offene Rand noch fehlt
+        self.abc = None
+
+    def prob_def(self, frequency, units, prob_type, precision, depth, min_angle=30):
+        """Definiert die Problem-Eigenschaften."""
+        if units not in LENGTH_UNITS_M:
+            raise ValueError(f"Unbekannte Längeneinheit '{units}'.")
+        self.problem = {
+            "frequency": float(frequency),
+            "units": units,
+            "prob_type": prob_type,
+            "precision": float(precision),
+            "depth": float(depth),
+            "min_angle": float(min_angle),
+        }
+
+    def add_material(
+        self,
+        mat_name,
+        mu_x=1,
+        mu_y=1,
+        h_c=0,
+        j=0,
+        c=0,
+        d=0,
+        phi_hmax=0,
+        lam_fill=1,
+        lam_type=0,
+        phi_hx=0,
+        phi_hy=0,
+    ):
+        """Fügt ein Material hinzu (Argumente wie `mi_addmaterial`)."""
+        j = complex(j)
+        self.materials[mat_name] = {
+            "mu_x": float(mu_x),
+            "mu_y": float(mu_y),
+            "h_c": float(h_c),
+            "j_re": j.real,
+            "j_im": j.imag,
+            "sigma": float(c),
+            "d_lam": float(d),
+            "phi_h": float(phi_hmax),
+            "lam_fill": float(lam_fill),
+            "lam_type": int(lam_type),
+            "phi_hx": float(phi_hx),
+            "phi_hy": float(phi_hy),
+            "bh_points": [],
+        }
+
+    def add_bh_point(self, mat_name, b, h):
+        """Fügt einen Punkt zur B-H-Kurve eines Materials hinzu."""
+        self.materials[mat_name]["bh_points"].append((float(b), float(h)))
+
+    def get_material(self, mat_name):
+        """Übernimmt ein Material der FEMM-Bibliothek (siehe `LIBRARY_MATERIALS`)."""
+        if mat_name not in LIBRARY_MATERIALS:
+            raise ValueError(f"Material '{mat_name}' ist nicht in der Bibliothek.")
+        props = LIBRARY_MATERIALS[mat_name]
+        self.add_material(mat_name, props["mu_x"], props["mu_y"], c=props["sigma"])
+
+    def add_circuit(self, circuit_name, current, circuit_type=1):
+        """Fügt einen Stromkreis hinzu (1 = Reihenschaltung)."""
+        self.circuits[circuit_name] = {
+            "current": complex(current),
+            "type": int(circuit_type),
+        }
+
+    def set_circuit_current(self, circuit_name, current):
+        """Ändert den Gesamtstrom eines bestehenden Stromkreises."""
+        self.circuits[circuit_name]["current"] = complex(current)
+
+    def modify_circuit(self, circuit_name, prop_num, value):
+        """Wie `mi_modifycircprop`; unterstützt Strom (1) und Typ (2)."""
+        if int(prop_num) == 1:
+            self.set_circuit_current(circuit_name, value)
+        elif int(prop_num) == 2:
+            self.circuits[circuit_name]["type"] = int(value)
+        elif int(prop_num) == 0:
+            self.circuits[value] = self.circuits.pop(circuit_name)
+
+    def draw_rectangle(self, x1, y1, x2, y2):
+        """Zeichnet ein Rechteck aus vier Knoten und Segmenten."""
+        corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        for x, y in corners:
+            self.add_node(x, y)
+        for k in range(4):
+            (xa, ya), (xb, yb) = corners[k], corners[(k + 1) % 4]
+            self.add_segment(xa, ya, xb, yb)
+
+    def add_node(self, x, y):
+        """Fügt einen Knoten hinzu."""
+        self._nodes.append((float(x), float(y)))
+
+    def add_segment(self, x1, y1, x2, y2):
+        """Verbindet zwei Knoten mit einem Liniensegment."""
+        self._segments.append((float(x1), float(y1), float(x2), float(y2)))
+
+    def add_arc(self, x1, y1, x2, y2, angle, max_seg, boundary=None):
+        """Verbindet zwei Knoten mit einem Bogen (Winkel in Grad, gegen den Uhrzeigersinn)."""
+        self._arcs.append(
+            (
+                float(x1),
+                float(y1),
+                float(x2),
+                float(y2),
+                float(angle),
+                float(max_seg),
+                boundary,
+            )
+        )
+
+    def add_block_label(self, x, y):
+        """Setzt ein Label ohne Eigenschaften."""
+        self.labels.append(
+            {
+                "x": float(x),
+                "y": float(y),
+                "material": None,
+                "mesh_size": -1.0,
+                "circuit": None,
+                "mag_dir": 0.0,
+                "group": 0,
+                "turns": 0,
+            }
+        )
+
+    def select_label(self, x, y):
+        """Wählt das Label, das am nächsten an (x, y) liegt."""
+        if not self.labels:
+            return
+        distances = [(l["x"] - x) ** 2 + (l["y"] - y) ** 2 for l in self.labels]
+        self._selected.add(int(np.argmin(distances)))
+
+    def set_block_prop(
+        self, mat_name, automesh, mesh_size, circuit, mag_dir, group, turns
+    ):
+        """Weist den ausgewählten Labels Material, Stromkreis und Gruppe zu."""
+        for index in self._selected:
+            self.labels[index].update(
+                {
+                    "material": None if mat_name == "<None>" else mat_name,
+                    "mesh_size": -1.0 if automesh else float(mesh_size),
+                    "circuit": None if circuit == "<None>" else circuit,
+                    "mag_dir": float(mag_dir),
+                    "group": int(group),
+                    "turns": int(turns),
+                }
+            )
+
+    def clear_selected(self):
+        """Hebt die aktuelle Auswahl auf."""
+        self._selected = set()
+
+    def make_abc(
+        self, num_layers=7, radius=500, center_x=0, center_y=0, boundary_type=0
+    ):
+        """
+        Merkt sich den offenen Rand wie `mi_makeABC`, ohne ihn zu zeichnen.
+        Die Schalen erzeugt FEMM nach dem Öffnen der Datei mit denselben
+        Angaben (`abc`); siehe `add_asymptotic_boundary` für Löser ohne FEMM.
+        """
+        self.abc = (num_layers, radius, center_x, center_y, boundary_type)
+
+    def add_asymptotic_boundary(self):
+        """
+        Ersetzt den gemerkten offenen Rand durch einen Kreis vom Radius der
+        ABC, auf dem die asymptotische Randbedingung c0 = 1/(μ0·R) gilt. Das
+        ist eine Näherung erster Ordnung und nicht der Rand von `mi_makeABC`.
+        """
+        if self.abc is None:
+            return
+        _, radius, center_x, center_y, _ = self.abc
+        radius_m = float(radius) * LENGTH_UNITS_M[self.problem["units"]]
+        self.boundaries[ABC_BOUNDARY_NAME] = {"type": 2, "c0": 1 / (MU0 * radius_m)}
+        right = (center_x + radius, center_y)
+        left = (center_x - radius, center_y)
+        for x, y in (right, left):
+            self.add_node(x, y)
+        self.add_arc(*right, *left, 180, ABC_MAX_SEGMENT_DEG, ABC_BOUNDARY_NAME)
+        self.add_arc(*left, *right, 180, ABC_MAX_SEGMENT_DEG, ABC_BOUNDARY_NAME)
+        self.abc = None
+
+    def apply(self, name, args):
+        """Führt einen aufgezeichneten FEMM-Aufruf (z. B. "mi_addnode") aus."""
+        if name not in FEMM_CALLS:
+            raise ValueError(f"FEMM-Aufruf '{name}' wird nicht unterstützt.")
+        return getattr(self, FEMM_CALLS[name])(*args)
+
+    def geometry(self):
+        """
+        Knoten und Segmente, wie FEMM sie speichern würde: doppelte Knoten
+        zusammengefasst, Segmente an darauf liegenden Knoten geteilt.
+
+        Returns:
+            tuple: (Knoten (N, 2), Segmente (S, 2), Bögen (A, 2)) als
+                NumPy-Arrays; Segmente und Bögen als Knotenindizes.
+        """
+        points = np.array(
+            self._nodes
+            + [p for s in self._segments for p in (s[:2], s[2:4])]
+            + [p for a in self._arcs for p in (a[:2], a[2:4])],
+            dtype=float,
+        ).reshape(-1, 2)
+        keys = np.round(points, NODE_DECIMALS)
+        _, first, inverse = np.unique(
+            keys, axis=0, return_index=True, return_inverse=True
+        )
+        inverse = inverse.reshape(-1)
+        # Knoten in der Reihenfolge ihres ersten Auftretens
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        nodes = points[first[order]]
+        indices = rank[inverse]
+
+        start = len(self._nodes)
+        segments = indices[start : start + 2 * len(self._segments)].reshape(-1, 2)
+        arcs = indices[start + 2 * len(self._segments) :].reshape(-1, 2)
+        segments = _unique_segments(_split_segments(nodes, segments))
+        _check_crossings(nodes, segments)
+        return nodes, segments, arcs
+
+    def to_text(self):
+        """Das Modell im .fem-Format."""
+        nodes, segments, arcs = self.geometry()
+        problem = self.problem
+        materials = list(self.materials)
+        circuits = list(self.circuits)
+        boundaries = list(self.boundaries)
+
+        lines = [
+            "[Format]      =  4.0",
+            f"[Frequency]   =  {_format_value(problem['frequency'])}",
+            f"[Precision]   =  {_format_value(problem['precision'])}",
+            f"[MinAngle]    =  {_format_value(problem['min_angle'])}",
+            "[DoSmartMesh] =  1",
+            f"[Depth]       =  {_format_value(problem['depth'])}",
+            f"[LengthUnits] =  {problem['units']}",
+            f"[ProblemType] =  {problem['prob_type']}",
+            "[Coordinates] =  cartesian",
+            "[ACSolver]    =  0",
+            "[PrevType]    =  0",
+            '[PrevSoln]    =  ""',
+            '[Comment]     =  ""',
+            "[PointProps]   = 0",
+            f"[BdryProps]   = {len(boundaries)}",
+        ]
+        for name in boundaries:
+            props = self.boundaries[name]
+            lines += [
+                "  <BeginBdry>",
+                f'    <BdryName> = "{name}"',
+                f"    <BdryType> = {props['type']}",
+                "    <A_0> = 0",
+                "    <A_1> = 0",
+                "    <A_2> = 0",
+                "    <Phi> = 0",
+                f"    <c0> = {_format_value(props.get('c0', 0))}",
+                "    <c0i> = 0",
+                f"    <c1> = {_format_value(props.get('c1', 0))}",
+                "    <c1i> = 0",
+                "    <Mu_ssd> = 0",
+                "    <Sigma_ssd> = 0",
+                "  <EndBdry>",
+            ]
+        lines.append(f"[BlockProps]  = {len(materials)}")
+        for name in materials:
+            props = self.materials[name]
+            lines += [
+                "  <BeginBlock>",
+                f'    <BlockName> = "{name}"',
+                f"    <Mu_x> = {_format_value(props['mu_x'])}",
+                f"    <Mu_y> = {_format_value(props['mu_y'])}",
+                f"    <H_c> = {_format_value(props['h_c'])}",
+                "    <H_cAngle> = 0",
+                f"    <J_re> = {_format_value(props['j_re'])}",
+                f"    <J_im> = {_format_value(props['j_im'])}",
+                f"    <Sigma> = {_format_value(props['sigma'])}",
+                f"    <d_lam> = {_format_value(props['d_lam'])}",
+                f"    <Phi_h> = {_format_value(props['phi_h'])}",
+                f"    <Phi_hx> = {_format_value(props['phi_hx'])}",
+                f"    <Phi_hy> = {_format_value(props['phi_hy'])}",
+                f"    <LamType> = {props['lam_type']}",
+                f"    <LamFill> = {_format_value(props['lam_fill'])}",
+                "    <NStrands> = 0",
+                "    <WireD> = 0",
+                f"    <BHPoints> = {len(props['bh_points'])}",
+            ]
+            text = _format_table(props["bh_points"], ["      %.17g", "%.17g"])
+            lines += text.splitlines()
+            lines.append("  <EndBlock>")
+        lines.append(f"[CircuitProps]  = {len(circuits)}")
+        for name in circuits:
+            props = self.circuits[name]
+            lines += [
+                "  <BeginCircuit>",
+                f'    <CircuitName> = "{name}"',
+                f"    <TotalAmps_re> = {_format_value(props['current'].real)}",
+                f"    <TotalAmps_im> = {_format_value(props['current'].imag)}",
+                f"    <CircuitType> = {props['type']}",
+                "  <EndCircuit>",
+            ]
+
+        text = "\n".join(lines) + "\n"
+        # Punkte: x, y, Randbedingung, Gruppe
+        text += f"[NumPoints] = {len(nodes)}\n"
+        text += _format_table(
+            np.column_stack([nodes, np.zeros((len(nodes), 2))]),
+            ["%.17g", "%.17g", "%d", "%d"],
+        )
+        # Segmente: Knoten, Knoten, max. Länge (-1 = automatisch), Rand, versteckt, Gruppe
+        text += f"[NumSegments] = {len(segments)}\n"
+        text += _format_table(
+            np.column_stack(
+                [segments, -np.ones(len(segments)), np.zeros((len(segments), 3))]
+            ),
+            "%d",
+        )
+        # Bögen: Knoten, Knoten, Winkel, max. Teilwinkel, Rand, versteckt, Gruppe
+        text += f"[NumArcSegments] = {len(arcs)}\n"
+        text += _format_table(
+            [
+                (
+                    arcs[k, 0],
+                    arcs[k, 1],
+                    arc[4],
+                    arc[5],
+                    boundaries.index(arc[6]) + 1 if arc[6] in boundaries else 0,
+                    0,
+                    0,
+                )
+                for k, arc in enumerate(self._arcs)
+            ],
+            ["%d", "%d", "%.17g", "%.17g", "%d", "%d", "%d"],
+        )
+        text += "[NumHoles] = 0\n"
+        # Labels: x, y, Material, Netzgröße (-1 = automatisch), Stromkreis,
+        # Magnetisierungsrichtung, Gruppe, Windungen, extern
+        text += f"[NumBlockLabels] = {len(self.labels)}\n"
+        text += _format_table(
+            [
+                (
+                    label["x"],
+                    label["y"],
+                    materials.index(label["material"]) + 1
+                    if label["material"] in materials
+                    else 0,
+                    label["mesh_size"] if label["mesh_size"] > 0 else -1,
+                    circuits.index(label["circuit"]) + 1
+                    if label["circuit"] in circuits
+                    else 0,
+                    label["mag_dir"],
+                    label["group"],
+                    label["turns"],
+                    0,
+                )
+                for label in self.labels
+            ],
+            ["%.17g", "%.17g", "%d", "%.17g", "%d", "%.17g", "%d", "%d", "%d"],
+        )
+        return text
+
+    def write(self, path):
+        """Schreibt das Modell als .fem-Datei."""
+        text = self.to_text()
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+        return path
+
+    def save_as(self, filename):
+        """Wie `FEMMSession.save_as`: speichert die .fem-Datei."""
+        self.write(filename)
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Liest ein Modell im .fem-Format, auch den Modellteil einer .ans-Datei.
+        Übernommen werden die Angaben, die `to_text` schreibt; Punkt- und
+        Segment-Randbedingungen sowie Löcher werden übergangen.
+        """
+        model = cls()
+        lines = iter(text.splitlines())
+        problem = dict(model.problem)
+        nodes = []
+        block = None
+        for line in lines:
+            key, _, value = line.strip().partition("=")
+            key, value = key.strip().lower(), value.strip().strip('"')
+            if key in _HEADER_KEYS:
+                name, convert = _HEADER_KEYS[key]
+                problem[name] = convert(value)
+            elif key in ("<beginbdry>", "<beginblock>", "<begincircuit>"):
+                block = {}
+            elif key in ("<endbdry>", "<endblock>", "<endcircuit>"):
+                _add_property_block(model, key, block)
+                block = None
+            elif key == "<bhpoints>":
+                block["bh_points"] = [
+                    tuple(float(v) for v in next(lines).split()[:2])
+                    for _ in range(int(value))
+                ]
+            elif block is not None and key.startswith("<"):
+                block[key.strip("<>")] = value
+            elif key == "[numpoints]":
+                nodes = [
+                    tuple(float(v) for v in next(lines).split()[:2])
+                    for _ in range(int(value))
+                ]
+                for x, y in nodes:
+                    model.add_node(x, y)
+            elif key == "[numsegments]":
+                for _ in range(int(value)):
+                    n0, n1 = (int(v) for v in next(lines).split()[:2])
+                    model.add_segment(*nodes[n0], *nodes[n1])
+            elif key == "[numarcsegments]":
+                boundaries = list(model.boundaries)
+                for _ in range(int(value)):
+                    parts = next(lines).split()
+                    n0, n1, marker = int(parts[0]), int(parts[1]), int(parts[4])
+                    model.add_arc(
+                        *nodes[n0],
+                        *nodes[n1],
+                        float(parts[2]),
+                        float(parts[3]),
+                        boundaries[marker - 1] if marker > 0 else None,
+                    )
+            elif key == "[numholes]":
+                for _ in range(int(value)):
+                    next(lines)
+            elif key == "[numblocklabels]":
+                materials, circuits = list(model.materials), list(model.circuits)
+                for _ in range(int(value)):
+                    parts = next(lines).split()
+                    block_type, circuit = int(parts[2]), int(parts[4])
+                    model.labels.append(
+                        {
+                            "x": float(parts[0]),
+                            "y": float(parts[1]),
+                            "material": materials[block_type - 1]
+                            if block_type > 0
+                            else None,
+                            "mesh_size": float(parts[3]),
+                            "circuit": circuits[circuit - 1] if circuit > 0 else None,
+                            "mag_dir": float(parts[5]),
+                            "group": int(parts[6]),
+                            "turns": int(parts[7]),
+                        }
+                    )
+        model.problem = problem
+        return model
+
+
+def _range_pairs(starts, stops):
+    """
+    Alle Paare (i, k) mit `starts[i] <= k < stops[i]`.
+
+    Returns:
+        tuple: Die Indizes i und k als zwei gleich lange Arrays.
+    """
+    counts = np.maximum(stops - starts, 0)
+    first = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    second = np.repeat(starts, counts) + np.arange(counts.sum()) - offsets
+    return first, second
+
+
+def _split_segments(nodes, segments):
+    """
+    Teilt Segmente an allen Knoten, die auf ihnen liegen. Geprüft werden nur
+    die Knoten im umschließenden Rechteck eines Segments, gefunden über die
+    nach x sortierten Knoten.
+    """
+    if len(segments) == 0:
+        return segments
+    start = nodes[segments[:, 0]]
+    end = nodes[segments[:, 1]]
+    low = np.minimum(start, end) - NODE_TOLERANCE
+    high = np.maximum(start, end) + NODE_TOLERANCE
+
+    order = np.argsort(nodes[:, 0], kind="stable")
+    sorted_x = nodes[order, 0]
+    seg_idx, position = _range_pairs(
+        np.searchsorted(sorted_x, low[:, 0], side="left"),
+        np.searchsorted(sorted_x, high[:, 0], side="right"),
+    )
+    node_idx = order[position]
+    y = nodes[node_idx, 1]
+    in_box = (y >= low[seg_idx, 1]) & (y <= high[seg_idx, 1])
+    seg_idx, node_idx = seg_idx[in_box], node_idx[in_box]
+
+    direction = (end - start)[seg_idx]
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    relative = nodes[node_idx] - start[seg_idx]
+    along = (relative * direction).sum(axis=1) / length
+    across = (
+        relative[:, 0] * direction[:, 1] - relative[:, 1] * direction[:, 0]
+    ) / length
+    inside = (
+        (np.abs(across) < NODE_TOLERANCE)
+        & (along > NODE_TOLERANCE)
+        & (along < length - NODE_TOLERANCE)
+    )
+    if not inside.any():
+        return segments
+    seg_idx, node_idx, along = seg_idx[inside], node_idx[inside], along[inside]
+    split = np.zeros(len(segments), dtype=bool)
+    split[seg_idx] = True
+
+    # Treffer je Segment entlang des Segments sortiert
+    order = np.lexsort((along, seg_idx))
+    seg_idx, node_idx = seg_idx[order], node_idx[order]
+    bounds = np.flatnonzero(np.diff(seg_idx)) + 1
+    pieces = [segments[~split]]
+    for s, hits in zip(seg_idx[np.r_[0, bounds]], np.split(node_idx, bounds)):
+        chain = np.concatenate([[segments[s, 0]], hits, [segments[s, 1]]])
+        pieces.append(np.column_stack([chain[:-1], chain[1:]]))
+    return np.concatenate(pieces)
+
+
+def _unique_segments(segments):
+    """Entfernt Segmente ohne Länge und doppelte Segmente (Reihenfolge bleibt)."""
+    segments = segments[segments[:, 0] != segments[:, 1]]
+    if len(segments) == 0:
+        return segments.reshape(0, 2)
+    _, first = np.unique(np.sort(segments, axis=1), axis=0, return_index=True)
+    return segments[np.sort(first)]
+
+
+def _check_crossings(nodes, segments):
+    """
+    Bricht ab, wenn sich zwei Segmente außerhalb ihrer Knoten kreuzen.
+    Geprüft werden nur Paare, deren umschließende Rechtecke sich überlappen:
+    nach dem linken Rand sortiert, folgen auf ein Segment nur die Segmente,
+    die links von seinem rechten Rand beginnen.
+    """
+    if len(segments) < 2:
+        return
+    a, b = nodes[segments[:, 0]], nodes[segments[:, 1]]
+    low = np.minimum(a, b) - NODE_TOLERANCE
+    high = np.maximum(a, b) + NODE_TOLERANCE
+
+    order = np.argsort(low[:, 0], kind="stable")
+    sorted_low = low[order, 0]
+    first, second = _range_pairs(
+        np.arange(1, len(order) + 1),
+        np.searchsorted(sorted_low, high[order, 0], side="right"),
+    )
+    i, j = order[first], order[second]
+    overlap = (low[i, 1] <= high[j, 1]) & (low[j, 1] <= high[i, 1])
+    i, j = i[overlap], j[overlap]
+
+    def side(p, q, r):
+        """Vorzeichen der Lage von r zur Geraden p→q (0 innerhalb der Toleranz)."""
+        d = q - p
+        value = d[..., 0] * (r[..., 1] - p[..., 1]) - d[..., 1] * (
+            r[..., 0] - p[..., 0]
+        )
+        scale = np.hypot(d[..., 0], d[..., 1])
+        return np.where(np.abs(value) < NODE_TOLERANCE * scale, 0, np.sign(value))
+
+    crossing = (side(a[i], b[i], a[j]) * side(a[i], b[i], b[j]) < 0) & (
+        side(a[j], b[j], a[i]) * side(a[j], b[j], b[i]) < 0
+    )
+    if crossing.any():
+        # Das erste Paar in der Reihenfolge der Segmente melden
+        pairs = np.sort(np.column_stack([i[crossing], j[crossing]]), axis=1)
+        i, j = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))[0]]
+        raise ValueError(
+            "Segmente schneiden sich: "
+            f"{tuple(a[i].tolist())}-{tuple(b[i].tolist())} und "
+            f"{tuple(a[j].tolist())}-{tuple(b[j].tolist())}."
+        )
+
+
+def _add_property_block(model, end_key, block):
+    """Übernimmt einen gelesenen Rand-, Material- oder Stromkreis-Block."""
+
+    def number(name):
+        return float(block.get(name, 0) or 0)
+
+    if end_key == "<endbdry>":
+        model.boundaries[block.get("bdryname", "")] = {
+            "type": int(number("bdrytype")),
+            "c0": number("c0"),
+            "c1": number("c1"),
+        }
+    elif end_key == "<endblock>":
+        name = block.get("blockname", "")
+        model.add_material(
+            name,
+            number("mu_x"),
+            number("mu_y"),
+            number("h_c"),
+            complex(number("j_re"), number("j_im")),
+            number("sigma"),
+            number("d_lam"),
+            number("phi_h"),
+            float(block.get("lamfill", 1) or 1),
+            int(number("lamtype")),
+            number("phi_hx"),
+            number("phi_hy"),
+        )
+        model.materials[name]["bh_points"] = block.get("bh_points", [])
+    else:
+        model.add_circuit(
+            block.get("circuitname", ""),
+            complex(number("totalamps_re"), number("totalamps_im")),
+            int(number("circuittype")),
+        )
+
+
+def read_fem(path):
+    """Liest eine .fem-Datei als `FemModel`."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return FemModel.from_text(f.read())
+
+
+def read_fem_circuits(path):
+    """
+    Liest Frequenz und Stromkreise aus einer .fem- oder .ans-Datei.
+
+    Returns:
+        tuple: (Frequenz in Hz, {Name: komplexer Strom})
+    """
+    frequency = 0.0
+    circuits = {}
+    name = None
+    current = [0.0, 0.0]
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            key, _, value = line.strip().partition("=")
+            key, value = key.strip().lower(), value.strip()
+            if key == "[frequency]":
+                frequency = float(value)
+            elif key == "<circuitname>":
+                name = value.strip('"')
+                current = [0.0, 0.0]
+            elif key == "<totalamps_re>":
+                current[0] = float(value)
+            elif key == "<totalamps_im>":
+                current[1] = float(value)
+            elif key == "<endcircuit>" and name is not None:
+                circuits[name] = complex(*current)
+                name = None
+            elif key == "[numpoints]":
+                break
+    return frequency, circuits
+
+
+def _write_job(job):
+    """Baut und schreibt eine Variante (wird im Pool ausgeführt)."""
+    # Erst hier importieren, da der Worker dieses Modul selbst verwendet
+    from src.simulation_worker import build_fem_model
+
+    path, step_config, global_params, angle_deg, phasor = job
+    build_fem_model(global_params, step_config, angle_deg, phasor=phasor).write(path)
+    return path
+
+
+def write_fem_files(jobs, processes=None, chunk_size=16):
+    """
+    Schreibt viele Modellvarianten parallel. Den offenen Rand enthalten die
+    Dateien nicht; FEMM muss ihn nach dem Öffnen mit `mi_makeABC` erzeugen
+    (siehe `FemModel.make_abc`).
+
+    Args:
+        jobs (list): Tupel (Pfad, step_config, Konfiguration, Winkel, phasor)
+            wie bei `build_fem_model`.
+        processes (int): Anzahl der Prozesse (Standard: alle Kerne), 1 = ohne Pool.
+
+    Returns:
+        list: Die geschriebenen Pfade.
+    """
+    jobs = list(jobs)
+    for path, *_ in jobs:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if processes == 1 or len(jobs) <= 1:
+        return [_write_job(job) for job in jobs]
+    with multiprocessing.Pool(processes=processes) as pool:
+        paths = list(pool.imap(_write_job, jobs, chunksize=max(1, int(chunk_size))))
+    logging.info("%d .fem-Dateien geschrieben.", len(paths))
+    return paths
@@ -0,0 +1,699 @@
+# src/femm_backends.py
+"""
+Austauschbare Backends für `FEMMSession`.
+
+Ein Backend stellt dieselben Funktionen wie das Modul `femm` bereit
+(`openfemm`, `mi_*`, `mo_*`, ...). Es gibt vier Implementierungen:
+
+    "pyfemm"     ruft das echte `femm`-Modul auf (nur Windows); es wird erst
+                 beim ersten Aufruf importiert
+    "recording"  ruft ein anderes Backend auf und schreibt jeden Aufruf mit
+                 Argumenten, Ergebnis und Laufzeit als JSON-Zeile in
+                 `<logDir>/femm_calls_<pid>.jsonl`
+    "replay"     gibt aufgezeichnete Ergebnisse zurück oder, wo keine passen,
+                 Werte eines einfachen Modells; die Laufzeit pro Aufruf ist
+                 einstellbar ("latency": {Funktion: Sekunden} oder "recorded")
+    "xfemm"      baut das Modell ohne FEMM auf und löst es mit den Programmen
+                 `fmesher` und `fsolver` von xfemm, z. B. unter Linux
+                 ("fmesher"/"fsolver": Pfade der Programme, "timeout",
+                 "keepMesh": Netzdateien behalten, "openBoundary":
+                 "asymptotic" ersetzt den offenen Rand von `mi_makeABC`)
+
+Mit "replay" lässt sich die Orchestrierung des `SimulationRunner` ohne FEMM
+messen und unter Last testen, mit "xfemm" rechnet sie ohne FEMM.
+
+Die Auswahl erfolgt über `simulation_meta.femmBackend` oder die
+Umgebungsvariable `FEMM_BACKEND`, jeweils als Name oder als Objekt, z. B.
+{"type": "replay", "recordings": ["calls/"], "latency": {"mi_analyze": 0.5}}.
+
+Alle Backends bieten zusätzlich `run_batch(calls)`, das eine Folge von
+Aufrufen in einem Durchgang ausführt (siehe `FEMMSession.batched`). pyfemm
+sendet sie dazu als ein Lua-Skript an FEMM.
+"""
+import glob
+import json
+import logging
+import math
+import numbers
+import os
+import subprocess
+import time
+import zlib
+
+import numpy as np
+
+from src.block_integrals import BLOCK_INTEGRAL_TYPES, selected_integral_types
+from src.fem_solution import FIELD_ENERGY_TYPES, STRESS_TENSOR_TYPES, FemSolution
+from src.fem_writer import FEMM_CALLS, FemModel, read_fem, read_fem_circuits
+from src.phasor import DOUBLE_FREQUENCY_TYPES
+from src.utils import json_default, json_object_hook
+
+BACKEND_ENV_VAR = "FEMM_BACKEND"
+DEFAULT_BACKEND = "pyfemm"
+DEFAULT_RECORDING_DIR = os.path.join("simulations", "femm_recordings")
+
+# Höchstdauer eines Aufrufs von fmesher bzw. fsolver in Sekunden
+DEFAULT_XFEMM_TIMEOUT = 3600
+# Dateien, die fmesher neben der .fem-Datei anlegt
+XFEMM_MESH_EXTENSIONS = (".node", ".ele", ".edge", ".pbc", ".poly")
+
+# Größenordnung der Modellwerte des synthetischen Backends
+SYNTHETIC_SCALE = 1e-3
+
+
+def lua_value(value):
+    """Schreibt einen Python-Wert als Lua-Ausdruck für FEMM."""
+    if value is None:
+        return "nil"
+    if isinstance(value, str):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+    if isinstance(value, numbers.Complex):
+        # FEMM-Lua kennt komplexe Zahlen über die imaginäre Einheit I
+        return f"({float(value.real)!r}+I*{float(value.imag)!r})"
+    raise TypeError(f"Wert {value!r} kann nicht an FEMM übergeben werden.")
+
+
+def lua_chunk(calls):
+    """
+    Erzeugt das Lua-Skript für eine Folge von Aufrufen.
+
+    Args:
+        calls (list): Tupel (Funktion, Argumente, Anzahl der Rückgabewerte).
+
+    Returns:
+        tuple: (Skript, je Abfrage die Namen der Lua-Variablen mit ihren
+        Ergebnissen)
+    """
+    lines = []
+    targets = []
+    for i, (name, args, results) in enumerate(calls):
+        call = f"{name}({', '.join(lua_value(arg) for arg in args)})"
+        if results:
+            names = [f"_batch_{i}_{k}" for k in range(results)]
+            lines.append(f"{', '.join(names)} = {call}")
+            targets.append(names)
+        else:
+            lines.append(call)
+    return "\n".join(lines), targets
+
+
+def backend_spec(spec=None):
+    """
+    Vereinheitlicht eine Backend-Angabe zu einem Dictionary mit "type".
+    Ohne Angabe wird `FEMM_BACKEND` gelesen, sonst "pyfemm" verwendet.
+    """
+    if spec is None:
+        spec = os.environ.get(BACKEND_ENV_VAR) or DEFAULT_BACKEND
+    if isinstance(spec, str):
+        spec = json.loads(spec) if spec.lstrip().startswith("{") else {"type": spec}
+    return dict(spec)
+
+
+def create_backend(spec=None):
+    """Erzeugt das Backend zu einer Angabe (siehe `backend_spec`)."""
+    spec = backend_spec(spec)
+    kind = spec.get("type", DEFAULT_BACKEND)
+    if kind == "pyfemm":
+        return PyFEMMBackend()
+    if kind == "recording":
+        return RecordingBackend(
+            create_backend(spec.get("inner", DEFAULT_BACKEND)),
+            spec.get("logDir", DEFAULT_RECORDING_DIR),
+        )
+    if kind == "replay":
+        return ReplayBackend(spec.get("recordings", []), spec.get("latency"))
+    if kind == "xfemm":
+        return XFemmBackend(
+            spec.get("fmesher", "fmesher"),
+            spec.get("fsolver", "fsolver"),
+            spec.get("timeout", DEFAULT_XFEMM_TIMEOUT),
+            spec.get("keepMesh", False),
+            spec.get("openBoundary"),
+        )
+    raise ValueError(f"Unbekanntes FEMM-Backend '{kind}'.")
+
+
+def solver_identity(spec=None):
+    """
+    Beschreibt, womit ein Backend löst, für den Schlüssel des Solve-Caches.
+
+    Returns:
+        dict | None: Die Angaben, die das Ergebnis bestimmen, oder None, wenn
+        das Backend keine echten Lösungen liefert ("replay").
+    """
+    spec = backend_spec(spec)
+    kind = spec.get("type", DEFAULT_BACKEND)
+    if kind == "recording":
+        return solver_identity(spec.get("inner", DEFAULT_BACKEND))
+    if kind == "replay":
+        return None
+    if kind == "xfemm":
+        return {"type": kind, "openBoundary": spec.get("openBoundary")}
+    return {"type": kind}
+
+
+def check_xfemm_config(spec, run_data):
+    """
+    Prüft vor dem Start eines Laufs, ob das xfemm-Backend alle Aufrufe und
+    Integrale der Konfiguration beantworten kann, statt mitten im Lauf mit
+    `NotImplementedError` abzubrechen: Integrale über den Spannungstensor,
+    Energie und Verluste in nichtlinearen Kernen (siehe `src.fem_solution`)
+    und den offenen Rand von `mi_makeABC` ohne "openBoundary".
+
+    Raises:
+        ValueError: Mit allen Gründen, aus denen der Lauf nicht möglich ist.
+    """
+    spec = backend_spec(spec)
+    integral_types = set(
+        selected_integral_types(
+            run_data.get("simulation_meta", {}).get("selectedIntegrals")
+        )
+    )
+    problems = []
+    stress_types = sorted(integral_types & STRESS_TENSOR_TYPES)
+    if stress_types:
+        problems.append(f"Blockintegrale {stress_types} über den Spannungstensor")
+    nonlinear = {
+        material.get("name")
+        for material in run_data.get("materials", [])
+        if material.get("is_nonlinear") and material.get("bh_curve")
+    }
+    core_materials = {
+        asm["transformer_details"]["specificProductInformation"]["geometry"].get(
+            "coreMaterial", "M-36 Steel"
+        )
+        for asm in run_data.get("assemblies", [])
+        if asm.get("transformer_details")
+    }
+    energy_types = sorted(integral_types & FIELD_ENERGY_TYPES)
+    if energy_types and nonlinear & core_materials:
+        problems.append(
+            f"Blockintegrale {energy_types} in nichtlinearen Kernen "
+            f"({', '.join(sorted(nonlinear & core_materials))})"
+        )
+    if spec.get("openBoundary") != "asymptotic":
+        problems.append(
+            'der offene Rand von \'mi_makeABC\' ohne "openBoundary": "asymptotic"'
+        )
+    if problems:
+        raise ValueError(
+            "Das xfemm-Backend unterstützt nicht: " + "; ".join(problems) + "."
+        )
+
+
+class PyFEMMBackend:
+    """Reicht alle Aufrufe an das pyfemm-Modul `femm` weiter."""
+
+    def __init__(self):
+        self._module = None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._module is None:
+            import femm  # pylint: disable=import-outside-toplevel
+
+            self._module = femm
+        return getattr(self._module, name)
+
+    def run_batch(self, calls):
+        """
+        Sendet eine Folge von Aufrufen als ein Lua-Skript an FEMM. Die
+        Ergebnisse der Abfragen werden in Lua-Variablen abgelegt und mit einem
+        zweiten Aufruf gemeinsam abgeholt.
+
+        Returns:
+            list: Je Abfrage ihr Ergebnis, bei mehreren Rückgabewerten als Tupel.
+        """
+        chunk, targets = lua_chunk(calls)
+        self.callfemm_noeval(chunk)
+        if not targets:
+            return []
+        values = self.callfemm(", ".join(name for names in targets for name in names))
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        results = []
+        position = 0
+        for names in targets:
+            group = values[position : position + len(names)]
+            position += len(names)
+            results.append(group[0] if len(names) == 1 else tuple(group))
+        return results
+
+
+class RecordingBackend:
+    """Zeichnet alle Aufrufe eines anderen Backends mit ihrer Laufzeit auf."""
+
+    def __init__(self, inner, log_dir=DEFAULT_RECORDING_DIR):
+        self._inner = inner
+        os.makedirs(log_dir, exist_ok=True)
+        self._log_path = os.path.join(log_dir, f"femm_calls_{os.getpid()}.jsonl")
+
+    def _write(self, entries):
+        """Hängt Aufrufe an die Aufzeichnung an."""
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=json_default) + "\n")
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        function = getattr(self._inner, name)
+
+        def call(*args):
+            start = time.perf_counter()
+            result = function(*args)
+            self._write(
+                [
+                    {
+                        "call": name,
+                        "args": list(args),
+                        "result": result,
+                        "seconds": time.perf_counter() - start,
+                    }
+                ]
+            )
+            return result
+
+        return call
+
+    def run_batch(self, calls):
+        """
+        Führt einen Stapel im inneren Backend aus und zeichnet ihn Aufruf für
+        Aufruf auf; die Laufzeit wird gleichmäßig auf die Aufrufe verteilt.
+        """
+        start = time.perf_counter()
+        results = self._inner.run_batch(calls)
+        seconds = (time.perf_counter() - start) / max(1, len(calls))
+        query_results = iter(results)
+        self._write(
+            [
+                {
+                    "call": name,
+                    "args": list(args),
+                    "result": next(query_results) if count else None,
+                    "seconds": seconds,
+                    "batch": True,
+                }
+                for name, args, count in calls
+            ]
+        )
+        return results
+
+
+class _CallState:
+    """
+    Verfolgt den Zustand, von dem die Ergebnisse der mo_*-Abfragen abhängen:
+    gespeichertes Dokument, Ströme der Stromkreise und ausgewählte Gruppen.
+    Wird beim Einlesen einer Aufzeichnung und beim Abspielen gleich geführt.
+    """
+
+    def __init__(self):
+        self.document = None
+        self.frequency = 0.0
+        self.circuits = {}
+        self.groups = set()
+
+    def update(self, name, args):
+        """Übernimmt die Wirkung eines Aufrufs auf den Zustand."""
+        if name == "newdocument":
+            self.document = None
+            self.circuits = {}
+            self.groups = set()
+        elif name == "mi_probdef":
+            self.frequency = float(args[0])
+        elif name == "mi_saveas":
+            self.document = os.path.basename(str(args[0]))
+        elif name == "opendocument" and str(args[0]).lower().endswith(".fem"):
+            # Direkt geschriebenes Modell: Ströme stehen in der Datei
+            self.document = os.path.basename(str(args[0]))
+            self.groups = set()
+            if os.path.exists(args[0]):
+                self.frequency, self.circuits = read_fem_circuits(args[0])
+        elif name == "mi_addcircprop":
+            self.circuits[args[0]] = complex(args[1])
+        elif name == "mi_modifycircprop" and args[1] == 1:
+            self.circuits[args[0]] = complex(args[2])
+        elif name == "mo_groupselectblock":
+            self.groups.add(int(args[0]))
+        elif name in ("mo_clearblock", "mo_close"):
+            self.groups = set()
+
+    def key(self, name, args):
+        """Schlüssel eines Aufrufs im aktuellen Zustand."""
+        currents = sorted(
+            (circuit, round(value.real, 9), round(value.imag, 9))
+            for circuit, value in self.circuits.items()
+        )
+        return json.dumps(
+            [name, list(args), self.document, currents, sorted(self.groups)],
+            default=json_default,
+        )
+
+
+class ReplayBackend:
+    """
+    Spielt aufgezeichnete Ergebnisse ab und modelliert fehlende Werte.
+
+    Die Modellwerte hängen wie bei FEMM von den Strömen ab: Integrale der
+    Ordnung 1 linear (Σ c·I), Ordnung 2 quadratisch (|Σ c·I|², bei den
+    Typen mit doppelter Frequenz (Σ c·I)²), Ordnung 0 gar nicht. Die
+    Koeffizienten c sind aus Gruppe, Typ und Stromkreis abgeleitet und damit
+    reproduzierbar. Sie sind reell wie bei einem verlustfreien linearen
+    Modell, sodass ein Sweep und eine Zeiger-Lösung (Modus "phasor")
+    dieselben Momentanwerte liefern. Dateien (.fem, .ans, Bilder) werden als Platzhalter
+    geschrieben, damit die Abläufe um FEMM herum unverändert funktionieren.
+    """
+
+    def __init__(self, recordings=(), latency=None):
+        self._state = _CallState()
+        self._results = {}
+        self._timings = {}
+        for path in self._recording_files(recordings):
+            self._load_recording(path)
+        if latency == "recorded":
+            self._latency = {
+                name: sum(times) / len(times) for name, times in self._timings.items()
+            }
+        else:
+            self._latency = dict(latency or {})
+        self._document_path = None
+        self._reported_miss = False
+
+    @staticmethod
+    def _recording_files(recordings):
+        """Expandiert Ordner und Muster zu Aufzeichnungsdateien."""
+        if isinstance(recordings, str):
+            recordings = [recordings]
+        files = []
+        for entry in recordings:
+            if os.path.isdir(entry):
+                files.extend(sorted(glob.glob(os.path.join(entry, "*.jsonl"))))
+            else:
+                files.extend(sorted(glob.glob(entry)))
+        return files
+
+    def _load_recording(self, path):
+        """Liest eine Aufzeichnung und ordnet die Ergebnisse ihrem Zustand zu."""
+        state = _CallState()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line, object_hook=json_object_hook)
+                except json.JSONDecodeError:
+                    continue
+                name, args = entry["call"], entry["args"]
+                if name.startswith("mo_") and entry["result"] is not None:
+                    self._results[state.key(name, args)] = entry["result"]
+                state.update(name, args)
+                self._timings.setdefault(name, []).append(entry["seconds"])
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args):
+            self._wait(name)
+            return self._invoke(name, args)
+
+        return call
+
+    def _wait(self, name):
+        """Simuliert die Laufzeit eines Aufrufs."""
+        delay = self._latency.get(name, self._latency.get("default", 0.0))
+        if delay:
+            time.sleep(delay)
+
+    def _invoke(self, name, args):
+        """Ergebnis eines Aufrufs aus der Aufzeichnung oder dem Modell."""
+        key = self._state.key(name, args)
+        if key in self._results:
+            result = self._results[key]
+        else:
+            if self._results and name.startswith("mo_") and not self._reported_miss:
+                logging.info(
+                    "Kein aufgezeichnetes Ergebnis für '%s', verwende Modellwerte.",
+                    name,
+                )
+                self._reported_miss = True
+            result = self._synthetic(name, args)
+        self._state.update(name, args)
+        return result
+
+    def run_batch(self, calls):
+        """
+        Spielt einen Stapel ab. Die Latenz fällt wie bei FEMM nur einmal je
+        Stapel an (Schlüssel "run_batch", sonst "default"), teure Aufrufe wie
+        `mi_analyze` zusätzlich mit ihrer eigenen.
+        """
+        self._wait("run_batch")
+        results = []
+        for name, args, count in calls:
+            if name in self._latency:
+                self._wait(name)
+            value = self._invoke(name, tuple(args))
+            if count:
+                results.append(value)
+        return results
+
+    @staticmethod
+    def _coefficient(*parts):
+        """Reproduzierbarer reeller Koeffizient aus den Schlüsselteilen."""
+        seed = zlib.crc32(":".join(str(p) for p in parts).encode("utf-8"))
+        magnitude = 0.5 + (seed % 1000) / 1000.0
+        sign = 1 if (seed // 1000) % 2 else -1
+        return SYNTHETIC_SCALE * magnitude * sign
+
+    def _linear(self, *parts):
+        """Σ c·I über alle Stromkreise."""
+        return sum(
+            self._coefficient(*parts, circuit) * current
+            for circuit, current in sorted(self._state.circuits.items())
+        )
+
+    def _synthetic(self, name, args):
+        """Modellwert bzw. Nebenwirkung eines Aufrufs ohne Aufzeichnung."""
+        state = self._state
+        if name == "mi_saveas":
+            self._document_path = args[0]
+            with open(args[0], "w", encoding="utf-8") as f:
+                f.write("[Format] = 4.0\n")
+        elif name == "opendocument" and str(args[0]).lower().endswith(".fem"):
+            self._document_path = args[0]
+        elif name == "mi_analyze" and self._document_path:
+            ans_path = os.path.splitext(self._document_path)[0] + ".ans"
+            with open(ans_path, "w", encoding="utf-8") as f:
+                f.write("[Format] = 4.0\n")
+        elif name == "mo_savebitmap":
+            with open(args[0], "wb") as f:
+                f.write(b"")
+        elif name == "mo_blockintegral":
+            int_type = int(args[0])
+            group = tuple(sorted(state.groups))
+            order = BLOCK_INTEGRAL_TYPES.get(int_type, {}).get("order", 1)
+            if order == 0:
+                return abs(self._coefficient(group, int_type))
+            linear = self._linear(group, int_type)
+            if order == 1:
+                return linear
+            if int_type in DOUBLE_FREQUENCY_TYPES:
+                return linear * linear
+            return abs(linear) ** 2
+        elif name == "mo_getcircuitproperties":
+            current = state.circuits.get(args[0], 0j)
+            flux = self._linear("circuit", args[0])
+            voltage = 2j * math.pi * state.frequency * flux
+            return (current, voltage, flux)
+        elif name == "mo_lineintegral":
+            return (self._linear("line", int(args[0])), 0j)
+        elif name.startswith("mo_get"):
+            return 0.0
+        return None
+
+
+class XFemmBackend:
+    """
+    Löst Modelle mit xfemm statt FEMM, z. B. auf Linux-Rechenknoten.
+
+    Das Modell wird in einem `FemModel` aufgebaut. `mi_analyze` schreibt es,
+    vernetzt es mit `fmesher` und löst es mit `fsolver`, beide als lokale
+    Unterprozesse. `fsolver` erhält wie der FEMM-Solver den Pfad ohne
+    Endung. Die Auswertung (`mo_*`) rechnet mit `FemSolution` auf der
+    .ans-Datei; Bilder und Konturintegrale gibt es nicht.
+
+    Die Schalen von `mi_makeABC` kann nur FEMM erzeugen. Mit `open_boundary`
+    "asymptotic" wird der offene Rand durch einen Kreis mit asymptotischer
+    Randbedingung ersetzt (`FemModel.add_asymptotic_boundary`); die
+    Ergebnisse weichen dann von FEMM ab. Ohne diese Angabe wird ein Modell
+    mit `mi_makeABC` abgelehnt. Ob eine Konfiguration vollständig
+    unterstützt wird, prüft der `SimulationRunner` vorab mit
+    `check_xfemm_config`.
+    """
+
+    def __init__(
+        self,
+        fmesher="fmesher",
+        fsolver="fsolver",
+        timeout=DEFAULT_XFEMM_TIMEOUT,
+        keep_mesh=False,
+        open_boundary=None,
+    ):
+        if open_boundary not in (None, "asymptotic"):
+            raise ValueError(f"Unbekannter offener Rand '{open_boundary}'.")
+        self._fmesher = fmesher
+        self._fsolver = fsolver
+        self._timeout = timeout
+        self._keep_mesh = keep_mesh
+        self._open_boundary = open_boundary
+        self._model = FemModel()
+        self._document_path = None
+        self._solution = None
+        self._selected = set()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in FEMM_CALLS:
+            return lambda *args: self._model.apply(name, args)
+
+        def unsupported(*args):
+            raise NotImplementedError(
+                f"'{name}' wird vom xfemm-Backend nicht unterstützt."
+            )
+
+        return unsupported
+
+    def openfemm(self, visible=False):
+        """Es gibt keine Sitzung, die gestartet werden muss."""
+
+    def closefemm(self):
+        """Verwirft Modell und Lösung."""
+        self.newdocument(0)
+
+    def newdocument(self, doc_type=0):
+        """Beginnt ein leeres Modell."""
+        self._model.new_document(doc_type)
+        self._document_path = None
+        self.mo_close()
+
+    def mi_close(self):
+        """Schließt das Modell."""
+        self.newdocument(0)
+
+    def mo_close(self):
+        """Verwirft die geladene Lösung."""
+        self._solution = None
+        self._selected = set()
+
+    def opendocument(self, path):
+        """Öffnet eine .fem-Datei als Modell oder eine .ans-Datei als Lösung."""
+        if str(path).lower().endswith(".ans"):
+            self.mo_close()
+            self._solution = FemSolution.load(path)
+        else:
+            self._model = read_fem(path)
+            self._document_path = path
+
+    def mi_saveas(self, path):
+        """Schreibt das Modell als .fem-Datei."""
+        self._model.write(path)
+        self._document_path = path
+
+    def _run(self, command):
+        """Führt fmesher bzw. fsolver aus."""
+        try:
+            completed = subprocess.run(
+                command,
+                capture_output=True,
+                text=True,
+                timeout=self._timeout,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise RuntimeError(f"'{command[0]}' fehlgeschlagen: {e}") from e
+        if completed.returncode != 0:
+            raise RuntimeError(
+                f"'{command[0]}' beendet mit Code {completed.returncode}: "
+                f"{(completed.stderr or completed.stdout)[-2000:]}"
+            )
+
+    def mi_analyze(self, flag=1):
+        """Speichert das Modell, vernetzt und löst es."""
+        if self._document_path is None:
+            raise RuntimeError("Das Modell muss vor der Analyse gespeichert werden.")
+        if self._model.abc is not None:
+            if self._open_boundary != "asymptotic":
+                raise NotImplementedError(
+                    "'mi_makeABC' wird vom xfemm-Backend nur mit "
+                    '"openBoundary": "asymptotic" unterstützt.'
+                )
+            self._model.add_asymptotic_boundary()
+        # Wie FEMM wird das Modell mit den aktuellen Änderungen gespeichert
+        self._model.write(self._document_path)
+        stem = os.path.splitext(self._document_path)[0]
+        try:
+            self._run([self._fmesher, self._document_path])
+            self._run([self._fsolver, stem])
+        finally:
+            if not self._keep_mesh:
+                for extension in XFEMM_MESH_EXTENSIONS:
+                    if os.path.exists(stem + extension):
+                        os.remove(stem + extension)
+        if not os.path.exists(stem + ".ans"):
+            raise RuntimeError(f"fsolver hat keine Lösung '{stem}.ans' geschrieben.")
+
+    def mi_loadsolution(self):
+        """Lädt die Lösung des gespeicherten Modells."""
+        stem = os.path.splitext(self._document_path)[0]
+        self.opendocument(stem + ".ans")
+
+    def mo_groupselectblock(self, group_id=None):
+        """Wählt alle Blöcke einer Gruppe (ohne Gruppe: alle Blöcke)."""
+        if group_id is None:
+            self._selected.update(range(len(self._solution.model.labels)))
+        else:
+            self._selected.update(self._solution.labels_in_groups([int(group_id)]))
+
+    def mo_selectblock(self, x, y):
+        """Wählt den Block an einem Punkt."""
+        label = self._solution.label_at(float(x), float(y))
+        if label is not None:
+            self._selected.add(label)
+
+    def mo_clearblock(self):
+        """Hebt die Auswahl der Blöcke auf."""
+        self._selected = set()
+
+    def mo_blockintegral(self, integral_type):
+        """
+        Blockintegral über die ausgewählten Blöcke. Integrale, die sich nicht
+        wie in FEMM berechnen lassen (siehe `src.fem_solution`), werden
+        abgelehnt statt als NaN geliefert.
+        """
+        value = self._solution.block_integral(integral_type, self._selected)
+        if np.isnan(value):
+            raise NotImplementedError(
+                f"Blockintegral {integral_type} wird vom xfemm-Backend für "
+                "diese Auswahl nicht unterstützt."
+            )
+        return value
+
+    def mo_getcircuitproperties(self, circuit_name):
+        """Strom, Spannung und Flussverkettung eines Stromkreises."""
+        return self._solution.circuit_properties(circuit_name)
+
+    def run_batch(self, calls):
+        """Führt eine Folge von Aufrufen nacheinander aus."""
+        results = []
+        for name, args, count in calls:
+            value = getattr(self, name)(*args)
+            if count:
+                results.append(value)
+        return results
@@ -2,234 +2,359 @@
 """
 Ein Wrapper für die pyfemm-Bibliothek, um die API zu kapseln und die
 Testbarkeit sowie die zukünftige Wartung zu erleichtern.
+
+Die Aufrufe gehen an ein austauschbares Backend (siehe `src.femm_backends`);
+standardmäßig ist das pyfemm selbst.
+
+Im Stapelmodus (`FEMMSession.batched`) werden Befehle ohne Rückgabewert
+gesammelt und gemeinsam in einem Aufruf an FEMM geschickt, statt jeden
+einzeln über die Prozessgrenze zu senden.
 """
-import femm
+import os
+from contextlib import contextmanager
+
 import pandas as pd
 
-# Definition der Blockintegral-Typen mit Namen, Formelzeichen und Einheiten
-BLOCK_INTEGRAL_TYPES = {
-    0: {"name": "A·J-Integral", "symbol": "W_AJ", "unit": "J"},
-    1: {"name": "A-Integral", "symbol": "A_int", "unit": "Wb·m"},
-    2: {"name": "Magnetische Feldenergie", "symbol": "W_m", "unit": "J"},
-    3: {"name": "Hysterese- und Blechverluste", "symbol": "P_h", "unit": "W"},
-    4: {"name": "Ohmsche Verluste", "symbol": "P_R", "unit": "W"},
-    5: {"name": "Blockquerschnittsfläche", "symbol": "A_Block", "unit": "m²"},
-    6: {"name": "Gesamtverluste", "symbol": "P_ges", "unit": "W"},
-    7: {"name": "Gesamtstrom", "symbol": "I_ges", "unit": "A"},
-    8: {"name": "Integral von Bx über Block", "symbol": "Φx", "unit": "Wb"},
-    9: {"name": "Integral von By über Block", "symbol": "Φy", "unit": "Wb"},
-    10: {"name": "Blockvolumen", "symbol": "V_Block", "unit": "m³"},
-    11: {
-        "name": "x-Anteil der Lorentzkraft (stationär)",
-        "symbol": "F_x,L,ss",
-        "unit": "N",
-    },
-    12: {
-        "name": "y-Anteil der Lorentzkraft (stationär)",
-        "symbol": "F_y,L,ss",
-        "unit": "N",
-    },
-    13: {"name": "x-Anteil der 2·Lorentzkraft", "symbol": "F_x,L,2x", "unit": "N"},
-    14: {"name": "y-Anteil der 2·Lorentzkraft", "symbol": "F_y,L,2x", "unit": "N"},
-    15: {"name": "Lorentz-Drehmoment (stationär)", "symbol": "M_L,ss", "unit": "N·m"},
-    16: {
-        "name": "2·Komponente des Lorentz-Drehmoments",
-        "symbol": "M_L,2x",
-        "unit": "N·m",
-    },
-    17: {"name": "Magnetische Koenergie", "symbol": "W_c", "unit": "J"},
-    18: {
-        "name": "x-Anteil der WST-Kraft (stationär)",
-        "symbol": "F_x,WST,ss",
-        "unit": "N",
-    },
-    19: {
-        "name": "y-Anteil der WST-Kraft (stationär)",
-        "symbol": "F_y,WST,ss",
-        "unit": "N",
-    },
-    20: {"name": "x-Anteil der 2·WST-Kraft", "symbol": "F_x,WST,2x", "unit": "N"},
-    21: {"name": "y-Anteil der 2·WST-Kraft", "symbol": "F_y,WST,2x", "unit": "N"},
-    22: {"name": "WST-Drehmoment (stationär)", "symbol": "M_WST,ss", "unit": "N·m"},
-    23: {
-        "name": "2·Komponente des WST-Drehmoments",
-        "symbol": "M_WST,2x",
-        "unit": "N·m",
-    },
-    24: {"name": "R² (Trägheitsmoment / Dichte)", "symbol": "R²", "unit": "m⁴"},
-    25: {"name": "x-Anteil der 1·WST-Kraft", "symbol": "F_x,WST,1x", "unit": "N"},
-    26: {"name": "y-Anteil der 1·WST-Kraft", "symbol": "F_y,WST,1x", "unit": "N"},
-    27: {
-        "name": "1·Komponente des WST-Drehmoments",
-        "symbol": "M_WST,1x",
-        "unit": "N·m",
-    },
-    28: {"name": "x-Anteil der 1·Lorentzkraft", "symbol": "F_x,L,1x", "unit": "N"},
-    29: {"name": "y-Anteil der 1·Lorentzkraft", "symbol": "F_y,L,1x", "unit": "N"},
-    30: {
-        "name": "1·Komponente des Lorentz-Drehmoments",
-        "symbol": "M_L,1x",
-        "unit": "N·m",
-    },
-}
+from src.block_integrals import BLOCK_INTEGRAL_TYPES, GroupIntegrals
+from src.femm_backends import create_backend
+
+
+# Standard für `simulation_meta.femmBatchSize`: Befehle je Stapel, 0 = aus
+DEFAULT_BATCH_SIZE = 0
 
 
 class FEMMSession:
     """Eine Klasse, die eine einzelne FEMM-Sitzung verwaltet."""
 
-    def __init__(self, visible=False):
+    def __init__(self, visible=False, backend=None):
         """
         Initialisiert eine neue FEMM-Sitzung.
 
         Args:
             visible (bool): Ob das FEMM-GUI-Fenster angezeigt werden soll.
+            backend: Backend-Angabe für `create_backend`; ohne Angabe gilt
+                `FEMM_BACKEND` bzw. pyfemm.
+        """
+        self.femm = create_backend(backend)
+        self.femm.openfemm(visible)
+        # Gesammelte Befehle im Stapelmodus, sonst None
+        self._pending = None
+        self._batch_size = DEFAULT_BATCH_SIZE
+        # Zuletzt geöffnete bzw. gespeicherte .fem-Datei
+        self.document_path = None
+
+    @contextmanager
+    def batched(self, batch_size=DEFAULT_BATCH_SIZE):
         """
-        femm.openfemm(visible)
+        Sammelt innerhalb des Blocks alle Befehle ohne Rückgabewert und sendet
+        sie gebündelt, spätestens nach `batch_size` Befehlen, vor einem Aufruf
+        mit Rückgabewert und am Ende des Blocks. Bei einem Fehler im Block
+        werden die noch offenen Befehle verworfen. Mit `batch_size` 0 oder in
+        einem bereits gebündelten Block ändert sich nichts.
+        """
+        if batch_size <= 0 or self._pending is not None:
+            yield self
+            return
+        self._pending = []
+        self._batch_size = int(batch_size)
+        try:
+            yield self
+            self.flush()
+        finally:
+            self._pending = None
+
+    def flush(self):
+        """Sendet die gesammelten Befehle an FEMM."""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self.femm.run_batch(pending)
+
+    def _command(self, name, *args):
+        """Befehl ohne Rückgabewert; im Stapelmodus wird er gesammelt."""
+        if self._pending is None:
+            getattr(self.femm, name)(*args)
+            return
+        self._pending.append((name, args, 0))
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def _call(self, name, *args):
+        """Direkter Aufruf; vorher gesammelte Befehle werden zuerst gesendet."""
+        self.flush()
+        return getattr(self.femm, name)(*args)
+
+    def _query(self, calls):
+        """
+        Führt eine Folge von Befehlen und Abfragen aus, im Stapelmodus
+        zusammen mit den gesammelten Befehlen in einem Durchgang.
+
+        Args:
+            calls (list): Tupel (Funktion, Argumente, Anzahl der Rückgabewerte).
+
+        Returns:
+            list: Die Ergebnisse der Abfragen in ihrer Reihenfolge.
+        """
+        if self._pending is None:
+            results = []
+            for name, args, count in calls:
+                value = getattr(self.femm, name)(*args)
+                if count:
+                    results.append(value)
+            return results
+        pending, self._pending = self._pending + list(calls), []
+        return self.femm.run_batch(pending)
 
     def close(self):
         """Schließt die FEMM-Sitzung."""
-        femm.closefemm()
+        self._call("closefemm")
+
+    def close_documents(self):
+        """
+        Schließt das aktuelle Pre- und Postprocessor-Dokument, ohne FEMM zu beenden.
+        Damit kann eine laufende Sitzung für die nächste Aufgabe wiederverwendet werden.
+        """
+        self._call("mo_close")
+        self._call("mi_close")
 
     def new_document(self, doc_type=0):
         """
         Erstellt ein neues Dokument.
         0 = Magnetics, 1 = Electrostatics, 2 = Heat Flow, 3 = Current Flow
         """
-        femm.newdocument(doc_type)
+        self._call("newdocument", doc_type)
 
     def prob_def(self, frequency, units, prob_type, precision, depth, min_angle=30):
         """Definiert die Problem-Eigenschaften."""
-        femm.mi_probdef(frequency, units, prob_type, precision, depth, min_angle)
+        self._command(
+            "mi_probdef", frequency, units, prob_type, precision, depth, min_angle
+        )
 
     def add_material(self, mat_name, mu_x=1, mu_y=1, h_c=0, j=0, c=0, d=0):
         """Fügt ein neues Material hinzu."""
-        femm.mi_addmaterial(mat_name, mu_x, mu_y, h_c, j, c, d)
+        self._command("mi_addmaterial", mat_name, mu_x, mu_y, h_c, j, c, d)
 
     def add_bh_point(self, mat_name, b, h):
         """Fügt einen Punkt zur B-H Kurve eines Materials hinzu."""
-        femm.mi_addbhpoint(mat_name, b, h)
+        self._command("mi_addbhpoint", mat_name, b, h)
 
     def get_material(self, mat_name):
         """Lädt ein Material aus der Standard-Bibliothek."""
-        femm.mi_getmaterial(mat_name)
+        self._command("mi_getmaterial", mat_name)
 
     def add_circuit(self, circuit_name, current, circuit_type=1):
         """Fügt eine neue Stromquelle (Circuit) hinzu."""
-        femm.mi_addcircprop(circuit_name, current, circuit_type)
+        self._command("mi_addcircprop", circuit_name, current, circuit_type)
+
+    def set_circuit_current(self, circuit_name, current):
+        """Ändert den Gesamtstrom eines bestehenden Stromkreises."""
+        self._command("mi_modifycircprop", circuit_name, 1, current)
 
     def draw_rectangle(self, x1, y1, x2, y2):
         """Zeichnet ein Rechteck."""
-        femm.mi_drawrectangle(x1, y1, x2, y2)
+        self._command("mi_drawrectangle", x1, y1, x2, y2)
 
     def add_node(self, x, y):
         """Fügt einen Knoten hinzu."""
-        femm.mi_addnode(x, y)
+        self._command("mi_addnode", x, y)
 
     def add_segment(self, x1, y1, x2, y2):
         """Fügt ein Liniensegment hinzu."""
-        femm.mi_addsegment(x1, y1, x2, y2)
+        self._command("mi_addsegment", x1, y1, x2, y2)
 
     def add_arc(self, x1, y1, x2, y2, angle, max_seg):
         """Fügt einen Bogen hinzu."""
-        femm.mi_addarc(x1, y1, x2, y2, angle, max_seg)
+        self._command("mi_addarc", x1, y1, x2, y2, angle, max_seg)
 
     def add_block_label(self, x, y):
         """Setzt ein Material-Label."""
-        femm.mi_addblocklabel(x, y)
+        self._command("mi_addblocklabel", x, y)
 
     def select_label(self, x, y):
         """Wählt ein Label aus."""
-        femm.mi_selectlabel(x, y)
+        self._command("mi_selectlabel", x, y)
 
     def set_block_prop(
         self, mat_name, automesh, mesh_size, circuit, mag_dir, group, turns
     ):
         """Weist einem Label Materialeigenschaften zu."""
-        femm.mi_setblockprop(
-            mat_name, automesh, mesh_size, circuit, mag_dir, group, turns
+        self._command(
+            "mi_setblockprop",
+            mat_name,
+            automesh,
+            mesh_size,
+            circuit,
+            mag_dir,
+            group,
+            turns,
         )
 
     def clear_selected(self):
         """Hebt die aktuelle Auswahl auf."""
-        femm.mi_clearselected()
+        self._command("mi_clearselected")
 
     def make_abc(
         self, num_layers=7, radius=500, center_x=0, center_y=0, boundary_type=0
     ):
         """Erstellt absorbierende Randbedingungen."""
-        femm.mi_makeABC(num_layers, radius, center_x, center_y, boundary_type)
+        self._command(
+            "mi_makeABC", num_layers, radius, center_x, center_y, boundary_type
+        )
+
+    def open_model(self, fem_path):
+        """Öffnet eine gespeicherte .fem-Datei im Preprozessor."""
+        self._call("opendocument", fem_path)
+        self.document_path = fem_path
 
     def save_as(self, filename):
         """Speichert die .fem-Datei."""
-        return femm.mi_saveas(filename)
+        self.document_path = filename
+        return self._call("mi_saveas", filename)
 
     def analyze(self, flag=1):
         """Startet die Analyse."""
-        return femm.mi_analyze(flag)
+        return self._call("mi_analyze", flag)
 
     def load_solution(self):
         """Lädt die Lösungsdatei (.ans)."""
-        femm.mi_loadsolution()
+        self._call("mi_loadsolution")
+
+    def solution_path(self):
+        """Pfad der Lösungsdatei (.ans) zum aktuellen Modell."""
+        if self.document_path is None:
+            raise RuntimeError("Es ist kein gespeichertes Modell geöffnet.")
+        return os.path.splitext(self.document_path)[0] + ".ans"
 
     # --- Post-processing (mo_*) Befehle ---
 
+    def open_solution(self, ans_path):
+        """Öffnet eine gespeicherte Lösungsdatei (.ans) im Postprozessor."""
+        self._call("opendocument", ans_path)
+
+    def close_solution(self):
+        """Schließt die aktuell geladene Lösung (Postprocessor-Fenster)."""
+        self._call("mo_close")
+
     def save_bitmap(self, filename):
         """Speichert die aktuelle Ansicht als Bitmap-Datei."""
-        femm.mo_savebitmap(filename)
+        self._call("mo_savebitmap", filename)
 
     def show_density_plot(self, legend, gscale, upper_b, lower_b, plot_type="bmag"):
         """Zeigt einen Dichte-Plot an."""
-        femm.mo_showdensityplot(legend, gscale, upper_b, lower_b, plot_type)
+        self._call("mo_showdensityplot", legend, gscale, upper_b, lower_b, plot_type)
 
     def show_vector_plot(self, plot_type, scale_factor):
         """Zeigt einen Vektor-Plot an."""
-        femm.mo_showvectorplot(plot_type, scale_factor)
+        self._call("mo_showvectorplot", plot_type, scale_factor)
 
     def show_contour_plot(self, num_contours, lower_bound, upper_bound, plot_type="A"):
         """Zeigt die Kontur-Linien (Feldlinien) an."""
-        femm.mo_showcontourplot(num_contours, lower_bound, upper_bound, plot_type)
+        self._call(
+            "mo_showcontourplot", num_contours, lower_bound, upper_bound, plot_type
+        )
 
     def zoom_natural(self):
         """Zoomt auf die natürliche Größe des Problems."""
-        femm.mo_zoomnatural()
+        self._call("mo_zoomnatural")
 
     def get_circuit_properties(self, circuit_name):
         """Gibt die Eigenschaften eines Stromkreises aus der Lösung zurück."""
-        return femm.mo_getcircuitproperties(circuit_name)
+        return self._call("mo_getcircuitproperties", circuit_name)
 
     def group_select_block(self, group_id=None):
         """Wählt alle Blöcke einer Gruppe aus."""
         if group_id is not None:
-            femm.mo_groupselectblock(group_id)
+            self._command("mo_groupselectblock", group_id)
         else:
-            femm.mo_selectblock(0, 0)
+            self._command("mo_selectblock", 0, 0)
 
     def get_group_block_integral(self, integral_type, group_id):
         """Wählt eine Gruppe, berechnet das Integral und hebt die Auswahl wieder auf."""
-        self.group_select_block(group_id)
-        value = femm.mo_blockintegral(integral_type)
-        femm.mo_clearblock()
-        return value
+        return self.get_block_integrals(group_id, [integral_type])[integral_type]
+
+    def get_circuits_properties(self, circuit_names):
+        """
+        Fragt die Eigenschaften mehrerer Stromkreise ab, im Stapelmodus in
+        einem Durchgang.
+
+        Returns:
+            dict: Name -> Eigenschaften wie bei `get_circuit_properties`.
+        """
+        circuit_names = list(circuit_names)
+        values = self._query(
+            [("mo_getcircuitproperties", (name,), 3) for name in circuit_names]
+        )
+        return dict(zip(circuit_names, values))
 
     def block_integral(self, integral_type):
         """Berechnet ein Integral über die aktuell ausgewählten Blöcke."""
-        return femm.mo_blockintegral(integral_type)
+        return self._call("mo_blockintegral", integral_type)
 
     def clear_block_selection(self):
         """Hebt die Auswahl der Blöcke auf."""
-        femm.mo_clearblock()
+        self._command("mo_clearblock")
 
     def add_contour(self, x, y):
         """Fügt einen Punkt zu einem Konturpfad hinzu."""
-        femm.mo_addcontour(x, y)
+        self._command("mo_addcontour", x, y)
 
     def line_integral(self, integral_type):
         """Berechnet ein Integral entlang des definierten Konturpfades."""
-        return femm.mo_lineintegral(integral_type)
+        return self._call("mo_lineintegral", integral_type)
 
     def clear_contour(self):
         """Löscht den aktuellen Konturpfad."""
-        femm.mo_clearcontour()
+        self._command("mo_clearcontour")
+
+    @staticmethod
+    def _block_integral_calls(group_id, integral_types):
+        """Aufrufe, die eine Gruppe auswählen, integrieren und abwählen."""
+        if group_id is not None:
+            select = ("mo_groupselectblock", (group_id,), 0)
+        else:
+            select = ("mo_selectblock", (0, 0), 0)
+        return (
+            [select]
+            + [("mo_blockintegral", (int_type,), 1) for int_type in integral_types]
+            + [("mo_clearblock", (), 0)]
+        )
+
+    def get_block_integrals(self, group_id, integral_types):
+        """
+        Wählt eine Gruppe einmal aus und berechnet nur die angegebenen Integrale.
+
+        Returns:
+            dict: Integral-Typ -> Wert.
+        """
+        integral_types = list(integral_types)
+        values = self._query(self._block_integral_calls(group_id, integral_types))
+        return dict(zip(integral_types, values))
+
+    def extract_block_integrals(self, plan):
+        """
+        Führt alle geplanten Blockintegral-Abfragen einer Lösung in einem
+        Durchlauf aus.
+
+        Args:
+            plan (list[IntegralRequest]): Siehe `plan_block_integrals`.
+
+        Returns:
+            list[GroupIntegrals]: Die Ergebnisse in der Reihenfolge des Plans.
+        """
+        calls = []
+        for request in plan:
+            calls.extend(
+                self._block_integral_calls(request.group_id, request.integral_types)
+            )
+        values = iter(self._query(calls))
+        return [
+            GroupIntegrals(
+                request.group_id,
+                request.prefix,
+                request.phase_name,
+                {int_type: next(values) for int_type in request.integral_types},
+            )
+            for request in plan
+        ]
 
     def get_all_block_integrals_for_group(self, group_id, as_dataframe=False):
         """
@@ -244,11 +369,11 @@ class FEMMSession:
         """
         results = {"group_id": group_id, "integrals": {}}
 
+        values = self.get_block_integrals(group_id, BLOCK_INTEGRAL_TYPES)
         for int_type, data in BLOCK_INTEGRAL_TYPES.items():
-            value = self.get_group_block_integral(int_type, group_id)
             # Kopiere die Daten, um das Original-Dictionary nicht zu verändern
             result_data = data.copy()
-            result_data["value"] = value
+            result_data["value"] = values[int_type]
             results["integrals"][int_type] = result_data
 
         if as_dataframe:
@@ -0,0 +1,234 @@
+# src/field_lines.py
+"""
+Feldlinien (Isolinien des Vektorpotentials A) aus einer gespeicherten Lösung,
+ohne FEMM.
+
+Die Schnitte aller Dreiecke mit allen Niveaus werden vektorisiert bestimmt
+("marching triangles"): je Dreieck werden über die sortierten Niveaus nur die
+Niveaus zwischen kleinstem und größtem Knotenwert betrachtet. Jede Strecke
+verbindet zwei geschnittene Kanten; die Kanten dienen als Schlüssel, über die
+die Strecken eines Niveaus zu Polylinien verbunden werden. Zum Schluss werden
+die Linien auf eine Bildschirmauflösung vereinfacht: je Pixel bleibt ein
+Punkt.
+
+Bei Lösungen im Modus "phasor" ist A ein komplexer Zeiger; der Momentanwert
+zum Phasenwinkel θ ist Re(A·exp(jθ)). Bei den Lösungen einzelner Winkel wird
+der Realteil verwendet.
+"""
+import math
+import os
+
+import numpy as np
+
+from src.plot_renderer import solution_path, stored_solutions
+
+DEFAULT_LEVELS = 30
+DEFAULT_RESOLUTION = 800
+
+# Kanten eines Dreiecks als Paare lokaler Knotenindizes
+_EDGES = np.array([[0, 1], [1, 2], [2, 0]])
+
+
+def find_solution(run_path, pos_name, current_name, angle_deg):
+    """
+    Sucht die Lösung eines Positionsschritts und Stroms zu einem Phasenwinkel:
+    die Lösung dieses Winkels oder, falls der Lauf im Modus "phasor" gelöst
+    wurde, dessen Zeigerlösung.
+
+    Returns:
+        tuple: (Pfad der .ans-Datei, Winkel für `potential_at_angle`) bzw.
+        (None, None), wenn keine Lösung gespeichert ist.
+    """
+    solutions = stored_solutions(run_path, pos_name, current_name)
+    angle = int(round(float(angle_deg)))
+    if angle in solutions:
+        return solution_path(run_path, pos_name, current_name, solutions[angle]), None
+    phasor = solution_path(
+        run_path, pos_name, current_name, f"{pos_name}_{current_name}_phasor"
+    )
+    if os.path.exists(phasor):
+        return phasor, float(angle_deg)
+    return None, None
+
+
+def potential_at_angle(potential, angle_deg=None):
+    """Momentanwert des Vektorpotentials, bei `angle_deg` None der Realteil."""
+    if angle_deg is None:
+        return np.real(potential)
+    return np.real(potential * np.exp(1j * math.radians(angle_deg)))
+
+
+def contour_levels(values, num_levels=DEFAULT_LEVELS):
+    """`num_levels - 1` gleichmäßig verteilte Niveaus zwischen Minimum und Maximum."""
+    if len(values) == 0:
+        return np.zeros(0)
+    min_v, max_v = float(np.min(values)), float(np.max(values))
+    if abs(max_v - min_v) < 1e-9 * max(1.0, abs(max_v)):
+        return np.zeros(0)
+    return min_v + (max_v - min_v) * np.arange(1, num_levels) / num_levels
+
+
+def contour_segments(nodes, elements, values, levels):
+    """
+    Schneidet alle Dreiecke mit allen Niveaus.
+
+    Args:
+        nodes (ndarray): Knotenkoordinaten (N, 2).
+        elements (ndarray): Knotenindizes der Dreiecke (E, 3).
+        values (ndarray): Reeller Wert je Knoten (N,).
+        levels (ndarray): Aufsteigend sortierte Niveaus (L,).
+
+    Returns:
+        tuple: Anfangs- und Endpunkte (S, 2), Niveau-Index (S,) und die
+        Schlüssel der geschnittenen Kanten am Anfang und Ende (S,), gleich
+        für dieselbe Kante und dasselbe Niveau in benachbarten Dreiecken.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    elements = np.asarray(elements, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    levels = np.asarray(levels, dtype=float)
+    element_values = values[elements]
+
+    # Niveaus mit min <= Niveau < max je Dreieck, als Paare (Dreieck, Niveau)
+    first = np.searchsorted(levels, element_values.min(axis=1), side="left")
+    last = np.searchsorted(levels, element_values.max(axis=1), side="left")
+    counts = np.maximum(last - first, 0)
+    element_idx = np.repeat(np.arange(len(elements)), counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    level_idx = np.repeat(first, counts) + np.arange(counts.sum()) - offsets
+    level = levels[level_idx]
+
+    # Kanten mit aufsteigenden Knotenindizes, damit benachbarte Dreiecke
+    # denselben Schnittpunkt berechnen
+    edge_nodes = elements[element_idx][:, _EDGES]
+    edge_nodes = np.sort(edge_nodes, axis=2)
+    start, end = edge_nodes[..., 0], edge_nodes[..., 1]
+    v_start, v_end = values[start], values[end]
+    crossed = (v_start > level[:, None]) != (v_end > level[:, None])
+    delta = np.where(v_end == v_start, 1.0, v_end - v_start)
+    t = (level[:, None] - v_start) / delta
+    points = nodes[start] + t[..., None] * (nodes[end] - nodes[start])
+
+    # Genau zwei Kanten sind geschnitten: die beiden nach der ungeschnittenen
+    skipped = np.argmin(crossed, axis=1)
+    a = (skipped + 1) % 3
+    b = (skipped + 2) % 3
+    rows = np.arange(len(level_idx))
+    n = len(nodes)
+    keys = (level_idx[:, None] * n + start) * n + end
+    return (
+        points[rows, a],
+        points[rows, b],
+        level_idx,
+        keys[rows, a],
+        keys[rows, b],
+    )
+
+
+def join_segments(key_a, key_b):
+    """
+    Verbindet Strecken mit gemeinsamen Kantenschlüsseln zu Polylinien. Die
+    Strecke i hat die Enden i (Schlüssel `key_a[i]`) und count + i
+    (Schlüssel `key_b[i]`).
+
+    Returns:
+        list[ndarray]: Indizes der Endpunkte je Linie in der Reihenfolge
+        `concat(key_a, key_b)`, passend zu `concat(point_a, point_b)`;
+        bei geschlossenen Linien liegt der letzte Punkt auf dem ersten.
+    """
+    count = len(key_a)
+    keys = np.concatenate([key_a, key_b])
+    order = np.argsort(keys, kind="stable")
+    same = keys[order[1:]] == keys[order[:-1]]
+    partner = np.full(2 * count, -1, dtype=np.int64)
+    partner[order[:-1][same]] = order[1:][same]
+    partner[order[1:][same]] = order[:-1][same]
+
+    partner = partner.tolist()
+    visited = [False] * count
+    lines = []
+
+    def walk(end):
+        ends = [end]
+        while True:
+            segment = end % count
+            visited[segment] = True
+            far = (end + count) % (2 * count)
+            ends.append(far)
+            end = partner[far]
+            if end < 0 or visited[end % count]:
+                return ends
+
+    # Zuerst die offenen Linien von einem freien Ende aus, dann die Ringe
+    for end in range(2 * count):
+        if partner[end] < 0 and not visited[end % count]:
+            lines.append(walk(end))
+    for segment in range(count):
+        if not visited[segment]:
+            lines.append(walk(segment))
+    return [np.array(ends, dtype=np.int64) for ends in lines]
+
+
+def simplify_lines(points, lines, tolerance):
+    """
+    Vereinfacht die Linien auf ein Raster der Weite `tolerance`: von
+    aufeinanderfolgenden Punkten in derselben Rasterzelle bleibt der erste,
+    Anfang und Ende jeder Linie bleiben erhalten.
+
+    Returns:
+        list[ndarray]: Die Punkte (K, 2) je Linie, K >= 2.
+    """
+    if not lines:
+        return []
+    lengths = np.array([len(line) for line in lines])
+    flat = points[np.concatenate(lines)]
+    line_start = np.cumsum(lengths) - lengths
+    first = np.zeros(len(flat), dtype=bool)
+    first[line_start] = True
+    last = np.zeros(len(flat), dtype=bool)
+    last[line_start + lengths - 1] = True
+
+    if tolerance > 0:
+        cells = np.floor(flat / tolerance)
+        moved = np.ones(len(flat), dtype=bool)
+        moved[1:] = (cells[1:] != cells[:-1]).any(axis=1)
+        keep = first | last | moved
+    else:
+        keep = np.ones(len(flat), dtype=bool)
+    kept_lengths = np.add.reduceat(keep, line_start)
+    return np.split(flat[keep], np.cumsum(kept_lengths)[:-1])
+
+
+def extract_field_lines(
+    nodes,
+    elements,
+    values,
+    num_levels=DEFAULT_LEVELS,
+    resolution=DEFAULT_RESOLUTION,
+):
+    """
+    Berechnet die Feldlinien eines Knotenwerts und vereinfacht sie so, dass
+    über die größere Ausdehnung des Netzes `resolution` Punkte kommen.
+
+    Returns:
+        list[dict]: Je Linie {"level": Niveau, "points": ndarray (K, 2)}.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    levels = contour_levels(values, num_levels)
+    if len(levels) == 0 or len(elements) == 0:
+        return []
+    point_a, point_b, level_idx, key_a, key_b = contour_segments(
+        nodes, elements, values, levels
+    )
+    if len(level_idx) == 0:
+        return []
+    lines = join_segments(key_a, key_b)
+    extent = (nodes.max(axis=0) - nodes.min(axis=0)).max()
+    tolerance = extent / resolution if resolution else 0.0
+    # Das Niveau einer Linie über ihre erste Strecke
+    segment_count = len(level_idx)
+    simplified = simplify_lines(np.concatenate([point_a, point_b]), lines, tolerance)
+    return [
+        {"level": float(levels[level_idx[line[0] % segment_count]]), "points": piece}
+        for line, piece in zip(lines, simplified)
+    ]
@@ -0,0 +1,67 @@
+# src/journal.py
+"""
+Append-only Journal der erledigten Simulationsaufgaben eines Laufs.
+
+Jede abgeschlossene Aufgabe wird sofort als eine JSON-Zeile mit ihren
+Ergebniszeilen angehängt. Nach einem Absturz lassen sich damit die fertigen
+`run_identifier` überspringen und die `*_summary.csv`-Dateien ohne erneutes
+Lösen aus dem Journal erzeugen.
+"""
+import json
+import logging
+import os
+
+from src.utils import json_default, json_object_hook
+
+JOURNAL_FILENAME = "results_journal.jsonl"
+
+
+class RunJournal:
+    """Schreibt und liest das Journal eines Simulationslaufs."""
+
+    def __init__(self, run_path):
+        self.path = os.path.join(run_path, JOURNAL_FILENAME)
+
+    def append(self, rows):
+        """Hängt die Ergebniszeilen einer Aufgabe an und schreibt sie auf die Platte."""
+        line = json.dumps({"rows": rows}, default=json_default)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self):
+        """
+        Liest alle Ergebniszeilen des Journals. Eine beim Absturz nur teilweise
+        geschriebene letzte Zeile wird verworfen und abgeschnitten, damit neue
+        Einträge wieder auf einer eigenen Zeile beginnen.
+        """
+        rows = []
+        if not os.path.exists(self.path):
+            return rows
+        valid_size = 0
+        with open(self.path, "rb") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    entry = json.loads(
+                        line.decode("utf-8"), object_hook=json_object_hook
+                    )
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    logging.warning(
+                        "Journal-Zeile %d ist unvollständig und wird ignoriert.",
+                        line_number,
+                    )
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                rows.extend(entry["rows"])
+                valid_size += len(line)
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+        return rows
+
+
+def completed_identifiers(rows):
+    """Gibt die `run_identifier` aller Zeilen im Journal zurück."""
+    return {row["run_identifier"] for row in rows}
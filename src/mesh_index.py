@@ -0,0 +1,114 @@
+# src/mesh_index.py
+"""
+Räumlicher Index über die Dreiecke eines Netzes: ein gleichmäßiges Raster,
+dessen Zellen die Dreiecke führen, deren umschließendes Rechteck sie
+berühren. Die Zellgröße richtet sich nach der mittleren Dreiecksgröße, sodass
+eine Zelle im Mittel nur wenige Dreiecke enthält.
+
+Aufbau und Suche sind vektorisiert: alle Paare aus Punkt und Kandidat der
+jeweiligen Zelle werden auf einmal mit baryzentrischen Koordinaten geprüft.
+"""
+import numpy as np
+
+# Toleranz der baryzentrischen Koordinaten für Punkte auf einer Kante
+BARYCENTRIC_TOLERANCE = 1e-9
+
+
+class TriangleGrid:
+    """Gleichmäßiges Raster über die Dreiecke eines Netzes."""
+
+    def __init__(self, nodes, elements, cells_per_element=1.0):
+        """
+        Args:
+            nodes (ndarray): Knotenkoordinaten (N, 2).
+            elements (ndarray): Knotenindizes der Dreiecke (E, 3).
+            cells_per_element (float): Rasterzellen je Dreieck.
+        """
+        self.corners = np.asarray(nodes, dtype=float)[
+            np.asarray(elements, dtype=np.int64)
+        ]
+        count = len(self.corners)
+        lower = self.corners.min(axis=1)
+        upper = self.corners.max(axis=1)
+        self.origin = lower.min(axis=0) if count else np.zeros(2)
+        extent = upper.max(axis=0) - self.origin if count else np.ones(2)
+        area = max(extent[0] * extent[1], 1e-30)
+        self.cell_size = max(
+            np.sqrt(area / max(count * cells_per_element, 1)),
+            1e-12 * max(extent.max(), 1.0),
+        )
+        self.shape = (np.floor(extent / self.cell_size).astype(np.int64) + 1).tolist()
+
+        # Zellen des umschließenden Rechtecks jedes Dreiecks
+        first = self._cell_coords(lower)
+        last = self._cell_coords(upper)
+        width = last[:, 0] - first[:, 0] + 1
+        counts = width * (last[:, 1] - first[:, 1] + 1)
+        triangle = np.repeat(np.arange(count), counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cx = first[triangle, 0] + k % width[triangle]
+        cy = first[triangle, 1] + k // width[triangle]
+        cell = cy * self.shape[0] + cx
+
+        order = np.argsort(cell, kind="stable")
+        self.cell_triangles = triangle[order]
+        self.cell_start = np.searchsorted(
+            cell[order], np.arange(self.shape[0] * self.shape[1] + 1)
+        )
+
+    def _cell_coords(self, points):
+        """Rasterkoordinaten (ix, iy) von Punkten, auf das Raster begrenzt."""
+        coords = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(coords, 0, np.array(self.shape) - 1)
+
+    def locate(self, points):
+        """
+        Sucht für jeden Punkt das Dreieck, in dem er liegt.
+
+        Args:
+            points (ndarray): Punkte (P, 2) in den Koordinaten des Netzes.
+
+        Returns:
+            tuple: Index des Dreiecks je Punkt (P,), -1 außerhalb des Netzes,
+            und die baryzentrischen Koordinaten (P, 3).
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        element = np.full(len(points), -1, dtype=np.int64)
+        weights = np.zeros((len(points), 3))
+        if len(points) == 0 or len(self.corners) == 0:
+            return element, weights
+
+        coords = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        in_grid = (
+            (coords >= 0).all(axis=1)
+            & (coords[:, 0] < self.shape[0])
+            & (coords[:, 1] < self.shape[1])
+        )
+        cell = np.where(in_grid, coords[:, 1] * self.shape[0] + coords[:, 0], 0)
+        start = self.cell_start[cell]
+        counts = np.where(in_grid, self.cell_start[cell + 1] - start, 0)
+
+        # Alle Paare aus Punkt und Dreieck seiner Zelle
+        point = np.repeat(np.arange(len(points)), counts)
+        offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        triangle = self.cell_triangles[np.repeat(start, counts) + offset]
+
+        p0, p1, p2 = (self.corners[triangle, k] for k in range(3))
+        v0, v1, v2 = p1 - p0, p2 - p0, points[point] - p0
+        det = v0[:, 0] * v1[:, 1] - v1[:, 0] * v0[:, 1]
+        det = np.where(det == 0, np.nan, det)
+        l1 = (v2[:, 0] * v1[:, 1] - v1[:, 0] * v2[:, 1]) / det
+        l2 = (v0[:, 0] * v2[:, 1] - v2[:, 0] * v0[:, 1]) / det
+        l0 = 1 - l1 - l2
+        inside = (
+            (l0 >= -BARYCENTRIC_TOLERANCE)
+            & (l1 >= -BARYCENTRIC_TOLERANCE)
+            & (l2 >= -BARYCENTRIC_TOLERANCE)
+        )
+
+        # Je Punkt das erste passende Dreieck
+        hits, first = np.unique(point[inside], return_index=True)
+        chosen = np.flatnonzero(inside)[first]
+        element[hits] = triangle[chosen]
+        weights[hits] = np.stack([l0[chosen], l1[chosen], l2[chosen]], axis=1)
+        return element, weights
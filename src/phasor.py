@@ -0,0 +1,106 @@
+# src/phasor.py
+"""
+Rekonstruktion der Phasenwinkel-Ergebnisse aus einer komplexen Zeiger-Lösung.
+
+Im Modus "phasor" wird jeder Positionsschritt nur einmal mit komplexen
+Phasenströmen gelöst. Damit die Zeilen wertgleich zu einem Winkel-Sweep mit
+reellen Momentanströmen sind, gilt für einen Winkel θ:
+
+    lineare Größen Q            Re(Q · exp(jθ)), der Momentanwert
+    Stromkreise                 Strom und Flussverkettung wie lineare
+                                Größen, die Spannung jω·Φ in Quadratur
+                                dazu: j · Im(U · exp(jθ))
+    quadratische Größen         zeitlich gemittelt und damit vom Winkel
+                                unabhängig (Energien, Verluste, stationäre
+                                Kräfte); die doppeltfrequenten Anteile (2x)
+                                bleiben Zeiger und drehen mit exp(j2θ)
+    geometrische Größen         unverändert
+
+Die quadratischen Größen sind also Mittelwerte über eine Periode und keine
+Momentanwerte wie im Sweep. Die Zeilen tragen deshalb in der Spalte
+SOLUTION_MODE_COLUMN den Wert "phasor".
+"""
+import numpy as np
+
+from src.block_integrals import BLOCK_INTEGRAL_TYPES
+from src.utils import make_run_identifier
+
+# Integrale, deren Zeiger mit der doppelten Frequenz umläuft
+DOUBLE_FREQUENCY_TYPES = {13, 14, 16, 20, 21, 23}
+
+# Die Werte von `mo_getcircuitproperties` (Strom, Spannung, Fluss) liegen
+# unter den Spaltennamen des Ausgangsstands: "Isec_real_A" ist der Strom,
+# "Isec_imag_A" die Spannung, beide komplex, mit ihrer Phase gegenüber dem
+# Momentanstrom des Sweeps (Spannung jω·Φ: j)
+CIRCUIT_COLUMNS = {"Isec_real_A": 1, "Isec_imag_A": 1j}
+# Stromkreis-Spalten, die Real- und Imaginärteil eines Werts (der
+# Flussverkettung) getrennt ablegen
+COMPLEX_PAIR_COLUMNS = (("circuit_voltage_real_V", "circuit_voltage_imag_V"),)
+
+# Spalte, die Zeilen aus einer Zeiger-Lösung kennzeichnet
+SOLUTION_MODE_COLUMN = "solution_mode"
+
+
+def integral_column_rotations():
+    """
+    Ordnet jeder Integral-Spalte die Vielfachheit der Drehung zu
+    (0 = konstant, 1 = exp(jθ), 2 = exp(j2θ)).
+    """
+    rotations = {}
+    for int_type, data in BLOCK_INTEGRAL_TYPES.items():
+        if data["order"] == 1:
+            multiple = 1
+        elif int_type in DOUBLE_FREQUENCY_TYPES:
+            multiple = 2
+        else:
+            multiple = 0
+        for prefix in ("conductor", "core"):
+            rotations[f"{prefix}_{data['symbol']}_{data['unit']}"] = multiple
+    return rotations
+
+
+def rotate_phasor_row(row, angle_deg, rotations=None):
+    """
+    Berechnet die Werte einer Zeiger-Ergebniszeile für einen Phasenwinkel:
+    lineare Größen als Momentanwert, quadratische als zeitlicher Mittelwert
+    bzw. doppeltfrequenter Zeiger.
+    """
+    rotations = rotations if rotations is not None else integral_column_rotations()
+    rotation = np.exp(1j * np.deg2rad(angle_deg))
+
+    res = dict(row)
+    res["phaseAngle_deg"] = angle_deg
+    res["run_identifier"] = make_run_identifier(
+        row["pos_name"], row["current_name"], angle_deg
+    )
+    res[SOLUTION_MODE_COLUMN] = "phasor"
+    for col, value in row.items():
+        multiple = rotations.get(col, 0)
+        if not multiple or not isinstance(value, (int, float, complex)):
+            continue
+        if multiple == 1:
+            res[col] = float((complex(value) * rotation).real)
+        else:
+            res[col] = complex(value) * rotation**multiple
+
+    for col, phase in CIRCUIT_COLUMNS.items():
+        if row.get(col) is not None:
+            res[col] = phase * (complex(row[col]) / phase * rotation).real
+    for real_col, imag_col in COMPLEX_PAIR_COLUMNS:
+        if row.get(real_col) is not None and row.get(imag_col) is not None:
+            value = (row[real_col] + 1j * row[imag_col]) * rotation
+            res[real_col], res[imag_col] = float(value.real), 0.0
+    return res
+
+
+def expand_phasor_rows(rows, angles_deg):
+    """
+    Erzeugt aus den Zeiger-Ergebnissen je Leiter die Zeilen für alle
+    Phasenwinkel, im selben Format wie ein klassischer Winkel-Sweep.
+    """
+    rotations = integral_column_rotations()
+    return [
+        rotate_phasor_row(row, float(angle), rotations)
+        for row in rows
+        for angle in angles_deg
+    ]
@@ -0,0 +1,333 @@
+# src/plot_renderer.py
+"""
+Erzeugt die FEMM-Bilder (Dichte- und Vektorplot von H) getrennt vom Lösen.
+
+Die Worker speichern nur noch die Lösungsdateien (`.ans`); die Bilder werden
+aus diesen in einem eigenen Prozess-Pool mit niedriger Priorität gerendert.
+`simulation_meta.plotMode` legt fest, wann das geschieht:
+
+    "all"       alle gelösten Winkel, im Hintergrund während des Laufs
+    "selected"  nur Positionen/Winkel aus `simulation_meta.plotSelection`
+                ({"positions": [...], "angles": [...]}, fehlende Listen = alle)
+    "lazy"      erst beim ersten Abruf über `/analysis/femm_plots`, der
+                Abruf wartet nicht, sondern meldet die noch offenen Bilder
+    "off"       keine Bilder
+
+Winkel ohne eigene Lösungsdatei werden aus den gespeicherten Lösungen
+zusammengesetzt (siehe `plot_sources`): periodische Duplikate und gespiegelte
+Winkel aus dem gelösten Winkel, Winkel im Modus "phasor" aus der Zeigerlösung
+und im Modus "basis" aus den Einheitserregungen. Im adaptiven Modus
+interpolierte Winkel haben nur Bilder, wenn der um eine halbe Periode
+versetzte Winkel gelöst wurde.
+"""
+import ctypes
+import logging
+import multiprocessing
+import multiprocessing.util as mp_util
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from src.adaptive_sweep import PERIOD_DEG
+from src.utils import (
+    calculate_instantaneous_current,
+    is_linear_configuration,
+    make_run_identifier,
+)
+
+PLOT_MODES = ("all", "selected", "lazy", "off")
+DEFAULT_PLOT_MODE = "all"
+DEFAULT_PLOT_WORKERS = 1
+
+PLOTS_DIRNAME = "femm_plots"
+FEMM_FILES_DIRNAME = "femm_files"
+
+# Niedrigere Priorität der Render-Prozesse (POSIX-Nice-Wert bzw. Windows-Klasse)
+RENDER_NICENESS = 10
+BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+
+# FEMM-Sitzung und Backend des aktuellen Render-Prozesses
+_RENDER_SESSION = {"session": None, "backend": None}
+
+
+def plot_mode(run_data):
+    """Liest den Plot-Modus aus der Konfiguration."""
+    mode = run_data.get("simulation_meta", {}).get("plotMode", DEFAULT_PLOT_MODE)
+    if mode not in PLOT_MODES:
+        raise ValueError(f"Unbekannter Plot-Modus '{mode}'.")
+    return mode
+
+
+def solution_path(run_path, pos_name, current_name, run_identifier):
+    """Pfad der `.ans`-Datei einer Einzelsimulation."""
+    return os.path.join(
+        run_path,
+        FEMM_FILES_DIRNAME,
+        f"{pos_name}_{current_name}",
+        f"{run_identifier}.ans",
+    )
+
+
+def find_task_solution(run_path, run_identifier):
+    """
+    Sucht die `.ans`-Datei einer Aufgabe (z. B. `pos_1_I_1_angle30` oder
+    `pos_1_I_1_phasor`) in den Ordnern der Positionsschritte.
+
+    Returns:
+        str | None: Der Pfad oder None, wenn keine Lösung gespeichert ist.
+    """
+    if not run_identifier or os.path.basename(run_identifier) != run_identifier:
+        return None
+    files_dir = os.path.join(run_path, FEMM_FILES_DIRNAME)
+    if not os.path.isdir(files_dir):
+        return None
+    for entry in sorted(os.listdir(files_dir)):
+        path = os.path.join(files_dir, entry, f"{run_identifier}.ans")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def plot_paths(run_path, run_identifier):
+    """Pfade des Dichte- und des Vektorplots einer Einzelsimulation."""
+    plots_dir = os.path.join(run_path, PLOTS_DIRNAME)
+    return (
+        os.path.join(plots_dir, f"{run_identifier}_density_H.png"),
+        os.path.join(plots_dir, f"{run_identifier}_vector_H.png"),
+    )
+
+
+def stored_solutions(run_path, pos_name, current_name):
+    """
+    Sucht die gespeicherten Lösungen eines Positionsschritts und Stroms.
+
+    Returns:
+        dict: {Winkel: run_identifier}
+    """
+    group_dir = os.path.join(run_path, FEMM_FILES_DIRNAME, f"{pos_name}_{current_name}")
+    if not os.path.isdir(group_dir):
+        return {}
+    pattern = re.compile(
+        f"({re.escape(pos_name)}_{re.escape(current_name)}_angle(-?\\d+))\\.ans$"
+    )
+    solutions = {}
+    for filename in os.listdir(group_dir):
+        match = pattern.match(filename)
+        if match:
+            solutions[int(match.group(2))] = match.group(1)
+    return solutions
+
+
+def _basis_sources(run_path, run_data, pos_name, current_name, angle_deg):
+    """
+    Gewichtet die Lösungen der Einheitserregungen eines Positionsschritts mit
+    den Momentanströmen des Messstroms zum Phasenwinkel (wie `evaluate_sweep`).
+    """
+    rms = run_data.get("scenarioParams", {}).get(current_name)
+    phases = run_data.get("electricalSystem", [])
+    if rms is None or not phases:
+        return None
+    basis_dir = os.path.join(run_path, FEMM_FILES_DIRNAME, f"{pos_name}_basis")
+    sources = []
+    for phase in phases:
+        path = os.path.join(basis_dir, f"{pos_name}_basis_unit_{phase['name']}.ans")
+        if not os.path.exists(path):
+            return None
+        weight = calculate_instantaneous_current(
+            float(rms) * np.sqrt(2), phase["phaseShiftDeg"], angle_deg
+        )
+        sources.append((path, float(weight)))
+    return sources
+
+
+def plot_sources(run_path, run_data, pos_name, current_name, angle_deg):
+    """
+    Sucht die gespeicherten Lösungen, aus denen sich das Feld eines
+    Phasenwinkels ergibt, in dieser Reihenfolge: die Lösung des Winkels oder
+    eines periodisch gleichen Winkels, bei Halbperioden-Symmetrie die negierte
+    Lösung des um 180° versetzten Winkels, die Zeigerlösung (Momentanwert
+    Re(A·exp(jθ))) und die Einheitserregungen der Basis.
+
+    Returns:
+        tuple: (Liste von (Pfad der .ans-Datei, Gewicht), nur Realteil) bzw.
+        (None, False), wenn der Winkel aus keiner Lösung folgt.
+    """
+    angle = float(angle_deg)
+    key = round(angle % PERIOD_DEG, 9)
+    mirror_key = round((angle - PERIOD_DEG / 2) % PERIOD_DEG, 9)
+    symmetric = run_data.get("simulation_meta", {}).get(
+        "halfPeriodSymmetry", True
+    ) and is_linear_configuration(run_data)
+    mirror = None
+    for solved, run_identifier in sorted(
+        stored_solutions(run_path, pos_name, current_name).items()
+    ):
+        path = solution_path(run_path, pos_name, current_name, run_identifier)
+        solved_key = round(solved % PERIOD_DEG, 9)
+        if solved_key == key:
+            return [(path, 1.0)], False
+        if symmetric and solved_key == mirror_key and mirror is None:
+            mirror = [(path, -1.0)]
+    if mirror is not None:
+        return mirror, False
+
+    phasor = solution_path(
+        run_path, pos_name, current_name, f"{pos_name}_{current_name}_phasor"
+    )
+    if os.path.exists(phasor):
+        return [(phasor, complex(np.exp(1j * np.deg2rad(angle))))], True
+
+    basis = _basis_sources(run_path, run_data, pos_name, current_name, angle)
+    if basis is not None:
+        return basis, False
+    return None, False
+
+
+def _lower_priority(backend=None):
+    """Initializer der Render-Prozesse: niedrige Priorität, eigene FEMM-Sitzung."""
+    try:
+        if hasattr(os, "nice"):
+            os.nice(RENDER_NICENESS)
+        elif os.name == "nt":
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(
+                kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS
+            )
+    except OSError as e:
+        logging.warning("Priorität des Render-Prozesses nicht gesenkt: %s", e)
+    _RENDER_SESSION["session"] = None
+    _RENDER_SESSION["backend"] = backend
+    mp_util.Finalize(None, _close_render_session, exitpriority=10)
+
+
+def _close_render_session():
+    """Beendet die FEMM-Sitzung des Render-Prozesses."""
+    session = _RENDER_SESSION["session"]
+    _RENDER_SESSION["session"] = None
+    if session is not None:
+        try:
+            session.close()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.warning("FEMM-Sitzung konnte nicht geschlossen werden: %s", e)
+
+
+def render_solution_plots(sources, density_path, vector_path, real_part=False):
+    """
+    Rendert Dichte- und Vektorplot einer gespeicherten Lösung (wird im
+    Render-Pool ausgeführt). Besteht `sources` nicht aus genau einer
+    ungewichteten Lösung, wird die Überlagerung vorher in eine temporäre
+    `.ans`-Datei geschrieben (siehe `plot_sources`).
+
+    Returns:
+        float: Renderzeit in Sekunden, None bei einem Fehler.
+    """
+    # Erst hier importieren, damit der Server ohne FEMM starten kann
+    from src.fem_solution import write_combined_solution
+    from src.femm_wrapper import FEMMSession
+
+    start = time.perf_counter()
+    combined = None
+    try:
+        os.makedirs(os.path.dirname(density_path), exist_ok=True)
+        if len(sources) == 1 and sources[0][1] == 1 and not real_part:
+            ans_path = sources[0][0]
+        else:
+            handle, combined = tempfile.mkstemp(
+                suffix=".ans", dir=os.path.dirname(density_path)
+            )
+            os.close(handle)
+            write_combined_solution(sources, combined, real_part)
+            ans_path = combined
+
+        femm = _RENDER_SESSION["session"]
+        if femm is None:
+            femm = FEMMSession(visible=False, backend=_RENDER_SESSION["backend"])
+            _RENDER_SESSION["session"] = femm
+        femm.open_solution(ans_path)
+
+        femm.zoom_natural()
+        femm.show_density_plot(legend=1, gscale=0, upper_b=0, lower_b=0, plot_type="h")
+        femm.save_bitmap(density_path)
+
+        femm.zoom_natural()
+        femm.show_vector_plot(plot_type=1, scale_factor=2)
+        femm.save_bitmap(vector_path)
+
+        femm.close_solution()
+        return time.perf_counter() - start
+    except Exception as e:  # pylint: disable=broad-except
+        logging.error("Plots für '%s' fehlgeschlagen: %s", density_path, e)
+        _close_render_session()
+        return None
+    finally:
+        if combined is not None and os.path.exists(combined):
+            os.remove(combined)
+
+
+class BackgroundPlotRenderer:
+    """Rendert die Bilder von Einzelsimulationen in einem Hintergrund-Pool."""
+
+    def __init__(self, processes=DEFAULT_PLOT_WORKERS, backend=None):
+        self.pool = multiprocessing.Pool(
+            processes=max(1, int(processes)),
+            initializer=_lower_priority,
+            initargs=(backend,),
+        )
+        self.jobs = {}
+
+    def submit(
+        self, run_path, run_data, pos_name, current_name, angle_deg, callback=None
+    ):
+        """
+        Stellt die Bilder eines Phasenwinkels in die Warteschlange, falls sie
+        noch fehlen und sich das Feld aus gespeicherten Lösungen ergibt.
+        Jeder Winkel wird höchstens einmal gerendert, auch wenn das Rendern
+        fehlschlägt. `callback` erhält die Renderzeit (siehe
+        `render_solution_plots`).
+
+        Returns:
+            AsyncResult oder None, wenn nichts zu tun ist.
+        """
+        run_identifier = make_run_identifier(pos_name, current_name, angle_deg)
+        density_path, vector_path = plot_paths(run_path, run_identifier)
+        if os.path.exists(density_path) and os.path.exists(vector_path):
+            return None
+        key = (run_path, run_identifier)
+        if key in self.jobs:
+            return None if self.jobs[key].ready() else self.jobs[key]
+        sources, real_part = plot_sources(
+            run_path, run_data, pos_name, current_name, angle_deg
+        )
+        if sources is None:
+            return None
+        job = self.pool.apply_async(
+            render_solution_plots,
+            (sources, density_path, vector_path, real_part),
+            callback=callback,
+        )
+        self.jobs[key] = job
+        return job
+
+    def close(self):
+        """Wartet, bis alle Bilder gerendert sind, und beendet den Pool."""
+        self.pool.close()
+        self.pool.join()
+        self.jobs = {}
+
+
+def selected_for_plots(row, selection):
+    """Prüft, ob eine Ergebniszeile in der `plotSelection` liegt."""
+    positions = selection.get("positions")
+    angles = selection.get("angles")
+    if positions is not None and row.get("pos_name") not in positions:
+        return False
+    if angles is not None:
+        angle = row.get("phaseAngle_deg")
+        if angle is None or not any(
+            abs(float(angle) - float(a)) < 1e-9 for a in angles
+        ):
+            return False
+    return True
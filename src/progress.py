@@ -0,0 +1,146 @@
+# src/progress.py
+"""
+Fortschritt eines Simulationslaufs: Laufzeiten je Aufgabe und Stufe,
+Durchsatz, Restzeit, die langsamsten und die gerade laufenden Aufgaben.
+
+Die Worker messen je Aufgabe die Stufen (siehe `TIMING_STAGES` in
+`src.simulation_worker`) und melden den Start einer Aufgabe über eine
+Ereignis-Queue. Die Zeiten werden als JSON-Zeilen in `task_timings.jsonl`
+neben den Ergebnissen abgelegt, die Zusammenfassung geht in die Statusdatei.
+
+Mit `--events` gibt der Runner Fortschritt und erledigte Aufgaben zusätzlich
+als Zeilen `@event {...}` auf stdout aus; der Server liest sie über die Pipe
+des Prozesses und verteilt sie per Server-Sent Events (siehe
+`server.simulation`).
+"""
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+TIMINGS_FILENAME = "task_timings.jsonl"
+
+# Anzahl der letzten erledigten Aufgaben, aus denen der Durchsatz für die
+# Restzeit gemittelt wird
+DEFAULT_ETA_WINDOW = 20
+DEFAULT_SLOWEST_COUNT = 5
+
+EVENT_PREFIX = "@event "
+
+
+def emit_event(event, stream=None):
+    """Schreibt ein Ereignis als eine Zeile auf stdout (oder `stream`)."""
+    stream = stream or sys.stdout
+    stream.write(EVENT_PREFIX + json.dumps(event) + "\n")
+    stream.flush()
+
+
+def parse_event_line(line):
+    """
+    Wandelt eine Ausgabezeile des Runners in ein Ereignis um. Zeilen ohne
+    Präfix sind Log-Meldungen.
+    """
+    line = line.rstrip("\r\n")
+    if line.startswith(EVENT_PREFIX):
+        try:
+            return json.loads(line[len(EVENT_PREFIX) :])
+        except json.JSONDecodeError:
+            pass
+    return {"type": "log", "message": line}
+
+
+class RunProgress:
+    """Sammelt die Laufzeiten eines Laufs und fasst sie für den Status zusammen."""
+
+    def __init__(
+        self,
+        run_path,
+        resume=False,
+        eta_window=DEFAULT_ETA_WINDOW,
+        slowest_count=DEFAULT_SLOWEST_COUNT,
+    ):
+        self.path = os.path.join(run_path, TIMINGS_FILENAME)
+        # Beim Fortsetzen werden die Zeiten des abgebrochenen Laufs ergänzt
+        if not resume and os.path.exists(self.path):
+            os.remove(self.path)
+        self.slowest_count = int(slowest_count)
+        self.started = time.time()
+        self.finish_times = collections.deque(maxlen=max(2, int(eta_window)))
+        self.slowest = []
+        self.in_flight = {}
+        self.finished = set()
+        # Die Zeiten der Bilder kommen aus dem Ergebnis-Thread des Render-Pools
+        self._lock = threading.Lock()
+
+    def _append(self, entry):
+        """Hängt eine Zeile an die Zeitdatei an."""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def handle_event(self, event):
+        """Verarbeitet ein Ereignis der Worker ("start", Schlüssel, Prozess-ID, Zeit)."""
+        kind, key, pid, timestamp = event
+        key = tuple(key)
+        if kind == "start" and key not in self.finished:
+            self.in_flight[key] = {"worker": pid, "since": timestamp}
+
+    def record_task(self, key, label, seconds, stages):
+        """Übernimmt die gemessenen Zeiten einer erledigten Aufgabe."""
+        self.finished.add(key)
+        self.in_flight.pop(key, None)
+        self.finish_times.append(time.time())
+        entry = {
+            "task": label,
+            "seconds": round(seconds, 4),
+            "stages": {stage: round(value, 4) for stage, value in stages.items()},
+        }
+        self._append(entry)
+        self.slowest.append(entry)
+        self.slowest.sort(key=lambda e: e["seconds"], reverse=True)
+        del self.slowest[self.slowest_count :]
+
+    def record_plots(self, run_identifier, seconds):
+        """Übernimmt die Renderzeit der Bilder einer Einzelsimulation."""
+        if seconds is not None:
+            self._append(
+                {"task": run_identifier, "stages": {"plots": round(seconds, 4)}}
+            )
+
+    def throughput(self):
+        """Erledigte Aufgaben pro Sekunde im gleitenden Fenster."""
+        times = self.finish_times
+        if len(times) < 2 or times[-1] <= times[0]:
+            return None
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def summary(self, completed, total, labels):
+        """
+        Zusätzliche Felder der Statusdatei.
+
+        Args:
+            labels (dict): Beschreibung der Aufgaben je Schlüssel für die
+                laufenden Aufgaben.
+        """
+        now = time.time()
+        rate = self.throughput()
+        remaining = max(0, total - completed)
+        in_flight = [
+            {
+                "task": labels.get(key, str(key)),
+                "worker": info["worker"],
+                "running_s": round(now - info["since"], 1),
+            }
+            for key, info in sorted(
+                self.in_flight.items(), key=lambda item: item[1]["since"]
+            )
+        ]
+        return {
+            "elapsed_s": round(now - self.started, 1),
+            "throughput_per_s": round(rate, 4) if rate else None,
+            "eta_s": round(remaining / rate, 1) if rate else None,
+            "slowest_tasks": list(self.slowest),
+            "in_flight": in_flight,
+        }
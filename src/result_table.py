@@ -0,0 +1,266 @@
+# src/result_table.py
+"""
+Typisierte, spaltenorientierte Ergebnisdatei eines Simulationslaufs.
+
+Neben den `*_summary.csv`-Dateien schreibt der Runner alle Ergebniszeilen in
+`results.npz`. Komplexe Größen liegen dort als getrennte float64-Spalten für
+Real- und Imaginärteil vor, Leiter-, Positions- und Stromnamen als
+Kategorien (Codes + Kategorien). Das Schema in `__schema__` beschreibt jede
+Spalte und enthält für Blockintegrale Symbol, Einheit und Integral-Typ aus
+`BLOCK_INTEGRAL_TYPES`. Die Dateien in der npz-Datei sind durchnummeriert
+(`col_<i>_...`), weil die Spaltennamen Sonderzeichen enthalten.
+
+Die Datei wird inkrementell aufgebaut: die Zeilen gehen abschnittsweise in
+Zwischendateien je Spalte, die npz-Datei wird am Ende Spalte für Spalte
+geschrieben.
+"""
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from src.block_integrals import BLOCK_INTEGRAL_TYPES
+
+RESULT_TABLE_FILENAME = "results.npz"
+SCHEMA_VERSION = 1
+
+# Zeilen, nach denen der Builder seine Spalten auf die Platte auslagert
+DEFAULT_FLUSH_ROWS = 5000
+
+# Spalten, die als Kategorien gespeichert werden
+CATEGORICAL_COLUMNS = ("pos_name", "current_name", "conductor")
+
+
+def _integral_metadata():
+    """Ordnet jeder Integral-Spalte ihre Metadaten aus BLOCK_INTEGRAL_TYPES zu."""
+    metadata = {}
+    for int_type, data in BLOCK_INTEGRAL_TYPES.items():
+        for prefix in ("conductor", "core"):
+            metadata[f"{prefix}_{data['symbol']}_{data['unit']}"] = {
+                "integral_type": int_type,
+                "group": prefix,
+                "label": data["name"],
+                "symbol": data["symbol"],
+                "unit": data["unit"],
+            }
+    return metadata
+
+
+def _category_text(values, is_complex):
+    """Zahlen einer Spalte, die erst später zur Kategorie wurde, als Text."""
+    if is_complex:
+        return ["" if np.isnan(v) else str(complex(v)) for v in values]
+    return ["" if np.isnan(v.real) else str(float(v.real)) for v in values]
+
+
+class ResultTableBuilder:
+    """
+    Sammelt Ergebniszeilen spaltenweise für die typisierte Ergebnisdatei.
+
+    Die Zeilen werden alle `flush_rows` Zeilen (oder mit `flush()`) je Spalte
+    an eine Zwischendatei in `spill_dir` angehängt: Zahlen als complex128,
+    Kategorien als Codes. Im Speicher liegen also nur die Zeilen seit dem
+    letzten Auslagern und die Kategorien. `save()` liest die Spalten einzeln
+    zurück und schreibt sie nacheinander in die npz-Datei.
+    """
+
+    def __init__(self, columns, spill_dir=None, flush_rows=DEFAULT_FLUSH_ROWS):
+        self.columns = list(columns)
+        self.flush_rows = max(1, int(flush_rows))
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="result_table_")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.pending = {col: [] for col in self.columns}
+        self.pending_rows = 0
+        # Je Spalte: Art der Abschnitte ("number"/"category"), komplexe Werte,
+        # Kategorien mit ihren Codes
+        self.chunk_kinds = {col: [] for col in self.columns}
+        self.is_complex = dict.fromkeys(self.columns, False)
+        self.categories = {col: {} for col in self.columns}
+
+    def _column_path(self, index):
+        """Zwischendatei einer Spalte."""
+        return os.path.join(self.spill_dir, f"col_{index}.npy")
+
+    def add_row(self, row):
+        """Übernimmt eine Ergebniszeile; fehlende Werte werden zu NaN."""
+        for col in self.columns:
+            self.pending[col].append(row.get(col))
+        self.pending_rows += 1
+        if self.pending_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        """Hängt die gesammelten Zeilen an die Zwischendateien der Spalten an."""
+        if not self.pending_rows:
+            return
+        for i, col in enumerate(self.columns):
+            values = self.pending[col]
+            self.pending[col] = []
+            if col not in CATEGORICAL_COLUMNS:
+                try:
+                    array = np.array(
+                        [np.nan if v is None else v for v in values],
+                        dtype=np.complex128,
+                    )
+                    kind = "number"
+                except (TypeError, ValueError):
+                    kind = "category"
+                else:
+                    self.is_complex[col] |= any(
+                        isinstance(v, (complex, np.complexfloating)) for v in values
+                    )
+            else:
+                kind = "category"
+            if kind == "category":
+                codes = self.categories[col]
+                array = np.array(
+                    [
+                        codes.setdefault("" if v is None else str(v), len(codes))
+                        for v in values
+                    ],
+                    dtype=np.int32,
+                )
+            with open(self._column_path(i), "ab") as f:
+                np.save(f, array)
+            self.chunk_kinds[col].append(kind)
+        self.pending_rows = 0
+
+    def _read_column(self, index, col):
+        """
+        Liest eine Spalte aus ihrer Zwischendatei.
+
+        Returns:
+            tuple: (Art, Arrays) wie in der npz-Datei, ohne Präfix.
+        """
+        kinds = self.chunk_kinds[col]
+        with open(self._column_path(index), "rb") as f:
+            chunks = [np.load(f) for _ in kinds]
+
+        if "category" not in kinds:
+            values = np.concatenate(chunks) if chunks else np.zeros(0, np.complex128)
+            if self.is_complex[col]:
+                return "complex", {"_real": values.real, "_imag": values.imag}
+            return "float", {"": values.real.copy()}
+
+        # Kategorien, wie bei np.unique sortiert
+        categories = self.categories[col]
+        for kind, chunk in zip(kinds, chunks):
+            if kind == "number":
+                for text in _category_text(chunk, self.is_complex[col]):
+                    categories.setdefault(text, len(categories))
+        names = np.array(list(categories), dtype=str)
+        order = np.argsort(names, kind="stable")
+        remap = np.empty(len(names), dtype=np.int32)
+        remap[order] = np.arange(len(names), dtype=np.int32)
+        codes = [
+            (
+                chunk
+                if kind == "category"
+                else np.array(
+                    [
+                        categories[t]
+                        for t in _category_text(chunk, self.is_complex[col])
+                    ],
+                    dtype=np.int32,
+                )
+            )
+            for kind, chunk in zip(kinds, chunks)
+        ]
+        codes = np.concatenate(codes) if codes else np.zeros(0, np.int32)
+        return "category", {"_codes": remap[codes], "_categories": names[order]}
+
+    def save(self, run_path):
+        """
+        Schreibt die Spalten als `results.npz` in den Laufordner und entfernt
+        die Zwischendateien.
+        """
+        self.flush()
+        integral_metadata = _integral_metadata()
+        schema = []
+        path = os.path.join(run_path, RESULT_TABLE_FILENAME)
+        tmp_path = f"{path}.tmp"
+        try:
+            with zipfile.ZipFile(
+                tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+            ) as archive:
+                for i, col in enumerate(self.columns):
+                    if self.chunk_kinds[col]:
+                        kind, arrays = self._read_column(i, col)
+                    else:
+                        kind, arrays = "float", {"": np.zeros(0)}
+                    entry = {"name": col, "kind": kind, "key": f"col_{i}"}
+                    entry.update(integral_metadata.get(col, {}))
+                    if col.startswith("pos_") and col not in CATEGORICAL_COLUMNS:
+                        entry["unit"] = "mm"
+                    elif col == "phaseAngle_deg":
+                        entry["unit"] = "°"
+                    schema.append(entry)
+                    for suffix, array in arrays.items():
+                        _write_npz_member(archive, f"col_{i}{suffix}", array)
+                _write_npz_member(
+                    archive,
+                    "__schema__",
+                    np.array(
+                        json.dumps({"version": SCHEMA_VERSION, "columns": schema})
+                    ),
+                )
+            os.replace(tmp_path, path)
+        finally:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+
+def _write_npz_member(archive, name, array):
+    """Schreibt ein Array wie `np.savez_compressed` in ein offenes Archiv."""
+    with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(array), allow_pickle=False)
+
+
+def save_result_table(df, run_path):
+    """Schreibt einen DataFrame (z. B. um Spalten ergänzt) als `results.npz`."""
+    table = ResultTableBuilder(df.columns)
+    for row in df.to_dict("records"):
+        table.add_row(row)
+    return table.save(run_path)
+
+
+def load_result_schema(path):
+    """Liest nur das Schema einer Ergebnisdatei."""
+    with np.load(path) as data:
+        return json.loads(str(data["__schema__"]))
+
+
+def load_result_table(path, pos_name=None, current_name=None):
+    """
+    Lädt eine Ergebnisdatei als DataFrame, optional gefiltert auf einen
+    Positionsschritt und Messstrom.
+
+    Komplexe Spalten werden als complex128, Kategorien als
+    `pd.Categorical` zurückgegeben.
+    """
+    columns = {}
+    with np.load(path) as data:
+        schema = json.loads(str(data["__schema__"]))
+        for entry in schema["columns"]:
+            key = entry["key"]
+            if entry["kind"] == "complex":
+                columns[entry["name"]] = data[f"{key}_real"] + 1j * data[f"{key}_imag"]
+            elif entry["kind"] == "category":
+                columns[entry["name"]] = pd.Categorical.from_codes(
+                    data[f"{key}_codes"], data[f"{key}_categories"]
+                )
+            else:
+                columns[entry["name"]] = data[key]
+
+    df = pd.DataFrame(columns)
+    if pos_name is not None:
+        df = df[df["pos_name"] == pos_name]
+    if current_name is not None:
+        df = df[df["current_name"] == current_name]
+    return df.reset_index(drop=True)
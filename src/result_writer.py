@@ -0,0 +1,182 @@
+# src/result_writer.py
+"""
+Schreibt die Ergebniszeilen eines Laufs gestreamt in die `*_summary.csv`-Dateien.
+
+Die Zeilen kommen ungeordnet aus `imap_unordered` und werden je
+(pos_name, current_name) gepuffert. Überschreitet die Summe aller Puffer
+`max_buffered_rows`, wird der größte Puffer sortiert in eine Zwischendatei
+ausgelagert. Am Ende werden die sortierten Zwischendateien und der Rest des
+Puffers je Gruppe per k-Wege-Merge in die CSV geschrieben; dabei liegt pro
+Zwischendatei immer nur eine Zeile im Speicher.
+
+Beim Schreiben werden die Zeilen zusätzlich spaltenweise in die typisierte
+Ergebnisdatei `results.npz` übernommen (siehe `src.result_table`); nach jeder
+Gruppe werden ihre Spalten ausgelagert und ihr Puffer freigegeben.
+"""
+import csv
+import heapq
+import json
+import logging
+import math
+import os
+import shutil
+
+from src.result_table import ResultTableBuilder
+from src.utils import json_default, json_object_hook
+
+DEFAULT_MAX_BUFFERED_ROWS = 20000
+
+SPILL_DIRNAME = ".result_spill"
+
+# Spalten, die nur zur Gruppierung dienen und nicht in die CSV geschrieben werden
+GROUP_COLUMNS = ("pos_name", "current_name", "run_identifier")
+
+
+def _sort_key(row):
+    """Sortierung der Zeilen innerhalb einer CSV: Phasenwinkel, dann Leiter."""
+    return (row.get("phaseAngle_deg"), row.get("conductor"))
+
+
+def _format_value(value):
+    """Formatiert einen Wert wie `DataFrame.to_csv` (fehlende Werte bleiben leer)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+
+def update_summary_columns(base_path, pos_name, current_name, columns):
+    """
+    Ergänzt oder ersetzt Spalten einer geschriebenen `*_summary.csv`.
+
+    Args:
+        columns (dict): Spaltenname -> Werte in der Zeilenreihenfolge der Datei.
+    """
+    csv_path = os.path.join(base_path, f"{pos_name}_{current_name}_summary.csv")
+    with open(csv_path, "r", encoding="utf-8", newline="") as f:
+        header, *rows = list(csv.reader(f))
+    for col, values in columns.items():
+        if col not in header:
+            header.append(col)
+            for row in rows:
+                row.append("")
+        index = header.index(col)
+        for row, value in zip(rows, values):
+            row[index] = _format_value(value)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+class StreamingResultWriter:
+    """Sammelt Ergebniszeilen gruppenweise und schreibt sie sortiert als CSV."""
+
+    def __init__(
+        self, base_path, max_buffered_rows=DEFAULT_MAX_BUFFERED_ROWS, write_table=True
+    ):
+        self.base_path = base_path
+        self.write_table = write_table
+        self.max_buffered_rows = max(1, int(max_buffered_rows))
+        self.spill_dir = os.path.join(base_path, SPILL_DIRNAME)
+        # Spaltenreihenfolge in der Reihenfolge des ersten Auftretens
+        self.columns = {}
+        self.buffers = {}
+        self.spill_files = {}
+        self.buffered_rows = 0
+        self.spill_count = 0
+
+    def add_rows(self, rows):
+        """Nimmt Ergebniszeilen entgegen und lagert Puffer bei Bedarf aus."""
+        for row in rows:
+            for col in row:
+                self.columns.setdefault(col, None)
+            group = (row.get("pos_name"), row.get("current_name"))
+            self.buffers.setdefault(group, []).append(row)
+            self.buffered_rows += 1
+
+        while self.buffered_rows > self.max_buffered_rows:
+            largest = max(self.buffers, key=lambda g: len(self.buffers[g]))
+            self._spill(largest)
+
+    def _spill(self, group):
+        """Schreibt den sortierten Puffer einer Gruppe in eine Zwischendatei."""
+        rows = sorted(self.buffers.pop(group), key=_sort_key)
+        self.buffered_rows -= len(rows)
+        os.makedirs(self.spill_dir, exist_ok=True)
+        files = self.spill_files.setdefault(group, [])
+        self.spill_count += 1
+        path = os.path.join(self.spill_dir, f"spill_{self.spill_count}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=json_default) + "\n")
+        files.append(path)
+
+    @staticmethod
+    def _read_spill(path):
+        """Liest die Zeilen einer Zwischendatei nacheinander."""
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line, object_hook=json_object_hook)
+
+    def _write_group(self, group, csv_path, columns, table=None):
+        """Führt Puffer und Zwischendateien einer Gruppe sortiert zusammen."""
+        sources = [self._read_spill(path) for path in self.spill_files.get(group, [])]
+        sources.append(iter(sorted(self.buffers.get(group, []), key=_sort_key)))
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(columns)
+            for row in heapq.merge(*sources, key=_sort_key):
+                writer.writerow([_format_value(row.get(col)) for col in columns])
+                if table is not None:
+                    table.add_row(row)
+        # Die Zeilen der Gruppe werden nicht mehr gebraucht
+        self.buffers.pop(group, None)
+        if table is not None:
+            table.flush()
+
+    def close(self):
+        """Schreibt alle CSV-Dateien und entfernt die Zwischendateien."""
+        groups = list(self.buffers)
+        groups += [g for g in self.spill_files if g not in self.buffers]
+        if not groups:
+            logging.warning(
+                "Die Ergebnisliste ist leer. Es wird keine CSV-Datei geschrieben."
+            )
+            return
+
+        table = None
+        if self.write_table:
+            table = ResultTableBuilder(
+                (col for col in self.columns if col != "run_identifier"),
+                spill_dir=os.path.join(self.spill_dir, "table"),
+            )
+
+        for pos, current in groups:
+            if pos is None or current is None:
+                logging.error(
+                    "Erforderliche Spalten 'pos_name' oder 'current_name' fehlen in den Ergebnissen."
+                )
+                # Fallback: Zeilen ohne Gruppe gemeinsam in eine Datei schreiben
+                csv_path = os.path.join(self.base_path, "summary_full.csv")
+                self._write_group((pos, current), csv_path, list(self.columns), table)
+                logging.info(
+                    f"Ergebnisse ohne Gruppe wurden in '{csv_path}' gespeichert."
+                )
+                continue
+
+            csv_filename = f"{pos}_{current}_summary.csv"
+            csv_path = os.path.join(self.base_path, csv_filename)
+            columns = [col for col in self.columns if col not in GROUP_COLUMNS]
+            self._write_group((pos, current), csv_path, columns, table)
+            logging.info(
+                f"Ergebnisse für {pos} / {current} in '{csv_path}' gespeichert."
+            )
+
+        if table is not None:
+            table_path = table.save(self.base_path)
+            logging.info("Typisierte Ergebnisdatei in '%s' gespeichert.", table_path)
+
+        self.buffers = {}
+        self.spill_files = {}
+        self.buffered_rows = 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
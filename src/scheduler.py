@@ -0,0 +1,276 @@
+# src/scheduler.py
+"""
+Kostenmodell und Planung der Simulationsaufgaben für den Prozess-Pool.
+
+Die Kosten einer Aufgabe werden aus der Anzahl der Lösungen, der Größe der
+Geometrie (Anzahl der gezeichneten Körper) und der Nichtlinearität der
+verwendeten Materialien geschätzt. Sind für eine Geometrie und Stromstärke
+bereits Laufzeiten aus früheren Läufen bekannt, werden diese verwendet.
+
+Die Aufgaben werden je Positionsschritt zu Paketen (`chunkSize`) gebündelt,
+damit ein Worker die Aufgaben desselben Schritts nacheinander mit seiner
+FEMM-Sitzung abarbeitet. Ohne Angabe umfasst ein Paket im Winkel-Sweep so
+viele Aufgaben, wie je Positionsschritt und Strom Winkel gelöst werden,
+in den übrigen Modi eine Aufgabe. Danach werden die Pakete absteigend nach Kosten
+verteilt (Longest Processing Time first), damit am Ende keine langen
+Aufgaben einzeln nachlaufen.
+"""
+import ctypes
+import json
+import logging
+import os
+
+from src.solve_cache import cache_key, task_fingerprint
+from src.utils import SIMULATIONS_DIR
+
+# None = Winkel je Positionsschritt und Strom (siehe `default_chunk_size`)
+DEFAULT_CHUNK_SIZE = None
+DEFAULT_MEMORY_PER_WORKER_MB = 1024
+DEFAULT_MEMORY_FRACTION = 0.8
+HISTORY_PATH = os.path.join(SIMULATIONS_DIR, "scheduler_history.json")
+
+# Aufwandsfaktoren des Kostenmodells
+BODY_COST = 0.25
+NONLINEAR_FACTOR = 3.0
+
+# Gewicht neuer Messungen im gleitenden Mittel der Laufzeiten
+HISTORY_WEIGHT = 0.5
+
+# Position von pos_name und Anzahl der Lösungen im Aufgaben-Tupel je Modus
+POS_NAME_INDEX = {"sweep": 6, "adaptive": 6, "grouped": 5, "phasor": 4, "basis": 4}
+SOLVES_INDEX = {"grouped": 3, "basis": 5}
+
+
+def task_label(task, run_mode):
+    """Lesbare Bezeichnung einer Aufgabe für Status und Zeitmessung."""
+    if run_mode in ("sweep", "adaptive"):
+        return task[4]
+    pos_name = task[POS_NAME_INDEX[run_mode]]
+    if run_mode == "basis":
+        return f"{pos_name}_basis"
+    return f"{pos_name}_{task[POS_NAME_INDEX[run_mode] + 1]}"
+
+
+def available_memory_mb():
+    """
+    Ermittelt den verfügbaren Arbeitsspeicher in MB, unter Linux aus
+    `/proc/meminfo`, unter Windows über `GlobalMemoryStatusEx`. Gibt None
+    zurück, wenn er nicht bestimmt werden kann.
+    """
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if os.name == "nt":
+
+        class MemoryStatus(ctypes.Structure):
+            """Struktur MEMORYSTATUSEX der Windows-API."""
+
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys / (1024 * 1024)
+    return None
+
+
+def worker_count(
+    requested=None,
+    memory_per_worker_mb=DEFAULT_MEMORY_PER_WORKER_MB,
+    memory_fraction=DEFAULT_MEMORY_FRACTION,
+):
+    """
+    Bestimmt die Anzahl der Worker-Prozesse: die gewünschte Anzahl (Standard:
+    alle Kerne), begrenzt durch den verfügbaren Arbeitsspeicher, da jeder
+    FEMM-Prozess sein eigenes Netz hält.
+    """
+    count = int(requested) if requested else (os.cpu_count() or 1)
+    memory_mb = available_memory_mb()
+    if memory_mb is not None and memory_per_worker_mb:
+        memory_cap = int(
+            memory_mb * float(memory_fraction) // float(memory_per_worker_mb)
+        )
+        if memory_cap < count:
+            logging.info(
+                "Arbeitsspeicher (%.0f MB frei) begrenzt die Worker von %d auf %d.",
+                memory_mb,
+                count,
+                max(1, memory_cap),
+            )
+            count = memory_cap
+    return max(1, count)
+
+
+def geometry_body_count(step_config):
+    """Zählt die Körper, die `build_femm_geometry` zeichnet."""
+    bodies = 0
+    for asm in step_config.get("assemblies", []):
+        bodies += 1
+        if "transformer_details" in asm and asm["transformer_details"]:
+            bodies += 2
+    for comp in step_config.get("standAloneComponents", []):
+        geo = comp["component_details"]["specificProductInformation"]["geometry"]
+        if geo.get("type") == "SheetPackage":
+            bodies += int(geo.get("sheetCount", 1))
+            bodies += 2 if geo.get("withInsulation") else 0
+        else:
+            bodies += 1
+    return bodies
+
+
+def _uses_nonlinear_material(step_config):
+    """Prüft, ob ein verwendetes Material eine B-H-Kurve hat."""
+    fingerprint = task_fingerprint(step_config, None, None, None)
+    return any(
+        mat.get("is_nonlinear") and mat.get("bh_curve")
+        for mat in fingerprint["materials"]
+    )
+
+
+class CostModel:
+    """Schätzt die Laufzeit von Aufgaben und lernt aus gemessenen Zeiten."""
+
+    def __init__(self, history_path=HISTORY_PATH):
+        self.history_path = history_path
+        self.history = {"seconds_per_unit": None, "seconds_per_solve": {}}
+        try:
+            with open(history_path, "r", encoding="utf-8") as f:
+                self.history.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        self._units = {}
+
+    @staticmethod
+    def task_info(task, run_mode):
+        """Gibt (step_config, pos_name, Anzahl Lösungen) einer Aufgabe zurück."""
+        solves = 1
+        if run_mode in SOLVES_INDEX:
+            solves = len(task[SOLVES_INDEX[run_mode]])
+        return task[1], task[POS_NAME_INDEX[run_mode]], solves
+
+    @staticmethod
+    def signature(step_config):
+        """
+        Schlüssel für gemessene Laufzeiten: Geometrie, Materialien und
+        Stromstärken, aber nicht der Phasenwinkel.
+        """
+        currents = {
+            p["name"]: abs(float(p["peakCurrentA"]))
+            for p in step_config.get("electricalSystem", [])
+        }
+        return cache_key(task_fingerprint(step_config, None, currents, None))
+
+    def _step_info(self, step_config):
+        """
+        Modellkosten einer einzelnen Lösung (relative Einheiten) und Signatur
+        einer Schritt-Konfiguration; die Aufgaben einer Gruppe teilen sich
+        dasselbe Objekt, daher wird nach `id` zwischengespeichert.
+        """
+        key = id(step_config)
+        if key not in self._units:
+            units = 1.0 + BODY_COST * geometry_body_count(step_config)
+            if _uses_nonlinear_material(step_config):
+                units *= NONLINEAR_FACTOR
+            self._units[key] = (step_config, units, self.signature(step_config))
+        return self._units[key][1:]
+
+    def estimate(self, task, run_mode):
+        """Geschätzte Laufzeit einer Aufgabe (Sekunden oder relative Einheiten)."""
+        step_config, _, solves = self.task_info(task, run_mode)
+        units, signature = self._step_info(step_config)
+        measured = self.history["seconds_per_solve"].get(signature)
+        if measured is not None:
+            return solves * measured
+        if self.history["seconds_per_unit"]:
+            return solves * units * self.history["seconds_per_unit"]
+        return solves * units
+
+    def record(self, task, run_mode, seconds):
+        """Übernimmt die gemessene Laufzeit einer Aufgabe in die Historie."""
+        step_config, _, solves = self.task_info(task, run_mode)
+        units, signature = self._step_info(step_config)
+        per_solve = seconds / max(1, solves)
+
+        table = self.history["seconds_per_solve"]
+        old = table.get(signature)
+        table[signature] = (
+            per_solve
+            if old is None
+            else (1 - HISTORY_WEIGHT) * old + HISTORY_WEIGHT * per_solve
+        )
+        old = self.history["seconds_per_unit"]
+        self.history["seconds_per_unit"] = (
+            per_solve / units
+            if old is None
+            else (1 - HISTORY_WEIGHT) * old + HISTORY_WEIGHT * per_solve / units
+        )
+
+    def save(self):
+        """Schreibt die Historie für spätere Läufe."""
+        directory = os.path.dirname(self.history_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.history_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.history, f)
+        os.replace(tmp_path, self.history_path)
+
+
+def default_chunk_size(tasks, run_mode):
+    """
+    Paketgröße ohne `chunkSize`: im Winkel-Sweep die größte Anzahl von
+    Winkeln je Positionsschritt und Strom, damit die Winkel eines Schritts
+    in einer FEMM-Sitzung gelöst werden; sonst 1, weil dort eine Aufgabe
+    schon alle Winkel eines Schritts umfasst.
+    """
+    if run_mode not in ("sweep", "adaptive") or not tasks:
+        return 1
+    index = POS_NAME_INDEX[run_mode]
+    counts = {}
+    for task in tasks:
+        key = (task[index], task[index + 1])
+        counts[key] = counts.get(key, 0) + 1
+    return max(counts.values())
+
+
+def schedule_batches(tasks, run_mode, cost_model, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bündelt die Aufgaben je Positionsschritt zu Paketen von höchstens
+    `chunk_size` Aufgaben (None: `default_chunk_size`) und sortiert die
+    Pakete absteigend nach den geschätzten Kosten.
+
+    Returns:
+        list[list]: Die Pakete in Verteilungsreihenfolge.
+    """
+    if chunk_size is None:
+        chunk_size = default_chunk_size(tasks, run_mode)
+    chunk_size = max(1, int(chunk_size))
+    by_position = {}
+    for task in tasks:
+        cost = cost_model.estimate(task, run_mode)
+        pos_name = cost_model.task_info(task, run_mode)[1]
+        by_position.setdefault(pos_name, []).append((cost, task))
+
+    batches = []
+    for entries in by_position.values():
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start : start + chunk_size]
+            batches.append((sum(cost for cost, _ in chunk), [t for _, t in chunk]))
+    batches.sort(key=lambda batch: batch[0], reverse=True)
+    return [batch for _, batch in batches]
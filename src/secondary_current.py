@@ -0,0 +1,332 @@
+# src/secondary_current.py
+"""
+Sekundärströme der Wandler aus dem Feld entlang des mittleren Kernpfads
+(siehe doc/berechnung_sec_strom.md), ohne neue FEMM-Lösungen.
+
+Für jeden Wandler wird der mittlere Pfad als Rechteck zwischen Innen- und
+Außenkontur des Kerns gebildet (Breite (coreInnerWidth + coreOuterWidth) / 2,
+Höhe entsprechend) und die Tangentialkomponente von B entlang des Pfads aus
+der gespeicherten Lösung integriert. Daraus folgen je Leiter:
+
+    B_messung = ∮ B·dl / l_m
+    Φ = B_messung · A,  A = (coreOuterWidth − coreInnerWidth) / 2 · Tiefe
+    R_m = l_m / (μ0 · μr · A)
+    Θ = Φ · R_m
+    I_sek = Θ / w2,  w2 = I_prim,Nenn / I_sek,Nenn aus `electrical.ratio`
+
+μr ist die Permeabilität des Kernmaterials, bei einer BH-Kurve die
+Sekantenpermeabilität bei |B_messung|. Der Pfad läuft gegen den
+Uhrzeigersinn, ein Strom in +z ergibt also ein positives Θ.
+
+Die Werte werden als zusätzliche Spalten in `results.npz` und die
+`*_summary.csv`-Dateien eines abgeschlossenen Laufs geschrieben; alle Wandler
+einer Lösung werden dabei in einer Abfrage ausgewertet. Lösungen im Modus
+"phasor" werden einmal ausgewertet; wie in `src.phasor` ergibt sich je
+Winkel der Momentanwert Re(Q·exp(jθ)). Gespiegelte Winkel der zweiten
+Halbperiode übernehmen die Werte mit umgekehrtem Vorzeichen.
+
+Aufruf:
+    python -m src.secondary_current <Laufordner> [--spacing MM]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+
+import numpy as np
+
+from src.adaptive_sweep import PERIOD_DEG
+from src.fem_solution import FemSolution
+from src.fem_writer import MU0
+from src.field_lines import find_solution
+from src.result_table import (
+    RESULT_TABLE_FILENAME,
+    load_result_table,
+    save_result_table,
+)
+from src.result_writer import update_summary_columns
+from src.utils import is_linear_configuration
+
+# Abstand der Stützstellen entlang des mittleren Pfads in Modelleinheiten
+DEFAULT_PATH_SPACING = 0.5
+
+# Zusätzliche Ergebnisspalten je Leiter mit Wandler
+MEAN_PATH_COLUMNS = (
+    "meanPath_lm_m",
+    "meanPath_μr",
+    "meanPath_B_T",
+    "meanPath_Φ_Wb",
+    "meanPath_Θ_A",
+    "meanPath_Isek_A",
+)
+
+
+def secondary_turns(ratio):
+    """
+    Sekundärwindungszahl aus einem Übersetzungsverhältnis wie "4000/5"
+    (w1 = 1); None, wenn die Angabe fehlt oder nicht lesbar ist.
+    """
+    try:
+        primary, secondary = (float(v) for v in str(ratio).split("/"))
+    except (TypeError, ValueError):
+        return None
+    return primary / secondary if secondary else None
+
+
+def mean_path(center_x, center_y, geometry, spacing=DEFAULT_PATH_SPACING):
+    """
+    Stützstellen des mittleren Kernpfads (Mittelpunktregel) gegen den
+    Uhrzeigersinn.
+
+    Returns:
+        tuple: Punkte (K, 2), Tangenten-Einheitsvektoren (K, 2) und
+        Längenanteile (K,) in Modelleinheiten.
+    """
+    half_w = (float(geometry["coreOuterWidth"]) + float(geometry["coreInnerWidth"])) / 4
+    half_h = (
+        float(geometry["coreOuterHeight"]) + float(geometry["coreInnerHeight"])
+    ) / 4
+    corners = np.array(
+        [[half_w, -half_h], [half_w, half_h], [-half_w, half_h], [-half_w, -half_h]]
+    ) + [center_x, center_y]
+    points, tangents, lengths = [], [], []
+    for start, end in zip(corners, np.roll(corners, -1, axis=0)):
+        side = np.hypot(*(end - start))
+        count = max(1, math.ceil(side / spacing))
+        t = (np.arange(count) + 0.5) / count
+        points.append(start + t[:, None] * (end - start))
+        tangents.append(np.tile((end - start) / side, (count, 1)))
+        lengths.append(np.full(count, side / count))
+    return np.concatenate(points), np.concatenate(tangents), np.concatenate(lengths)
+
+
+def relative_permeability(material, b_abs):
+    """μr eines Materials der Lösung, nichtlinear als Sekante bei `b_abs`."""
+    if material is None:
+        return 1.0
+    curve = np.array(material["bh_points"], dtype=float).reshape(-1, 2)
+    if len(curve) < 2:
+        return float(material["mu_x"])
+    b, h = curve[:, 0], curve[:, 1]
+    if b_abs <= 0:
+        return float(b[1] / (MU0 * h[1])) if h[1] > 0 else 1.0
+    return float(b_abs / (MU0 * np.interp(b_abs, b, h)))
+
+
+def mean_path_values(solution, transformers, spacing=DEFAULT_PATH_SPACING):
+    """
+    Wertet den mittleren Pfad aller Wandler einer Lösung in einer Abfrage aus.
+
+    Args:
+        solution (FemSolution): Die gespeicherte Lösung.
+        transformers (list[dict]): Je Wandler "phase", "x", "y" (Mittelpunkt),
+            "geometry" und "w2".
+
+    Returns:
+        dict: Leiter -> {Spalte aus MEAN_PATH_COLUMNS: Wert}.
+    """
+    if not transformers:
+        return {}
+    paths = [mean_path(t["x"], t["y"], t["geometry"], spacing) for t in transformers]
+    points = np.concatenate([p[0] for p in paths])
+    tangents = np.concatenate([p[1] for p in paths])
+    lengths = np.concatenate([p[2] for p in paths])
+    owner = np.repeat(np.arange(len(paths)), [len(p[2]) for p in paths])
+
+    probe = solution.probe(points)
+    tangential = probe["bx"] * tangents[:, 0] + probe["by"] * tangents[:, 1]
+    weighted = tangential * lengths
+    circulation = np.bincount(owner, weights=weighted.real) + 1j * np.bincount(
+        owner, weights=weighted.imag
+    )
+    path_length = np.bincount(owner, weights=lengths)
+
+    values = {}
+    for k, transformer in enumerate(transformers):
+        geometry = transformer["geometry"]
+        b_mean = complex(circulation[k] / path_length[k])
+        l_m = path_length[k] * solution.unit
+        area = (
+            (float(geometry["coreOuterWidth"]) - float(geometry["coreInnerWidth"]))
+            / 2
+            * solution.unit
+            * solution.depth
+        )
+        mu_r = relative_permeability(
+            solution.model.materials.get(geometry.get("coreMaterial")), abs(b_mean)
+        )
+        flux = b_mean * area
+        reluctance = l_m / (MU0 * mu_r * area)
+        mmf = flux * reluctance
+        w2 = transformer["w2"]
+        values[transformer["phase"]] = {
+            "meanPath_lm_m": float(l_m),
+            "meanPath_μr": mu_r,
+            "meanPath_B_T": b_mean,
+            "meanPath_Φ_Wb": flux,
+            "meanPath_Θ_A": mmf,
+            "meanPath_Isek_A": mmf / w2 if w2 else complex("nan"),
+        }
+    return values
+
+
+def _transformers_at(assemblies, row):
+    """Die Wandler eines Positionsschritts mit den Positionen aus einer Ergebniszeile."""
+    transformers = []
+    for phase, asm in assemblies.items():
+        x, y = row.get(f"pos_{phase}_x"), row.get(f"pos_{phase}_y")
+        if x is None or y is None or np.isnan(x) or np.isnan(y):
+            continue
+        details = asm["transformer_details"]["specificProductInformation"]
+        transformers.append(
+            {
+                "phase": phase,
+                "x": float(x),
+                "y": float(y),
+                "geometry": details["geometry"],
+                "w2": secondary_turns(details.get("electrical", {}).get("ratio")),
+            }
+        )
+    return transformers
+
+
+def _stored_solution(run_path, pos_name, current_name, angle, mirrored):
+    """
+    Sucht die Lösung zu einer Ergebniszeile. Winkel ohne eigene Lösung sind
+    periodische Duplikate oder, bei Halbperioden-Symmetrie, Spiegelungen des
+    um 180° früheren Winkels mit umgekehrtem Vorzeichen.
+
+    Returns:
+        tuple: (Pfad, Winkel für Zeiger-Lösungen, Vorzeichen), ohne Lösung
+        (None, None, 1).
+    """
+    candidates = [(angle, 1), (angle % PERIOD_DEG, 1)]
+    if mirrored:
+        candidates.append(((angle - PERIOD_DEG / 2) % PERIOD_DEG, -1))
+    for candidate, sign in candidates:
+        path, phasor_angle = find_solution(run_path, pos_name, current_name, candidate)
+        if path is not None:
+            return path, phasor_angle, sign
+    return None, None, 1
+
+
+def add_mean_path_columns(run_path, spacing=DEFAULT_PATH_SPACING):
+    """
+    Ergänzt die Ergebnisse eines Laufs um die Spalten aus MEAN_PATH_COLUMNS.
+    Zeilen ohne Wandler bleiben leer (NaN). Zeilen mit Wandler, deren Lösung
+    fehlt oder sich nicht auswerten lässt, erhalten ebenfalls NaN; die Fehler
+    werden je Lösung protokolliert und gezählt, der Lauf schlägt nicht fehl.
+
+    Returns:
+        int: Anzahl der ausgewerteten Lösungen.
+    """
+    with open(
+        os.path.join(run_path, "simulation_run.json"), "r", encoding="utf-8"
+    ) as f:
+        run_data = json.load(f)
+    assemblies = {
+        asm["phaseName"]: asm
+        for asm in run_data.get("assemblies", [])
+        if asm.get("transformer_details")
+    }
+    # Wie im Runner: die zweite Halbperiode wird nur bei linearen Materialien
+    # gespiegelt statt gelöst
+    mirrored = bool(
+        run_data.get("simulation_meta", {}).get("halfPeriodSymmetry", True)
+    ) and is_linear_configuration(run_data)
+    table_path = os.path.join(run_path, RESULT_TABLE_FILENAME)
+    if not assemblies or not os.path.exists(table_path):
+        logging.warning("Keine Wandler oder Ergebnisse in '%s'.", run_path)
+        return 0
+
+    df = load_result_table(table_path)
+    rows = df.to_dict("records")
+    columns = {col: [np.nan] * len(rows) for col in MEAN_PATH_COLUMNS}
+    solutions = {}
+    computed = {}
+    missing = 0
+    for i, row in enumerate(rows):
+        angle = row.get("phaseAngle_deg")
+        if row["conductor"] not in assemblies or angle is None or np.isnan(angle):
+            continue
+        key = (row["pos_name"], row["current_name"], angle)
+        if key not in solutions:
+            solutions[key] = _stored_solution(run_path, *key, mirrored)
+        ans_path, phasor_angle, sign = solutions[key]
+        if ans_path is None:
+            missing += 1
+            continue
+        if ans_path not in computed:
+            try:
+                computed[ans_path] = mean_path_values(
+                    FemSolution.load(ans_path),
+                    _transformers_at(assemblies, row),
+                    spacing,
+                )
+            except (OSError, ValueError, KeyError, IndexError) as e:
+                logging.error(
+                    "Mittlerer Kernpfad für '%s' nicht auswertbar: %s", ans_path, e
+                )
+                computed[ans_path] = None
+        values = (computed[ans_path] or {}).get(row["conductor"])
+        if values is None:
+            missing += 1
+            continue
+        for col, value in values.items():
+            if isinstance(value, complex):
+                value *= sign
+                if phasor_angle is not None:
+                    value = (value * np.exp(1j * np.deg2rad(angle))).real
+            columns[col][i] = value
+
+    if missing:
+        logging.warning(
+            "%d Zeilen mit Wandler ohne Werte des mittleren Kernpfads "
+            "(keine Lösung oder Auswertung fehlgeschlagen).",
+            missing,
+        )
+    evaluated = sum(1 for values in computed.values() if values is not None)
+    if not evaluated:
+        logging.warning("Keine auswertbaren Lösungen in '%s' gefunden.", run_path)
+    for col, values in columns.items():
+        df[col] = values
+    save_result_table(df, run_path)
+    for (pos_name, current_name), index in df.groupby(
+        ["pos_name", "current_name"], observed=True, sort=False
+    ).indices.items():
+        update_summary_columns(
+            run_path,
+            pos_name,
+            current_name,
+            {col: [columns[col][i] for i in index] for col in MEAN_PATH_COLUMNS},
+        )
+    logging.info(
+        "Sekundärströme über den mittleren Kernpfad aus %d Lösungen berechnet.",
+        evaluated,
+    )
+    return evaluated
+
+
+def main(argv=None):
+    """Kommandozeilen-Einstieg für einen abgeschlossenen Lauf."""
+    parser = argparse.ArgumentParser(
+        description="Berechnet die Sekundärströme über den mittleren Kernpfad."
+    )
+    parser.add_argument("run_path", help="Ordner des Simulationslaufs")
+    parser.add_argument(
+        "--spacing",
+        type=float,
+        default=DEFAULT_PATH_SPACING,
+        help="Abstand der Stützstellen entlang des Pfads in Modelleinheiten",
+    )
+    args = parser.parse_args(argv)
+    return 0 if add_mean_path_columns(args.run_path, args.spacing) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    sys.exit(main())
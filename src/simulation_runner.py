@@ -2,18 +2,96 @@
 """
 Haupt-Skript zur Steuerung des FEMM-Simulations-Workflows.
 """
+import argparse
+import functools
 import json
 import os
 import shutil
 import multiprocessing
 import logging
+import queue
 import time
-import sys
 from datetime import datetime
 import numpy as np
-import pandas as pd
 
-from src.simulation_worker import run_single_simulation
+from src.simulation_worker import (
+    DEFAULT_SESSION_MAX_TASKS,
+    init_worker,
+    run_basis_simulation,
+    run_group_simulation,
+    run_phasor_simulation,
+    run_single_simulation,
+    run_task_batch,
+    solver_settings,
+)
+from src.adaptive_sweep import (
+    DEFAULT_COARSE_FACTOR,
+    DEFAULT_MAX_ROUNDS,
+    DEFAULT_TOLERANCE,
+    alias_rows,
+    coarse_angles,
+    complete_rows,
+    half_period_mirrors,
+    mirror_rows,
+    refinement_angles,
+    unique_periodic_angles,
+)
+from src.distributed import (
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_HEARTBEAT_TIMEOUT,
+    DEFAULT_HOST,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_PORT,
+    DistributedExecutor,
+    parse_address,
+)
+from src.femm_backends import backend_spec, check_xfemm_config, solver_identity
+from src.journal import RunJournal, completed_identifiers
+from src.phasor import expand_phasor_rows
+from src.plot_renderer import (
+    DEFAULT_PLOT_WORKERS,
+    BackgroundPlotRenderer,
+    plot_mode,
+    selected_for_plots,
+)
+from src.progress import RunProgress, emit_event
+from src.result_writer import DEFAULT_MAX_BUFFERED_ROWS, StreamingResultWriter
+from src.secondary_current import add_mean_path_columns
+from src.scheduler import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MEMORY_FRACTION,
+    DEFAULT_MEMORY_PER_WORKER_MB,
+    HISTORY_PATH,
+    CostModel,
+    default_chunk_size,
+    schedule_batches,
+    task_label,
+    worker_count,
+)
+from src.solve_cache import SolveCache, cache_key, rename_rows, task_fingerprint
+from src.superposition import (
+    basis_excitations,
+    build_basis,
+    evaluate_sweep,
+    save_basis,
+)
+from src.utils import (
+    calculate_instantaneous_current,
+    calculate_phasor_current,
+    is_linear_configuration,
+    make_run_identifier,
+    phase_sweep_angles,
+)
+
+# Unterstützte Ausführungsmodi und die zugehörige Worker-Funktion
+RUN_MODES = {
+    "sweep": run_single_simulation,
+    "grouped": run_group_simulation,
+    "phasor": run_phasor_simulation,
+    "basis": run_basis_simulation,
+    "adaptive": run_single_simulation,
+}
 
 
 class SimulationRunner:
@@ -21,7 +99,18 @@ class SimulationRunner:
     Orchestriert den gesamten FEMM-Simulations-Workflow.
     """
 
-    def __init__(self, config_path="simulation_run.json", base_path=None):
+    def __init__(
+        self,
+        config_path="simulation_run.json",
+        base_path=None,
+        resume=False,
+        workers=None,
+        chunk_size=None,
+        memory_per_worker_mb=None,
+        executor=None,
+        broker=None,
+        events=False,
+    ):
         self.run_data = self._load_config(config_path)
         if not self.run_data:
             raise ValueError("Konfigurationsdatei konnte nicht geladen werden.")
@@ -37,21 +126,153 @@ class SimulationRunner:
 
         self._setup_logging_file_handler()
 
-        shutil.copy(
-            config_path, os.path.join(self.base_results_path, "simulation_run.json")
+        # Ergebnisse aus dem Cache und die Schlüssel der noch zu lösenden Aufgaben
+        self.cached_results = []
+        self.pending_cache_entries = {}
+
+        # Beim Fortsetzen die bereits erledigten Aufgaben aus dem Journal lesen
+        self.journal = RunJournal(self.base_results_path)
+        self.resume = resume
+        self.journal_results = []
+        if resume:
+            self.journal_results = self.journal.load()
+            logging.info(
+                "Lauf wird fortgesetzt: %d Ergebniszeilen im Journal.",
+                len(self.journal_results),
+            )
+        elif os.path.exists(self.journal.path):
+            os.remove(self.journal.path)
+        self.completed_identifiers = completed_identifiers(self.journal_results)
+
+        # Periodisch doppelte und um eine halbe Periode gespiegelte Winkel,
+        # die nicht erneut gelöst werden
+        self.angle_aliases = {}
+        self.angle_mirrors = {}
+        self.completed_tasks = 0
+        self.total_tasks = 0
+
+        # Laufzeiten und Fortschritt; die Worker melden ihre Aufgaben über
+        # `worker_events`, die Pakete werden über alle Runden durchnummeriert
+        self.progress = RunProgress(self.base_results_path, resume=resume)
+        self.worker_events = None
+        self.batch_count = 0
+        self.task_labels = {}
+        # Fortschritt zusätzlich als Ereignisse auf stdout ausgeben
+        self.events = events
+
+        # Parallelisierung: Argumente haben Vorrang vor der Konfiguration
+        meta = self.run_data.get("simulation_meta", {})
+        self.workers = workers if workers is not None else meta.get("workers")
+        self.chunk_size = (
+            chunk_size
+            if chunk_size is not None
+            else meta.get("chunkSize", DEFAULT_CHUNK_SIZE)
+        )
+        if self.chunk_size is not None:
+            self.chunk_size = int(self.chunk_size)
+        self.memory_per_worker_mb = float(
+            memory_per_worker_mb
+            if memory_per_worker_mb is not None
+            else meta.get("memoryPerWorkerMB", DEFAULT_MEMORY_PER_WORKER_MB)
         )
+        self.memory_fraction = float(
+            meta.get("memoryFraction", DEFAULT_MEMORY_FRACTION)
+        )
+        self.cost_model = CostModel(meta.get("schedulerHistoryPath", HISTORY_PATH))
+
+        # Bilder werden getrennt vom Lösen im Hintergrund gerendert
+        self.plot_mode = plot_mode(self.run_data)
+        self.plot_selection = meta.get("plotSelection", {})
+        # FEMM-Backend der Worker (siehe src.femm_backends); None = FEMM_BACKEND
+        self.femm_backend = meta.get("femmBackend")
+        if (
+            self.plot_mode != "off"
+            and backend_spec(self.femm_backend).get("type") == "xfemm"
+        ):
+            logging.info("Mit dem xfemm-Backend werden keine FEMM-Bilder erzeugt.")
+            self.plot_mode = "off"
+            # Auch in der gespeicherten Konfiguration, damit der Server die
+            # Bilder später nicht mit pyfemm nachrendert
+            self.run_data.setdefault("simulation_meta", {})["plotMode"] = "off"
+        self.plot_renderer = None
+
+        # Ausführung im lokalen Pool oder verteilt über den Broker
+        self.executor = executor or meta.get("executor", "local")
+        if self.executor not in ("local", "distributed"):
+            raise ValueError(f"Unbekannter Executor '{self.executor}'.")
+        self.broker_options = dict(meta.get("broker", {}))
+        if broker:
+            host, port = parse_address(broker)
+            self.broker_options.update({"host": host, "port": port})
+        # Mit xfemm vorab prüfen, ob der Lauf unterstützt wird; verteilt wählen
+        # die Agenten ihr Backend selbst
+        if (
+            self.executor == "local"
+            and backend_spec(self.femm_backend).get("type") == "xfemm"
+        ):
+            check_xfemm_config(self.femm_backend, self.run_data)
+
+        # Nur Lösungen echter Löser zwischenspeichern. Verteilt wählen die
+        # Agenten ihr Backend selbst, es ist hier also nicht bekannt.
+        self.solver = solver_identity(self.femm_backend)
+        self.solve_cache = SolveCache.from_config(self.run_data)
+        if self.solve_cache is not None and (
+            self.solver is None or self.executor == "distributed"
+        ):
+            logging.info(
+                "Solve-Cache deaktiviert: das Backend liefert keine zwischenspeicherbaren Lösungen."
+            )
+            self.solve_cache = None
+
+        config_copy = os.path.join(self.base_results_path, "simulation_run.json")
+        if not os.path.exists(config_copy) or not os.path.samefile(
+            config_path, config_copy
+        ):
+            shutil.copy(config_path, config_copy)
+        if self.plot_mode != plot_mode(self._load_config(config_copy)):
+            with open(config_copy, "w", encoding="utf-8") as f:
+                json.dump(self.run_data, f, indent=4)
         logging.info("Ergebnisse werden in '%s' gespeichert.", self.base_results_path)
 
     def _update_status(self, status, completed=0, total=0, duration=None):
-        """Schreibt den aktuellen Status in die lauf-spezifische JSON-Datei."""
+        """
+        Schreibt den aktuellen Status in die lauf-spezifische JSON-Datei und
+        gibt ihn als Ereignis aus. Die Datei wird atomar ersetzt, damit Leser
+        nie einen halb geschriebenen Stand sehen.
+        """
         status_data = {
             "status": status,
             "completed": completed,
             "total": total,
             "duration": duration,
         }
-        with open(self.status_file, "w", encoding="utf-8") as f:
+        if self.solve_cache is not None:
+            status_data["cache"] = self.solve_cache.stats()
+        self._drain_worker_events()
+        status_data.update(self.progress.summary(completed, total, self.task_labels))
+        if self.events:
+            emit_event({"type": "progress", **status_data})
+
+        tmp_path = f"{self.status_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(status_data, f)
+        try:
+            os.replace(tmp_path, self.status_file)
+        except PermissionError as e:
+            # Unter Windows schlägt das Ersetzen fehl, solange ein Leser die
+            # Datei geöffnet hat; der nächste Status holt es nach
+            logging.debug("Statusdatei nicht ersetzt: %s", e)
+
+    def _drain_worker_events(self):
+        """Übernimmt die bisher gemeldeten Ereignisse der Worker."""
+        if self.worker_events is None:
+            return
+        while True:
+            try:
+                event = self.worker_events.get_nowait()
+            except queue.Empty:
+                break
+            self.progress.handle_event(event)
 
     def _load_config(self, path):
         """Lädt die JSON-Konfigurationsdatei."""
@@ -84,154 +305,700 @@ class SimulationRunner:
         logging.info("--- Starte parallelen Python-Simulations-Workflow ---")
         start_time = time.time()
 
-        tasks = self._prepare_all_tasks()
+        run_mode = self._run_mode()
+        tasks = self._prepare_all_tasks(run_mode)
         total_tasks = len(tasks)
+        worker_function = RUN_MODES[run_mode]
+        self.total_tasks = total_tasks
+
+        if self.cached_results:
+            self.journal.append(self.cached_results)
 
-        if total_tasks == 0:
+        if total_tasks == 0 and not (self.cached_results or self.journal_results):
             logging.warning(
                 "Keine Simulationsaufgaben gefunden. Workflow wird beendet."
             )
             self._update_status("complete", 0, 0, 0)
             return
+        if self.solve_cache is not None:
+            logging.info(
+                "Solve-Cache: %d Treffer, %d Fehlzugriffe.",
+                self.solve_cache.hits,
+                self.solve_cache.misses,
+            )
 
-        logging.info("Insgesamt %d Simulationsaufgaben zu erledigen.", total_tasks)
+        logging.info(
+            "Insgesamt %d Simulationsaufgaben im Modus '%s' zu erledigen.",
+            total_tasks,
+            run_mode,
+        )
         self._update_status("running", 0, total_tasks)
 
-        num_processes = os.cpu_count()
-        logging.info("Nutze %d Prozessorkerne für die Parallelisierung.", num_processes)
+        num_processes = worker_count(
+            self.workers, self.memory_per_worker_mb, self.memory_fraction
+        )
+        logging.info(
+            "Nutze %d Worker-Prozesse, bis zu %d Aufgaben je Paket.",
+            num_processes,
+            (
+                self.chunk_size
+                if self.chunk_size is not None
+                else default_chunk_size(tasks, run_mode)
+            ),
+        )
+
+        session_max_tasks = int(
+            self.run_data.get("simulation_meta", {}).get(
+                "femmSessionMaxTasks", DEFAULT_SESSION_MAX_TASKS
+            )
+        )
+        logging.info(
+            "Jeder Worker nutzt eine FEMM-Sitzung für bis zu %d Aufgaben.",
+            session_max_tasks,
+        )
+
+        writer = StreamingResultWriter(
+            self.base_results_path,
+            self.run_data.get("simulation_meta", {}).get(
+                "resultBufferRows", DEFAULT_MAX_BUFFERED_ROWS
+            ),
+        )
+        preloaded_results = self.journal_results + self.cached_results
+        # Die Zeilen gehen jetzt an den Writer, die Listen werden nicht mehr gebraucht
+        self.journal_results = []
+        self.cached_results = []
+
+        if self.plot_mode in ("all", "selected"):
+            self.plot_renderer = BackgroundPlotRenderer(
+                self.run_data.get("simulation_meta", {}).get(
+                    "plotWorkers", DEFAULT_PLOT_WORKERS
+                ),
+                self.femm_backend,
+            )
 
-        all_results = []
-        completed_tasks = 0
+        with self._create_executor(num_processes, session_max_tasks) as pool:
+            if run_mode == "adaptive":
+                self._run_adaptive(pool, tasks, preloaded_results, writer)
+            else:
+                self._write_results(writer, preloaded_results, run_mode)
+                self._run_tasks(
+                    pool,
+                    worker_function,
+                    tasks,
+                    lambda rows: self._write_results(writer, rows, run_mode),
+                    run_mode,
+                )
 
-        with multiprocessing.Pool(processes=num_processes) as pool:
-            for result_chunk in pool.imap_unordered(run_single_simulation, tasks):
-                completed_tasks += 1
-                if (
-                    result_chunk
-                ):  # Nur Ergebnisse hinzufügen, wenn die Analyse erfolgreich war
-                    all_results.extend(result_chunk)
+            # Worker regulär beenden, damit sie ihre FEMM-Sitzungen schließen
+            pool.close()
+            pool.join()
+        self.worker_events = None
 
-                # Status seltener aktualisieren, um die Dateizugriffe zu reduzieren
-                if (completed_tasks % 5 == 0) or (completed_tasks == total_tasks):
-                    self._update_status("running", completed_tasks, total_tasks)
+        if self.solve_cache is not None:
+            self.solve_cache.evict()
+        self.cost_model.save()
 
-        if all_results:
-            self._save_results_to_csv(all_results)
+        if writer.columns:
+            writer.close()
+            # Optional: Sekundärströme über den mittleren Kernpfad ergänzen
+            if self.run_data.get("simulation_meta", {}).get("meanPathCurrents"):
+                add_mean_path_columns(self.base_results_path)
         else:
             logging.warning(
                 "Keine Ergebnisse nach Abschluss aller Simulationen vorhanden. Es wird keine CSV-Datei erstellt."
             )
 
+        if self.plot_renderer is not None:
+            logging.info("Warte auf die restlichen FEMM-Bilder...")
+            self.plot_renderer.close()
+            self.plot_renderer = None
+
         end_time = time.time()
         duration = round(end_time - start_time, 2)
         logging.info(
             "--- Simulations-Workflow nach %.2f Sekunden erfolgreich abgeschlossen. ---",
             duration,
         )
-        self._update_status("complete", total_tasks, total_tasks, duration)
+        self._update_status(
+            "complete", self.completed_tasks, self.total_tasks, duration
+        )
 
-    def _prepare_all_tasks(self):
-        """Erstellt eine flache Liste aller zu erledigenden Simulationsaufgaben."""
-        all_tasks = []
-        position_steps = self.run_data["simulation_meta"]["bewegungspfade_alle_leiter"][
-            "schritte_details"
-        ]
-        measured_currents = {
+    def _create_executor(self, num_processes, session_max_tasks):
+        """
+        Erzeugt den lokalen Prozess-Pool oder den Broker für verteilte Agenten.
+        Beide werden gleich bedient (`imap_unordered`, `close`, `join`).
+        """
+        if self.executor == "distributed":
+            options = self.broker_options
+            return DistributedExecutor(
+                options.get("host", DEFAULT_HOST),
+                options.get("port", DEFAULT_PORT),
+                heartbeat_interval=options.get(
+                    "heartbeatInterval", DEFAULT_HEARTBEAT_INTERVAL
+                ),
+                heartbeat_timeout=options.get(
+                    "heartbeatTimeout", DEFAULT_HEARTBEAT_TIMEOUT
+                ),
+                max_retries=options.get("maxRetries", DEFAULT_MAX_RETRIES),
+                token=options.get("token"),
+                timeout=options.get("timeout"),
+                idle_timeout=options.get("idleTimeout", DEFAULT_IDLE_TIMEOUT),
+            )
+        self.worker_events = multiprocessing.Queue()
+        return multiprocessing.Pool(
+            processes=num_processes,
+            initializer=init_worker,
+            initargs=(session_max_tasks, self.femm_backend, self.worker_events),
+        )
+
+    def _run_tasks(self, pool, worker_function, tasks, handle_rows, run_mode):
+        """
+        Verteilt die Aufgaben in Paketen, absteigend nach geschätzten Kosten,
+        auf den Pool. Die Ergebnisse jeder erledigten Aufgabe werden sofort ins
+        Journal und den Cache geschrieben und dann an `handle_rows` übergeben;
+        die gemessenen Laufzeiten gehen in das Kostenmodell und den Fortschritt
+        ein.
+        """
+        batches = schedule_batches(tasks, run_mode, self.cost_model, self.chunk_size)
+        first = self.batch_count
+        self.batch_count += len(batches)
+        batch_args = []
+        for index, batch in enumerate(batches, first):
+            batch_args.append((index, worker_function, batch))
+            for offset, task in enumerate(batch):
+                self.task_labels[(index, offset)] = task_label(task, run_mode)
+
+        for index, batch_results in pool.imap_unordered(run_task_batch, batch_args):
+            for offset, (task, (result_chunk, seconds, stages, failed)) in enumerate(
+                zip(batches[index - first], batch_results)
+            ):
+                self.completed_tasks += 1
+                label = self.task_labels.pop((index, offset))
+                self.progress.record_task((index, offset), label, seconds, stages)
+                if self.events:
+                    emit_event(
+                        {
+                            "type": "task",
+                            "task": label,
+                            "seconds": round(seconds, 4),
+                            "stages": {k: round(v, 4) for k, v in stages.items()},
+                            "failed": failed or not result_chunk,
+                            "completed": self.completed_tasks,
+                            "total": self.total_tasks,
+                        }
+                    )
+                if (
+                    result_chunk
+                ):  # Nur Ergebnisse hinzufügen, wenn die Analyse erfolgreich war
+                    self.cost_model.record(task, run_mode, seconds)
+                    self.journal.append(result_chunk)
+                    self._store_in_cache(result_chunk)
+                    handle_rows(result_chunk)
+
+                # Status seltener aktualisieren, um die Dateizugriffe zu reduzieren
+                if (self.completed_tasks % 5 == 0) or (
+                    self.completed_tasks == self.total_tasks
+                ):
+                    self._update_status(
+                        "running", self.completed_tasks, self.total_tasks
+                    )
+
+    def _queue_plots(self, rows):
+        """
+        Gibt die Bilder der geschriebenen Ergebniszeilen an den Render-Pool,
+        auch für Winkel, die aus Symmetrie, einer Zeigerlösung oder der Basis
+        folgen (siehe `plot_sources`).
+        """
+        if self.plot_renderer is None:
+            return
+        seen = set()
+        for row in rows:
+            run_identifier = row.get("run_identifier")
+            if run_identifier in seen or row.get("phaseAngle_deg") is None:
+                continue
+            seen.add(run_identifier)
+            if self.plot_mode == "selected" and not selected_for_plots(
+                row, self.plot_selection
+            ):
+                continue
+            self.plot_renderer.submit(
+                self.base_results_path,
+                self.run_data,
+                row["pos_name"],
+                row["current_name"],
+                row["phaseAngle_deg"],
+                callback=functools.partial(self.progress.record_plots, run_identifier),
+            )
+
+    def _run_adaptive(self, pool, tasks, preloaded_results, writer):
+        """
+        Löst die Winkel jeder Gruppe in Runden, beginnend mit dem groben Raster,
+        und verfeinert nur dort, wo das periodische Modell ungenau ist. Am Ende
+        werden alle Winkel des `phaseSweep` geschrieben.
+        """
+        meta = self.run_data.get("simulation_meta", {})
+        tolerance = float(meta.get("adaptiveTolerance", DEFAULT_TOLERANCE))
+        max_rounds = int(meta.get("adaptiveMaxRounds", DEFAULT_MAX_ROUNDS))
+        targets, _ = unique_periodic_angles(self._phase_angles())
+
+        rows_by_group = {}
+
+        def collect(rows):
+            for row in rows:
+                group = (row["pos_name"], row["current_name"])
+                rows_by_group.setdefault(group, []).append(row)
+
+        collect(preloaded_results)
+        for round_number in range(1, max_rounds + 1):
+            self._run_tasks(pool, run_single_simulation, tasks, collect, "adaptive")
+
+            angles_by_group = {}
+            for group, rows in rows_by_group.items():
+                extra_angles = refinement_angles(rows, targets, tolerance)
+                if extra_angles:
+                    angles_by_group[group] = extra_angles
+            if not angles_by_group or round_number == max_rounds:
+                break
+
+            tasks = self._prepare_all_tasks("adaptive", angles_by_group)
+            if self.cached_results:
+                self.journal.append(self.cached_results)
+                collect(self.cached_results)
+            self.total_tasks += len(tasks)
+            logging.info(
+                "Adaptive Runde %d: %d zusätzliche Winkel in %d Gruppen.",
+                round_number + 1,
+                sum(len(a) for a in angles_by_group.values()),
+                len(angles_by_group),
+            )
+
+        for (pos_name, current_name), rows in rows_by_group.items():
+            solved_angles = len({row["phaseAngle_deg"] for row in rows})
+            logging.info(
+                "%s / %s: %d von %d Winkeln gelöst, Rest interpoliert.",
+                pos_name,
+                current_name,
+                solved_angles,
+                len(targets),
+            )
+            rows = alias_rows(complete_rows(rows, targets), self.angle_aliases)
+            writer.add_rows(rows)
+            self._queue_plots(rows)
+
+    def _run_mode(self):
+        """Liest den Ausführungsmodus aus der Konfiguration."""
+        run_mode = self.run_data.get("simulation_meta", {}).get("runMode", "sweep")
+        if run_mode not in RUN_MODES:
+            logging.warning(
+                "Unbekannter Ausführungsmodus '%s', nutze 'sweep'.", run_mode
+            )
+            run_mode = "sweep"
+        if run_mode == "basis" and not is_linear_configuration(self.run_data):
+            logging.warning(
+                "Modus 'basis' erfordert lineare Materialien, nutze 'sweep'."
+            )
+            run_mode = "sweep"
+        if run_mode == "phasor" and not is_linear_configuration(self.run_data):
+            logging.warning(
+                "Modus 'phasor' mit nichtlinearen Materialien: Die Winkelwerte "
+                "werden unter der Annahme eines linearen Verhaltens berechnet."
+            )
+        return run_mode
+
+    def _use_half_period_symmetry(self):
+        """
+        Prüft, ob die zweite Halbperiode aus der ersten berechnet werden darf:
+        nur bei linearen Materialien und wenn `halfPeriodSymmetry` nicht
+        abgeschaltet ist.
+        """
+        enabled = self.run_data.get("simulation_meta", {}).get(
+            "halfPeriodSymmetry", True
+        )
+        return bool(enabled) and is_linear_configuration(self.run_data)
+
+    def _phase_angles(self):
+        """Berechnet die Phasenwinkel aus dem `phaseSweep` der Konfiguration."""
+        return phase_sweep_angles(self.run_data)
+
+    def _measured_currents(self):
+        """Liest die gemessenen Primärströme (Effektivwerte) aus der Konfiguration."""
+        return {
             "I_1_mes": float(self.run_data["scenarioParams"].get("I_1_mes", 0)),
             "I_2_mes": float(self.run_data["scenarioParams"].get("I_2_mes", 0)),
             "I_3_mes": float(self.run_data["scenarioParams"].get("I_3_mes", 0)),
         }
-        phase_sweep = self.run_data["scenarioParams"]["phaseSweep"]
-        phase_angles = np.arange(
-            float(phase_sweep["start"]),
-            float(phase_sweep["end"]) + float(phase_sweep["step"]),
-            float(phase_sweep["step"]),
-        )
+
+    def _electrical_system_for(self, current_value):
+        """Kopiert das elektrische System mit dem Scheitelwert eines Messstroms."""
+        electrical_system = [p.copy() for p in self.run_data["electricalSystem"]]
+        for phase in electrical_system:
+            phase["peakCurrentA"] = current_value * np.sqrt(2)
+        return electrical_system
+
+    def _iter_task_groups(self):
+        """
+        Liefert für jede Kombination aus Positionsschritt und Messstrom die
+        zugehörige Schritt-Konfiguration und den Ordner für die FEMM-Dateien.
+        """
+        position_steps = self.run_data["simulation_meta"]["bewegungspfade_alle_leiter"][
+            "schritte_details"
+        ]
 
         for i, step in enumerate(position_steps):
             pos_name = f"pos_{i+1}"
-            for current_name, current_value in measured_currents.items():
+            for current_name, current_value in self._measured_currents().items():
                 if current_value == 0:
                     continue
 
                 femm_files_path = os.path.join(
                     self.base_results_path, "femm_files", f"{pos_name}_{current_name}"
                 )
+
+                step_config = self.run_data.copy()
+                step_config["electricalSystem"] = self._electrical_system_for(
+                    current_value
+                )
+
+                step_config["assemblies"] = [
+                    asm.copy() for asm in self.run_data["assemblies"]
+                ]
+                for asm_cfg in step_config["assemblies"]:
+                    phase_name = asm_cfg["phaseName"]
+                    if phase_name in step:
+                        asm_cfg["position"] = step[phase_name]
+
+                yield pos_name, current_name, step, step_config, femm_files_path
+
+    def _prepare_all_tasks(self, run_mode="sweep", angles_by_group=None):
+        """
+        Erstellt eine flache Liste aller zu erledigenden Simulationsaufgaben.
+
+        Im Modus "sweep" ist jede Aufgabe ein einzelner Phasenwinkel, im Modus
+        "grouped" eine Gruppe aus Positionsschritt und Strom mit allen Winkeln.
+        Im Modus "phasor" wird jede Gruppe einmal komplex gelöst, im Modus
+        "basis" jeder Positionsschritt einmal für alle Einheitserregungen.
+
+        Lösungen, die bereits im Solve-Cache liegen, werden nicht eingeplant;
+        ihre Ergebniszeilen landen in `self.cached_results`. Beim Fortsetzen
+        werden außerdem alle `run_identifier` aus dem Journal übersprungen.
+
+        Winkel, die sich nur um ganze Perioden unterscheiden, werden einmal
+        gelöst; bei linearen Materialien entfällt zusätzlich die zweite
+        Halbperiode. Im Modus "adaptive" wird zunächst nur das grobe Raster
+        eingeplant; `angles_by_group` legt die Winkel je (pos_name,
+        current_name) für weitere Runden fest.
+        """
+        all_tasks = []
+        phase_angles, self.angle_aliases = unique_periodic_angles(self._phase_angles())
+        self.angle_mirrors = {}
+        if run_mode in ("sweep", "grouped") and self._use_half_period_symmetry():
+            phase_angles, self.angle_mirrors = half_period_mirrors(phase_angles)
+        if run_mode == "adaptive" and angles_by_group is None:
+            phase_angles = coarse_angles(
+                phase_angles,
+                self.run_data.get("simulation_meta", {}).get(
+                    "adaptiveCoarseFactor", DEFAULT_COARSE_FACTOR
+                ),
+            )
+        phase_names = [p["name"] for p in self.run_data["electricalSystem"]]
+        basis_positions = set()
+        self.cached_results = []
+        self.pending_cache_entries = {}
+
+        for (
+            pos_name,
+            current_name,
+            step,
+            step_config,
+            femm_files_path,
+        ) in self._iter_task_groups():
+            if run_mode == "basis":
+                # Die Basis ist unabhängig vom Strom, einmal pro Position genügt
+                if pos_name in basis_positions:
+                    continue
+                basis_positions.add(pos_name)
+                femm_files_path = os.path.join(
+                    self.base_results_path, "femm_files", f"{pos_name}_basis"
+                )
                 os.makedirs(femm_files_path, exist_ok=True)
+                excitations = basis_excitations(phase_names)
+                if self._is_completed(
+                    f"{pos_name}_basis_{label}" for label, _ in excitations
+                ) or self._lookup_cache(
+                    step_config,
+                    excitations,
+                    None,
+                    pos_name,
+                    "basis",
+                    [
+                        os.path.join(femm_files_path, f"{pos_name}_basis_{label}")
+                        for label, _ in excitations
+                    ],
+                ):
+                    continue
+                all_tasks.append(
+                    (
+                        femm_files_path,
+                        step_config,
+                        self.run_data,
+                        step,
+                        pos_name,
+                        excitations,
+                    )
+                )
+                continue
+
+            os.makedirs(femm_files_path, exist_ok=True)
+            electrical_system = step_config["electricalSystem"]
+            if run_mode == "phasor":
+                phasor_currents = {
+                    p["name"]: calculate_phasor_current(
+                        p["peakCurrentA"], p["phaseShiftDeg"]
+                    )
+                    for p in electrical_system
+                }
+                if self._is_completed(
+                    [f"{pos_name}_{current_name}_phasor"]
+                ) or self._lookup_cache(
+                    step_config,
+                    phasor_currents,
+                    None,
+                    pos_name,
+                    current_name,
+                    [
+                        os.path.join(
+                            femm_files_path, f"{pos_name}_{current_name}_phasor"
+                        )
+                    ],
+                ):
+                    continue
+                all_tasks.append(
+                    (
+                        femm_files_path,
+                        step_config,
+                        self.run_data,
+                        step,
+                        pos_name,
+                        current_name,
+                    )
+                )
+                continue
+
+            group_angles = phase_angles
+            if angles_by_group is not None:
+                group_angles = angles_by_group.get((pos_name, current_name), [])
+
+            # Nur die Winkel lösen, die weder erledigt sind noch im Cache liegen
+            open_angles = [
+                angle
+                for angle in group_angles
+                if not self._is_completed(
+                    [make_run_identifier(pos_name, current_name, angle)]
+                )
+                and not self._lookup_cache(
+                    step_config,
+                    {
+                        p["name"]: calculate_instantaneous_current(
+                            p["peakCurrentA"], p["phaseShiftDeg"], angle
+                        )
+                        for p in electrical_system
+                    },
+                    angle,
+                    pos_name,
+                    current_name,
+                    [
+                        os.path.join(
+                            femm_files_path,
+                            make_run_identifier(pos_name, current_name, angle),
+                        )
+                    ],
+                )
+            ]
+            if not open_angles:
+                continue
 
-                for angle in phase_angles:
-                    run_identifier = f"{pos_name}_{current_name}_angle{int(angle)}"
-                    step_config = self.run_data.copy()
-                    step_config["electricalSystem"] = [
-                        p.copy() for p in self.run_data["electricalSystem"]
-                    ]
-                    for phase in step_config["electricalSystem"]:
-                        phase["peakCurrentA"] = current_value * np.sqrt(2)
-
-                    step_config["assemblies"] = [
-                        asm.copy() for asm in self.run_data["assemblies"]
-                    ]
-                    for asm_cfg in step_config["assemblies"]:
-                        phase_name = asm_cfg["phaseName"]
-                        if phase_name in step:
-                            asm_cfg["position"] = step[phase_name]
-
-                    task = (
+            if run_mode == "grouped":
+                all_tasks.append(
+                    (
                         femm_files_path,
                         step_config,
                         self.run_data,
-                        angle,
-                        run_identifier,
+                        open_angles,
                         step,
                         pos_name,
                         current_name,
                     )
-                    all_tasks.append(task)
+                )
+                continue
+
+            for angle in open_angles:
+                run_identifier = make_run_identifier(pos_name, current_name, angle)
+                task = (
+                    femm_files_path,
+                    step_config,
+                    self.run_data,
+                    angle,
+                    run_identifier,
+                    step,
+                    pos_name,
+                    current_name,
+                )
+                all_tasks.append(task)
         return all_tasks
 
-    def _save_results_to_csv(self, results):
-        """Speichert eine Liste von Ergebnis-Dictionaries in gruppierten CSV-Dateien."""
-        if not results:
-            logging.warning(
-                "Die Ergebnisliste ist leer. Es wird keine CSV-Datei geschrieben."
+    def _is_completed(self, run_identifiers):
+        """Prüft, ob alle angegebenen Simulationen bereits im Journal stehen."""
+        return all(rid in self.completed_identifiers for rid in run_identifiers)
+
+    def _lookup_cache(
+        self, step_config, currents, angle_deg, pos_name, current_name, ans_bases
+    ):
+        """
+        Sucht die Lösung einer Aufgabe im Solve-Cache. Bei einem Treffer werden
+        die Ergebniszeilen übernommen, die `.ans`-Dateien in den Laufordner
+        kopiert und True zurückgegeben, sonst wird der Schlüssel zum späteren
+        Speichern vorgemerkt.
+
+        `ans_bases` sind die Pfade der `.ans`-Dateien der Aufgabe ohne Endung.
+        """
+        if self.solve_cache is None:
+            return False
+
+        key = cache_key(
+            task_fingerprint(
+                step_config,
+                solver_settings(self.run_data),
+                currents,
+                angle_deg,
+                self.solver,
             )
-            return
-
-        df = pd.DataFrame(results)
-
-        # KORREKTUR: Sicherstellen, dass die Spalten für die Gruppierung existieren
-        if "pos_name" not in df.columns or "current_name" not in df.columns:
-            logging.error(
-                "Erforderliche Spalten 'pos_name' oder 'current_name' fehlen in den Ergebnissen."
+        )
+        ans_paths = [f"{ans_base}.ans" for ans_base in ans_bases]
+        rows = self.solve_cache.get(key, ans_paths)
+        if rows is None:
+            self.pending_cache_entries[(pos_name, current_name, angle_deg)] = (
+                key,
+                ans_paths,
             )
-            # Fallback: Alles in eine Datei schreiben
-            csv_path = os.path.join(self.base_results_path, "summary_full.csv")
-            df.to_csv(csv_path, index=False)
-            logging.info(f"Alle Ergebnisse wurden in '{csv_path}' gespeichert.")
-            return
+            return False
+        self.cached_results.extend(rename_rows(rows, pos_name, current_name))
+        return True
 
-        for (pos, current), group in df.groupby(["pos_name", "current_name"]):
-            csv_filename = f"{pos}_{current}_summary.csv"
-            csv_path = os.path.join(self.base_results_path, csv_filename)
-            sorted_group = group.sort_values(by=["phaseAngle_deg", "conductor"])
-            columns_to_drop = ["pos_name", "current_name", "run_identifier"]
-
-            # KORREKTUR: Die unvollständige Zeile wurde vervollständigt.
-            sorted_group.drop(columns=columns_to_drop, errors="ignore").to_csv(
-                csv_path, index=False
-            )
-            logging.info(
-                f"Ergebnisse für {pos} / {current} in '{csv_path}' gespeichert."
-            )
+    def _store_in_cache(self, rows):
+        """Legt die Ergebniszeilen einer gelösten Aufgabe im Solve-Cache ab."""
+        if self.solve_cache is None:
+            return
+        rows_by_entry = {}
+        for row in rows:
+            entry = (row["pos_name"], row["current_name"], row["phaseAngle_deg"])
+            rows_by_entry.setdefault(entry, []).append(row)
+        for entry, entry_rows in rows_by_entry.items():
+            if entry in self.pending_cache_entries:
+                key, ans_paths = self.pending_cache_entries.pop(entry)
+                self.solve_cache.put(key, entry_rows, ans_paths)
+
+    def _results_from_basis(self, basis_rows):
+        """
+        Baut und speichert die Superpositions-Basis jedes Positionsschritts und
+        berechnet daraus die Ergebnisse aller Messströme und Phasenwinkel.
+        """
+        phase_names = [p["name"] for p in self.run_data["electricalSystem"]]
+        rows_by_pos = {}
+        for row in basis_rows:
+            rows_by_pos.setdefault(row["pos_name"], []).append(row)
+
+        results = []
+        for pos_name, rows in rows_by_pos.items():
+            basis = build_basis(rows, phase_names, pos_name)
+            basis_path = save_basis(basis, self.base_results_path)
+            logging.info("Basis für %s in '%s' gespeichert.", pos_name, basis_path)
+
+            for current_name, current_value in self._measured_currents().items():
+                if current_value == 0:
+                    continue
+                results.extend(
+                    evaluate_sweep(
+                        basis,
+                        self._electrical_system_for(current_value),
+                        self._phase_angles(),
+                        current_name,
+                    )
+                )
+        return results
+
+    def _write_results(self, writer, rows, run_mode):
+        """
+        Übergibt die Ergebniszeilen einer Aufgabe an den CSV-Writer. Zeiger-
+        und Basis-Ergebnisse werden vorher in die Zeilen je Phasenwinkel und
+        Messstrom umgerechnet.
+        """
+        if not rows:
+            return
+        if run_mode == "phasor":
+            rows = expand_phasor_rows(rows, self._phase_angles())
+        elif run_mode == "basis":
+            rows = self._results_from_basis(rows)
+        else:
+            rows = alias_rows(mirror_rows(rows, self.angle_mirrors), self.angle_aliases)
+        writer.add_rows(rows)
+        self._queue_plots(rows)
 
 
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
     )
-    if len(sys.argv) > 1:
-        RUNNER_BASE_PATH = sys.argv[1]
-        RUNNER = SimulationRunner(base_path=RUNNER_BASE_PATH)
+    PARSER = argparse.ArgumentParser(description="Startet einen Simulationslauf.")
+    PARSER.add_argument("base_path", nargs="?", help="Ordner für die Ergebnisse")
+    PARSER.add_argument(
+        "--resume",
+        metavar="RUN_PATH",
+        help="Setzt einen abgebrochenen Lauf anhand seines Journals fort",
+    )
+    PARSER.add_argument(
+        "--workers", type=int, help="Anzahl der Worker-Prozesse (Standard: alle Kerne)"
+    )
+    PARSER.add_argument(
+        "--chunk-size", type=int, help="Aufgaben je Paket eines Positionsschritts"
+    )
+    PARSER.add_argument(
+        "--memory-per-worker-mb",
+        type=float,
+        help="Erwarteter Arbeitsspeicher je Worker, begrenzt die Anzahl der Worker",
+    )
+    PARSER.add_argument(
+        "--executor",
+        choices=("local", "distributed"),
+        help="Lokaler Prozess-Pool oder verteilte Agenten über den Broker",
+    )
+    PARSER.add_argument(
+        "--broker", metavar="HOST:PORT", help="Adresse, an der der Broker lauscht"
+    )
+    PARSER.add_argument(
+        "--events",
+        action="store_true",
+        help="Fortschritt und erledigte Aufgaben als Ereignisse auf stdout ausgeben",
+    )
+    ARGS = PARSER.parse_args()
+    SCHEDULING = {
+        "workers": ARGS.workers,
+        "chunk_size": ARGS.chunk_size,
+        "memory_per_worker_mb": ARGS.memory_per_worker_mb,
+        "executor": ARGS.executor,
+        "broker": ARGS.broker,
+        "events": ARGS.events,
+    }
+    if ARGS.resume:
+        RUNNER = SimulationRunner(
+            config_path=os.path.join(ARGS.resume, "simulation_run.json"),
+            base_path=ARGS.resume,
+            resume=True,
+            **SCHEDULING,
+        )
+        RUNNER.run()
+    elif ARGS.base_path:
+        RUNNER_BASE_PATH = ARGS.base_path
+        RUNNER = SimulationRunner(base_path=RUNNER_BASE_PATH, **SCHEDULING)
         RUNNER.run()
     else:
         logging.error("Fehler: Es wurde kein Basispfad für die Ergebnisse übergeben.")
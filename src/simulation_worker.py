@@ -2,10 +2,165 @@
 """
 Worker-Funktionen für die parallele FEMM-Simulation.
 """
+import logging
 import os
+import shutil
+import time
+from contextlib import contextmanager
+from multiprocessing import util as mp_util
 import numpy as np
-from src.femm_wrapper import FEMMSession
-from src.utils import calculate_instantaneous_current
+from src.block_integrals import integral_columns, plan_block_integrals
+from src.fem_solution import FemSolution
+from src.fem_writer import FemModel
+from src.femm_wrapper import DEFAULT_BATCH_SIZE, FEMMSession
+from src.utils import (
+    calculate_instantaneous_current,
+    calculate_phasor_current,
+    make_run_identifier,
+)
+
+# Nach so vielen Aufgaben wird die FEMM-Sitzung eines Workers neu gestartet.
+DEFAULT_SESSION_MAX_TASKS = 50
+
+# Zustand der langlebigen FEMM-Sitzung des aktuellen Worker-Prozesses.
+# Ohne Pool-Initializer wird die Sitzung nach jeder Aufgabe geschlossen.
+_WORKER_SESSION = {
+    "session": None,
+    "tasks": 0,
+    "max_tasks": 1,
+    "backend": None,
+    "events": None,
+}
+
+# Aufbau des Modells (`simulation_meta.modelBuilder`): "femm" zeichnet es
+# Befehl für Befehl in FEMM, "direct" schreibt die .fem-Datei selbst
+MODEL_BUILDERS = ("femm", "direct")
+DEFAULT_MODEL_BUILDER = "femm"
+
+# Auswertung der Blockintegrale (`simulation_meta.postProcessor`): "femm"
+# fragt jede Gruppe und jeden Typ in FEMM ab, "numpy" rechnet sie aus der
+# .ans-Datei (siehe src.fem_solution) und fragt nur ab, was FEMM anders rechnet
+POST_PROCESSORS = ("femm", "numpy")
+DEFAULT_POST_PROCESSOR = "femm"
+
+# Gemessene Stufen einer Aufgabe und ihre Laufzeiten in Sekunden
+TIMING_STAGES = ("setup", "geometry", "solve", "integrals")
+_TASK_TIMINGS = {}
+
+
+def init_worker(
+    max_tasks_per_session=DEFAULT_SESSION_MAX_TASKS, backend=None, events=None
+):
+    """
+    Initializer für die Prozesse des `multiprocessing.Pool`.
+
+    Jeder Worker hält danach eine FEMM-Sitzung über mehrere Aufgaben offen und
+    startet sie erst nach `max_tasks_per_session` Aufgaben oder nach einem
+    Fehler neu. `backend` wählt das FEMM-Backend (siehe `src.femm_backends`).
+    Über die Queue `events` meldet der Worker den Start jeder Aufgabe.
+    """
+    _WORKER_SESSION["session"] = None
+    _WORKER_SESSION["tasks"] = 0
+    _WORKER_SESSION["max_tasks"] = max(1, int(max_tasks_per_session))
+    _WORKER_SESSION["backend"] = backend
+    _WORKER_SESSION["events"] = events
+    if events is not None:
+        # Nicht abgeholte Ereignisse dürfen das Beenden nicht blockieren
+        events.cancel_join_thread()
+    # Schließt FEMM, wenn der Worker-Prozess regulär beendet wird.
+    mp_util.Finalize(None, close_worker_session, exitpriority=10)
+
+
+def close_worker_session():
+    """Beendet die FEMM-Sitzung des aktuellen Worker-Prozesses, falls vorhanden."""
+    session = _WORKER_SESSION["session"]
+    _WORKER_SESSION["session"] = None
+    _WORKER_SESSION["tasks"] = 0
+    if session is not None:
+        try:
+            session.close()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.warning("FEMM-Sitzung konnte nicht geschlossen werden: %s", e)
+
+
+def _acquire_session():
+    """
+    Gibt die FEMM-Sitzung des Workers zurück. Eine wiederverwendete Sitzung
+    wird vorher auf ein leeres Dokument zurückgesetzt.
+    """
+    session = _WORKER_SESSION["session"]
+    if session is not None and _WORKER_SESSION["tasks"] > 0:
+        try:
+            session.close_documents()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.warning("FEMM-Sitzung wird nach Fehler neu gestartet: %s", e)
+            close_worker_session()
+            session = None
+    if session is None:
+        session = FEMMSession(visible=False, backend=_WORKER_SESSION["backend"])
+        _WORKER_SESSION["session"] = session
+        _WORKER_SESSION["tasks"] = 0
+    return session
+
+
+def _release_session(failed):
+    """Zählt die erledigte Aufgabe und recycelt die Sitzung bei Bedarf."""
+    _WORKER_SESSION["tasks"] += 1
+    if failed or _WORKER_SESSION["tasks"] >= _WORKER_SESSION["max_tasks"]:
+        close_worker_session()
+
+
+@contextmanager
+def _timed(stage):
+    """Addiert die Laufzeit des Blocks zur Stufe der aktuellen Aufgabe."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _TASK_TIMINGS[stage] = _TASK_TIMINGS.get(stage, 0.0) + (
+            time.perf_counter() - start
+        )
+
+
+def run_task_batch(batch, raise_errors=False):
+    """
+    Führt ein Paket von Aufgaben nacheinander im selben Worker aus (wird
+    parallel ausgeführt), damit Aufgaben desselben Positionsschritts die
+    FEMM-Sitzung des Workers nacheinander nutzen.
+
+    Args:
+        batch (tuple): (Paketnummer, Worker-Funktion, Liste der Aufgaben).
+
+    Eine fehlgeschlagene Aufgabe bricht weder das Paket noch den Lauf ab:
+    der Fehler wird protokolliert, die Aufgabe liefert keine Zeilen und ist
+    als gescheitert markiert. Die Sitzung hat der Worker dann bereits
+    recycelt (`_release_session`), die nächste Aufgabe startet neu. Mit
+    `raise_errors` wird der Fehler weitergereicht, damit ein Agent das Paket
+    dem Broker als gescheitert meldet (siehe `src.distributed`).
+
+    Returns:
+        tuple: (Paketnummer, je Aufgabe ein Tupel (Ergebniszeilen, Laufzeit
+        in Sekunden, {Stufe: Sekunden}, gescheitert)).
+    """
+    index, worker_function, tasks = batch
+    events = _WORKER_SESSION["events"]
+    results = []
+    for offset, task in enumerate(tasks):
+        if events is not None:
+            events.put(("start", (index, offset), os.getpid(), time.time()))
+        _TASK_TIMINGS.clear()
+        start = time.perf_counter()
+        try:
+            rows, failed = worker_function(task), False
+        except Exception:  # pylint: disable=broad-except
+            if raise_errors:
+                raise
+            logging.exception(
+                "Aufgabe %d von Paket %d ist fehlgeschlagen.", offset, index
+            )
+            rows, failed = [], True
+        results.append((rows, time.perf_counter() - start, dict(_TASK_TIMINGS), failed))
+    return index, results
 
 
 def run_single_simulation(task_params):
@@ -23,14 +178,17 @@ def run_single_simulation(task_params):
         current_name,
     ) = task_params
 
-    femm = FEMMSession(visible=False)
+    with _timed("setup"):
+        femm = _acquire_session()
+    failed = True
     try:
-        setup_femm_problem(
-            femm, global_params, step_config["electricalSystem"], angle_deg
+        prepare_model(
+            femm,
+            global_params,
+            step_config,
+            angle_deg,
+            os.path.join(femm_files_dir, f"{run_identifier}.fem"),
         )
-        build_femm_geometry(femm, step_config)
-        fem_file = os.path.join(femm_files_dir, f"{run_identifier}.fem")
-        femm.save_as(fem_file)
         results = run_analysis_and_collect_results(
             femm,
             step_config,  # Gebe die gesamte step_config weiter
@@ -39,25 +197,308 @@ def run_single_simulation(task_params):
             run_identifier,
             pos_name,
             current_name,
-            femm_files_dir,
         )
+        failed = False
     finally:
-        femm.close()
+        _release_session(failed)
     return results
 
 
-def setup_femm_problem(femm, global_params, electrical_system, angle_deg):
+def run_group_simulation(task_params):
     """
-    Konfiguriert die Grundeinstellungen des FEMM-Problems.
+    Simuliert alle Phasenwinkel eines Positionsschritts und Stroms mit nur einer
+    Geometrie (wird parallel ausgeführt).
+
+    Modell und Materialien werden einmal aufgebaut und gespeichert; pro Winkel
+    werden nur die Ströme der Stromkreise angepasst und neu gelöst.
+    """
+    (
+        femm_files_dir,
+        step_config,
+        global_params,
+        angles_deg,
+        step_positions,
+        pos_name,
+        current_name,
+    ) = task_params
+
+    electrical_system = step_config["electricalSystem"]
+    results = []
+    batch_size = femm_batch_size(global_params)
+    with _timed("setup"):
+        femm = _acquire_session()
+    failed = True
+    try:
+        fem_file = os.path.join(femm_files_dir, f"{pos_name}_{current_name}.fem")
+        prepare_model(femm, global_params, step_config, angles_deg[0], fem_file)
+
+        for i, angle_deg in enumerate(angles_deg):
+            run_identifier = make_run_identifier(pos_name, current_name, angle_deg)
+            if i > 0:
+                with _timed("setup"), femm.batched(batch_size):
+                    femm.close_solution()
+                    update_circuit_currents(femm, electrical_system, angle_deg)
+            results.extend(
+                run_analysis_and_collect_results(
+                    femm,
+                    step_config,
+                    angle_deg,
+                    step_positions,
+                    run_identifier,
+                    pos_name,
+                    current_name,
+                )
+            )
+            # Die .ans-Datei wird beim nächsten Winkel überschrieben, daher kopieren
+            shutil.copyfile(
+                os.path.splitext(fem_file)[0] + ".ans",
+                os.path.join(femm_files_dir, f"{run_identifier}.ans"),
+            )
+        failed = False
+    finally:
+        _release_session(failed)
+    return results
+
+
+def run_phasor_simulation(task_params):
+    """
+    Löst einen Positionsschritt und Strom einmalig mit komplexen Phasenströmen
+    (wird parallel ausgeführt).
+
+    Die Ergebnisse sind komplexe Zeiger ohne Phasenwinkel; die Werte für die
+    einzelnen Winkel werden erst beim Schreiben der Ergebnisse berechnet.
+    """
+    (
+        femm_files_dir,
+        step_config,
+        global_params,
+        step_positions,
+        pos_name,
+        current_name,
+    ) = task_params
+
+    run_identifier = f"{pos_name}_{current_name}_phasor"
+    with _timed("setup"):
+        femm = _acquire_session()
+    failed = True
+    try:
+        prepare_model(
+            femm,
+            global_params,
+            step_config,
+            None,
+            os.path.join(femm_files_dir, f"{run_identifier}.fem"),
+            phasor=True,
+        )
+        results = run_analysis_and_collect_results(
+            femm,
+            step_config,
+            None,
+            step_positions,
+            run_identifier,
+            pos_name,
+            current_name,
+        )
+        failed = False
+    finally:
+        _release_session(failed)
+    return results
+
+
+def run_basis_simulation(task_params):
     """
+    Löst einen Positionsschritt für alle Einheitserregungen der
+    Superpositions-Basis (wird parallel ausgeführt).
+
+    Jede Ergebniszeile trägt das Label ihrer Erregung in der Spalte
+    "excitation"; die Lösung jeder Erregung bleibt als
+    `<pos>_basis_<label>.ans` erhalten.
+    """
+    (
+        femm_files_dir,
+        step_config,
+        global_params,
+        step_positions,
+        pos_name,
+        excitations,
+    ) = task_params
+
+    results = []
+    batch_size = femm_batch_size(global_params)
+    with _timed("setup"):
+        femm = _acquire_session()
+    failed = True
+    try:
+        fem_file = os.path.join(femm_files_dir, f"{pos_name}_basis.fem")
+        prepare_model(femm, global_params, step_config, None, fem_file, phasor=True)
+
+        for i, (label, currents) in enumerate(excitations):
+            with _timed("setup"), femm.batched(batch_size):
+                if i > 0:
+                    femm.close_solution()
+                for circuit_name, current in currents.items():
+                    femm.set_circuit_current(circuit_name, current)
+            rows = run_analysis_and_collect_results(
+                femm,
+                step_config,
+                None,
+                step_positions,
+                f"{pos_name}_basis_{label}",
+                pos_name,
+                "basis",
+            )
+            for row in rows:
+                row["excitation"] = label
+            results.extend(rows)
+            # Die .ans-Datei wird von der nächsten Erregung überschrieben
+            shutil.copyfile(
+                os.path.splitext(fem_file)[0] + ".ans",
+                os.path.join(femm_files_dir, f"{pos_name}_basis_{label}.ans"),
+            )
+        failed = False
+    finally:
+        _release_session(failed)
+    return results
+
+
+def femm_batch_size(global_params):
+    """
+    Anzahl der Befehle, die gesammelt in einem Aufruf an FEMM gehen
+    (`simulation_meta.femmBatchSize`, 0 = jeder Befehl einzeln).
+    """
+    return int(
+        global_params.get("simulation_meta", {}).get(
+            "femmBatchSize", DEFAULT_BATCH_SIZE
+        )
+    )
+
+
+def model_builder(global_params):
+    """Liest den Aufbau des Modells (`simulation_meta.modelBuilder`)."""
+    builder = global_params.get("simulation_meta", {}).get(
+        "modelBuilder", DEFAULT_MODEL_BUILDER
+    )
+    if builder not in MODEL_BUILDERS:
+        raise ValueError(f"Unbekannter Modellaufbau '{builder}'.")
+    return builder
+
+
+def post_processor(global_params):
+    """Liest die Auswertung der Blockintegrale (`simulation_meta.postProcessor`)."""
+    processor = global_params.get("simulation_meta", {}).get(
+        "postProcessor", DEFAULT_POST_PROCESSOR
+    )
+    if processor not in POST_PROCESSORS:
+        raise ValueError(f"Unbekannte Auswertung '{processor}'.")
+    return processor
+
+
+def solution_block_integrals(femm, plan):
+    """
+    Berechnet die geplanten Blockintegrale aus der .ans-Datei der aktuellen
+    Lösung. Integrale, die die Auswertung in NumPy nicht wie FEMM berechnen
+    kann (NaN, z. B. der Spannungstensor oder die Energie in nichtlinearen
+    Materialien), werden weiterhin in FEMM abgefragt.
+
+    Returns:
+        list[GroupIntegrals]: Die Ergebnisse in der Reihenfolge des Plans.
+    """
+    records = FemSolution.load(femm.solution_path()).extract_block_integrals(plan)
+    remaining = []
+    for request, record in zip(plan, records):
+        missing = [t for t in request.integral_types if np.isnan(record.values[t])]
+        if missing:
+            remaining.append(request._replace(integral_types=missing))
+    if not remaining:
+        return records
+    from_femm = {
+        record.group_id: record.values
+        for record in femm.extract_block_integrals(remaining)
+    }
+    return [
+        record._replace(values={**record.values, **from_femm.get(record.group_id, {})})
+        for record in records
+    ]
+
+
+def build_fem_model(global_params, step_config, angle_deg, phasor=False):
+    """Baut das Modell eines Schritts ohne FEMM als `FemModel` auf."""
+    model = FemModel()
+    setup_femm_problem(
+        model, global_params, step_config["electricalSystem"], angle_deg, phasor
+    )
+    build_femm_geometry(model, step_config)
+    return model
+
+
+def prepare_model(femm, global_params, step_config, angle_deg, fem_file, phasor=False):
+    """
+    Baut das Modell eines Schritts auf und speichert es unter `fem_file`,
+    sodass FEMM es anschließend lösen kann. Mit `modelBuilder` "direct" wird
+    die Datei ohne FEMM geschrieben und nur noch geöffnet; den offenen Rand
+    erzeugt danach FEMM selbst mit `mi_makeABC`. Kann das Modell nicht direkt
+    geschrieben werden (sich kreuzende Segmente), schlägt die Aufgabe fehl.
+    """
+    if model_builder(global_params) == "direct":
+        with _timed("geometry"):
+            model = build_fem_model(global_params, step_config, angle_deg, phasor)
+            try:
+                model.write(fem_file)
+            except ValueError as e:
+                raise ValueError(
+                    f"Direkter Modellaufbau für '{os.path.basename(fem_file)}' "
+                    f"nicht möglich: {e}"
+                ) from e
+        with _timed("setup"):
+            femm.open_model(fem_file)
+            if model.abc is not None:
+                femm.make_abc(*model.abc)
+                femm.save_as(fem_file)
+        return
+
+    batch_size = femm_batch_size(global_params)
+    with _timed("setup"), femm.batched(batch_size):
+        setup_femm_problem(
+            femm, global_params, step_config["electricalSystem"], angle_deg, phasor
+        )
+    with _timed("geometry"), femm.batched(batch_size):
+        build_femm_geometry(femm, step_config)
+        femm.save_as(fem_file)
+
+
+def solver_settings(global_params):
+    """Stellt die Problemdefinition für FEMM aus der Konfiguration zusammen."""
     scenario_params = global_params.get("scenarioParams", {})
+    return {
+        "frequency": float(scenario_params.get("frequencyHz", 50)),
+        "units": "millimeters",
+        "prob_type": "planar",
+        "precision": 1e-8,
+        "depth": float(scenario_params.get("problemDepthM", 30)),
+        "min_angle": 30,
+        "core_perm": float(scenario_params.get("coreRelPermeability", 2500)),
+    }
+
+
+def setup_femm_problem(femm, global_params, electrical_system, angle_deg, phasor=False):
+    """
+    Konfiguriert die Grundeinstellungen des FEMM-Problems.
+    Mit `phasor=True` erhält jede Phase ihren komplexen Stromzeiger statt
+    des Momentanstroms beim Winkel `angle_deg`.
+    """
     materials_config = global_params.get("materials", [])
-    freq = float(scenario_params.get("frequencyHz", 50))
-    depth = float(scenario_params.get("problemDepthM", 30))
-    core_perm = float(scenario_params.get("coreRelPermeability", 2500))
+    settings = solver_settings(global_params)
+    core_perm = settings["core_perm"]
 
     femm.new_document(0)
-    femm.prob_def(freq, "millimeters", "planar", 1e-8, depth, 30)
+    femm.prob_def(
+        settings["frequency"],
+        settings["units"],
+        settings["prob_type"],
+        settings["precision"],
+        settings["depth"],
+        settings["min_angle"],
+    )
 
     for mat_props in materials_config:
         mat_name = mat_props.get("name")
@@ -76,11 +517,25 @@ def setup_femm_problem(femm, global_params, electrical_system, angle_deg):
                 mu_y = float(mat_props.get("mu_y", core_perm))
                 femm.add_material(mat_name, mu_x=mu_x, mu_y=mu_y)
 
+    for phase in electrical_system:
+        if phasor:
+            current = calculate_phasor_current(
+                phase["peakCurrentA"], phase["phaseShiftDeg"]
+            )
+        else:
+            current = calculate_instantaneous_current(
+                phase["peakCurrentA"], phase["phaseShiftDeg"], angle_deg
+            )
+        femm.add_circuit(phase["name"], current)
+
+
+def update_circuit_currents(femm, electrical_system, angle_deg):
+    """Setzt die Momentanströme aller Phasen für einen neuen Phasenwinkel."""
     for phase in electrical_system:
         inst_current = calculate_instantaneous_current(
             phase["peakCurrentA"], phase["phaseShiftDeg"], angle_deg
         )
-        femm.add_circuit(phase["name"], inst_current)
+        femm.set_circuit_current(phase["name"], inst_current)
 
 
 def build_femm_geometry(femm, step_config):
@@ -191,33 +646,36 @@ def run_analysis_and_collect_results(
     run_identifier,
     pos_name,
     current_name,
-    femm_files_dir,
 ):
     """
-    Führt die Analyse durch, sammelt alle Blockintegrale und speichert Plots.
+    Führt die Analyse durch und sammelt alle Blockintegrale. Die Bilder werden
+    nicht hier, sondern aus der `.ans`-Datei gerendert (siehe
+    `src.plot_renderer`).
     """
-    femm.analyze(1)
-    femm.load_solution()
-
-    run_base_dir = os.path.dirname(os.path.dirname(femm_files_dir))
-    plots_dir = os.path.join(run_base_dir, "femm_plots")
-    os.makedirs(plots_dir, exist_ok=True)
+    with _timed("solve"):
+        femm.analyze(1)
+        femm.load_solution()
 
-    femm.zoom_natural()
-    femm.show_density_plot(legend=1, gscale=0, upper_b=0, lower_b=0, plot_type="h")
-    density_plot_path = os.path.join(plots_dir, f"{run_identifier}_density_H.png")
-    femm.save_bitmap(density_plot_path)
-
-    femm.zoom_natural()
-    femm.show_vector_plot(plot_type=1, scale_factor=2)
-    vector_plot_path = os.path.join(plots_dir, f"{run_identifier}_vector_H.png")
-    femm.save_bitmap(vector_plot_path)
-
-    # Die Liste der ausgewählten Integrale aus der Konfiguration holen
-    selected_integrals = step_config.get("simulation_meta", {}).get("selectedIntegrals")
+    # Alle Gruppen einer Lösung in einem Durchlauf abfragen, jeweils nur mit
+    # den in der Konfiguration ausgewählten Integralen, danach die Stromkreise
+    # der Wandler
+    assemblies = step_config["assemblies"]
+    integrals = {}
+    plan = plan_block_integrals(step_config)
+    with _timed("integrals"), femm.batched(femm_batch_size(step_config)):
+        if post_processor(step_config) == "numpy":
+            records = solution_block_integrals(femm, plan)
+        else:
+            records = femm.extract_block_integrals(plan)
+        for record in records:
+            integrals[record.group_id] = integral_columns(record)
+        circuits = femm.get_circuits_properties(
+            asm["phaseName"]
+            for asm in assemblies
+            if "transformer_details" in asm and asm["transformer_details"]
+        )
 
     results = []
-    assemblies = step_config["assemblies"]
     for i, asm in enumerate(assemblies):
         phase_name = asm["phaseName"]
         has_transformer = "transformer_details" in asm and asm["transformer_details"]
@@ -231,27 +689,17 @@ def run_analysis_and_collect_results(
             "phaseAngle_deg": angle_deg,
         }
 
-        # Immer die Integrale für den Leiter (Kupferschiene) abfragen
-        conductor_group_id = i * 10 + 1
-        conductor_integrals = femm.get_all_block_integrals_for_group(conductor_group_id)
-        for int_type, data in conductor_integrals["integrals"].items():
-            if selected_integrals is None or int_type in selected_integrals:
-                # Erstelle den Spaltennamen aus Symbol und Einheit
-                col_name = f"conductor_{data['symbol']}_{data['unit']}"
-                # Konvertiere komplexe Zahlen in Strings
-                res[col_name] = (
-                    str(data["value"])
-                    if isinstance(data["value"], complex)
-                    else data["value"]
-                )
+        # Integrale des Leiters (Kupferschiene). Komplexe Werte bleiben
+        # erhalten und werden erst in der CSV zu Strings.
+        res.update(integrals[i * 10 + 1])
 
-        # Wenn ein Wandler vorhanden ist, dessen Eigenschaften und Integrale abfragen
+        # Wenn ein Wandler vorhanden ist, dessen Eigenschaften und Integrale übernehmen
         if has_transformer:
             (
                 i_sec_real_a,
                 i_sec_imag_a,
                 circuit_voltage_complex,
-            ) = femm.get_circuit_properties(phase_name)
+            ) = circuits[phase_name]
 
             res.update(
                 {
@@ -261,19 +709,7 @@ def run_analysis_and_collect_results(
                     "circuit_voltage_imag_V": circuit_voltage_complex.imag,
                 }
             )
-
-            core_group_id = i * 10 + 2
-            core_integrals = femm.get_all_block_integrals_for_group(core_group_id)
-            for int_type, data in core_integrals["integrals"].items():
-                if selected_integrals is None or int_type in selected_integrals:
-                    # Erstelle den Spaltennamen aus Symbol und Einheit
-                    col_name = f"core_{data['symbol']}_{data['unit']}"
-                    # Konvertiere komplexe Zahlen in Strings
-                    res[col_name] = (
-                        str(data["value"])
-                        if isinstance(data["value"], complex)
-                        else data["value"]
-                    )
+            res.update(integrals[i * 10 + 2])
 
         # Positionsdaten hinzufügen
         flat_positions = {
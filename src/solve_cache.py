@@ -0,0 +1,227 @@
+# src/solve_cache.py
+"""
+Inhaltsadressierter Cache für FEMM-Lösungen über Simulationsläufe hinweg.
+
+Der Schlüssel eines Eintrags ist ein SHA-256-Hash über alle Eingaben, die
+das Ergebnis einer Lösung bestimmen: Geometrie, verwendete Materialien,
+Stromkreis-Ströme, Phasenwinkel, Löser-Einstellungen, die Auswahl der
+Blockintegrale sowie Backend, Modellaufbau und Auswertung, mit denen die
+Lösung entstanden ist. Positions- und Stromnamen gehören nicht dazu, damit
+ein identischer Schritt auch unter anderem Namen oder in einem anderen Lauf
+wiederverwendet wird.
+
+Ein Eintrag besteht aus den Ergebniszeilen (`<schlüssel>.json`) und den
+`.ans`-Dateien der Lösung (`<schlüssel>.<i>.ans`), denn Bilder, Feldlinien,
+Punktabfragen und Sekundärströme werden später aus ihnen berechnet. Ein
+Eintrag ohne alle `.ans`-Dateien gilt als Fehlzugriff. Überschreitet der
+Cache seine Maximalgröße, werden die am längsten nicht genutzten Einträge
+gelöscht (Änderungszeit als LRU-Marke).
+
+Gespeichert werden nur Lösungen echter Löser (siehe
+`femm_backends.solver_identity`); die Modellwerte des replay-Backends
+gelangen nie in den Cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from src.utils import SIMULATIONS_DIR, json_default, json_object_hook
+
+# Bei Änderungen an Modellaufbau oder Auswertung erhöhen, damit alte
+# Einträge nicht mehr getroffen werden.
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = os.path.join(SIMULATIONS_DIR, "solve_cache")
+DEFAULT_MAX_SIZE_MB = 1024
+
+
+def _referenced_names(value, names):
+    """Sammelt rekursiv alle String-Werte einer Konfiguration."""
+    if isinstance(value, dict):
+        for item in value.values():
+            _referenced_names(item, names)
+    elif isinstance(value, list):
+        for item in value:
+            _referenced_names(item, names)
+    elif isinstance(value, str):
+        names.add(value)
+    return names
+
+
+def task_fingerprint(step_config, solver_settings, currents, angle_deg, solver=None):
+    """
+    Stellt die für den Löser relevanten Eingaben einer Aufgabe kanonisch
+    zusammen.
+
+    Args:
+        step_config (dict): Die Konfiguration des Positionsschritts.
+        solver_settings (dict): Siehe `simulation_worker.solver_settings`.
+        currents: Die Ströme der Stromkreise (z. B. `{phase: strom}` oder
+            eine Liste von Erregungen); komplexe Werte sind erlaubt.
+        angle_deg (float | None): Der Phasenwinkel der Ergebniszeilen.
+        solver (dict | None): Das lösende Backend, siehe
+            `femm_backends.solver_identity`.
+    """
+    geometry = {
+        "assemblies": step_config.get("assemblies", []),
+        "standAloneComponents": step_config.get("standAloneComponents", []),
+        "simulationsraum": step_config["simulation_meta"]["simulationsraum"],
+    }
+    used_names = _referenced_names(geometry, {"Air", "Copper"})
+    materials = [
+        m for m in step_config.get("materials", []) if m.get("name") in used_names
+    ]
+    meta = step_config.get("simulation_meta", {})
+    return {
+        "version": CACHE_VERSION,
+        "geometry": geometry,
+        "materials": materials,
+        "currents": currents,
+        "angle_deg": None if angle_deg is None else float(angle_deg),
+        "solver": solver_settings,
+        "selectedIntegrals": meta.get("selectedIntegrals"),
+        "backend": solver,
+        "modelBuilder": meta.get("modelBuilder", "femm"),
+        "postProcessor": meta.get("postProcessor", "femm"),
+    }
+
+
+def cache_key(fingerprint):
+    """Berechnet den Hash-Schlüssel eines Fingerabdrucks."""
+    canonical = json.dumps(
+        fingerprint, sort_keys=True, separators=(",", ":"), default=json_default
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def rename_rows(rows, pos_name, current_name):
+    """
+    Überträgt gespeicherte Ergebniszeilen auf eine Aufgabe mit anderem
+    Positions- und Stromnamen. Der `run_identifier` behält seinen Suffix
+    (z. B. `_angle15` oder `_phasor`).
+    """
+    renamed = []
+    for row in rows:
+        res = dict(row)
+        old_prefix = f"{row['pos_name']}_{row['current_name']}"
+        res["pos_name"] = pos_name
+        res["current_name"] = current_name
+        res[
+            "run_identifier"
+        ] = f"{pos_name}_{current_name}{row['run_identifier'][len(old_prefix):]}"
+        renamed.append(res)
+    return renamed
+
+
+class SolveCache:
+    """Ein größenbegrenzter Cache für Ergebniszeilen und `.ans`-Dateien."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(float(max_size_mb) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, run_data):
+        """
+        Erstellt den Cache aus `simulation_meta.solveCache`, z. B.
+        `{"enabled": true, "path": "...", "maxSizeMB": 1024}`. Gibt None
+        zurück, wenn der Cache deaktiviert ist.
+        """
+        config = run_data.get("simulation_meta", {}).get("solveCache", {})
+        if not config.get("enabled", True):
+            return None
+        return cls(
+            config.get("path", DEFAULT_CACHE_DIR),
+            config.get("maxSizeMB", DEFAULT_MAX_SIZE_MB),
+        )
+
+    def _entry_path(self, key, extension):
+        """Pfad einer Eintragsdatei, nach den ersten Zeichen des Schlüssels verteilt."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}{extension}")
+
+    def get(self, key, ans_targets=()):
+        """
+        Liest die Ergebniszeilen eines Eintrags oder gibt None zurück. Die
+        gespeicherten `.ans`-Dateien werden nach `ans_targets` kopiert; fehlt
+        eine davon, ist es ein Fehlzugriff.
+        """
+        rows_path = self._entry_path(key, ".json")
+        ans_paths = [
+            self._entry_path(key, f".{i}.ans") for i in range(len(ans_targets))
+        ]
+        try:
+            with open(rows_path, "r", encoding="utf-8") as f:
+                rows = json.load(f, object_hook=json_object_hook)
+        except (FileNotFoundError, json.JSONDecodeError):
+            rows = None
+        if rows is None or not all(os.path.exists(path) for path in ans_paths):
+            self.misses += 1
+            return None
+
+        for ans_path, ans_target in zip(ans_paths, ans_targets):
+            shutil.copyfile(ans_path, ans_target)
+            os.utime(ans_path)
+        # Änderungszeit als Zeitpunkt der letzten Nutzung für die LRU-Verdrängung
+        os.utime(rows_path)
+        self.hits += 1
+        return rows
+
+    def put(self, key, rows, ans_sources=()):
+        """
+        Speichert die Ergebniszeilen und `.ans`-Dateien einer Lösung. Fehlt
+        eine der `.ans`-Dateien, wird nichts gespeichert.
+        """
+        if not all(os.path.exists(path) for path in ans_sources):
+            return
+        rows_path = self._entry_path(key, ".json")
+        os.makedirs(os.path.dirname(rows_path), exist_ok=True)
+        # Die Zeilen zuletzt, damit ein Eintrag erst mit allen Dateien gilt
+        for i, ans_source in enumerate(ans_sources):
+            ans_path = self._entry_path(key, f".{i}.ans")
+            shutil.copyfile(ans_source, f"{ans_path}.{os.getpid()}.tmp")
+            os.replace(f"{ans_path}.{os.getpid()}.tmp", ans_path)
+        tmp_path = f"{rows_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, default=json_default)
+        os.replace(tmp_path, rows_path)
+
+    def evict(self):
+        """Löscht die ältesten Einträge, bis der Cache wieder in seine Größe passt."""
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            removed += 1
+        if removed:
+            logging.info("Solve-Cache: %d Dateien verdrängt.", removed)
+
+    def stats(self):
+        """Gibt Treffer, Fehlzugriffe und Trefferquote für die Statusdatei zurück."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,452 @@
+# src/superposition.py
+"""
+Einheitserregungs-Basis und Superposition für lineare Konfigurationen.
+
+Für einen Positionsschritt wird jede Phase einmal mit dem Einheitsstrom 1 A
+gelöst, zusätzlich jedes Phasenpaar mit den Strömen (1, 1) und (1, j).
+Daraus ergeben sich für jede Ergebnisspalte
+- lineare Größen:       Q = Σ h_a · I_a
+- quadratische Größen:  Q = Σ conj(I_a) · M_ab · I_b  (zeitliche Mittelwerte)
+- 2x-Anteile:           Q = Σ G_ab · I_a · I_b         (doppelte Frequenz)
+- geometrische Größen:  Q = konstant
+
+Mit der gespeicherten Basis lassen sich beliebige Stromkombinationen
+(Messströme, unsymmetrische Phasen, Phasenausfall, beliebige Winkel) ohne
+neue FEMM-Rechnung auswerten.
+
+Aufruf über die Kommandozeile, z.B.:
+    python -m src.superposition simulations/<datum>/<lauf> --rms 4000
+    python -m src.superposition <lauf> --current L1=4000@0 --current L2=0@120 \\
+        --current L3=4000@-120 --angles 0:360:15 --output szenario.csv
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.block_integrals import BLOCK_INTEGRAL_TYPES
+from src.phasor import DOUBLE_FREQUENCY_TYPES
+from src.utils import (
+    calculate_instantaneous_current,
+    calculate_phasor_current,
+    make_run_identifier,
+)
+
+BASIS_DIR = "basis"
+
+# Spalten, die nicht überlagert, sondern unverändert übernommen werden
+STATIC_COLUMNS = ("conductor",)
+
+# Der Spannungszeiger wird in den Ergebnissen getrennt nach Real- und
+# Imaginärteil abgelegt und für die Basis wieder zusammengefasst.
+VOLTAGE_COLUMNS = ("circuit_voltage_real_V", "circuit_voltage_imag_V")
+VOLTAGE_KEY = "circuit_voltage_V"
+
+
+def column_kinds():
+    """Ordnet jeder überlagerbaren Ergebnisspalte ihre Abhängigkeit vom Strom zu."""
+    kinds = {}
+    for int_type, data in BLOCK_INTEGRAL_TYPES.items():
+        if data["order"] == 0:
+            kind = "constant"
+        elif data["order"] == 1:
+            kind = "linear"
+        elif int_type in DOUBLE_FREQUENCY_TYPES:
+            kind = "bilinear"
+        else:
+            kind = "sesquilinear"
+        for prefix in ("conductor", "core"):
+            kinds[f"{prefix}_{data['symbol']}_{data['unit']}"] = kind
+    kinds["Isec_real_A"] = "linear"
+    kinds["Isec_imag_A"] = "linear"
+    kinds[VOLTAGE_KEY] = "linear"
+    return kinds
+
+
+def basis_excitations(phase_names):
+    """
+    Liefert die Erregungen für den Aufbau der Basis als Liste von
+    `(label, {phase: strom})`.
+    """
+    excitations = []
+    for name in phase_names:
+        currents = {p: 0j for p in phase_names}
+        currents[name] = 1 + 0j
+        excitations.append((f"unit_{name}", currents))
+    for a, name_a in enumerate(phase_names):
+        for name_b in phase_names[a + 1 :]:
+            for label, factor in (("sum", 1 + 0j), ("quad", 1j)):
+                currents = {p: 0j for p in phase_names}
+                currents[name_a] = 1 + 0j
+                currents[name_b] = factor
+                excitations.append((f"{label}_{name_a}_{name_b}", currents))
+    return excitations
+
+
+def _row_values(row, kinds):
+    """Extrahiert die überlagerbaren Werte einer Ergebniszeile als komplexe Zahlen."""
+    values = {}
+    for col, value in row.items():
+        if col in kinds and isinstance(value, (int, float, complex)):
+            values[col] = complex(value)
+    if all(col in row for col in VOLTAGE_COLUMNS):
+        values[VOLTAGE_KEY] = complex(row[VOLTAGE_COLUMNS[0]], row[VOLTAGE_COLUMNS[1]])
+    return values
+
+
+def build_basis(rows, phase_names, pos_name):
+    """
+    Berechnet die Basis eines Positionsschritts aus den Ergebniszeilen der
+    Erregungen aus `basis_excitations`. Jede Zeile trägt ihr Erregungs-Label
+    in der Spalte "excitation".
+    """
+    kinds = column_kinds()
+    by_excitation = {}
+    conductors = []
+    static = {}
+    row_columns = [col for col in rows[0] if col != "excitation"] if rows else []
+    for row in rows:
+        conductor = row["conductor"]
+        if conductor not in static:
+            conductors.append(conductor)
+            static[conductor] = {
+                col: value
+                for col, value in row.items()
+                if col in STATIC_COLUMNS
+                or (col.startswith("pos_") and col != "pos_name")
+            }
+        by_excitation.setdefault(row["excitation"], {})[conductor] = _row_values(
+            row, kinds
+        )
+
+    columns = list(
+        dict.fromkeys(
+            col for exc in by_excitation.values() for v in exc.values() for col in v
+        )
+    )
+    n_phases = len(phase_names)
+    shape = (len(conductors), len(columns))
+    linear = np.zeros(shape + (n_phases,), dtype=complex)
+    quadratic = np.zeros(shape + (n_phases, n_phases), dtype=complex)
+    constant = np.zeros(shape, dtype=complex)
+    valid = np.zeros(shape, dtype=bool)
+
+    def value(label, c_idx, col):
+        return by_excitation[label][conductors[c_idx]].get(col, np.nan)
+
+    for c_idx, conductor in enumerate(conductors):
+        for k_idx, col in enumerate(columns):
+            valid[c_idx, k_idx] = col in by_excitation[f"unit_{phase_names[0]}"].get(
+                conductor, {}
+            )
+            if not valid[c_idx, k_idx]:
+                continue
+            kind = kinds[col]
+            diagonal = [value(f"unit_{p}", c_idx, col) for p in phase_names]
+            if kind == "constant":
+                constant[c_idx, k_idx] = diagonal[0]
+            elif kind == "linear":
+                linear[c_idx, k_idx] = diagonal
+            else:
+                matrix = np.diag(np.array(diagonal, dtype=complex))
+                for a, name_a in enumerate(phase_names):
+                    for b in range(a + 1, n_phases):
+                        name_b = phase_names[b]
+                        s_sum = (
+                            value(f"sum_{name_a}_{name_b}", c_idx, col)
+                            - diagonal[a]
+                            - diagonal[b]
+                        )
+                        if kind == "bilinear":
+                            matrix[a, b] = matrix[b, a] = s_sum / 2
+                        else:
+                            s_quad = (
+                                value(f"quad_{name_a}_{name_b}", c_idx, col)
+                                - diagonal[a]
+                                - diagonal[b]
+                            )
+                            matrix[a, b] = (s_sum - 1j * s_quad) / 2
+                            matrix[b, a] = (s_sum + 1j * s_quad) / 2
+                quadratic[c_idx, k_idx] = matrix
+
+    return {
+        "pos_name": pos_name,
+        "phases": list(phase_names),
+        "conductors": conductors,
+        "columns": columns,
+        "kinds": [kinds[col] for col in columns],
+        "linear": linear,
+        "quadratic": quadratic,
+        "constant": constant,
+        "valid": valid,
+        "static": [static[c] for c in conductors],
+        "row_columns": row_columns,
+    }
+
+
+def save_basis(basis, run_path):
+    """Speichert eine Basis als `<lauf>/basis/<pos_name>.npz`."""
+    basis_dir = os.path.join(run_path, BASIS_DIR)
+    os.makedirs(basis_dir, exist_ok=True)
+    path = os.path.join(basis_dir, f"{basis['pos_name']}.npz")
+    np.savez_compressed(
+        path,
+        pos_name=np.array(basis["pos_name"]),
+        phases=np.array(basis["phases"]),
+        conductors=np.array(basis["conductors"]),
+        columns=np.array(basis["columns"]),
+        kinds=np.array(basis["kinds"]),
+        linear=basis["linear"],
+        quadratic=basis["quadratic"],
+        constant=basis["constant"],
+        valid=basis["valid"],
+        static=np.array(json.dumps(basis["static"])),
+        row_columns=np.array(basis["row_columns"]),
+    )
+    return path
+
+
+def load_basis(run_path, pos_name):
+    """Lädt die gespeicherte Basis eines Positionsschritts."""
+    path = os.path.join(run_path, BASIS_DIR, f"{pos_name}.npz")
+    with np.load(path) as data:
+        return {
+            "pos_name": str(data["pos_name"]),
+            "phases": data["phases"].tolist(),
+            "conductors": data["conductors"].tolist(),
+            "columns": data["columns"].tolist(),
+            "kinds": data["kinds"].tolist(),
+            "linear": data["linear"],
+            "quadratic": data["quadratic"],
+            "constant": data["constant"],
+            "valid": data["valid"],
+            "static": json.loads(str(data["static"])),
+            "row_columns": data["row_columns"].tolist(),
+        }
+
+
+def list_basis_positions(run_path):
+    """Gibt alle Positionsschritte zurück, für die eine Basis gespeichert ist."""
+    basis_dir = os.path.join(run_path, BASIS_DIR)
+    if not os.path.isdir(basis_dir):
+        return []
+    return sorted(f[:-4] for f in os.listdir(basis_dir) if f.endswith(".npz"))
+
+
+def evaluate_basis(basis, phase_currents):
+    """
+    Berechnet die Ergebnisse für beliebige Phasenströme durch Superposition.
+
+    Args:
+        basis (dict): Eine Basis aus `build_basis` oder `load_basis`.
+        phase_currents (dict or np.ndarray): Strom je Phase (Scheitelwert,
+            reell oder komplex), als Dictionary oder als Matrix mit einer
+            Zeile pro Stromkombination und einer Spalte pro Phase.
+
+    Returns:
+        np.ndarray: Komplexe Werte der Form (Kombinationen, Leiter, Spalten).
+    """
+    if isinstance(phase_currents, dict):
+        currents = np.array(
+            [[complex(phase_currents.get(p, 0)) for p in basis["phases"]]]
+        )
+    else:
+        currents = np.atleast_2d(np.asarray(phase_currents, dtype=complex))
+
+    kinds = np.array(basis["kinds"])
+    lin = np.einsum("ckp,np->nck", basis["linear"], currents)
+    sesq = np.einsum("ckab,na,nb->nck", basis["quadratic"], currents.conj(), currents)
+    bilin = np.einsum("ckab,na,nb->nck", basis["quadratic"], currents, currents)
+
+    values = np.broadcast_to(basis["constant"], lin.shape).copy()
+    values[..., kinds == "linear"] = lin[..., kinds == "linear"]
+    values[..., kinds == "sesquilinear"] = sesq[..., kinds == "sesquilinear"]
+    values[..., kinds == "bilinear"] = bilin[..., kinds == "bilinear"]
+    values[..., ~basis["valid"]] = np.nan
+    return values
+
+
+def _values_to_rows(basis, values, extra_columns):
+    """
+    Wandelt ausgewertete Werte in Ergebniszeilen um, mit derselben
+    Spaltenreihenfolge wie die Zeilen eines Sweeps.
+    """
+    column_index = {col: k for k, col in enumerate(basis["columns"])}
+    rows = []
+    for n, extra in enumerate(extra_columns):
+        for c_idx, static in enumerate(basis["static"]):
+            row_values = {"pos_name": basis["pos_name"], **extra, **static}
+            for col, k_idx in column_index.items():
+                if not basis["valid"][c_idx, k_idx]:
+                    continue
+                value = values[n, c_idx, k_idx]
+                if col == VOLTAGE_KEY:
+                    row_values[VOLTAGE_COLUMNS[0]] = value.real
+                    row_values[VOLTAGE_COLUMNS[1]] = value.imag
+                else:
+                    row_values[col] = value
+            res = {
+                col: row_values[col]
+                for col in basis["row_columns"]
+                if col in row_values
+            }
+            res.update(row_values)
+            rows.append(res)
+    return rows
+
+
+def evaluate_sweep(basis, electrical_system, angles_deg, current_name):
+    """
+    Erzeugt die Ergebniszeilen eines klassischen Winkel-Sweeps (reelle
+    Momentanströme je Winkel) aus der Basis.
+    """
+    currents = np.array(
+        [
+            [
+                calculate_instantaneous_current(
+                    phase["peakCurrentA"], phase["phaseShiftDeg"], angle
+                )
+                for phase in _ordered_phases(basis, electrical_system)
+            ]
+            for angle in angles_deg
+        ]
+    )
+    values = evaluate_basis(basis, currents)
+    extra_columns = [
+        {
+            "current_name": current_name,
+            "run_identifier": make_run_identifier(
+                basis["pos_name"], current_name, angle
+            ),
+            "phaseAngle_deg": float(angle),
+        }
+        for angle in angles_deg
+    ]
+    return _values_to_rows(basis, values, extra_columns)
+
+
+def _ordered_phases(basis, electrical_system):
+    """Ordnet die Phasen des elektrischen Systems in der Reihenfolge der Basis an."""
+    by_name = {phase["name"]: phase for phase in electrical_system}
+    return [
+        by_name.get(name, {"name": name, "peakCurrentA": 0, "phaseShiftDeg": 0})
+        for name in basis["phases"]
+    ]
+
+
+def scenario_electrical_system(run_data, rms=None, overrides=None):
+    """
+    Erstellt das elektrische System eines neuen Stromszenarios.
+
+    Args:
+        run_data (dict): Die `simulation_run.json` des Laufs.
+        rms (float, optional): Effektivwert für alle Phasen (wie `I_x_mes`).
+        overrides (dict, optional): `{phase: (effektivwert, phasenlage)}` für
+            einzelne Phasen; eine Phasenlage `None` übernimmt die Konfiguration.
+    """
+    overrides = overrides or {}
+    electrical_system = []
+    for phase in run_data.get("electricalSystem", []):
+        phase_rms, shift = overrides.get(phase["name"], (rms, None))
+        if phase_rms is None:
+            phase_rms = phase["peakCurrentA"] / np.sqrt(2)
+        electrical_system.append(
+            {
+                "name": phase["name"],
+                "peakCurrentA": float(phase_rms) * np.sqrt(2),
+                "phaseShiftDeg": phase["phaseShiftDeg"] if shift is None else shift,
+            }
+        )
+    return electrical_system
+
+
+def evaluate_scenario(
+    run_path, electrical_system, positions=None, angles_deg=None, current_name="custom"
+):
+    """
+    Wertet ein Stromszenario für alle (oder die angegebenen) Positionsschritte
+    eines Laufs aus. Mit `angles_deg` entstehen Zeilen wie bei einem Sweep,
+    sonst eine komplexe Zeiger-Zeile je Leiter.
+    """
+    rows = []
+    for pos_name in positions or list_basis_positions(run_path):
+        basis = load_basis(run_path, pos_name)
+        if angles_deg is not None:
+            rows.extend(
+                evaluate_sweep(basis, electrical_system, angles_deg, current_name)
+            )
+        else:
+            currents = {
+                p["name"]: calculate_phasor_current(
+                    p["peakCurrentA"], p["phaseShiftDeg"]
+                )
+                for p in _ordered_phases(basis, electrical_system)
+            }
+            values = evaluate_basis(basis, currents)
+            rows.extend(
+                _values_to_rows(basis, values, [{"current_name": current_name}])
+            )
+    return rows
+
+
+def _parse_current_arguments(values):
+    """Parst `NAME=EFFEKTIVWERT@WINKEL`-Angaben der Kommandozeile."""
+    currents = {}
+    for value in values or []:
+        name, spec = value.split("=", 1)
+        rms, _, shift = spec.partition("@")
+        currents[name] = (float(rms), float(shift) if shift else None)
+    return currents
+
+
+def main(argv=None):
+    """Kommandozeilen-Einstieg zur Auswertung neuer Ströme gegen eine Basis."""
+    parser = argparse.ArgumentParser(
+        description="Wertet Stromkombinationen gegen eine gespeicherte Basis aus."
+    )
+    parser.add_argument("run_path", help="Ordner des Simulationslaufs")
+    parser.add_argument(
+        "--pos", action="append", help="Positionsschritt(e), Standard: alle"
+    )
+    parser.add_argument(
+        "--rms", type=float, help="Effektivwert für alle Phasen (wie I_x_mes)"
+    )
+    parser.add_argument(
+        "--current",
+        action="append",
+        help="Strom einer Phase als NAME=EFFEKTIVWERT[@PHASENLAGE_GRAD]",
+    )
+    parser.add_argument(
+        "--angles",
+        help="Winkel-Sweep als START:ENDE:SCHRITT, sonst eine komplexe Auswertung",
+    )
+    parser.add_argument("--name", default="custom", help="Wert für current_name")
+    parser.add_argument("--output", help="CSV-Ausgabedatei, Standard: stdout")
+    args = parser.parse_args(argv)
+
+    with open(
+        os.path.join(args.run_path, "simulation_run.json"), "r", encoding="utf-8"
+    ) as f:
+        run_data = json.load(f)
+
+    electrical_system = scenario_electrical_system(
+        run_data, args.rms, _parse_current_arguments(args.current)
+    )
+    angles = None
+    if args.angles:
+        start, end, step = (float(v) for v in args.angles.split(":"))
+        angles = np.arange(start, end + step, step)
+
+    rows = evaluate_scenario(
+        args.run_path, electrical_system, args.pos, angles, args.name
+    )
+    df = pd.DataFrame(rows)
+    df.to_csv(args.output if args.output else sys.stdout, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
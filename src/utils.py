@@ -2,9 +2,64 @@
 """
 Hilfsfunktionen für die Simulations-Logik.
 """
+import os
+
 import numpy as np
 
+# Ausgabeordner der Läufe und ihrer gemeinsamen Daten (Cache, Laufzeiten),
+# unabhängig vom Arbeitsverzeichnis
+SIMULATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulations"
+)
+
 
 def calculate_instantaneous_current(peak_current, phase_shift_deg, angle_deg):
     """Berechnet den Momentanstrom für einen gegebenen Phasenwinkel."""
     return peak_current * np.cos(np.deg2rad(angle_deg + phase_shift_deg))
+
+
+def calculate_phasor_current(peak_current, phase_shift_deg):
+    """
+    Berechnet den komplexen Stromzeiger einer Phase.
+    Der Realteil von `I * exp(j * Winkel)` entspricht dem Momentanstrom.
+    """
+    return complex(peak_current * np.exp(1j * np.deg2rad(phase_shift_deg)))
+
+
+def phase_sweep_angles(run_data):
+    """Berechnet die Phasenwinkel aus dem `phaseSweep` der Konfiguration."""
+    phase_sweep = run_data["scenarioParams"]["phaseSweep"]
+    return np.arange(
+        float(phase_sweep["start"]),
+        float(phase_sweep["end"]) + float(phase_sweep["step"]),
+        float(phase_sweep["step"]),
+    )
+
+
+def is_linear_configuration(run_data):
+    """Prüft, ob alle Materialien der Konfiguration linear sind."""
+    return not any(
+        mat.get("is_nonlinear") and mat.get("bh_curve")
+        for mat in run_data.get("materials", [])
+    )
+
+
+def make_run_identifier(pos_name, current_name, angle_deg):
+    """Erzeugt den eindeutigen Namen einer Einzelsimulation."""
+    return f"{pos_name}_{current_name}_angle{int(angle_deg)}"
+
+
+def json_default(value):
+    """Serialisiert komplexe Zahlen und NumPy-Skalare für JSON."""
+    if isinstance(value, (complex, np.complexfloating)):
+        return {"__complex__": [float(value.real), float(value.imag)]}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Typ {type(value).__name__} ist nicht serialisierbar.")
+
+
+def json_object_hook(obj):
+    """Stellt die mit `json_default` kodierten komplexen Zahlen wieder her."""
+    if "__complex__" in obj and len(obj) == 1:
+        return complex(*obj["__complex__"])
+    return obj
@@ -1,6 +1,10 @@
 // static/js/configurator-simulation.js
 
 let progressInterval;
+let progressSource;
+
+// Anzahl der Log-Zeilen, die in der Ausgabe angezeigt werden
+const MAX_LOG_LINES = 200;
 
 /**
  * Startet den Simulationsprozess im Backend.
@@ -22,7 +26,7 @@ function startSimulation() {
       if (data.status === "success") {
         outputElement.textContent =
           "Simulation im Hintergrund gestartet. Warte auf Fortschritt...";
-        pollProgress();
+        followProgress();
       } else {
         outputElement.textContent = `Fehler: ${data.error}`;
         startButton.disabled = false;
@@ -34,6 +38,94 @@ function startSimulation() {
     });
 }
 
+/**
+ * Empfängt Fortschritt, erledigte Aufgaben und Log-Meldungen per
+ * Server-Sent Events. Ohne EventSource oder bei einem Verbindungsfehler
+ * wird auf das periodische Abfragen zurückgegriffen.
+ */
+function followProgress() {
+  if (typeof EventSource === "undefined") {
+    pollProgress();
+    return;
+  }
+  const startTime = Date.now();
+  const timerElement = document.getElementById("progress-timer");
+  const outputElement = document.getElementById("simulation-output");
+  let logLines = [];
+
+  progressInterval = setInterval(() => {
+    const elapsedTime = (Date.now() - startTime) / 1000;
+    timerElement.textContent = `Verstrichene Zeit: ${formatTime(elapsedTime)}`;
+  }, 1000);
+
+  const stopFollowing = () => {
+    progressSource.close();
+    progressSource = null;
+    clearInterval(progressInterval);
+  };
+
+  progressSource = new EventSource("/simulation_events");
+  progressSource.onmessage = (message) => {
+    const data = JSON.parse(message.data);
+    if (data.type === "progress") {
+      if (renderProgress(data)) {
+        stopFollowing();
+      }
+    } else if (data.type === "task") {
+      renderProgress({ status: "running", ...data }, false);
+    } else if (data.type === "log") {
+      logLines.push(data.message);
+      logLines = logLines.slice(-MAX_LOG_LINES);
+      outputElement.textContent = logLines.join("\n");
+    } else if (data.type === "end" || data.type === "idle") {
+      stopFollowing();
+      if (data.returncode) {
+        document.getElementById(
+          "progress-text"
+        ).textContent = `Simulation mit Fehler beendet (Exit Code ${data.returncode}).`;
+      }
+      document.getElementById("start-simulation-btn").disabled = false;
+    }
+  };
+  progressSource.onerror = () => {
+    console.warn("Event-Stream unterbrochen, frage den Fortschritt ab.");
+    stopFollowing();
+    pollProgress();
+  };
+}
+
+/**
+ * Zeigt einen Fortschrittsstand an.
+ * @param {object} data Der Status des Runners.
+ * @param {boolean} [withStatistics=true] Durchsatz und Restzeit aktualisieren.
+ * @returns {boolean} true, wenn die Simulation beendet ist.
+ */
+function renderProgress(data, withStatistics = true) {
+  const progressBar = document.getElementById("progress-bar");
+  const progressText = document.getElementById("progress-text");
+  const progressSummary = document.getElementById("progress-summary");
+
+  if (data.status === "running") {
+    const percent = data.total > 0 ? (data.completed / data.total) * 100 : 0;
+    progressBar.style.width = `${percent}%`;
+    progressText.textContent = `${data.completed} / ${data.total} Teilschritte abgeschlossen.`;
+    if (withStatistics) {
+      progressSummary.textContent = formatRunStatistics(data);
+    }
+  } else if (data.status === "complete") {
+    progressBar.style.width = "100%";
+    progressText.textContent = `Simulation abgeschlossen!`;
+    progressSummary.textContent = `Gesamtdauer: ${formatTime(data.duration)}`;
+    document.getElementById("progress-timer").textContent = "";
+    document.getElementById("start-simulation-btn").disabled = false;
+    return true;
+  } else if (data.status === "idle") {
+    document.getElementById("start-simulation-btn").disabled = false;
+    return true;
+  }
+  return false;
+}
+
 /**
  * Fragt den Fortschritt der Simulation periodisch vom Backend ab.
  */
@@ -45,32 +137,13 @@ function pollProgress() {
     fetch("/simulation_progress")
       .then((response) => response.json())
       .then((data) => {
-        const progressBar = document.getElementById("progress-bar");
-        const progressText = document.getElementById("progress-text");
-        const progressSummary = document.getElementById("progress-summary");
-
         const elapsedTime = (Date.now() - startTime) / 1000;
         timerElement.textContent = `Verstrichene Zeit: ${formatTime(
           elapsedTime
         )}`;
 
-        if (data.status === "running") {
-          const percent =
-            data.total > 0 ? (data.completed / data.total) * 100 : 0;
-          progressBar.style.width = `${percent}%`;
-          progressText.textContent = `${data.completed} / ${data.total} Teilschritte abgeschlossen.`;
-        } else if (data.status === "complete") {
-          progressBar.style.width = "100%";
-          progressText.textContent = `Simulation abgeschlossen!`;
-          progressSummary.textContent = `Gesamtdauer: ${formatTime(
-            data.duration
-          )}`;
-          timerElement.textContent = "";
+        if (renderProgress(data)) {
           clearInterval(progressInterval);
-          document.getElementById("start-simulation-btn").disabled = false;
-        } else if (data.status === "idle") {
-          clearInterval(progressInterval);
-          document.getElementById("start-simulation-btn").disabled = false;
         }
       })
       .catch((error) => {
@@ -81,6 +154,33 @@ function pollProgress() {
   }, 2000);
 }
 
+/**
+ * Fasst Durchsatz, Restzeit, langsamste und laufende Aufgaben zusammen.
+ * @param {object} data Der Status von /simulation_progress.
+ * @returns {string} Die Zusammenfassung, leer solange keine Messwerte vorliegen.
+ */
+function formatRunStatistics(data) {
+  const parts = [];
+  if (data.throughput_per_s) {
+    parts.push(`${data.throughput_per_s.toFixed(2)} Teilschritte/s`);
+  }
+  if (data.eta_s !== null && data.eta_s !== undefined) {
+    parts.push(`Restzeit ca. ${formatTime(data.eta_s)}`);
+  }
+  if (data.slowest_tasks && data.slowest_tasks.length > 0) {
+    const slowest = data.slowest_tasks[0];
+    parts.push(`Langsamster: ${slowest.task} (${formatTime(slowest.seconds)})`);
+  }
+  if (data.in_flight && data.in_flight.length > 0) {
+    parts.push(
+      `Läuft: ${data.in_flight
+        .map((task) => `${task.task} (${formatTime(task.running_s)})`)
+        .join(", ")}`
+    );
+  }
+  return parts.join(" · ");
+}
+
 /**
  * Formatiert Sekunden in ein lesbares Zeitformat (z.B. 1h 2m 3s).
  * @param {number} seconds Die zu formatierende Zeit in Sekunden.
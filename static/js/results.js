@@ -17,6 +17,9 @@ document.addEventListener("DOMContentLoaded", () => {
   const playPauseBtn = document.getElementById("play-pause-btn");
   const speedSlider = document.getElementById("speed-slider");
   const speedDisplay = document.getElementById("speed-display");
+  // Abfrageintervall, solange FEMM-Bilder im Hintergrund gerendert werden (ms)
+  const femmPlotPollInterval = 3000;
+  let femmPlotPollTimer = null;
 
   let simulationRuns = [];
   const storageKey = "resultsSelection";
@@ -295,6 +298,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const posGroup = positionSelector.value;
     const currentGroup = currentSelector.value;
 
+    clearTimeout(femmPlotPollTimer);
     stopAnimation();
     densityPlotList = [];
     vectorPlotList = [];
@@ -351,6 +355,14 @@ document.addEventListener("DOMContentLoaded", () => {
         } else {
           vectorLoading.style.display = "none";
         }
+
+        if (data.pending > 0) {
+          if (densityPlotList.length === 0) {
+            densityLoading.textContent = `${data.pending} Plots werden gerendert...`;
+            vectorLoading.textContent = densityLoading.textContent;
+          }
+          femmPlotPollTimer = setTimeout(fetchFemmPlots, femmPlotPollInterval);
+        }
       })
       .catch((error) => {
         console.error("Fehler beim Laden der FEMM-Plots:", error);
@@ -13,6 +13,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
   const speedMap = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0];
   const baseInterval = 200;
+  // Abfrageintervall, solange FEMM-Bilder im Hintergrund gerendert werden (ms)
+  const femmPlotPollInterval = 3000;
 
   // Zustand und Daten
   let simulationRuns = [];
@@ -224,6 +226,7 @@ document.addEventListener("DOMContentLoaded", () => {
     let imageTransform = { scale: 1, translateX: 0, translateY: 0 };
     let currentPositionGroup = null;
     let animationInterval = null;
+    let femmPlotPollTimer = null;
 
     runSelector.addEventListener("change", (event) =>
       handleRunChange(event.detail || {})
@@ -444,6 +447,7 @@ document.addEventListener("DOMContentLoaded", () => {
     function fetchFemmPlots() {
       const runIndex = runSelector.value;
       const currentGroup = currentSelector.value;
+      clearTimeout(femmPlotPollTimer);
       if (!runIndex || !currentGroup || !currentPositionGroup) {
         return;
       }
@@ -477,10 +481,16 @@ document.addEventListener("DOMContentLoaded", () => {
             updatePlotByIndex(angleSlider.value);
             densityLoading.style.display = "none";
           } else {
-            densityLoading.textContent = "Keine Plots verfügbar.";
+            densityLoading.textContent =
+              data.pending > 0
+                ? `${data.pending} Plots werden gerendert...`
+                : "Keine Plots verfügbar.";
             playBtn.disabled = true;
           }
           updateGlobalSlider();
+          if (data.pending > 0) {
+            femmPlotPollTimer = setTimeout(fetchFemmPlots, femmPlotPollInterval);
+          }
         })
         .catch((err) => {
           densityLoading.textContent = "Fehler beim Laden.";
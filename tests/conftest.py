@@ -0,0 +1,53 @@
+# tests/conftest.py
+"""Gemeinsame Fixtures: kleine Läufe des `SimulationRunner` mit dem replay-Backend."""
+import copy
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def replay_config(tmp_path):
+    """
+    Die Konfiguration aus `fixtures/replay_run.json` für das replay-Backend,
+    ohne Bilder und mit Cache und Laufzeit-Historie im temporären Ordner.
+    """
+    with open(os.path.join(FIXTURES, "replay_run.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["simulation_meta"].update(
+        {
+            "femmBackend": "replay",
+            "plotMode": "off",
+            "workers": 2,
+            "solveCache": {"path": str(tmp_path / "solve_cache")},
+            "schedulerHistoryPath": str(tmp_path / "scheduler_history.json"),
+        }
+    )
+    return config
+
+
+@pytest.fixture
+def run_replay(tmp_path):
+    """Führt einen Lauf mit einer Konfiguration aus und gibt seinen Ordner zurück."""
+    from src.simulation_runner import SimulationRunner
+
+    count = [0]
+
+    def run(config, **meta):
+        config = copy.deepcopy(config)
+        config["simulation_meta"].update(meta)
+        count[0] += 1
+        config_path = tmp_path / f"config_{count[0]}.json"
+        config_path.write_text(json.dumps(config), encoding="utf-8")
+        run_path = str(tmp_path / f"run_{count[0]}")
+        SimulationRunner(config_path=str(config_path), base_path=run_path).run()
+        return run_path
+
+    return run
@@ -0,0 +1,99 @@
+# tests/fixtures/baseline_femm/femm.py
+"""
+Ersatz für das pyfemm-Modul `femm`, mit dem der Ausgangsstand (vor dem
+Backend-Umbau) ohne FEMM läuft. Die Werte entsprechen genau dem Modell von
+`ReplayBackend` in `src.femm_backends`: gleiche Koeffizienten, gleicher
+Zustand je Dokument, Ströme und Gruppen. Das Modul ist bewusst eigenständig,
+weil der Ausgangsstand `src.femm_backends` noch nicht kennt.
+
+Verwendet von `tests/fixtures/make_baseline.py`.
+"""
+import math
+import os
+import zlib
+
+SYNTHETIC_SCALE = 1e-3
+DOUBLE_FREQUENCY_TYPES = {13, 14, 16, 20, 21, 23}
+# Ordnung der Blockintegrale wie in `src.block_integrals.BLOCK_INTEGRAL_TYPES`
+ORDERS = {t: 2 for t in range(31)}
+ORDERS.update({t: 1 for t in (1, 7, 8, 9, 25, 26, 27, 28, 29, 30)})
+ORDERS.update({t: 0 for t in (5, 10, 24)})
+
+_state = {"document": None, "frequency": 0.0, "circuits": {}, "groups": set()}
+
+
+def _coefficient(*parts):
+    seed = zlib.crc32(":".join(str(p) for p in parts).encode("utf-8"))
+    magnitude = 0.5 + (seed % 1000) / 1000.0
+    sign = 1 if (seed // 1000) % 2 else -1
+    return SYNTHETIC_SCALE * magnitude * sign
+
+
+def _linear(*parts):
+    return sum(
+        _coefficient(*parts, circuit) * current
+        for circuit, current in sorted(_state["circuits"].items())
+    )
+
+
+def newdocument(doc_type=0):
+    _state.update(document=None, circuits={}, groups=set())
+
+
+def mi_probdef(frequency, *args):
+    _state["frequency"] = float(frequency)
+
+
+def mi_addcircprop(name, current, circuit_type=1):
+    _state["circuits"][name] = complex(current)
+
+
+def mi_saveas(path):
+    _state["document"] = path
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[Format] = 4.0\n")
+
+
+def mi_analyze(flag=1):
+    if _state["document"]:
+        with open(os.path.splitext(_state["document"])[0] + ".ans", "w") as f:
+            f.write("[Format] = 4.0\n")
+
+
+def mo_savebitmap(path):
+    with open(path, "wb") as f:
+        f.write(b"")
+
+
+def mo_groupselectblock(group):
+    _state["groups"].add(int(group))
+
+
+def mo_clearblock():
+    _state["groups"] = set()
+
+
+def mo_blockintegral(int_type):
+    int_type = int(int_type)
+    group = tuple(sorted(_state["groups"]))
+    order = ORDERS.get(int_type, 1)
+    if order == 0:
+        return abs(_coefficient(group, int_type))
+    linear = _linear(group, int_type)
+    if order == 1:
+        return linear
+    if int_type in DOUBLE_FREQUENCY_TYPES:
+        return linear * linear
+    return abs(linear) ** 2
+
+
+def mo_getcircuitproperties(name):
+    current = _state["circuits"].get(name, 0j)
+    flux = _linear("circuit", name)
+    return (current, 2j * math.pi * _state["frequency"] * flux, flux)
+
+
+def __getattr__(name):
+    if name.startswith("_"):
+        raise AttributeError(name)
+    return lambda *args: None
@@ -0,0 +1,64 @@
+# tests/fixtures/make_baseline.py
+"""
+Erzeugt die Referenz-CSVs in `tests/fixtures/baseline/` mit dem Ausgangsstand
+des Repositorys (Commit BASELINE_COMMIT) und dem Modul `femm` aus
+`baseline_femm/`, das die Modellwerte des replay-Backends liefert.
+
+Aufruf aus dem Wurzelordner:
+    python tests/fixtures/make_baseline.py
+"""
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BASELINE_COMMIT = "0ee40c9"
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(FIXTURES))
+CONFIG = os.path.join(FIXTURES, "replay_run.json")
+TARGET = os.path.join(FIXTURES, "baseline")
+
+RUN_SCRIPT = """
+import logging, sys
+from src.simulation_runner import SimulationRunner
+logging.basicConfig(level=logging.WARNING)
+SimulationRunner(config_path=sys.argv[1], base_path=sys.argv[2]).run()
+"""
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        tree = os.path.join(tmp, "baseline")
+        subprocess.run(
+            ["git", "-C", ROOT, "worktree", "add", "--detach", tree, BASELINE_COMMIT],
+            check=True,
+        )
+        try:
+            run_path = os.path.join(tmp, "run")
+            env = dict(
+                os.environ,
+                PYTHONPATH=os.pathsep.join(
+                    [os.path.join(FIXTURES, "baseline_femm"), tree]
+                ),
+            )
+            subprocess.run(
+                [sys.executable, "-c", RUN_SCRIPT, CONFIG, run_path],
+                cwd=tree,
+                env=env,
+                check=True,
+            )
+            os.makedirs(TARGET, exist_ok=True)
+            for path in sorted(glob.glob(os.path.join(run_path, "*_summary.csv"))):
+                shutil.copy(path, TARGET)
+                print(os.path.relpath(os.path.join(TARGET, os.path.basename(path))))
+        finally:
+            subprocess.run(
+                ["git", "-C", ROOT, "worktree", "remove", "--force", tree], check=True
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# tests/fixtures/make_femm_integrals.py
+"""
+Zeichnet in `tests/fixtures/femm_integrals/` echte Blockintegrale von FEMM
+auf (pyfemm, nur Windows): Ein Positionsschritt aus `replay_run.json` wird
+je Modus ("sweep": Magnetostatik, "phasor": Wechselstrom) mit dem Backend
+"recording" und `postProcessor` "femm" gelöst. Je Modus landen in
+`<modus>/` die Aufzeichnung `femm_calls_<pid>.jsonl` (alle Aufrufe mit den
+Ergebnissen von `mo_blockintegral` und `mo_getcircuitproperties`) und die
+.ans-Dateien der Lösungen. `test_fem_solution.py` rechnet die Integrale mit
+`FemSolution` nach.
+
+Aufruf aus dem Wurzelordner:
+    python tests/fixtures/make_femm_integrals.py
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(FIXTURES))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from src.block_integrals import BLOCK_INTEGRAL_TYPES
+from src.fem_solution import STRESS_TENSOR_TYPES
+from src.simulation_runner import SimulationRunner
+
+CONFIG = os.path.join(FIXTURES, "replay_run.json")
+TARGET = os.path.join(FIXTURES, "femm_integrals")
+MODES = ("sweep", "phasor")
+
+
+def main():
+    with open(CONFIG, "r", encoding="utf-8") as f:
+        run_data = json.load(f)
+    meta = run_data["simulation_meta"]
+    # Ein Positionsschritt, ein Messstrom und zwei Winkel halten die
+    # Lösungsdateien klein; abgefragt werden alle Integrale außer dem
+    # Spannungstensor
+    meta["bewegungspfade_alle_leiter"]["schritte_details"] = meta[
+        "bewegungspfade_alle_leiter"
+    ]["schritte_details"][:1]
+    run_data["scenarioParams"]["I_2_mes"] = "0"
+    run_data["scenarioParams"]["phaseSweep"] = {"start": "0", "end": "30", "step": "30"}
+    meta.update(
+        {
+            "selectedIntegrals": [
+                t for t in BLOCK_INTEGRAL_TYPES if t not in STRESS_TENSOR_TYPES
+            ],
+            "postProcessor": "femm",
+            "plotMode": "off",
+            "workers": 1,
+            "solveCache": {"enabled": False},
+        }
+    )
+
+    for mode in MODES:
+        target = os.path.join(TARGET, mode)
+        shutil.rmtree(target, ignore_errors=True)
+        os.makedirs(target)
+        with tempfile.TemporaryDirectory() as tmp:
+            meta["runMode"] = mode
+            meta["femmBackend"] = {
+                "type": "recording",
+                "inner": "pyfemm",
+                "logDir": target,
+            }
+            meta["schedulerHistoryPath"] = os.path.join(tmp, "history.json")
+            config_path = os.path.join(tmp, "config.json")
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump(run_data, f)
+            run_path = os.path.join(tmp, "run")
+            SimulationRunner(config_path=config_path, base_path=run_path).run()
+            for path in glob.glob(
+                os.path.join(run_path, "femm_files", "**", "*.ans"), recursive=True
+            ):
+                shutil.copy(path, target)
+        for path in sorted(os.listdir(target)):
+            print(os.path.relpath(os.path.join(target, path)))
+
+
+if __name__ == "__main__":
+    main()
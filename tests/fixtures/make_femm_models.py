@@ -0,0 +1,87 @@
+# tests/fixtures/make_femm_models.py
+"""
+Erzeugt die Referenzmodelle in `tests/fixtures/femm_models/` mit FEMM
+(pyfemm, nur Windows): Für einige Positionsschritte und Winkel aus
+`replay_run.json` wird das Modell
+
+    <name>_femm.fem    Befehl für Befehl in FEMM gezeichnet und gespeichert
+    <name>_direct.fem  mit `src.fem_writer` geschrieben, in FEMM geöffnet,
+                       dort mit `mi_makeABC` abgeschlossen und gespeichert
+
+und in `<name>.json` der Winkel, das elektrische System und die Baugruppen
+des Schritts abgelegt. Beide Dateien schreibt FEMM; `test_fem_writer.py`
+vergleicht sie.
+
+Aufruf aus dem Wurzelordner:
+    python tests/fixtures/make_femm_models.py
+"""
+import json
+import os
+import sys
+import tempfile
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(FIXTURES))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from src.femm_wrapper import FEMMSession
+from src.simulation_runner import SimulationRunner
+from src.simulation_worker import prepare_model
+
+CONFIG = os.path.join(FIXTURES, "replay_run.json")
+TARGET = os.path.join(FIXTURES, "femm_models")
+
+# (Positionsschritt, Messstrom, Winkel) der Referenzmodelle
+VARIANTS = (("pos_1", "I_1_mes", 0.0), ("pos_2", "I_2_mes", 30.0))
+
+
+def main():
+    with open(CONFIG, "r", encoding="utf-8") as f:
+        run_data = json.load(f)
+    run_data["simulation_meta"]["femmBackend"] = "pyfemm"
+    run_data["simulation_meta"]["solveCache"] = {"enabled": False}
+    os.makedirs(TARGET, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config_path = os.path.join(tmp, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(run_data, f)
+        runner = SimulationRunner(config_path, os.path.join(tmp, "run"))
+        step_configs = {
+            (pos_name, current_name): step_config
+            for pos_name, current_name, _, step_config, _ in runner._iter_task_groups()
+        }
+
+    femm = FEMMSession(visible=False, backend="pyfemm")
+    try:
+        for pos_name, current_name, angle in VARIANTS:
+            step_config = step_configs[(pos_name, current_name)]
+            name = f"{pos_name}_{current_name}_angle{int(angle)}"
+            for builder in ("femm", "direct"):
+                run_data["simulation_meta"]["modelBuilder"] = builder
+                prepare_model(
+                    femm,
+                    run_data,
+                    step_config,
+                    angle,
+                    os.path.join(TARGET, f"{name}_{builder}.fem"),
+                )
+                femm.close_documents()
+            with open(os.path.join(TARGET, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "angle": angle,
+                        "electricalSystem": step_config["electricalSystem"],
+                        "assemblies": step_config["assemblies"],
+                    },
+                    f,
+                    indent=2,
+                )
+            print(os.path.relpath(os.path.join(TARGET, name)))
+    finally:
+        femm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# tests/test_adaptive_sweep.py
+"""Verfeinerung der Winkel im Modus "adaptive" an synthetischen Verläufen."""
+import numpy as np
+import pytest
+
+from src.adaptive_sweep import complete_rows, loo_errors, refinement_angles
+
+TARGETS = [float(angle) for angle in range(0, 360, 15)]
+SAMPLES = [float(angle) for angle in range(0, 360, 45)]
+
+
+def response_rows(response, angles):
+    """Zeilen eines Leiters mit dem Verlauf `response(θ)` als Stromspalte."""
+    return [
+        {
+            "pos_name": "pos_1",
+            "current_name": "I_1_mes",
+            "run_identifier": f"pos_1_I_1_mes_angle{angle}",
+            "conductor": "L1",
+            "phaseAngle_deg": angle,
+            "conductor_I_ges_A": float(response(np.deg2rad(angle))),
+        }
+        for angle in angles
+    ]
+
+
+def linear_response(theta):
+    """Grundschwingung und 2x-Anteil wie bei linearen Materialien."""
+    return np.cos(theta) + 0.3 * np.cos(2 * theta + 0.4)
+
+
+def test_linear_response_needs_no_refinement():
+    rows = response_rows(linear_response, SAMPLES)
+
+    assert refinement_angles(rows, TARGETS) == []
+    completed = complete_rows(rows, TARGETS)
+    assert sorted(row["phaseAngle_deg"] for row in completed) == TARGETS
+    for row in completed:
+        assert row["conductor_I_ges_A"] == pytest.approx(
+            linear_response(np.deg2rad(row["phaseAngle_deg"]))
+        )
+
+
+def test_third_harmonic_refines_next_to_the_bad_samples():
+    def response(theta):
+        return linear_response(theta) + 0.05 * np.cos(3 * theta)
+
+    rows = response_rows(response, SAMPLES)
+    errors = loo_errors(
+        np.array(SAMPLES), np.array([[row["conductor_I_ges_A"]] for row in rows])
+    )
+    # Der 3x-Anteil ist bei 0° und 180° am größten, bei 90° und 270° null
+    bad = [angle for angle, error in zip(SAMPLES, errors) if error > 0.08]
+    assert bad == [0.0, 180.0]
+
+    # Je angrenzender Lücke der mittlere ungelöste Zielwinkel
+    assert refinement_angles(rows, TARGETS, tolerance=0.08) == [30.0, 150.0, 210.0]
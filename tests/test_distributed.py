@@ -0,0 +1,108 @@
+# tests/test_distributed.py
+"""Broker und Agent der verteilten Ausführung, mit Agenten als Threads."""
+import threading
+
+import pytest
+
+from src import distributed, simulation_worker
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(distributed, "POLL_INTERVAL", 0.05)
+    monkeypatch.delenv(distributed.TOKEN_ENV_VAR, raising=False)
+
+
+@pytest.fixture
+def fake_worker(monkeypatch):
+    """Ersetzt die Worker-Funktion: verdoppelt den Wert, scheitert bei 3."""
+    calls = []
+
+    def run_single_simulation(task):
+        calls.append(task[1])
+        if task[1] == 3:
+            raise OSError("FEMM nicht erreichbar")
+        return [{"value": task[1] * 2}]
+
+    monkeypatch.setattr(
+        simulation_worker, "run_single_simulation", run_single_simulation
+    )
+    return run_single_simulation, calls
+
+
+def start_agent(executor, token=None):
+    """Startet einen Agenten gegen den Broker des Executors."""
+    host, port = executor.broker.address[:2]
+    agent = threading.Thread(
+        target=distributed.run_agent,
+        args=(f"{host}:{port}",),
+        kwargs={"once": True, "backend": "replay", "token": token},
+        daemon=True,
+    )
+    agent.start()
+    return agent
+
+
+def batches(function, directory, values):
+    return [(i, function, [[str(directory), value]]) for i, value in enumerate(values)]
+
+
+def test_agent_solves_batches(tmp_path, fake_worker):
+    function, _ = fake_worker
+    with distributed.DistributedExecutor(
+        "127.0.0.1", 0, heartbeat_interval=0.1, token="secret"
+    ) as executor:
+        agent = start_agent(executor, "secret")
+        results = dict(
+            executor.imap_unordered(None, batches(function, tmp_path, [1, 2]))
+        )
+    agent.join(timeout=5)
+    assert not agent.is_alive()
+    assert {i: rows[0][0] for i, rows in results.items()} == {
+        0: [{"value": 2}],
+        1: [{"value": 4}],
+    }
+
+
+def test_failing_batch_is_retried_then_raised(tmp_path, fake_worker):
+    function, calls = fake_worker
+    with distributed.DistributedExecutor(
+        "127.0.0.1", 0, heartbeat_interval=0.1, max_retries=1
+    ) as executor:
+        agent = start_agent(executor)
+        results = {}
+        with pytest.raises(RuntimeError, match="FEMM nicht erreichbar"):
+            for index, rows in executor.imap_unordered(
+                None, batches(function, tmp_path, [3, 1])
+            ):
+                results[index] = rows
+        # Der Agent überlebt den Fehler und löst das andere Paket
+        assert agent.is_alive()
+    agent.join(timeout=5)
+    assert calls.count(3) == 2
+    assert 1 in calls
+
+
+def test_wrong_token_is_rejected(tmp_path, fake_worker):
+    function, calls = fake_worker
+    with distributed.DistributedExecutor(
+        "127.0.0.1", 0, token="secret", idle_timeout=0.3
+    ) as executor:
+        agent = start_agent(executor, "wrong")
+        agent.join(timeout=5)
+        assert not agent.is_alive()
+        with pytest.raises(TimeoutError):
+            list(executor.imap_unordered(None, batches(function, tmp_path, [1])))
+    assert not calls
+
+
+def test_overall_timeout(tmp_path, fake_worker):
+    function, _ = fake_worker
+    with distributed.DistributedExecutor("127.0.0.1", 0, timeout=0.2) as executor:
+        with pytest.raises(TimeoutError, match="Zeitlimit"):
+            list(executor.imap_unordered(None, batches(function, tmp_path, [1])))
+
+
+def test_public_address_requires_token():
+    with pytest.raises(ValueError):
+        distributed.TaskBroker("0.0.0.0", 0)
@@ -0,0 +1,171 @@
+# tests/test_fem_solution.py
+"""
+Die Auswertung der Lösungen in NumPy (`FemSolution`): analytisch an einem
+homogenen Feld und gegen die mit FEMM aufgezeichneten Blockintegrale aus
+`fixtures/femm_integrals/` (erzeugt mit `fixtures/make_femm_integrals.py`).
+"""
+import glob
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+from src.fem_solution import FemSolution
+from src.fem_writer import MU0, FemModel
+from src.utils import json_object_hook
+
+FEMM_INTEGRALS = os.path.join(os.path.dirname(__file__), "fixtures", "femm_integrals")
+
+
+def homogeneous_solution(tmp_path, frequency=50, **material):
+    """
+    Ein Quadrat von 1 m x 1 m aus einem Material mit A = y (Bx = 1 T, By = 0)
+    als .ans-Datei, gelesen als `FemSolution`.
+    """
+    model = FemModel()
+    model.new_document(0)
+    model.prob_def(frequency, "meters", "planar", 1e-8, 2)
+    model.add_material("Core", **material)
+    model.draw_rectangle(0, 0, 1, 1)
+    model.add_block_label(0.5, 0.5)
+    model.select_label(0.5, 0.5)
+    model.set_block_prop("Core", 1, 0, "<None>", 0, 1, 0)
+    nodes = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    lines = ["[Solution]", "4"] + [f"{x} {y} {y} 0" for x, y in nodes]
+    lines += ["2", "0 1 2 0", "0 2 3 0", "0"]
+    path = tmp_path / "homogeneous.ans"
+    path.write_text(model.to_text() + "\n".join(lines) + "\n", encoding="utf-8")
+    return FemSolution.load(str(path))
+
+
+def test_hysteresis_losses_follow_lag_angle(tmp_path):
+    mu, phi = 1000.0, 20.0
+    solution = homogeneous_solution(tmp_path, mu_x=mu, mu_y=mu, phi_hx=phi, phi_hy=phi)
+    values = solution.group_integrals([1], [2, 3, 4, 6])[1]
+
+    # Volumen 2 m³, B = 1 T, H = B / (μ0·μ·exp(−jφ)), zeitliche Mittelwerte
+    volume, h_abs = 2.0, 1.0 / (MU0 * mu)
+    omega = 2 * math.pi * 50
+    assert values[2] == pytest.approx(volume * h_abs * math.cos(math.radians(phi)) / 4)
+    expected_losses = volume * omega / 2 * h_abs * math.sin(math.radians(phi))
+    assert values[3] == pytest.approx(expected_losses)
+    assert values[4] == 0
+    assert values[6] == pytest.approx(expected_losses)
+
+
+def test_no_hysteresis_losses_without_frequency(tmp_path):
+    solution = homogeneous_solution(
+        tmp_path, frequency=0, mu_x=1000, mu_y=1000, phi_hx=20, phi_hy=20
+    )
+
+    assert solution.group_integrals([1], [3])[1][3] == 0
+
+
+@pytest.mark.parametrize(
+    "material",
+    [
+        {"mu_x": 1, "mu_y": 1, "h_c": 1e5},
+        {"mu_x": 1000, "mu_y": 1000, "lam_fill": 0.95},
+        {"mu_x": 1000, "mu_y": 1000, "c": 2, "d": 0.5},
+    ],
+)
+def test_integrals_femm_computes_differently_are_nan(tmp_path, material):
+    values = homogeneous_solution(tmp_path, **material).group_integrals(
+        [1], [2, 3, 5, 8, 17]
+    )[1]
+
+    for int_type in (2, 3, 17):
+        assert np.isnan(values[int_type]), int_type
+    assert values[5] == pytest.approx(1.0)
+    assert values[8] == pytest.approx(2.0)
+
+
+def test_nonlinear_material_has_no_energy(tmp_path):
+    solution = homogeneous_solution(tmp_path, frequency=0)
+    solution.model.materials["Core"]["bh_points"] = [(0, 0), (1, 200), (1.5, 2000)]
+
+    values = solution.group_integrals([1], [2, 8])[1]
+    assert np.isnan(values[2])
+    assert values[8] == pytest.approx(2.0)
+
+
+def recorded_queries(log_paths):
+    """
+    Geht die aufgezeichneten FEMM-Aufrufe durch und liefert je Abfrage die
+    gelöste Datei, die Auswahl und das Ergebnis von FEMM.
+
+    Yields:
+        tuple: (.ans-Name, Aufruf, Argumente, Auswahl, Ergebnis); die Auswahl
+        ist eine Liste von Gruppen oder ("point", x, y).
+    """
+    for log_path in log_paths:
+        document = None
+        selection = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line, object_hook=json_object_hook)
+                call, args = entry["call"], entry["args"]
+                if call in ("mi_saveas", "opendocument"):
+                    document = os.path.splitext(os.path.basename(args[0]))[0] + ".ans"
+                elif call == "mo_groupselectblock":
+                    selection.append(int(args[0]))
+                elif call == "mo_selectblock":
+                    selection.append(("point", float(args[0]), float(args[1])))
+                elif call == "mo_clearblock":
+                    selection = []
+                elif call in ("mo_blockintegral", "mo_getcircuitproperties"):
+                    yield document, call, args, list(selection), entry["result"]
+
+
+@pytest.mark.parametrize(
+    "mode",
+    sorted(
+        os.path.basename(path)
+        for path in glob.glob(os.path.join(FEMM_INTEGRALS, "*"))
+        if os.path.isdir(path)
+    )
+    or [
+        pytest.param(
+            None,
+            marks=pytest.mark.skip(
+                reason="keine FEMM-Aufzeichnung, siehe fixtures/femm_integrals/README.md"
+            ),
+        )
+    ],
+)
+def test_integrals_match_recorded_femm(mode):
+    directory = os.path.join(FEMM_INTEGRALS, mode)
+    solutions = {}
+    compared = 0
+    for document, call, args, selection, expected in recorded_queries(
+        sorted(glob.glob(os.path.join(directory, "femm_calls_*.jsonl")))
+    ):
+        if document not in solutions:
+            solutions[document] = FemSolution.load(os.path.join(directory, document))
+        solution = solutions[document]
+        if call == "mo_getcircuitproperties":
+            actual = solution.circuit_properties(args[0])
+            expected = [complex(v) for v in expected]
+        else:
+            labels = set()
+            for item in selection:
+                if isinstance(item, tuple):
+                    label = solution.label_at(item[1], item[2])
+                    labels.update([] if label is None else [label])
+                else:
+                    labels.update(solution.labels_in_groups([item]))
+            actual = solution.block_integral(args[0], labels)
+            if np.isnan(actual):
+                # FEMM rechnet dieses Integral anders; es wird dort abgefragt
+                continue
+        np.testing.assert_allclose(
+            np.atleast_1d(actual),
+            np.atleast_1d(complex(expected) if np.isscalar(expected) else expected),
+            rtol=1e-5,
+            atol=1e-12,
+            err_msg=f"{mode}/{document}: {call}{tuple(args)} {selection}",
+        )
+        compared += 1
+    assert compared
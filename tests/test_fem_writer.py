@@ -0,0 +1,181 @@
+# tests/test_fem_writer.py
+"""
+Der direkte .fem-Schreiber (`src.fem_writer`): Vorauswahl der Knoten- und
+Segmentpaare gegen die Prüfung aller Paare und das geschriebene Modell gegen
+Modelle, die FEMM gezeichnet und gespeichert hat
+(`fixtures/femm_models/`, erzeugt mit `fixtures/make_femm_models.py`).
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURES
+from src.fem_writer import (
+    NODE_TOLERANCE,
+    FemModel,
+    _check_crossings,
+    _split_segments,
+    read_fem,
+)
+from src.simulation_worker import build_fem_model
+
+FEMM_MODELS = os.path.join(FIXTURES, "femm_models")
+
+
+def split_all_pairs(nodes, segments):
+    """Teilt Segmente wie `_split_segments`, aber mit allen Knoten je Segment."""
+    pieces = []
+    for n0, n1 in segments:
+        start, direction = nodes[n0], nodes[n1] - nodes[n0]
+        length = np.hypot(*direction)
+        hits = []
+        for k, node in enumerate(nodes):
+            relative = node - start
+            along = relative @ direction / length
+            across = (relative[0] * direction[1] - relative[1] * direction[0]) / length
+            if (
+                abs(across) < NODE_TOLERANCE
+                and NODE_TOLERANCE < along < length - NODE_TOLERANCE
+            ):
+                hits.append((along, k))
+        chain = [n0] + [k for _, k in sorted(hits)] + [n1]
+        pieces.extend(zip(chain[:-1], chain[1:]))
+    return pieces
+
+
+def crossings_all_pairs(nodes, segments):
+    """Ob sich zwei Segmente außerhalb ihrer Knoten kreuzen, über alle Paare."""
+
+    def side(p, q, r):
+        value = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return 0 if abs(value) < NODE_TOLERANCE * np.hypot(*(q - p)) else value
+
+    for i, (a0, a1) in enumerate(segments):
+        for b0, b1 in segments[i + 1 :]:
+            p, q, r, s = nodes[a0], nodes[a1], nodes[b0], nodes[b1]
+            if side(p, q, r) * side(p, q, s) < 0 and side(r, s, p) * side(r, s, q) < 0:
+                return True
+    return False
+
+
+def grid_model(rng, size=6):
+    """Ein Gitter aus Rechtecken mit Knoten auf den Kanten und Zufallsknoten."""
+    nodes = [(x, y) for x in range(size) for y in range(size)]
+    nodes += [tuple(p) for p in rng.uniform(0, size - 1, size=(size, 2))]
+    nodes = np.array(nodes, dtype=float)
+    segments = [(0, size - 1), (0, size * (size - 1))]
+    for k in range(1, size):
+        segments.append((k * size, k * size + size - 1))
+        segments.append((k, size * (size - 1) + k))
+    return nodes, np.array(segments, dtype=np.int64)
+
+
+def test_split_matches_all_pairs():
+    rng = np.random.default_rng(7)
+    for _ in range(5):
+        nodes, segments = grid_model(rng)
+        got = {tuple(sorted(s)) for s in _split_segments(nodes, segments).tolist()}
+        want = {tuple(sorted(s)) for s in split_all_pairs(nodes, segments)}
+        assert got == want
+
+
+def test_crossings_match_all_pairs():
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        nodes = rng.uniform(0, 10, size=(16, 2))
+        segments = rng.choice(len(nodes), size=(3, 2), replace=False).astype(np.int64)
+        segments = segments[segments[:, 0] != segments[:, 1]]
+        expected = crossings_all_pairs(nodes, segments)
+        if expected:
+            with pytest.raises(ValueError):
+                _check_crossings(nodes, segments)
+        else:
+            _check_crossings(nodes, segments)
+
+
+def test_make_abc_is_left_to_femm():
+    model = FemModel()
+    model.prob_def(50, "millimeters", "planar", 1e-8, 10)
+    model.draw_rectangle(-1, -1, 1, 1)
+    model.make_abc(7, 100, 0, 0, 0)
+    assert model.abc == (7, 100, 0, 0, 0)
+    nodes, _, arcs = model.geometry()
+    assert len(nodes) == 4 and len(arcs) == 0
+
+    model.add_asymptotic_boundary()
+    assert model.abc is None
+    assert model.boundaries["ABC"]["type"] == 2
+    assert len(model.geometry()[2]) == 2
+
+
+def canonical(model):
+    """Vergleichbare Darstellung eines Modells, unabhängig von der Reihenfolge."""
+    nodes, segments, arcs = model.geometry()
+    points = np.round(nodes, 6)
+
+    def edges(pairs):
+        return sorted(
+            tuple(sorted((tuple(points[a]), tuple(points[b])))) for a, b in pairs
+        )
+
+    labels = sorted(
+        (
+            round(label["x"], 6),
+            round(label["y"], 6),
+            label["material"],
+            label["circuit"],
+            label["group"],
+            label["turns"],
+        )
+        for label in model.labels
+    )
+    return {
+        "problem": model.problem,
+        "nodes": sorted(map(tuple, points)),
+        "segments": edges(segments),
+        "arcs": edges(arcs),
+        "labels": labels,
+        "materials": model.materials,
+        "circuits": model.circuits,
+        "boundaries": model.boundaries,
+    }
+
+
+def femm_model_names():
+    return sorted(
+        os.path.basename(path)[: -len(".json")]
+        for path in glob.glob(os.path.join(FEMM_MODELS, "*.json"))
+    )
+
+
+@pytest.mark.skipif(
+    not femm_model_names(),
+    reason="Keine mit FEMM erzeugten Referenzmodelle, siehe fixtures/femm_models/README.md",
+)
+@pytest.mark.parametrize("name", femm_model_names())
+def test_direct_model_matches_femm(name):
+    with open(os.path.join(FIXTURES, "replay_run.json"), "r", encoding="utf-8") as f:
+        run_data = json.load(f)
+    with open(os.path.join(FEMM_MODELS, f"{name}.json"), "r", encoding="utf-8") as f:
+        variant = json.load(f)
+    step_config = dict(
+        run_data,
+        electricalSystem=variant["electricalSystem"],
+        assemblies=variant["assemblies"],
+    )
+
+    drawn = read_fem(os.path.join(FEMM_MODELS, f"{name}_femm.fem"))
+    direct = read_fem(os.path.join(FEMM_MODELS, f"{name}_direct.fem"))
+    assert canonical(direct) == canonical(drawn)
+
+    # Ohne den offenen Rand, den FEMM ergänzt, ist das geschriebene Modell
+    # ein Teil des gezeichneten
+    written = canonical(build_fem_model(run_data, step_config, variant["angle"]))
+    femm = canonical(drawn)
+    assert written["problem"] == femm["problem"]
+    assert set(written["nodes"]) <= set(femm["nodes"])
+    assert set(written["labels"]) <= set(femm["labels"])
+    assert written["circuits"] == femm["circuits"]
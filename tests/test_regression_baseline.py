@@ -0,0 +1,49 @@
+# tests/test_regression_baseline.py
+"""
+Vergleicht die CSV-Ausgabe eines Laufs mit dem replay-Backend mit der des
+Ausgangsstands (`fixtures/baseline/`, erzeugt mit `fixtures/make_baseline.py`).
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from conftest import FIXTURES
+
+BASELINE = os.path.join(FIXTURES, "baseline")
+
+
+def parse_column(values):
+    """Zahlen und als Text gespeicherte komplexe Werte als komplexes Array."""
+    return np.array(
+        [complex(str(v).replace(" ", "")) for v in values], dtype=np.complex128
+    )
+
+
+def test_sweep_matches_baseline(replay_config, run_replay):
+    replay_config["simulation_meta"]["solveCache"]["enabled"] = False
+    run_path = run_replay(replay_config, runMode="sweep")
+
+    baseline_files = sorted(glob.glob(os.path.join(BASELINE, "*_summary.csv")))
+    assert baseline_files
+    for baseline_path in baseline_files:
+        name = os.path.basename(baseline_path)
+        expected = pd.read_csv(baseline_path)
+        actual = pd.read_csv(os.path.join(run_path, name))
+        assert len(actual) == len(expected), name
+        assert not set(expected.columns) - set(actual.columns), name
+
+        keys = ["phaseAngle_deg", "conductor"]
+        expected = expected.sort_values(keys).reset_index(drop=True)
+        actual = actual.sort_values(keys).reset_index(drop=True)
+        assert (expected["conductor"] == actual["conductor"]).all(), name
+        for column in expected.columns:
+            if column == "conductor":
+                continue
+            want = parse_column(expected[column])
+            got = parse_column(actual[column])
+            scale = np.nanmax(np.abs(want)) if len(want) else 1.0
+            np.testing.assert_allclose(
+                got, want, rtol=1e-9, atol=1e-12 * scale, err_msg=f"{name}: {column}"
+            )
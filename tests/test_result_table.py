@@ -0,0 +1,53 @@
+# tests/test_result_table.py
+"""Die inkrementell geschriebene Ergebnisdatei `results.npz`."""
+import numpy as np
+
+from src.result_table import ResultTableBuilder, load_result_schema, load_result_table
+
+ROWS = [
+    {
+        "pos_name": f"pos_{i % 3 + 1}",
+        "current_name": "I_1_mes",
+        "conductor": ("L1", "L2", "L3")[i % 3],
+        "phaseAngle_deg": float(i * 15),
+        "conductor_A_int_Wb·m": complex(i, -i) if i % 2 else float(i),
+        "conductor_W_m_J": None if i == 4 else i * 0.5,
+        "note": "text" if i == 7 else (None if i < 7 else 1.5),
+    }
+    for i in range(10)
+]
+
+
+def test_columns_written_incrementally(tmp_path):
+    table = ResultTableBuilder(
+        ROWS[0].keys(), spill_dir=str(tmp_path / "spill"), flush_rows=3
+    )
+    for row in ROWS:
+        table.add_row(row)
+        # Höchstens `flush_rows` Zeilen bleiben im Speicher
+        assert table.pending_rows < 3
+    path = table.save(str(tmp_path))
+    assert not (tmp_path / "spill").exists()
+
+    kinds = {c["name"]: c["kind"] for c in load_result_schema(path)["columns"]}
+    assert kinds == {
+        "pos_name": "category",
+        "current_name": "category",
+        "conductor": "category",
+        "phaseAngle_deg": "float",
+        "conductor_A_int_Wb·m": "complex",
+        "conductor_W_m_J": "float",
+        "note": "category",
+    }
+
+    df = load_result_table(path)
+    assert list(df["conductor"]) == [row["conductor"] for row in ROWS]
+    assert list(df["pos_name"].cat.categories) == ["pos_1", "pos_2", "pos_3"]
+    np.testing.assert_array_equal(
+        df["conductor_A_int_Wb·m"], [complex(r["conductor_A_int_Wb·m"]) for r in ROWS]
+    )
+    assert np.isnan(df["conductor_W_m_J"][4])
+    assert list(df["note"]) == [""] * 7 + ["text", "1.5", "1.5"]
+
+    filtered = load_result_table(path, pos_name="pos_2")
+    assert list(filtered["phaseAngle_deg"]) == [15.0, 60.0, 105.0]
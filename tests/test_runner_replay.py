@@ -0,0 +1,233 @@
+# tests/test_runner_replay.py
+"""
+Läufe des `SimulationRunner` mit dem replay-Backend: CSV-Ausgabe, Bündelung
+der FEMM-Befehle und Pakete, Solve-Cache und die Modi "phasor", "basis" und "adaptive".
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.phasor import SOLUTION_MODE_COLUMN, integral_column_rotations
+from src.superposition import evaluate_scenario, main, scenario_electrical_system
+
+KEYS = ["phaseAngle_deg", "conductor"]
+
+
+def read_summaries(run_path):
+    """Liest alle `*_summary.csv` eines Laufs, sortiert nach Winkel und Leiter."""
+    tables = {}
+    for path in sorted(glob.glob(os.path.join(run_path, "*_summary.csv"))):
+        table = pd.read_csv(path).sort_values(KEYS).reset_index(drop=True)
+        tables[os.path.basename(path)] = table
+    return tables
+
+
+def numeric(values):
+    """Zahlen und als Text gespeicherte komplexe Werte als komplexes Array."""
+    return np.array([complex(str(v).replace(" ", "")) for v in values])
+
+
+def assert_same_tables(actual, expected, columns=None, rtol=1e-9):
+    assert sorted(actual) == sorted(expected)
+    for name, want in expected.items():
+        got = actual[name]
+        assert len(got) == len(want), name
+        for column in columns or want.columns:
+            if column == "conductor":
+                assert (got[column] == want[column]).all(), name
+                continue
+            if column not in want.columns:
+                continue
+            expected = numeric(want[column])
+            # Rundungsfehler um 0 relativ zur Größenordnung der Spalte
+            scale = np.nanmax(np.abs(expected)) if len(expected) else 1.0
+            np.testing.assert_allclose(
+                numeric(got[column]),
+                expected,
+                rtol=rtol,
+                atol=rtol * 1e-3 * scale,
+                err_msg=f"{name}: {column}",
+            )
+
+
+def read_status(run_path):
+    with open(
+        os.path.join(run_path, "simulation_status.json"), "r", encoding="utf-8"
+    ) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def uncached_config(replay_config):
+    replay_config["simulation_meta"]["solveCache"]["enabled"] = False
+    return replay_config
+
+
+def test_sweep_writes_one_summary_per_group(uncached_config, run_replay):
+    run_path = run_replay(uncached_config, runMode="sweep")
+
+    tables = read_summaries(run_path)
+    # 2 Positionsschritte x 2 Messströme ungleich 0
+    assert len(tables) == 4
+    for name, table in tables.items():
+        assert sorted(table["phaseAngle_deg"].unique()) == list(range(0, 361, 30))
+        assert table.groupby("phaseAngle_deg").size().nunique() == 1, name
+    status = read_status(run_path)
+    assert status["status"] == "complete"
+    assert status["completed"] == status["total"]
+
+
+def test_batching_does_not_change_results(uncached_config, run_replay):
+    reference = read_summaries(
+        run_replay(uncached_config, runMode="sweep", femmBatchSize=0, chunkSize=1)
+    )
+    batched = read_summaries(
+        run_replay(uncached_config, runMode="sweep", femmBatchSize=64, chunkSize=5)
+    )
+    grouped = read_summaries(run_replay(uncached_config, runMode="grouped"))
+
+    assert_same_tables(batched, reference)
+    assert_same_tables(grouped, reference)
+
+
+def test_replay_backend_is_not_cached(replay_config, run_replay):
+    run_path = run_replay(replay_config, runMode="sweep")
+
+    assert "cache" not in read_status(run_path)
+
+
+def test_cache_hits_reproduce_results(replay_config, run_replay, monkeypatch):
+    # Der Cache ist nur für echte Solver aktiv; das replay-Backend gibt sich
+    # hier als pyfemm aus, damit der Cache verwendet wird
+    monkeypatch.setattr(
+        "src.simulation_runner.solver_identity", lambda spec: {"type": "pyfemm"}
+    )
+    first = run_replay(replay_config, runMode="sweep")
+    second = run_replay(replay_config, runMode="sweep")
+
+    assert read_status(first)["cache"]["hits"] == 0
+    cache = read_status(second)["cache"]
+    assert cache["hits"] > 0 and cache["misses"] == 0
+    assert_same_tables(read_summaries(second), read_summaries(first))
+    # Die Lösungsdateien werden aus dem Cache wiederhergestellt
+    first_ans = sorted(
+        os.path.relpath(p, first)
+        for p in glob.glob(os.path.join(first, "femm_files", "*", "*.ans"))
+    )
+    second_ans = sorted(
+        os.path.relpath(p, second)
+        for p in glob.glob(os.path.join(second, "femm_files", "*", "*.ans"))
+    )
+    assert first_ans and second_ans == first_ans
+
+
+def test_phasor_rows_match_sweep(uncached_config, run_replay):
+    sweep = read_summaries(run_replay(uncached_config, runMode="sweep"))
+    phasor = read_summaries(run_replay(uncached_config, runMode="phasor"))
+
+    # Das replay-Modell ist linear: lineare Größen und die Stromkreiswerte
+    # der einen Zeiger-Lösung müssen bei jedem Winkel dem Sweep entsprechen
+    linear_columns = [
+        col for col, multiple in integral_column_rotations().items() if multiple == 1
+    ]
+    circuit_columns = [
+        "Isec_real_A",
+        "Isec_imag_A",
+        "circuit_voltage_real_V",
+        "circuit_voltage_imag_V",
+    ]
+    for name, table in phasor.items():
+        assert (table[SOLUTION_MODE_COLUMN] == "phasor").all(), name
+        assert_same_tables(
+            {name: table},
+            {name: sweep[name]},
+            KEYS
+            + ["conductor_A_Block_m²", "core_A_Block_m²"]
+            + linear_columns
+            + circuit_columns,
+        )
+    assert set(linear_columns) & set(next(iter(sweep.values())).columns)
+
+
+def test_basis_matches_sweep(uncached_config, run_replay):
+    sweep = read_summaries(run_replay(uncached_config, runMode="sweep"))
+    basis_run = run_replay(uncached_config, runMode="basis")
+
+    assert_same_tables(read_summaries(basis_run), sweep)
+    assert sorted(os.listdir(os.path.join(basis_run, "basis"))) == [
+        "pos_1.npz",
+        "pos_2.npz",
+    ]
+
+
+def test_scenario_from_basis_matches_sweep(uncached_config, run_replay, tmp_path):
+    # Unsymmetrische Phasenlagen mit einem Effektivwert, der nicht in
+    # `scenarioParams` steht, gegen einen Sweep mit genau diesen Strömen
+    shifts = {"L1": 0, "L2": 90, "L3": -150}
+    basis_run = run_replay(uncached_config, runMode="basis")
+    for phase in uncached_config["electricalSystem"]:
+        phase["phaseShiftDeg"] = shifts[phase["name"]]
+    uncached_config["scenarioParams"].update(I_1_mes="3000", I_2_mes="0")
+    sweep = read_summaries(run_replay(uncached_config, runMode="sweep"))
+
+    with open(
+        os.path.join(basis_run, "simulation_run.json"), "r", encoding="utf-8"
+    ) as f:
+        run_data = json.load(f)
+    electrical_system = scenario_electrical_system(
+        run_data, 3000, {name: (3000, shift) for name, shift in shifts.items()}
+    )
+    rows = pd.DataFrame(
+        evaluate_scenario(basis_run, electrical_system, angles_deg=range(0, 361, 30))
+    )
+    scenario = {
+        f"{pos_name}_I_1_mes_summary.csv": table.sort_values(KEYS).reset_index(
+            drop=True
+        )
+        for pos_name, table in rows.groupby("pos_name")
+    }
+    assert_same_tables(scenario, sweep)
+
+    # Dasselbe Szenario über die Kommandozeile
+    output = tmp_path / "scenario.csv"
+    assert (
+        main(
+            [
+                basis_run,
+                "--rms",
+                "3000",
+                "--angles",
+                "0:360:30",
+                "--output",
+                str(output),
+            ]
+            + [f"--current={name}=3000@{shift}" for name, shift in shifts.items()]
+        )
+        == 0
+    )
+    table = pd.read_csv(output)
+    cli = {
+        f"{pos_name}_I_1_mes_summary.csv": group.sort_values(KEYS).reset_index(
+            drop=True
+        )
+        for pos_name, group in table.groupby("pos_name")
+    }
+    assert_same_tables(cli, sweep)
+
+
+def test_adaptive_solves_fewer_angles_and_matches_sweep(uncached_config, run_replay):
+    sweep = read_summaries(run_replay(uncached_config, runMode="sweep"))
+    run_path = run_replay(uncached_config, runMode="adaptive")
+
+    targets = len(range(0, 360, 30))
+    groups = glob.glob(os.path.join(run_path, "femm_files", "*"))
+    assert len(groups) == 4
+    for group in groups:
+        solved = glob.glob(os.path.join(group, "*.ans"))
+        assert 0 < len(solved) < targets, group
+    # Das replay-Modell ist linear; das Grundmodell ist damit exakt
+    assert_same_tables(read_summaries(run_path), sweep, rtol=1e-6)
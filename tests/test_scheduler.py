@@ -0,0 +1,32 @@
+# tests/test_scheduler.py
+"""Paketbildung der Aufgaben im Prozess-Pool."""
+from src.scheduler import CostModel, default_chunk_size, schedule_batches
+
+
+def sweep_tasks(step_config, positions, currents, angles):
+    """Aufgaben-Tupel wie im Modus "sweep"."""
+    return [
+        (None, step_config, None, angle, f"{pos}_{cur}_angle{angle}", {}, pos, cur)
+        for pos in positions
+        for cur in currents
+        for angle in angles
+    ]
+
+
+def test_default_chunk_groups_angles_of_a_position(replay_config, tmp_path):
+    tasks = sweep_tasks(
+        replay_config, ["pos_1", "pos_2"], ["I_1_mes"], range(0, 180, 30)
+    )
+    assert default_chunk_size(tasks, "sweep") == 6
+    assert default_chunk_size(tasks, "grouped") == 1
+
+    batches = schedule_batches(
+        tasks, "sweep", CostModel(str(tmp_path / "history.json"))
+    )
+    assert len(batches) == 2
+    assert all(len({task[6] for task in batch}) == 1 for batch in batches)
+
+    batches = schedule_batches(
+        tasks, "sweep", CostModel(str(tmp_path / "history.json")), chunk_size=4
+    )
+    assert sorted(len(batch) for batch in batches) == [2, 2, 4, 4]
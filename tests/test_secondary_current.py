@@ -0,0 +1,117 @@
+# tests/test_secondary_current.py
+"""
+Sekundärströme über den mittleren Kernpfad: analytisch am Feld eines
+Linienstroms und die Fehlerbehandlung an den Lösungen eines replay-Laufs.
+"""
+import glob
+import logging
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.fem_solution import FemSolution
+from src.fem_writer import MU0, FemModel
+from src.secondary_current import (
+    MEAN_PATH_COLUMNS,
+    add_mean_path_columns,
+    mean_path_values,
+)
+
+GEOMETRY = {
+    "coreMaterial": "Core",
+    "coreOuterWidth": 60,
+    "coreOuterHeight": 100,
+    "coreInnerWidth": 40,
+    "coreInnerHeight": 80,
+}
+
+
+def line_current_solution(tmp_path, current, mu_r, half_size=50, step=1.0):
+    """
+    Das Feld eines Linienstroms im Ursprung, A = −μ0·μr·I/(2π)·ln r, auf
+    einem Gitter in mm, das den Ursprung selbst auslässt, als `FemSolution`.
+    """
+    model = FemModel()
+    model.new_document(0)
+    model.prob_def(0, "millimeters", "planar", 1e-8, 1000)
+    model.add_material("Core", mu_x=mu_r, mu_y=mu_r)
+    model.draw_rectangle(-half_size, -half_size, half_size, half_size)
+    model.add_block_label(half_size / 2, half_size / 2)
+    model.select_label(half_size / 2, half_size / 2)
+    model.set_block_prop("Core", 1, 0, "<None>", 0, 2, 0)
+
+    coords = np.arange(-half_size + step / 2, half_size, step)
+    n = len(coords)
+    x, y = np.meshgrid(coords, coords)
+    radius = np.hypot(x, y).ravel() * 1e-3
+    potential = -MU0 * mu_r * current / (2 * math.pi) * np.log(radius)
+    corner = (np.arange(n - 1)[:, None] * n + np.arange(n - 1)).ravel()
+    triangles = np.concatenate(
+        [
+            np.column_stack([corner, corner + 1, corner + n + 1]),
+            np.column_stack([corner, corner + n + 1, corner + n]),
+        ]
+    )
+    lines = ["[Solution]", str(n * n)]
+    lines += [f"{a} {b} {p:.17g} 0" for a, b, p in zip(x.ravel(), y.ravel(), potential)]
+    lines += [str(len(triangles))] + [f"{a} {b} {c} 0" for a, b, c in triangles]
+    lines.append("0")
+    path = tmp_path / "line_current.ans"
+    path.write_text(model.to_text() + "\n".join(lines) + "\n", encoding="utf-8")
+    return FemSolution.load(str(path))
+
+
+def test_mmf_equals_line_current(tmp_path):
+    current, w2 = 1000.0, 600.0
+    solution = line_current_solution(tmp_path, current, mu_r=1000)
+
+    values = mean_path_values(
+        solution, [{"phase": "L1", "x": 0, "y": 0, "geometry": GEOMETRY, "w2": w2}]
+    )["L1"]
+
+    # Durchflutungsgesetz: ∮H·dl = I, unabhängig von μr und Pfadform
+    assert values["meanPath_lm_m"] == pytest.approx(2 * (0.05 + 0.09))
+    assert values["meanPath_μr"] == 1000
+    assert values["meanPath_Θ_A"].real == pytest.approx(current, rel=1e-3)
+    assert values["meanPath_Isek_A"].real == pytest.approx(current / w2, rel=1e-3)
+
+
+@pytest.fixture
+def replay_run(replay_config, run_replay):
+    """Ein replay-Lauf; seine .ans-Dateien sind Platzhalter ohne Lösung."""
+    replay_config["simulation_meta"]["solveCache"]["enabled"] = False
+    return run_replay(replay_config, runMode="sweep", meanPathCurrents=True)
+
+
+def test_unreadable_solutions_leave_nan_and_do_not_fail_the_run(replay_run, caplog):
+    summaries = glob.glob(os.path.join(replay_run, "*_summary.csv"))
+    assert summaries
+    for path in summaries:
+        table = pd.read_csv(path)
+        for column in MEAN_PATH_COLUMNS:
+            assert table[column].isna().all(), column
+
+    with caplog.at_level(logging.WARNING):
+        assert add_mean_path_columns(replay_run) == 0
+    errors = [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert errors and "nicht auswertbar" in errors[0].getMessage()
+    assert any(
+        "ohne Werte des mittleren Kernpfads" in r.getMessage() for r in caplog.records
+    )
+
+
+def test_missing_solutions_are_counted(replay_run, caplog):
+    for path in glob.glob(
+        os.path.join(replay_run, "femm_files", "**", "*.ans"), recursive=True
+    ):
+        os.remove(path)
+
+    with caplog.at_level(logging.WARNING):
+        assert add_mean_path_columns(replay_run) == 0
+    assert not [r for r in caplog.records if r.levelno == logging.ERROR]
+    assert any(
+        "ohne Werte des mittleren Kernpfads" in r.getMessage() for r in caplog.records
+    )
@@ -0,0 +1,111 @@
+# tests/test_worker_session.py
+"""
+Die FEMM-Sitzung der Worker (`init_worker`, `_acquire_session`,
+`_release_session`) gegen einen geskripteten Ersatz des Moduls `femm`.
+"""
+import json
+import sys
+import types
+
+import pytest
+
+from src import simulation_worker
+from src.simulation_runner import SimulationRunner
+
+
+class ScriptedFemm(types.ModuleType):
+    """
+    Ersatz für pyfemm: zählt die Aufrufe, beantwortet Abfragen mit Nullen und
+    lässt auf Wunsch die n-te Analyse scheitern.
+    """
+
+    def __init__(self, fail_on_analysis=None):
+        super().__init__("femm")
+        self.calls = []
+        self.analyses = 0
+        self.fail_on_analysis = fail_on_analysis
+
+    def count(self, name):
+        return self.calls.count(name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(*args):
+            self.calls.append(name)
+            if name == "mi_analyze":
+                self.analyses += 1
+                if self.analyses == self.fail_on_analysis:
+                    raise RuntimeError("FEMM abgestürzt")
+            if name == "mo_getcircuitproperties":
+                return (0.0, 0.0, 0.0)
+            if name == "mo_blockintegral":
+                return 0.0
+            return None
+
+        return call
+
+
+@pytest.fixture
+def sweep_tasks(replay_config, tmp_path):
+    """Die Aufgaben eines Laufs im Modus "sweep"."""
+    replay_config["simulation_meta"]["solveCache"]["enabled"] = False
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(replay_config), encoding="utf-8")
+    runner = SimulationRunner(
+        config_path=str(config_path), base_path=str(tmp_path / "run")
+    )
+    return runner._prepare_all_tasks("sweep")
+
+
+@pytest.fixture
+def scripted_worker(monkeypatch):
+    """Initialisiert den aktuellen Prozess als Worker mit dem Ersatz für `femm`."""
+
+    def start(max_tasks, fail_on_analysis=None):
+        femm = ScriptedFemm(fail_on_analysis)
+        monkeypatch.setitem(sys.modules, "femm", femm)
+        simulation_worker.init_worker(max_tasks, backend="pyfemm")
+        return femm
+
+    yield start
+    simulation_worker.close_worker_session()
+
+
+def run_batch(tasks):
+    _, results = simulation_worker.run_task_batch(
+        (0, simulation_worker.run_single_simulation, tasks)
+    )
+    return results
+
+
+def test_one_session_per_worker_and_a_fresh_document_per_task(
+    sweep_tasks, scripted_worker
+):
+    femm = scripted_worker(max_tasks=100)
+
+    results = run_batch(sweep_tasks[:5])
+
+    assert all(rows and not failed for rows, _, _, failed in results)
+    assert femm.count("openfemm") == 1
+    assert femm.count("closefemm") == 0
+    assert femm.count("newdocument") == 5
+    # Vor jeder weiteren Aufgabe wird die Sitzung geleert
+    assert femm.count("mi_close") == 4
+
+
+def test_session_is_recycled_after_max_tasks_and_after_an_error(
+    sweep_tasks, scripted_worker
+):
+    femm = scripted_worker(max_tasks=3, fail_on_analysis=5)
+
+    results = run_batch(sweep_tasks[:7])
+
+    failed = [failed for _, _, _, failed in results]
+    assert failed == [False, False, False, False, True, False, False]
+    assert results[4][0] == []
+    # Sitzung 1: Aufgaben 1-3 (Limit), Sitzung 2: 4-5 (Fehler), Sitzung 3: 6-7
+    assert femm.count("openfemm") == 3
+    assert femm.count("closefemm") == 2
+    assert femm.count("newdocument") == 7
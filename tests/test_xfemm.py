@@ -0,0 +1,119 @@
+# tests/test_xfemm.py
+"""
+Das xfemm-Backend: die Prüfung der Konfiguration vor dem Start, der
+abgeschaltete Plot-Modus und ein vollständiger Lauf mit `fmesher` und
+`fsolver`, sofern installiert.
+"""
+import glob
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from server import analysis
+from src.femm_backends import check_xfemm_config
+from src.simulation_runner import SimulationRunner
+
+XFEMM = {"type": "xfemm", "openBoundary": "asymptotic"}
+
+
+@pytest.fixture
+def xfemm_config(replay_config):
+    """Ein Positionsschritt, ein Messstrom und zwei Winkel ohne Spannungstensor."""
+    meta = replay_config["simulation_meta"]
+    meta["bewegungspfade_alle_leiter"]["schritte_details"] = meta[
+        "bewegungspfade_alle_leiter"
+    ]["schritte_details"][:1]
+    meta.update(
+        {
+            "femmBackend": dict(XFEMM),
+            "selectedIntegrals": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 17],
+            "solveCache": {"enabled": False},
+        }
+    )
+    replay_config["scenarioParams"]["I_2_mes"] = "0"
+    replay_config["scenarioParams"]["phaseSweep"] = {
+        "start": "0",
+        "end": "30",
+        "step": "30",
+    }
+    return replay_config
+
+
+def test_supported_config_passes(xfemm_config):
+    check_xfemm_config(XFEMM, xfemm_config)
+
+
+@pytest.mark.parametrize(
+    "change, reason",
+    [
+        (lambda spec, config: spec.pop("openBoundary"), "mi_makeABC"),
+        (
+            lambda spec, config: config["simulation_meta"].update(
+                selectedIntegrals=[5, 18]
+            ),
+            "Spannungstensor",
+        ),
+        (
+            lambda spec, config: config["materials"][2].update(is_nonlinear=1),
+            "M-36 Steel",
+        ),
+    ],
+)
+def test_unsupported_config_is_rejected_before_the_run(
+    xfemm_config, tmp_path, change, reason
+):
+    spec = dict(XFEMM)
+    change(spec, xfemm_config)
+    xfemm_config["simulation_meta"]["femmBackend"] = spec
+
+    with pytest.raises(ValueError, match=reason):
+        check_xfemm_config(spec, xfemm_config)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(xfemm_config), encoding="utf-8")
+    with pytest.raises(ValueError, match=reason):
+        SimulationRunner(config_path=str(config_path), base_path=str(tmp_path / "run"))
+
+
+def test_plots_stay_off_for_the_stored_run(xfemm_config, tmp_path):
+    xfemm_config["simulation_meta"]["plotMode"] = "all"
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(xfemm_config), encoding="utf-8")
+    run_path = tmp_path / "run"
+
+    runner = SimulationRunner(config_path=str(config_path), base_path=str(run_path))
+
+    assert runner.plot_mode == "off"
+    stored = json.loads((run_path / "simulation_run.json").read_text("utf-8"))
+    assert stored["simulation_meta"]["plotMode"] == "off"
+    assert stored["simulation_meta"]["femmBackend"] == XFEMM
+    # Auch ein älterer Lauf mit "lazy" wird vom Server nicht gerendert
+    stored["simulation_meta"]["plotMode"] = "lazy"
+    (run_path / "simulation_run.json").write_text(json.dumps(stored), "utf-8")
+    assert analysis._render_missing_plots(str(run_path), "pos_1", "I_1_mes") == 0
+    assert not analysis._PLOT_RENDERERS
+
+
+@pytest.mark.skipif(
+    not (shutil.which("fmesher") and shutil.which("fsolver")),
+    reason="fmesher und fsolver von xfemm sind nicht installiert",
+)
+def test_run_with_fmesher_and_fsolver(xfemm_config, run_replay):
+    run_path = run_replay(xfemm_config, runMode="sweep", workers=1)
+
+    summaries = glob.glob(os.path.join(run_path, "*_summary.csv"))
+    assert len(summaries) == 1
+    table = pd.read_csv(summaries[0])
+    assert sorted(table["phaseAngle_deg"].unique()) == [0, 30]
+    # Kernfläche 60 x 160 mm abzüglich 40 x 140 mm
+    np.testing.assert_allclose(table["core_A_Block_m²"].dropna(), 4e-3, rtol=1e-9)
+    # Alle ausgewählten Integrale liegen vor, auch Energie und Verluste
+    for column in table.columns:
+        if column.startswith("conductor_"):
+            assert np.isfinite(table[column].astype(float)).all(), column
+    assert glob.glob(
+        os.path.join(run_path, "femm_files", "**", "*.ans"), recursive=True
+    )